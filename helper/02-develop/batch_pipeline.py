@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量无界面流水线：STL 目录 → 中心线 → 重采样 → VTL3D 轮廓 CSV。
+
+控制进程（普通 Python）为每个 STL 启动一个 `Slicer --no-main-window` 工作进程，
+最多 -j 个同时运行；工作进程（同一脚本，在 Slicer 内以 --worker 运行）依次执行
+1. 载入 STL；
+2. ExtractCenterlineLogic.preprocess（抽稀/清理/三角化）；
+3. 自动端点：extractNetwork + getEndPoints（与模块界面 "Auto-detect" 相同，
+   半径最大的端点为起点）；
+4. ExtractCenterlineLogic.extractCenterline；
+5. 取最长的一条中心线按弧长等距重采样；
+6. contour_slicing 批量切割原始（未抽稀）表面，按 VTL3D 约定写出轮廓 CSV，
+   同时写出 centerline.csv (cm)。
+每个模型的各阶段耗时、截面数与错误写入 <out>/<model>/result.json；工作进程崩溃
+或超时时由控制进程补记。全部结果汇总为 <out>/manifest.json 与 manifest.csv。
+
+用法:
+    python batch_pipeline.py stl_dir -o out_dir --slicer /opt/Slicer/Slicer -j 4
+    python batch_pipeline.py stl_dir -o out_dir --spacing 0.5 --timeout 1800
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+HELPER_DIR = os.path.dirname(os.path.abspath(__file__))
+if HELPER_DIR not in sys.path:
+    sys.path.insert(0, HELPER_DIR)
+
+# ----------------- 默认参数 -----------------
+DEFAULT_SLICER = "Slicer"
+DEFAULT_TARGET_POINTS = 5000         # 与 Extract Centerline 模块默认值一致
+DEFAULT_DECIMATION_AGGRESSIVENESS = 4.0
+DEFAULT_CURVE_SAMPLING = 1.0         # extractCenterline 的采样间距 (mm)
+DEFAULT_SPACING = 1.0                # 截面间距 (mm)
+DEFAULT_TIMEOUT = 3600.0             # 单个模型的超时 (s)
+MIN_PTS_PER_SLICE = 3
+STAGES = ["load", "preprocess", "endpoints", "centerline", "resample", "contours"]
+RESULT_NAME = "result.json"
+
+
+def log(msg: str) -> None:
+    print(f"[BatchPipeline] {msg}", flush=True)
+
+
+# ----------------- 几何（工作进程） -----------------
+
+def reference_axes(n_vec: np.ndarray):
+    """给定法线 n，返回局部正交基 (t, b)；与 slicer_generate_vtl3d_csv.py 相同"""
+    ref = np.array([0.0, 0.0, 1.0]) if abs(n_vec[2]) < 0.9 else np.array([0.0, 1.0, 0.0])
+    t = np.cross(n_vec, ref)
+    t /= np.linalg.norm(t)
+    return t, np.cross(n_vec, t)
+
+
+def resample_polyline(points: np.ndarray, spacing: float) -> np.ndarray:
+    """按弧长等距重采样折线，首尾点保留；返回 (n,3)"""
+    seg = np.linalg.norm(np.diff(points, axis=0), axis=1)
+    keep = np.concatenate(([True], seg > 0))
+    points = points[keep]
+    s = np.concatenate(([0.0], np.cumsum(seg[seg > 0])))
+    n = max(2, int(math.ceil(s[-1] / spacing)) + 1)
+    t = np.linspace(0.0, s[-1], n)
+    return np.column_stack([np.interp(t, s, points[:, k]) for k in range(3)])
+
+
+def longest_centerline(centerline_polydata) -> np.ndarray:
+    """中心线 polydata 中最长（弧长）的一条 cell 的点 (n,3)，方向为起点 → 终点"""
+    from vtk.util.numpy_support import vtk_to_numpy  # type: ignore
+    all_points = vtk_to_numpy(centerline_polydata.GetPoints().GetData())
+    best, best_length = None, -1.0
+    for cell_id in range(centerline_polydata.GetNumberOfCells()):
+        ids = centerline_polydata.GetCell(cell_id).GetPointIds()
+        pts = all_points[[ids.GetId(i) for i in range(ids.GetNumberOfIds())]]
+        if len(pts) < 2:
+            continue
+        length = float(np.linalg.norm(np.diff(pts, axis=0), axis=1).sum())
+        if length > best_length:
+            best, best_length = pts, length
+    if best is None:
+        raise RuntimeError("中心线为空")
+    return np.array(best, dtype=float)
+
+
+def write_vtl3d_contours(writer, batch, clockwise: bool = False) -> List[np.ndarray]:
+    """
+    按 VTL3D 约定写出全部有效截面：中心点 mm → cm，scale 为等效半径 (cm)，
+    局部坐标除以等效半径 (mm) 无量纲化并按极角排序，法线写为 (N[1], N[0])。
+    cutter 输出为线段、batch.areas 为 0 时，面积取极角排序后多边形的鞋带公式面积
+    （slicer_generate_vtl3d_csv.py 此时退化为半径 1.0）。
+    返回写出截面的中心点 (cm)。
+    """
+    from contour_slicing import polar_sort_order, project_local
+    counts = batch.counts()
+    centers = []
+    for idx in range(len(batch)):
+        if counts[idx] < MIN_PTS_PER_SLICE:
+            continue
+        n_vec = batch.normals[idx]
+        t, b = reference_axes(n_vec)
+        local_y, local_z = project_local(batch, idx, t, b)
+        order = polar_sort_order(local_y, local_z, clockwise)
+        local_y, local_z = local_y[order], local_z[order]
+        area = batch.areas[idx]
+        if area <= 0:
+            area = 0.5 * abs(float(np.dot(local_y, np.roll(local_z, -1)) - np.dot(local_z, np.roll(local_y, -1))))
+        r_mm = math.sqrt(area / math.pi)
+        if r_mm >= 1e-9:
+            local_y, local_z = local_y / r_mm, local_z / r_mm
+        center_cm = batch.origins[idx] / 10.0
+        writer.write_section(center_cm, (n_vec[1], n_vec[0]), r_mm / 10.0, local_y, local_z)
+        centers.append(center_cm)
+    return centers
+
+
+# ----------------- 工作进程（Slicer 内） -----------------
+
+def run_model(stl_path: str, out_dir: str, args) -> Dict:
+    """在当前 Slicer 进程中处理一个 STL，返回结果字典（同时写入 result.json）"""
+    import slicer  # type: ignore
+    import vtk  # type: ignore
+    from ExtractCenterline import ExtractCenterlineLogic  # type: ignore
+    from contour_io import open_contour_writer
+    from contour_slicing import compute_tangents, slice_polydata
+
+    result = {"model": os.path.splitext(os.path.basename(stl_path))[0], "stl": stl_path,
+              "status": "failed", "stage": None, "error": None, "timings": {}}
+    os.makedirs(out_dir, exist_ok=True)
+    contour_csv = os.path.join(out_dir, "contour.csv")
+    stage_start = time.perf_counter()
+
+    def finish_stage(name):
+        nonlocal stage_start
+        now = time.perf_counter()
+        result["timings"][name] = round(now - stage_start, 4)
+        stage_start = now
+        result["stage"] = None
+
+    try:
+        result["stage"] = "load"
+        model_node = slicer.util.loadModel(stl_path)
+        surface = vtk.vtkPolyData()
+        surface.DeepCopy(model_node.GetPolyData())
+        result["inputPoints"] = surface.GetNumberOfPoints()
+        finish_stage("load")
+
+        logic = ExtractCenterlineLogic()
+        result["stage"] = "preprocess"
+        preprocessed = logic.preprocess(surface, args.target_points, args.decimation_aggressiveness,
+                                        args.subdivide)
+        finish_stage("preprocess")
+
+        result["stage"] = "endpoints"
+        endpoints_node = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLMarkupsFiducialNode", "Centerline endpoints")
+        network = logic.extractNetwork(preprocessed, endpoints_node)
+        positions = logic.getEndPoints(network, startPointPosition=None)
+        if len(positions) < 2:
+            raise RuntimeError(f"只检测到 {len(positions)} 个端点")
+        for position in positions:
+            endpoints_node.AddControlPoint(vtk.vtkVector3d(position))
+        # 未选中的第一个点为起点（半径最大）
+        endpoints_node.SetNthControlPointSelected(0, False)
+        result["endpoints"] = [list(map(float, p)) for p in positions]
+        finish_stage("endpoints")
+
+        result["stage"] = "centerline"
+        centerline_polydata, _ = logic.extractCenterline(preprocessed, endpoints_node, args.curve_sampling)
+        finish_stage("centerline")
+
+        result["stage"] = "resample"
+        points = resample_polyline(longest_centerline(centerline_polydata), args.spacing)
+        tangents = compute_tangents(points)
+        finish_stage("resample")
+
+        result["stage"] = "contours"
+        batch = slice_polydata(surface, points, tangents, max_workers=args.slice_workers)
+        with open_contour_writer(contour_csv) as writer:
+            centers = write_vtl3d_contours(writer, batch, args.clockwise)
+        with open(os.path.join(out_dir, "centerline.csv"), "w", newline="") as f:
+            w = csv.writer(f, delimiter=";")
+            w.writerow(["X", "Y", "Z"])
+            w.writerows(np.asarray(centers).tolist())
+        result["sections"] = len(points)
+        result["savedSections"] = len(centers)
+        result["contourCsv"] = contour_csv
+        finish_stage("contours")
+        result["status"] = "ok"
+    except Exception as exc:
+        result["error"] = f"{type(exc).__name__}: {exc}"
+        result["traceback"] = traceback.format_exc()
+    result["total"] = round(sum(result["timings"].values()), 4)
+    with open(os.path.join(out_dir, RESULT_NAME), "w") as f:
+        json.dump(result, f, indent=2)
+    return result
+
+
+def worker_main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Batch pipeline worker (run inside Slicer)")
+    parser.add_argument("--worker", action="store_true")
+    parser.add_argument("stl")
+    parser.add_argument("out_dir")
+    add_pipeline_arguments(parser)
+    args = parser.parse_args(argv)
+    result = run_model(args.stl, args.out_dir, args)
+    if result["status"] != "ok":
+        print(result.get("traceback", ""), file=sys.stderr)
+    return 0 if result["status"] == "ok" else 1
+
+
+# ----------------- 控制进程 -----------------
+
+def add_pipeline_arguments(parser: argparse.ArgumentParser) -> None:
+    """控制进程与工作进程共用的流水线参数"""
+    parser.add_argument("--target-points", type=float, default=DEFAULT_TARGET_POINTS,
+                        help="Preprocessing target number of points")
+    parser.add_argument("--decimation-aggressiveness", type=float, default=DEFAULT_DECIMATION_AGGRESSIVENESS)
+    parser.add_argument("--subdivide", action="store_true", help="Subdivide the surface during preprocessing")
+    parser.add_argument("--curve-sampling", type=float, default=DEFAULT_CURVE_SAMPLING,
+                        help="Centerline sampling distance in mm")
+    parser.add_argument("--spacing", type=float, default=DEFAULT_SPACING, help="Cross-section spacing in mm")
+    parser.add_argument("--clockwise", action="store_true", help="Clockwise contour point order")
+    parser.add_argument("--slice-workers", type=int, default=None, help="Slicing threads per worker")
+
+
+def pipeline_argv(args) -> List[str]:
+    """把控制进程的流水线参数转发给工作进程"""
+    argv = ["--target-points", str(args.target_points),
+            "--decimation-aggressiveness", str(args.decimation_aggressiveness),
+            "--curve-sampling", str(args.curve_sampling),
+            "--spacing", str(args.spacing)]
+    if args.subdivide:
+        argv.append("--subdivide")
+    if args.clockwise:
+        argv.append("--clockwise")
+    if args.slice_workers:
+        argv += ["--slice-workers", str(args.slice_workers)]
+    return argv
+
+
+def _tail(path: str, n: int = 20) -> str:
+    try:
+        with open(path, errors="replace") as f:
+            return "".join(f.readlines()[-n:])
+    except OSError:
+        return ""
+
+
+def launch_worker(stl_path: str, args) -> Dict:
+    """启动一个 Slicer 工作进程处理 stl_path，返回其 result.json（或失败记录）"""
+    model = os.path.splitext(os.path.basename(stl_path))[0]
+    out_dir = os.path.join(args.output, model)
+    os.makedirs(out_dir, exist_ok=True)
+    result_path = os.path.join(out_dir, RESULT_NAME)
+    if os.path.exists(result_path):
+        os.remove(result_path)
+    log_path = os.path.join(out_dir, "slicer.log")
+    cmd = [args.slicer, "--no-main-window", "--no-splash", "--python-script", os.path.abspath(__file__),
+           "--", "--worker", stl_path, out_dir] + pipeline_argv(args)
+
+    start = time.perf_counter()
+    returncode: Optional[int] = None
+    error = None
+    with open(log_path, "w") as log_file:
+        try:
+            returncode = subprocess.run(cmd, stdout=log_file, stderr=subprocess.STDOUT, timeout=args.timeout).returncode
+        except subprocess.TimeoutExpired:
+            error = f"Timeout after {args.timeout:.0f} s"
+        except OSError as exc:
+            error = f"Cannot start Slicer: {exc}"
+    wall = round(time.perf_counter() - start, 4)
+
+    if os.path.exists(result_path):
+        with open(result_path) as f:
+            result = json.load(f)
+    else:
+        # 工作进程崩溃 / 超时 / 未启动：result.json 未写出
+        result = {"model": model, "stl": stl_path, "status": "failed", "stage": None, "timings": {},
+                  "error": error or f"Slicer exited with code {returncode} without a result",
+                  "logTail": _tail(log_path)}
+    result["returncode"] = returncode
+    result["wallTime"] = wall
+    result["log"] = log_path
+    return result
+
+
+def write_manifest(output: str, results: List[Dict], elapsed: float) -> None:
+    """manifest.json（完整记录）与 manifest.csv（每行一个模型）"""
+    n_ok = sum(r["status"] == "ok" for r in results)
+    with open(os.path.join(output, "manifest.json"), "w") as f:
+        json.dump({"models": len(results), "succeeded": n_ok, "failed": len(results) - n_ok,
+                   "elapsed": round(elapsed, 4), "results": results}, f, indent=2)
+    with open(os.path.join(output, "manifest.csv"), "w", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["model", "status", "wall_s"] + [f"{s}_s" for s in STAGES] + ["sections", "failed_stage", "error"])
+        for r in results:
+            w.writerow([r["model"], r["status"], r.get("wallTime", "")]
+                       + [r["timings"].get(s, "") for s in STAGES]
+                       + [r.get("savedSections", ""), r.get("stage") or "", (r.get("error") or "").replace("\n", " ")])
+
+
+def run_batch(args) -> List[Dict]:
+    if not os.path.isdir(args.stl_dir):
+        raise SystemExit(f"STL directory not found: {args.stl_dir}")
+    # 按扩展名（不区分大小写）筛选，避免在不区分大小写的文件系统上重复列出
+    stl_files = sorted(os.path.join(args.stl_dir, name) for name in os.listdir(args.stl_dir)
+                       if os.path.splitext(name)[1].lower() == ".stl"
+                       and os.path.isfile(os.path.join(args.stl_dir, name)))
+    if not stl_files:
+        raise SystemExit(f"No STL files in {args.stl_dir}")
+    os.makedirs(args.output, exist_ok=True)
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.slice_workers is None:
+        # 各工作进程平分 CPU，避免切割线程超额订阅
+        args.slice_workers = max(1, (os.cpu_count() or 1) // jobs)
+    log(f"{len(stl_files)} models, {jobs} Slicer workers -> {args.output}")
+
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        for result in pool.map(lambda p: launch_worker(p, args), stl_files):
+            status = "ok" if result["status"] == "ok" else f"FAILED ({result.get('error')})"
+            log(f"{result['model']}: {result['wallTime']:.1f} s {status}")
+            results.append(result)
+    elapsed = time.perf_counter() - start
+    write_manifest(args.output, results, elapsed)
+    n_failed = sum(r["status"] != "ok" for r in results)
+    log(f"Done in {elapsed:.1f} s: {len(results) - n_failed} ok, {n_failed} failed; "
+        f"manifest -> {os.path.join(args.output, 'manifest.json')}")
+    return results
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Batch STL -> centerline -> contour CSV pipeline")
+    parser.add_argument("stl_dir", help="Directory of STL files")
+    parser.add_argument("-o", "--output", default="batch_output", help="Output directory")
+    parser.add_argument("--slicer", default=os.environ.get("SLICER_EXECUTABLE", DEFAULT_SLICER),
+                        help="Slicer executable (default: $SLICER_EXECUTABLE or 'Slicer')")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Concurrent Slicer workers (default: CPU count)")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-model timeout in s")
+    add_pipeline_arguments(parser)
+    args = parser.parse_args(argv)
+    args.output = os.path.abspath(args.output)
+    results = run_batch(args)
+    return 0 if all(r["status"] == "ok" for r in results) else 1
+
+
+if __name__ == "__main__":
+    argv = sys.argv[1:]
+    if argv[:1] == ["--"]:
+        argv = argv[1:]
+    if "--worker" in argv:
+        exit_code = worker_main(argv)
+        import slicer  # type: ignore
+        slicer.util.exit(exit_code)
+    else:
+        sys.exit(main(argv))
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+对比截面/分段几何计算的两条路径：
+
+1. 逐段路径：helper03/02-ex-csv-gui.py 中的 prepare_section_data +
+   compute_segment_geometry_scalar（每截面建字典、每分段调用标量函数）；
+2. 向量化路径：contour_geometry.analyse_contours（全部截面一次完成）。
+
+生成一条合成声道（圆弧 + 直段，椭圆截面），先写成 CSV，再分别计时
+「读取 + 几何」两阶段，并校验两条路径的长度/曲率/出口点一致。
+
+运行示例：
+    python bench_contour_geometry.py                 # 默认 1k/5k/10k 截面
+    python bench_contour_geometry.py -n 2000 -p 400  # 指定截面数与每截面点数
+"""
+
+import argparse
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from contour_geometry import analyse_contours
+from contour_io import load_contours, open_contour_writer
+
+GUI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "helper03", "02-ex-csv-gui.py")
+
+
+def load_gui_module():
+    """按路径导入 GUI 脚本（文件名含 '-'，无法直接 import）；只用到其中的函数，不创建窗口"""
+    spec = importlib.util.spec_from_file_location("vocal_tract_viewer", GUI_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def write_synthetic_tract(path: str, n_sections: int, n_points: int) -> None:
+    """前半段为 90° 圆弧、后半段为直管，截面为缓慢变化的椭圆"""
+    rng = np.random.default_rng(0)
+    theta = np.linspace(0.0, 2 * np.pi, n_points, endpoint=False)
+    half = n_sections // 2
+    arc = np.linspace(0.0, np.pi / 2, half)
+    radius = 5.0
+    step = radius * (np.pi / 2) / max(half - 1, 1)
+    with open_contour_writer(path) as w:
+        for i in range(n_sections):
+            if i < half:
+                a = arc[i]
+                center = (radius * np.sin(a), radius * (1 - np.cos(a)))
+                normal = (-np.sin(a), np.cos(a))
+            else:
+                k = i - half + 1
+                center = (radius, radius + k * step)
+                normal = (-1.0, 0.0)
+            sy = 0.8 + 0.2 * np.sin(i / 50.0)
+            sz = 0.6 + 0.1 * np.cos(i / 70.0)
+            y = sy * np.cos(theta) + 1e-3 * rng.standard_normal(n_points)
+            z = sz * np.sin(theta) + 0.05
+            w.write_section(center, normal, 1.0, y, z)
+
+
+def run_scalar(gui, path: str):
+    t0 = time.perf_counter()
+    contours = load_contours(path)
+    t1 = time.perf_counter()
+    sections = []
+    for i in range(len(contours)):
+        y, z = contours.section(i)
+        sections.append(gui.prepare_section_data(contours.head[i], y.tolist(), z.tolist()))
+    gui.compute_segment_geometry_scalar(sections)
+    t2 = time.perf_counter()
+    return sections, t1 - t0, t2 - t1
+
+
+def run_vectorized(path: str):
+    t0 = time.perf_counter()
+    contours = load_contours(path)
+    t1 = time.perf_counter()
+    sections, segments = analyse_contours(contours)
+    t2 = time.perf_counter()
+    return (sections, segments), t1 - t0, t2 - t1
+
+
+def check_agreement(scalar_sections, segments) -> float:
+    """返回两条路径在出口点上的最大绝对误差"""
+    n_seg = len(segments)
+    ref_len = np.array([d["length"] for d in scalar_sections[:n_seg]])
+    ref_out = np.array([d["ctrLinePtOut"] for d in scalar_sections[:n_seg]])
+    ref_ang = np.array([d["curvatureAngle"] for d in scalar_sections[:n_seg]])
+    err = max(np.max(np.abs(ref_len - segments["length"]), initial=0.0),
+              np.max(np.abs(ref_out - segments["pt_out"]), initial=0.0),
+              np.max(np.abs(ref_ang - segments["curvature_angle"]), initial=0.0))
+    return float(err)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scalar vs vectorized contour geometry pass")
+    parser.add_argument("-n", "--sections", type=int, nargs="+", default=[1000, 5000, 10000], help="截面数")
+    parser.add_argument("-p", "--points", type=int, default=200, help="每截面轮廓点数")
+    args = parser.parse_args()
+
+    gui = load_gui_module()
+    print(f"{'sections':>9} {'read[s]':>9} {'scalar[s]':>10} {'vector[s]':>10} {'speedup':>8} {'max_err':>9}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sections:
+            path = os.path.join(tmp, f"tract_{n}.csv")
+            write_synthetic_tract(path, n, args.points)
+            # 屏蔽逐段路径中的问题打印，避免干扰计时
+            stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+            try:
+                scalar_sections, t_read_s, t_scalar = run_scalar(gui, path)
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+            (_, segments), t_read_v, t_vec = run_vectorized(path)
+            err = check_agreement(scalar_sections, segments)
+            print(f"{n:>9d} {min(t_read_s, t_read_v):>9.3f} {t_scalar:>10.3f} {t_vec:>10.4f} "
+                  f"{t_scalar / max(t_vec, 1e-9):>7.1f}x {err:>9.1e}")
+
+
+if __name__ == "__main__":
+    main()
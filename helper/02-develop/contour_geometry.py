@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截面/分段几何的向量化计算（对全部 N 个截面一次完成）。
+
+对应 helper03/02-ex-csv-gui.py 中逐段调用的
+`polygon_signed_area` / `calculate_curvature` / `calculate_outlet_geometry` /
+`rotate_vector` / `analyse_section_pair`，语义保持一致（模拟 VTL3D C++ 中
+Acoustic3dSimulation 的 getCurvatureAngleShift 与 ctrLinePtOut）。
+
+输入为 contour_io.ContourSet，输出为结构化 NumPy 数组：
+    sections = compute_section_geometry(cs)        # (N,)   SECTION_DTYPE
+    segments = compute_segment_geometry(sections)  # (N-1,) SEGMENT_DTYPE
+    sections, segments = analyse_contours(cs)      # 两步合一
+
+分段问题以位掩码记录在 segments['issues']，用 issue_labels() 转成文字。
+"""
+
+from typing import List, Tuple
+
+import numpy as np
+
+from contour_io import ContourSet
+
+# ----------------- 常量 -----------------
+MINIMAL_DISTANCE = 1e-6   # 与 GUI 中一致：浮点/角度接近零的判定阈值
+
+# 分段问题位掩码（文字与 analyse_section_pair 保持一致）
+ISSUE_VERTEX_COUNT = 1 << 0
+ISSUE_AREA_RATIO = 1 << 1
+ISSUE_AREA_TINY = 1 << 2
+ISSUE_ORIENTATION = 1 << 3
+ISSUE_SHORT_TURN = 1 << 4
+ISSUE_SELF_INTERSECT = 1 << 5
+ISSUE_OVERLAP_NEXT = 1 << 6
+
+ISSUE_TEXT = (
+    (ISSUE_VERTEX_COUNT, "顶点数量差异过大"),
+    (ISSUE_AREA_RATIO, "相邻截面面积差异>5%"),
+    (ISSUE_AREA_TINY, "一个截面面积过小"),
+    (ISSUE_ORIENTATION, "轮廓方向不一致"),
+    (ISSUE_SHORT_TURN, "短段转角>20°"),
+    (ISSUE_SELF_INTERSECT, "分段梯形自相交"),
+    (ISSUE_OVERLAP_NEXT, "与下一分段重叠"),
+)
+
+SECTION_DTYPE = np.dtype([
+    ("center_orig", "f8", 2),   # CSV 中的原始中心 (X, Y)
+    ("center_adj", "f8", 2),    # Z 居中后的入口中心 ctrLinePtIn_adj
+    ("normal", "f8", 2),        # 归一化入口法线
+    ("scale_in", "f8"),
+    ("scale_out", "f8"),
+    ("z_c", "f8"),              # 原始局部 Z 中心 (zmin+zmax)/2
+    ("z_min_orig", "f8"),
+    ("z_max_orig", "f8"),
+    ("z_min_adj", "f8"),
+    ("z_max_adj", "f8"),
+    ("y_min", "f8"),
+    ("y_max", "f8"),
+    ("n_points", "i8"),
+    ("signed_area", "f8"),
+    ("orientation", "i1"),      # +1 逆时针，-1 顺时针，0 退化
+])
+
+SEGMENT_DTYPE = np.dtype([
+    ("length", "f8"),
+    ("curvature_radius", "f8"),   # inf 表示直线段
+    ("curvature_angle", "f8"),    # 弧度，(-pi, pi]
+    ("pt_out", "f8", 2),          # 调整后几何的出口中心
+    ("normal_out", "f8", 2),
+    ("length_orig", "f8"),
+    ("pt_out_orig", "f8", 2),     # 原始几何的出口中心
+    ("normal_out_orig", "f8", 2),
+    ("issues", "u2"),             # ISSUE_* 位掩码
+])
+
+
+# ----------------- 基础向量运算 -----------------
+
+def normalize_2d(v: np.ndarray) -> np.ndarray:
+    """逐行归一化 (N,2)；模长过小的行返回 (1,0)"""
+    norm = np.hypot(v[:, 0], v[:, 1])
+    out = np.empty_like(v, dtype=np.float64)
+    ok = norm > MINIMAL_DISTANCE
+    out[ok] = v[ok] / norm[ok, None]
+    out[~ok] = (1.0, 0.0)
+    return out
+
+
+def rotate_2d(v: np.ndarray, angle: np.ndarray) -> np.ndarray:
+    """把 (N,2) 向量逐行旋转 angle（弧度，(N,)）"""
+    c, s = np.cos(angle), np.sin(angle)
+    return np.stack((c * v[:, 0] - s * v[:, 1], s * v[:, 0] + c * v[:, 1]), axis=1)
+
+
+def normalize_angle(angle: np.ndarray) -> np.ndarray:
+    """标准化到 (-pi, pi]"""
+    out = np.mod(angle + np.pi, 2 * np.pi) - np.pi
+    out[out <= -np.pi] += 2 * np.pi
+    return out
+
+
+def _cross(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    return a[..., 0] * b[..., 1] - a[..., 1] * b[..., 0]
+
+
+def segments_intersect(p1: np.ndarray, p2: np.ndarray, q1: np.ndarray, q2: np.ndarray) -> np.ndarray:
+    """(N,2) 线段 p1p2 与 q1q2 是否严格相交（端点接触不算）"""
+    d1 = _cross(p2 - p1, q1 - p1)
+    d2 = _cross(p2 - p1, q2 - p1)
+    d3 = _cross(q2 - q1, p1 - q1)
+    d4 = _cross(q2 - q1, p2 - q1)
+    eps = MINIMAL_DISTANCE
+    return (((d1 > eps) & (d2 < -eps)) | ((d1 < -eps) & (d2 > eps))) & \
+           (((d3 > eps) & (d4 < -eps)) | ((d3 < -eps) & (d4 > eps)))
+
+
+# ----------------- 截面 -----------------
+
+def _ragged_index(cs: ContourSet) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """返回 (sec_id, y_idx, z_idx)：每个轮廓点所属截面及其 Y/Z 在 cs.data 中的下标"""
+    counts = cs.counts()
+    sec_id = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(int(counts.sum())) - np.repeat(cs.offsets[:-1], counts)
+    y_idx = 2 * cs.offsets[:-1][sec_id] + local
+    return sec_id, y_idx, y_idx + counts[sec_id]
+
+
+def polygon_signed_areas(cs: ContourSet) -> np.ndarray:
+    """全部截面 (y,z) 多边形的有符号面积 (N,)，少于 3 点的截面为 0"""
+    counts = cs.counts()
+    n_sec = len(counts)
+    areas = np.zeros(n_sec)
+    if not n_sec or not counts.sum():
+        return areas
+    sec_id, y_idx, z_idx = _ragged_index(cs)
+    data = np.asarray(cs.data, dtype=np.float64)
+    y, z = data[y_idx], data[z_idx]
+    # 每点的“下一点”：截面内循环
+    nxt = np.arange(y.size) + 1
+    last = cs.offsets[1:][counts > 0] - 1
+    nxt[last] = cs.offsets[:-1][counts > 0]
+    terms = y * z[nxt] - y[nxt] * z
+    areas = 0.5 * np.bincount(sec_id, weights=terms, minlength=n_sec)
+    areas[counts < 3] = 0.0
+    return areas
+
+
+def _ragged_minmax(values: np.ndarray, sec_id: np.ndarray, counts: np.ndarray, starts: np.ndarray):
+    n_sec = len(counts)
+    vmin = np.zeros(n_sec)
+    vmax = np.zeros(n_sec)
+    nz = counts > 0
+    if values.size:
+        vmin[nz] = np.minimum.reduceat(values, starts[nz])
+        vmax[nz] = np.maximum.reduceat(values, starts[nz])
+    return vmin, vmax
+
+
+def compute_section_geometry(cs: ContourSet) -> np.ndarray:
+    """
+    逐截面量（等价于 GUI 中 prepare_section_data 的数值部分）：
+    原始/调整后中心、归一化法线、Z 居中量、Y/Z 范围、有符号面积与方向。
+    """
+    n_sec = len(cs)
+    sec = np.zeros(n_sec, dtype=SECTION_DTYPE)
+    if not n_sec:
+        return sec
+    head = np.asarray(cs.head, dtype=np.float64)
+    counts = cs.counts()
+    sec["center_orig"] = head[:, [0, 3]]
+    sec["normal"] = normalize_2d(head[:, [1, 4]])
+    sec["scale_in"] = head[:, 2]
+    sec["scale_out"] = head[:, 5]
+    sec["n_points"] = counts
+
+    sec_id, y_idx, z_idx = _ragged_index(cs)
+    data = np.asarray(cs.data, dtype=np.float64)
+    starts = cs.offsets[:-1]
+    y_min, y_max = _ragged_minmax(data[y_idx], sec_id, counts, starts)
+    z_min, z_max = _ragged_minmax(data[z_idx], sec_id, counts, starts)
+    z_c = 0.5 * (z_min + z_max)
+    sec["y_min"], sec["y_max"] = y_min, y_max
+    sec["z_min_orig"], sec["z_max_orig"] = z_min, z_max
+    sec["z_c"] = z_c
+    sec["z_min_adj"], sec["z_max_adj"] = z_min - z_c, z_max - z_c
+
+    # 沿法线平移 z_c * scale_in，使轮廓在局部 Z 上居中
+    sec["center_adj"] = sec["center_orig"] + (z_c * sec["scale_in"])[:, None] * sec["normal"]
+
+    area = polygon_signed_areas(cs)   # 平移不变，无需先居中
+    sec["signed_area"] = area
+    sec["orientation"] = np.sign(area).astype(np.int8)
+    return sec
+
+
+# ----------------- 分段 -----------------
+
+def curvature(p1: np.ndarray, n1: np.ndarray, p2: np.ndarray, n2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """向量化 calculate_curvature：返回 (radius, angle)，直线段 radius=inf、angle=0"""
+    cross_p_n2 = _cross(p2 - p1, n2)
+    cross_n2_n1 = _cross(n2, n1)
+    curved = np.abs(cross_n2_n1) > MINIMAL_DISTANCE
+    radius = np.full(len(p1), np.inf)
+    radius[curved] = -cross_p_n2[curved] / cross_n2_n1[curved]
+    angle = normalize_angle(np.arctan2(n2[:, 1], n2[:, 0]) - np.arctan2(n1[:, 1], n1[:, 0]))
+    angle[~np.isfinite(radius)] = 0.0
+    return radius, angle
+
+
+def outlet_geometry(p_in: np.ndarray, n_in: np.ndarray, length: np.ndarray,
+                    radius: np.ndarray, angle: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """向量化 calculate_outlet_geometry：返回 (出口中心, 出口法线)"""
+    n_out = normalize_2d(rotate_2d(n_in, angle))
+    p_out = p_in.copy()
+    moving = length > MINIMAL_DISTANCE
+    straight = moving & ((np.abs(angle) < MINIMAL_DISTANCE) | ~np.isfinite(radius))
+    curved = moving & ~straight
+
+    # 直线：沿切线 t = (ny, -nx) 前进 L
+    tangent = np.stack((n_in[:, 1], -n_in[:, 0]), axis=1)
+    p_out[straight] = p_in[straight] + length[straight, None] * tangent[straight]
+
+    # 曲线：绕曲率中心 C = p + R n 把 V_in = -R n 旋转 -alpha
+    r = radius[curved, None]
+    center = p_in[curved] + r * n_in[curved]
+    v_out = rotate_2d(-r * n_in[curved], -angle[curved])
+    p_out[curved] = center + v_out
+    return p_out, n_out
+
+
+def segment_quads(p_in: np.ndarray, n_in: np.ndarray, s_in: np.ndarray, p_out: np.ndarray,
+                  n_out: np.ndarray, s_out: np.ndarray, z_min: np.ndarray, z_max: np.ndarray):
+    """矢状面梯形四角 (in_min, in_max, out_min, out_max)"""
+    in_min = p_in + n_in * (z_min * s_in)[:, None]
+    in_max = p_in + n_in * (z_max * s_in)[:, None]
+    out_min = p_out + n_out * (z_min * s_out)[:, None]
+    out_max = p_out + n_out * (z_max * s_out)[:, None]
+    return in_min, in_max, out_min, out_max
+
+
+def compute_segment_geometry(sec: np.ndarray) -> np.ndarray:
+    """
+    相邻截面 (i, i+1) 组成的 N-1 个分段：长度、曲率半径/角度、调整后与原始几何的出口中心/法线，
+    以及问题位掩码（含 analyse_section_pair 的各项判据与梯形自相交/重叠检测）。
+    """
+    n_seg = max(len(sec) - 1, 0)
+    seg = np.zeros(n_seg, dtype=SEGMENT_DTYPE)
+    if not n_seg:
+        return seg
+    a, b = sec[:-1], sec[1:]
+    p1, p2 = a["center_adj"], b["center_adj"]
+    n1, n2 = a["normal"], b["normal"]
+
+    length = np.hypot(*(p2 - p1).T)
+    radius, angle = curvature(p1, n1, p2, n2)
+    p_out, n_out = outlet_geometry(p1, n1, length, radius, angle)
+    seg["length"] = length
+    seg["curvature_radius"] = radius
+    seg["curvature_angle"] = angle
+    seg["pt_out"] = p_out
+    seg["normal_out"] = n_out
+
+    o1, o2 = a["center_orig"], b["center_orig"]
+    length_orig = np.hypot(*(o2 - o1).T)
+    p_out_orig, n_out_orig = outlet_geometry(o1, n1, length_orig, radius, angle)
+    seg["length_orig"] = length_orig
+    seg["pt_out_orig"] = p_out_orig
+    seg["normal_out_orig"] = n_out_orig
+
+    # ---- 问题检测（与 analyse_section_pair 判据一致） ----
+    issues = np.zeros(n_seg, dtype=np.uint16)
+    na, nb = a["n_points"], b["n_points"]
+    n_lo, n_hi = np.minimum(na, nb), np.maximum(na, nb)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio_n = np.where(n_hi > 0, n_lo / np.maximum(n_hi, 1), 1.0)
+    issues[(n_lo < 3) | ((n_lo > 0) & (ratio_n < 0.7))] |= ISSUE_VERTEX_COUNT
+
+    area_a, area_b = np.abs(a["signed_area"]), np.abs(b["signed_area"])
+    both = (area_a > 1e-8) & (area_b > 1e-8)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ratio_a = np.minimum(area_a, area_b) / np.maximum(area_a, area_b)
+    issues[both & (ratio_a < 0.95)] |= ISSUE_AREA_RATIO
+    tiny = ~both & (((area_a < 1e-8) & (area_b > 1e-2)) | ((area_b < 1e-8) & (area_a > 1e-2)))
+    issues[tiny] |= ISSUE_AREA_TINY
+
+    oa, ob = a["orientation"].astype(int), b["orientation"].astype(int)
+    issues[(oa * ob) < 0] |= ISSUE_ORIENTATION
+    issues[(length < 0.5) & (np.abs(np.degrees(angle)) > 20)] |= ISSUE_SHORT_TURN
+
+    # ---- 梯形自相交：入口/出口边交叉，或上下两条侧边交叉（弯曲半径小于截面半高时出现） ----
+    in_min, in_max, out_min, out_max = segment_quads(
+        p1, n1, a["scale_in"], p_out, n_out, a["scale_out"], a["z_min_adj"], a["z_max_adj"])
+    self_x = segments_intersect(in_min, in_max, out_min, out_max) | \
+        segments_intersect(in_min, out_min, in_max, out_max)
+    issues[self_x] |= ISSUE_SELF_INTERSECT
+
+    # ---- 与下一分段重叠：本段的侧边穿过下一段的出口边 ----
+    if n_seg > 1:
+        nxt = slice(1, None)
+        cur = slice(None, -1)
+        overlap = segments_intersect(in_min[cur], out_min[cur], out_min[nxt], out_max[nxt]) | \
+            segments_intersect(in_max[cur], out_max[cur], out_min[nxt], out_max[nxt])
+        issues[:-1][overlap] |= ISSUE_OVERLAP_NEXT
+
+    seg["issues"] = issues
+    return seg
+
+
+def analyse_contours(cs: ContourSet) -> Tuple[np.ndarray, np.ndarray]:
+    """一次得到 (sections, segments)"""
+    sec = compute_section_geometry(cs)
+    return sec, compute_segment_geometry(sec)
+
+
+def issue_labels(mask: int) -> List[str]:
+    """位掩码 -> 问题文字列表"""
+    return [text for bit, text in ISSUE_TEXT if int(mask) & bit]
@@ -0,0 +1,452 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+VTL3D 截面轮廓几何 I/O：流式写出 + 内存映射读取 + CSV/二进制无损互转。
+
+支持两种格式：
+
+1. 分号 CSV（12.2 节规范，每两个连续行 = 1 个截面）：
+   奇数行：center.X ; normal.X ; scale_in  ; localY0 ; localY1 ; ...
+   偶数行：center.Y ; normal.Y ; scale_out ; localZ0 ; localZ1 ; ...
+   浮点数按 repr 输出（最短可往返表示），float64 读回无损。
+
+2. 二进制 `.vtlc`（可 np.memmap，按需只触及用到的截面）：
+   [0, 64)        文件头  magic 'VTLC' | version u16 | itemsize u16 | flags u32 |
+                          n_sections u64 | n_points u64 | data_offset u64 | table_offset u64
+   [64, ...)      轮廓数据块：截面 i 依次存 Y[n_i] 与 Z[n_i]（float32 或 float64）
+   table_offset   截面表：head (N,6) float64 = (CX, NX, SCALE_IN, CY, NY, SCALE_OUT)
+                  之后为 offsets (N+1,) int64，截面 i 的点数 = offsets[i+1]-offsets[i]
+   截面表放在数据块之后，写出时无需预知截面数量，可边切割边写。
+
+用法：
+    >>> with open_contour_writer('contour.csv', sidecar=True) as w:
+    ...     w.write_section((cx, cy), (nx, ny), scale, local_y, local_z)
+    >>> cs = load_contours('contour.vtlc')        # 内存映射
+    >>> y, z = cs.section(10)
+    >>> fut = load_contours_async('contour.csv', progress=print)   # 后台线程
+
+命令行：
+    python contour_io.py convert contour.csv contour.vtlc
+    python contour_io.py convert contour.vtlc contour.csv
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import threading
+import warnings
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# ----------------- 格式常量 -----------------
+BINARY_EXT = ".vtlc"
+BINARY_MAGIC = b"VTLC"
+BINARY_VERSION = 1
+HEADER_STRUCT = struct.Struct("<4sHHIQQQQ")
+HEADER_SIZE = 64
+HEAD_COLUMNS = ("CX", "NX", "SCALE_IN", "CY", "NY", "SCALE_OUT")
+CSV_DELIMITER = ";"
+CSV_NEWLINE = "\r\n"     # 与 csv.writer 默认行尾一致，保持既有文件格式
+
+PathLike = Union[str, "os.PathLike[str]"]
+
+
+# ----------------- 数据结构 -----------------
+
+@dataclass
+class ContourSet:
+    """
+    N 个截面的列式存储。
+
+    head    : (N,6) float64，列含义见 HEAD_COLUMNS（即两行各自的前三列）
+    offsets : (N+1,) int64，截面 i 含 offsets[i+1]-offsets[i] 个轮廓点
+    data    : (2M,) 浮点，截面 i 的 Y 在 data[2*o_i : 2*o_i+n_i]，Z 紧随其后
+    """
+    head: np.ndarray
+    offsets: np.ndarray
+    data: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.head)
+
+    def counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def section(self, idx: int) -> Tuple[np.ndarray, np.ndarray]:
+        """返回截面 idx 的 (Y, Z) 视图（不拷贝）"""
+        start = 2 * int(self.offsets[idx])
+        n = int(self.offsets[idx + 1] - self.offsets[idx])
+        return self.data[start:start + n], self.data[start + n:start + 2 * n]
+
+    @property
+    def centers(self) -> np.ndarray:
+        return self.head[:, [0, 3]]
+
+    @property
+    def normals(self) -> np.ndarray:
+        return self.head[:, [1, 4]]
+
+    @property
+    def scales(self) -> np.ndarray:
+        return self.head[:, [2, 5]]
+
+
+def _as_pair(value) -> Tuple[float, float]:
+    """标量复制为 (v, v)，二元组原样返回"""
+    if np.ndim(value) == 0:
+        return float(value), float(value)
+    a, b = value
+    return float(a), float(b)
+
+
+# ----------------- 流式写出 -----------------
+
+class ContourCsvWriter:
+    """逐截面写出分号 CSV；不缓存截面，内存占用与截面数量无关。"""
+
+    def __init__(self, path: PathLike):
+        self.path = os.fspath(path)
+        self._f = open(self.path, "w", newline="")
+        self.n_sections = 0
+
+    def write_section(self, center: Sequence[float], normal: Sequence[float], scale,
+                      local_y: np.ndarray, local_z: np.ndarray) -> None:
+        """
+        写入一个截面（两行）。
+        center/normal 取 (X, Y) 两个分量，scale 为标量或 (scale_in, scale_out)。
+        """
+        local_y = np.asarray(local_y, dtype=np.float64).ravel()
+        local_z = np.asarray(local_z, dtype=np.float64).ravel()
+        if local_y.shape != local_z.shape:
+            raise ValueError(f"轮廓点数量不匹配 ({local_y.size} vs {local_z.size})")
+        scale_in, scale_out = _as_pair(scale)
+        row_odd = [float(center[0]), float(normal[0]), scale_in] + local_y.tolist()
+        row_even = [float(center[1]), float(normal[1]), scale_out] + local_z.tolist()
+        self._f.write(CSV_DELIMITER.join(map(repr, row_odd)) + CSV_NEWLINE)
+        self._f.write(CSV_DELIMITER.join(map(repr, row_even)) + CSV_NEWLINE)
+        self.n_sections += 1
+
+    def write_head(self, head: np.ndarray, local_y: np.ndarray, local_z: np.ndarray) -> None:
+        """按 HEAD_COLUMNS 顺序的 6 元组写入截面（用于格式转换）"""
+        self.write_section((head[0], head[3]), (head[1], head[4]), (head[2], head[5]), local_y, local_z)
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ContourBinaryWriter:
+    """
+    逐截面写出 `.vtlc`。轮廓块直接追加到文件，截面表（每截面 7 个数）留在内存，
+    close() 时写到文件末尾并回填文件头。
+    """
+
+    def __init__(self, path: PathLike, dtype=np.float64):
+        self.path = os.fspath(path)
+        self.dtype = np.dtype(dtype)
+        if self.dtype not in (np.dtype(np.float32), np.dtype(np.float64)):
+            raise ValueError(f"仅支持 float32 / float64，收到 {self.dtype}")
+        self._f = open(self.path, "wb")
+        self._f.write(b"\0" * HEADER_SIZE)
+        self._heads: List[Tuple[float, ...]] = []
+        self._counts: List[int] = []
+        self.n_sections = 0
+
+    def write_section(self, center: Sequence[float], normal: Sequence[float], scale,
+                      local_y: np.ndarray, local_z: np.ndarray) -> None:
+        scale_in, scale_out = _as_pair(scale)
+        self.write_head((center[0], normal[0], scale_in, center[1], normal[1], scale_out), local_y, local_z)
+
+    def write_head(self, head: Sequence[float], local_y: np.ndarray, local_z: np.ndarray) -> None:
+        local_y = np.ascontiguousarray(local_y, dtype=self.dtype).ravel()
+        local_z = np.ascontiguousarray(local_z, dtype=self.dtype).ravel()
+        if local_y.shape != local_z.shape:
+            raise ValueError(f"轮廓点数量不匹配 ({local_y.size} vs {local_z.size})")
+        local_y.tofile(self._f)
+        local_z.tofile(self._f)
+        self._heads.append(tuple(float(v) for v in head))
+        self._counts.append(local_y.size)
+        self.n_sections += 1
+
+    def close(self) -> None:
+        if self._f.closed:
+            return
+        n_points = int(sum(self._counts))
+        # 截面表按 8 字节对齐
+        pos = self._f.tell()
+        pad = (-pos) % 8
+        self._f.write(b"\0" * pad)
+        table_offset = pos + pad
+        head = np.asarray(self._heads, dtype=np.float64).reshape(-1, 6)
+        offsets = np.zeros(len(self._counts) + 1, dtype=np.int64)
+        np.cumsum(self._counts, out=offsets[1:])
+        head.astype("<f8").tofile(self._f)
+        offsets.astype("<i8").tofile(self._f)
+        self._f.seek(0)
+        self._f.write(HEADER_STRUCT.pack(BINARY_MAGIC, BINARY_VERSION, self.dtype.itemsize, 0,
+                                         len(self._counts), n_points, HEADER_SIZE, table_offset))
+        self._f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _TeeWriter:
+    """同时写出 CSV 与二进制 sidecar"""
+
+    def __init__(self, writers):
+        self.writers = writers
+
+    def write_section(self, *args) -> None:
+        for w in self.writers:
+            w.write_section(*args)
+
+    def write_head(self, *args) -> None:
+        for w in self.writers:
+            w.write_head(*args)
+
+    @property
+    def n_sections(self) -> int:
+        return self.writers[0].n_sections
+
+    def close(self) -> None:
+        for w in self.writers:
+            w.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def is_binary_path(path: PathLike) -> bool:
+    return os.fspath(path).lower().endswith(BINARY_EXT)
+
+
+def sidecar_path(csv_path: PathLike) -> str:
+    """CSV 对应的二进制 sidecar 路径：contour.csv -> contour.vtlc"""
+    return os.path.splitext(os.fspath(csv_path))[0] + BINARY_EXT
+
+
+def open_contour_writer(path: PathLike, sidecar: bool = False, dtype=np.float64):
+    """
+    按扩展名选择写出器；`.vtlc` 为二进制，其余按 CSV。
+    sidecar=True 时 CSV 旁同时写出同名 `.vtlc`。
+    """
+    if is_binary_path(path):
+        return ContourBinaryWriter(path, dtype=dtype)
+    csv_writer = ContourCsvWriter(path)
+    if not sidecar:
+        return csv_writer
+    return _TeeWriter([csv_writer, ContourBinaryWriter(sidecar_path(path), dtype=dtype)])
+
+
+# ----------------- 读取 -----------------
+
+def read_contour_binary(path: PathLike, mmap_mode: Optional[str] = "r") -> ContourSet:
+    """
+    读取 `.vtlc`。mmap_mode='r'（默认）时轮廓数据为内存映射，只有实际访问的截面才会被读入；
+    mmap_mode=None 时整体读入内存。
+    """
+    path = os.fspath(path)
+    with open(path, "rb") as f:
+        raw = f.read(HEADER_STRUCT.size)
+    if len(raw) < HEADER_STRUCT.size:
+        raise ValueError(f"{path}: 文件过短，不是有效的 {BINARY_EXT}")
+    magic, version, itemsize, _flags, n_sec, n_pts, data_offset, table_offset = HEADER_STRUCT.unpack(raw)
+    if magic != BINARY_MAGIC:
+        raise ValueError(f"{path}: magic 不匹配 ({magic!r})")
+    if version != BINARY_VERSION:
+        raise ValueError(f"{path}: 不支持的版本 {version}")
+    dtype = {4: np.dtype("<f4"), 8: np.dtype("<f8")}.get(itemsize)
+    if dtype is None:
+        raise ValueError(f"{path}: 不支持的 itemsize {itemsize}")
+
+    if mmap_mode is None:
+        with open(path, "rb") as f:
+            f.seek(data_offset)
+            data = np.fromfile(f, dtype=dtype, count=2 * n_pts)
+            f.seek(table_offset)
+            head = np.fromfile(f, dtype="<f8", count=6 * n_sec).reshape(n_sec, 6)
+            offsets = np.fromfile(f, dtype="<i8", count=n_sec + 1)
+    else:
+        data = np.memmap(path, dtype=dtype, mode=mmap_mode, offset=data_offset, shape=(2 * n_pts,)) \
+            if n_pts else np.empty(0, dtype=dtype)
+        head = np.memmap(path, dtype="<f8", mode=mmap_mode, offset=table_offset, shape=(n_sec, 6)) \
+            if n_sec else np.empty((0, 6))
+        offsets = np.memmap(path, dtype="<i8", mode=mmap_mode, offset=table_offset + 48 * n_sec,
+                            shape=(n_sec + 1,))
+    return ContourSet(head=head, offsets=offsets, data=data)
+
+
+def _parse_csv_rows(rows: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把若干 CSV 行一次性解析为扁平数组，返回 (values, counts)。
+    正常文件走 np.fromstring 的 C 解析；含空字段（';;'）时回退到逐字段解析。
+    """
+    stripped = [r.strip().rstrip(b";") for r in rows]
+    counts = np.fromiter((r.count(b";") + 1 for r in stripped), dtype=np.int64, count=len(stripped))
+    flat = b";".join(stripped)
+    if b";;" in flat:
+        fields = [[float(p) for p in r.split(b";") if p.strip()] for r in stripped]
+        counts = np.fromiter((len(f) for f in fields), dtype=np.int64, count=len(fields))
+        return np.fromiter((v for f in fields for v in f), dtype=np.float64, count=int(counts.sum())), counts
+    with warnings.catch_warnings():
+        # fromstring 遇到非法字段只给 DeprecationWarning 并截断，这里升级为异常
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            values = np.fromstring(flat, dtype=np.float64, sep=";")
+        except (ValueError, DeprecationWarning) as exc:
+            raise ValueError(f"无法解析的数值字段: {exc}") from None
+    if values.size != counts.sum():
+        raise ValueError(f"字段数量不一致 ({values.size} vs {int(counts.sum())})")
+    return values, counts
+
+
+def _rows_to_sections(values: np.ndarray, counts: np.ndarray, first_line: int):
+    """
+    扁平行数据 -> (head (K,6), n_points (K,), data (2*sum n,))。
+    每个截面的奇数行 [CX,NX,S_in,Y...] 与偶数行 [CY,NY,S_out,Z...] 去掉前三列后
+    恰好依次为 Y、Z，正是 ContourSet.data 的布局，因此只需一次布尔掩码。
+    """
+    odd, even = counts[0::2], counts[1::2]
+    bad = np.flatnonzero((odd < 3) | (even < 3))
+    if bad.size:
+        raise ValueError(f"第 {first_line + 2 * int(bad[0]) + 1} 行字段不足")
+    bad = np.flatnonzero(odd != even)
+    if bad.size:
+        k = int(bad[0])
+        raise ValueError(f"第 {first_line + 2 * k + 1} 行截面轮廓点数量不匹配 ({odd[k] - 3} vs {even[k] - 3})")
+    row_start = np.zeros(len(counts), dtype=np.int64)
+    np.cumsum(counts[:-1], out=row_start[1:])
+    head_idx = row_start[:, None] + np.arange(3)
+    head = values[head_idx].reshape(-1, 6)
+    keep = np.ones(values.size, dtype=bool)
+    keep[head_idx.ravel()] = False
+    return head, odd - 3, values[keep]
+
+
+def read_contour_csv(path: PathLike, progress: Optional[Callable[[float], None]] = None,
+                     chunk_sections: int = 512) -> ContourSet:
+    """
+    读取分号 CSV 为 ContourSet（float64）。
+
+    文件经 mmap 按块读取，每块 chunk_sections 个截面用一次 C 级解析完成，
+    不构建逐截面的 Python 列表。progress(fraction) 在每块结束后回调（0~1）。
+    """
+    path = os.fspath(path)
+    heads, npts, blocks = [], [], []
+    size = os.path.getsize(path)
+    line_no = 0
+    if size:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pending: List[bytes] = []
+            while True:
+                line = mm.readline()
+                if line and line.strip():
+                    pending.append(line)
+                if pending and (len(pending) >= 2 * chunk_sections or not line):
+                    if len(pending) % 2:
+                        if line:
+                            continue  # 凑齐成对的行再解析
+                        raise ValueError(f"{path}: 行数为奇数，截面行不成对")
+                    values, counts = _parse_csv_rows(pending)
+                    try:
+                        h, n, d = _rows_to_sections(values, counts, line_no)
+                    except ValueError as exc:
+                        raise ValueError(f"{path}: {exc}") from None
+                    heads.append(h); npts.append(n); blocks.append(d)
+                    line_no += len(pending)
+                    pending = []
+                    if progress is not None:
+                        progress(mm.tell() / size)
+                if not line:
+                    break
+    if progress is not None:
+        progress(1.0)
+    counts = np.concatenate(npts) if npts else np.empty(0, dtype=np.int64)
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return ContourSet(
+        head=np.concatenate(heads) if heads else np.empty((0, 6)),
+        offsets=offsets,
+        data=np.concatenate(blocks) if blocks else np.empty(0),
+    )
+
+
+def load_contours(path: PathLike, progress: Optional[Callable[[float], None]] = None) -> ContourSet:
+    """按扩展名读取 CSV 或 `.vtlc`（后者内存映射）"""
+    if is_binary_path(path):
+        cs = read_contour_binary(path)
+        if progress is not None:
+            progress(1.0)
+        return cs
+    return read_contour_csv(path, progress=progress)
+
+
+def load_contours_async(path: PathLike, progress: Optional[Callable[[float], None]] = None) -> Future:
+    """
+    在后台线程中执行 load_contours，立即返回 Future。
+
+    progress 与 Future 的回调都在工作线程里触发；Tk 等 GUI 不是线程安全的，
+    应只在回调中记录状态，再由主线程用 after() 轮询 future.done() 后取结果。
+    """
+    future: Future = Future()
+
+    def _run():
+        if not future.set_running_or_notify_cancel():
+            return
+        try:
+            future.set_result(load_contours(path, progress=progress))
+        except BaseException as exc:  # 交由调用方在主线程处理
+            future.set_exception(exc)
+
+    threading.Thread(target=_run, name="ContourLoader", daemon=True).start()
+    return future
+
+
+# ----------------- 格式转换 -----------------
+
+def convert_contours(src: PathLike, dst: PathLike, dtype=np.float64) -> int:
+    """
+    在 CSV 与 `.vtlc` 之间转换，返回截面数量。
+    float64 双向无损；选 float32 时二进制体积减半但会舍入。
+    """
+    cs = load_contours(src)
+    with open_contour_writer(dst, dtype=dtype) as w:
+        for i in range(len(cs)):
+            y, z = cs.section(i)
+            w.write_head(cs.head[i], y, z)
+    return len(cs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="VTL3D contour CSV / binary I/O")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_conv = sub.add_parser("convert", help="CSV <-> .vtlc 转换（按扩展名判断方向）")
+    p_conv.add_argument("src")
+    p_conv.add_argument("dst")
+    p_conv.add_argument("--float32", action="store_true", help="二进制使用 float32（有损）")
+    args = parser.parse_args()
+
+    if args.cmd == "convert":
+        n = convert_contours(args.src, args.dst, dtype=np.float32 if args.float32 else np.float64)
+        print(f"[INFO] 已转换 {n} 个截面 → {args.dst}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+任意截面形状的横向模态（二维 Helmholtz 本征问题）与高阶模态截止频率。
+
+硬壁声道截面 Ω 上的横向模态满足
+    -Δψ = k_t² ψ   (Ω 内)，   ∂ψ/∂n = 0   (边界)
+截止频率 f_c = c·k_t / (2π)。第 0 个本征值为 0（平面波），第 1 个即首个高阶
+模态，频率高于它时平面波假设（VTL3D 一维模型）不再成立。
+
+每个截面：
+1. 轮廓按 scale_in 还原为实际尺寸，边界等弧长重采样，内部铺正方形格点，
+   Delaunay 剖分后剔除重心落在多边形外的三角形；
+2. 组装 P1 线性三角元的刚度矩阵 K 与质量矩阵 M（稀疏，全向量化）；
+3. `scipy.sparse.linalg.eigsh(K, k, M, sigma<0)` 用移位求逆求最小的 k 个本征值。
+截面之间相互独立，在进程池中并行。
+
+用法：
+    python contour_modes.py contour.csv -k 4 -o contour_modes.csv
+    >>> from contour_modes import section_modes
+    >>> k_t = section_modes(y, z, n_modes=4)          # (4,) 横向波数
+"""
+
+import argparse
+import csv
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+import numpy as np
+from matplotlib.path import Path
+from scipy import sparse
+from scipy.sparse.linalg import eigsh
+from scipy.spatial import Delaunay
+
+from contour_io import load_contours
+
+# ----------------- 常量 -----------------
+DEFAULT_N_MODES = 4          # 含平面波在内的模态数
+DEFAULT_RESOLUTION = 24      # 网格尺寸 h = sqrt(面积) / resolution
+DEFAULT_UNIT = 1e-2          # 轮廓 CSV 坐标单位 (cm) → m
+SOUND_SPEED = 331.3 * math.sqrt(1 + 26.5 / 273.15)   # 26.5°C 空气声速 (m/s)
+MIN_POINTS = 3
+
+
+# ----------------- 网格 -----------------
+
+def _polygon_area(y: np.ndarray, z: np.ndarray) -> float:
+    return 0.5 * abs(float(np.dot(y, np.roll(z, -1)) - np.dot(z, np.roll(y, -1))))
+
+
+def resample_boundary(y: np.ndarray, z: np.ndarray, h: float) -> np.ndarray:
+    """把闭合多边形按弧长 h 等距重采样，返回 (n, 2)；重复点被去除。"""
+    pts = np.column_stack((y, z))
+    keep = np.ones(len(pts), dtype=bool)
+    keep[1:] = np.any(np.diff(pts, axis=0) != 0, axis=1)
+    pts = pts[keep]
+    if len(pts) > 1 and np.all(pts[0] == pts[-1]):
+        pts = pts[:-1]
+    closed = np.vstack((pts, pts[:1]))
+    s = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(closed, axis=0).T))))
+    n = max(MIN_POINTS, int(math.ceil(s[-1] / h)))
+    t = np.linspace(0.0, s[-1], n, endpoint=False)
+    return np.column_stack((np.interp(t, s, closed[:, 0]), np.interp(t, s, closed[:, 1])))
+
+
+def mesh_polygon(y: np.ndarray, z: np.ndarray, h: float) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    多边形三角剖分：返回 (nodes (n,2), triangles (m,3))。
+    内部点为间距 h 的正方形格点，离边界不足 h/2 的格点被舍弃，避免狭长三角形。
+    """
+    boundary = resample_boundary(y, z, h)
+    path = Path(boundary)
+    lo, hi = boundary.min(axis=0), boundary.max(axis=0)
+    gy, gz = np.meshgrid(np.arange(lo[0] + h / 2, hi[0], h), np.arange(lo[1] + h / 2, hi[1], h))
+    grid = np.column_stack((gy.ravel(), gz.ravel()))
+    grid = grid[path.contains_points(grid)]
+    if len(grid):
+        # 格点到边界线段的最小距离
+        a = boundary[None, :, :]
+        d = np.roll(boundary, -1, axis=0)[None, :, :] - a
+        rel = grid[:, None, :] - a
+        t = np.clip(np.sum(rel * d, axis=2) / np.maximum(np.sum(d * d, axis=2), 1e-300), 0.0, 1.0)
+        dist = np.min(np.hypot(*(rel - t[..., None] * d).transpose(2, 0, 1)), axis=1)
+        grid = grid[dist > 0.5 * h]
+    nodes = np.vstack((boundary, grid))
+    tri = Delaunay(nodes).simplices
+    centroids = nodes[tri].mean(axis=1)
+    tri = tri[path.contains_points(centroids)]
+    return nodes, tri
+
+
+# ----------------- 有限元 -----------------
+
+def assemble_p1(nodes: np.ndarray, tri: np.ndarray) -> Tuple[sparse.csr_matrix, sparse.csr_matrix]:
+    """P1 三角元的刚度矩阵 K 与一致质量矩阵 M。"""
+    p = nodes[tri]                                   # (m,3,2)
+    e1 = p[:, 1] - p[:, 0]
+    e2 = p[:, 2] - p[:, 0]
+    det = e1[:, 0] * e2[:, 1] - e1[:, 1] * e2[:, 0]
+    area = 0.5 * np.abs(det)
+    # 形函数梯度：grad φ_i = R90(对边) / (2A)
+    opp = np.stack((p[:, 2] - p[:, 1], p[:, 0] - p[:, 2], p[:, 1] - p[:, 0]), axis=1)   # (m,3,2)
+    grad = np.stack((-opp[..., 1], opp[..., 0]), axis=-1) / det[:, None, None]
+    k_loc = area[:, None, None] * np.einsum("mik,mjk->mij", grad, grad)
+    m_loc = area[:, None, None] / 12.0 * (np.ones((3, 3)) + np.eye(3))[None]
+    rows = np.repeat(tri, 3, axis=1).ravel()
+    cols = np.tile(tri, (1, 3)).ravel()
+    n = len(nodes)
+    K = sparse.coo_matrix((k_loc.ravel(), (rows, cols)), shape=(n, n)).tocsr()
+    M = sparse.coo_matrix((m_loc.ravel(), (rows, cols)), shape=(n, n)).tocsr()
+    return K, M
+
+
+def section_modes(y: np.ndarray, z: np.ndarray, n_modes: int = DEFAULT_N_MODES,
+                  resolution: int = DEFAULT_RESOLUTION) -> np.ndarray:
+    """
+    截面 (y, z)（实际尺寸）的前 n_modes 个横向波数 k_t（升序，第 0 个≈0 为平面波）。
+    点数不足或面积为 0 时返回 NaN。
+    """
+    y = np.asarray(y, dtype=float)
+    z = np.asarray(z, dtype=float)
+    out = np.full(n_modes, np.nan)
+    area = _polygon_area(y, z) if len(y) >= MIN_POINTS else 0.0
+    if area <= 0.0:
+        return out
+    h = math.sqrt(area) / resolution
+    nodes, tri = mesh_polygon(y, z, h)
+    if len(tri) == 0:
+        return out
+    used = np.unique(tri)
+    if len(used) <= n_modes:
+        return out
+    # 去掉未被任何三角形引用的节点（剔除外部三角形后可能出现）
+    remap = np.full(len(nodes), -1)
+    remap[used] = np.arange(len(used))
+    K, M = assemble_p1(nodes[used], remap[tri])
+    # K 半正定（Neumann 边界有零本征值），取负的移位量使 K - σM 可逆
+    sigma = -0.01 / area
+    vals = eigsh(K, k=n_modes, M=M, sigma=sigma, which="LM", return_eigenvectors=False)
+    return np.sqrt(np.clip(np.sort(vals), 0.0, None))
+
+
+# ----------------- 整条声道 -----------------
+
+def _section_task(args):
+    y, z, n_modes, resolution = args
+    return section_modes(y, z, n_modes, resolution)
+
+
+def contour_cut_on(path: str, n_modes: int = DEFAULT_N_MODES, c: float = SOUND_SPEED,
+                   unit: float = DEFAULT_UNIT, resolution: int = DEFAULT_RESOLUTION,
+                   max_workers: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    对轮廓 CSV / .vtlc 的每个截面求前 n_modes 个截止频率。
+    返回 (areas (N,) m², cut_on (N, n_modes) Hz)；cut_on[:, 1] 为首个高阶模态。
+    轮廓坐标按 scale_in 还原为实际尺寸，unit 为坐标到米的换算。
+    """
+    cs = load_contours(path)
+    scales = np.asarray(cs.head, dtype=float)[:, 2] * unit
+    tasks = []
+    for i in range(len(cs)):
+        y, z = cs.section(i)
+        tasks.append((np.asarray(y, dtype=float) * scales[i], np.asarray(z, dtype=float) * scales[i],
+                      n_modes, resolution))
+    areas = np.array([_polygon_area(y, z) if len(y) >= MIN_POINTS else 0.0 for y, z, _, _ in tasks])
+    if max_workers == 1:
+        k_t = [_section_task(t) for t in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            k_t = list(pool.map(_section_task, tasks, chunksize=max(1, len(tasks) // (4 * (os.cpu_count() or 1)))))
+    cut_on = c * np.array(k_t).reshape(len(tasks), n_modes) / (2 * math.pi)
+    return areas, cut_on
+
+
+def write_cut_on_table(path: str, areas: np.ndarray, cut_on: np.ndarray) -> None:
+    """每行一个截面：section ; area_cm2 ; f0_Hz ; f1_Hz ; ..."""
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(["section", "area_cm2"] + [f"f{j}_Hz" for j in range(cut_on.shape[1])])
+        for i, (a, fc) in enumerate(zip(areas, cut_on)):
+            w.writerow([i, f"{a * 1e4:.6g}"] + [f"{v:.2f}" for v in fc])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-section transverse mode cut-on frequencies of a contour CSV")
+    parser.add_argument("contours", help="Contour CSV or .vtlc")
+    parser.add_argument("-k", "--modes", type=int, default=DEFAULT_N_MODES, help="Modes per section incl. plane wave")
+    parser.add_argument("--c", type=float, default=SOUND_SPEED, help="Sound speed in m/s")
+    parser.add_argument("--unit", type=float, default=DEFAULT_UNIT, help="Contour coordinate unit in m (default cm)")
+    parser.add_argument("--resolution", type=int, default=DEFAULT_RESOLUTION, help="Mesh cells across sqrt(area)")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("-o", "--output", help="Output table (default: <contours>_modes.csv)")
+    args = parser.parse_args()
+
+    areas, cut_on = contour_cut_on(args.contours, args.modes, args.c, args.unit, args.resolution, args.jobs)
+    output = args.output or os.path.splitext(args.contours)[0] + "_modes.csv"
+    write_cut_on_table(output, areas, cut_on)
+    if args.modes > 1 and np.any(np.isfinite(cut_on[:, 1])):
+        i = int(np.nanargmin(cut_on[:, 1]))
+        print(f"{len(areas)} sections; lowest first higher-order cut-on {cut_on[i, 1]:.1f} Hz at section {i}")
+    print(f"Saved cut-on table to {output}")
+
+
+if __name__ == "__main__":
+    main()
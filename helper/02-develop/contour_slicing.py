@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量截面切割引擎：一次调用得到沿中心线的全部截面轮廓。
+
+原先的导出脚本对每个中心线点重新 Update 一次 `vtkCutter`，再 `DeepCopy`
+输出并用 `poly.GetPoint(i)` 逐点拷回 Python，2000 截面的弯管模型需数分钟。
+本模块改为：
+1. 每个工作线程持有自己的 vtkPlane / vtkCutter（输入为腔体的浅拷贝，
+   避免多线程同时懒构建同一 polydata 的 cell 结构）；
+2. 截面点通过 `vtk.util.numpy_support` 直接映射为 NumPy 数组，不再逐点拷贝；
+3. 所有截面点拼接为一个扁平缓冲区，配合 offsets 数组按截面索引。
+
+用法（Slicer Python Console 或任何装有 VTK 的 Python）：
+    >>> from contour_slicing import slice_polydata
+    >>> batch = slice_polydata(lumen_node.GetPolyData(), origins, normals)
+    >>> for idx in batch.valid_indices(): pts = batch.section_points(idx)
+
+增量重切（编辑少量中心线控制点后重新导出）：
+    >>> batch = slice_polydata_cached(polydata, origins, normals, 'contour.csv.slicecache.npz')
+只重新切割平面移动过、或平面穿过网格变化区域的截面，其余截面直接取自缓存。
+"""
+
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+import vtk  # type: ignore
+from vtk.util import numpy_support  # type: ignore
+
+# ----------------- 内部常量 -----------------
+MIN_PTS_PER_SLICE = 3    # polydata 至少 3 点才算有效切片
+MIN_DIST = 1e-6          # 向量归一化判定阈值
+CACHE_VERSION = 1        # 切割缓存文件格式版本
+BUCKETS_PER_AXIS = 32    # 网格分桶：包围盒最长边约分成的桶数
+
+
+# ----------------- 数据结构 -----------------
+
+@dataclass
+class SliceBatch:
+    """
+    N 个截面的切割结果（扁平存储）。
+
+    points   : (M,3) float64，全部截面点依次拼接（世界坐标）
+    offsets  : (N+1,) int64，截面 i 的点为 points[offsets[i]:offsets[i+1]]
+    areas    : (N,) float64，vtkMassProperties 给出的截面曲面面积
+    origins  : (N,3) 切平面原点
+    normals  : (N,3) 单位切平面法线
+    """
+    points: np.ndarray
+    offsets: np.ndarray
+    areas: np.ndarray
+    origins: np.ndarray
+    normals: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def counts(self) -> np.ndarray:
+        """每个截面的点数 (N,)"""
+        return np.diff(self.offsets)
+
+    def section_points(self, idx: int) -> np.ndarray:
+        """返回截面 idx 的 (n,3) 点视图（不拷贝）"""
+        return self.points[self.offsets[idx]:self.offsets[idx + 1]]
+
+    def valid_indices(self, min_points: int = MIN_PTS_PER_SLICE) -> np.ndarray:
+        """点数不少于 min_points 的截面索引"""
+        return np.flatnonzero(self.counts() >= min_points)
+
+    def equivalent_radii(self) -> np.ndarray:
+        """等效半径 r = sqrt(A/pi)；面积为 0 时与原脚本一致返回 1.0"""
+        radii = np.ones_like(self.areas)
+        pos = self.areas > 0
+        radii[pos] = np.sqrt(self.areas[pos] / math.pi)
+        return radii
+
+
+# ----------------- 向量工具 -----------------
+
+def normalize_rows(v: np.ndarray) -> np.ndarray:
+    """逐行归一化 (N,3)；模长过小的行返回 (1,0,0)"""
+    v = np.asarray(v, dtype=float)
+    n = np.linalg.norm(v, axis=1)
+    out = np.zeros_like(v)
+    ok = n >= MIN_DIST
+    out[ok] = v[ok] / n[ok, None]
+    out[~ok] = (1.0, 0.0, 0.0)
+    return out
+
+
+def compute_tangents(points: np.ndarray) -> np.ndarray:
+    """按三点滑动均值计算切向量；端点继承相邻方向"""
+    v = np.zeros_like(points)
+    v[1:-1] = (points[2:] - points[:-2]) * 0.5
+    v[0]    = points[1]  - points[0]
+    v[-1]   = points[-1] - points[-2]
+
+    t = np.zeros_like(points)
+    t[1:-1] = (v[:-2] + v[1:-1] + v[2:]) / 3.0
+    t[0]    = t[1]
+    t[-1]   = t[-2]
+    return normalize_rows(t)
+
+
+def polar_sort_order(local_y: np.ndarray, local_z: np.ndarray, clockwise: bool = False) -> np.ndarray:
+    """按极角排序轮廓点的索引（默认逆时针）"""
+    sort_idx = np.argsort(np.arctan2(local_z, local_y))
+    return sort_idx[::-1] if clockwise else sort_idx
+
+
+# ----------------- 切割核心 -----------------
+
+def _slice_chunk(polydata: vtk.vtkPolyData, origins: np.ndarray, normals: np.ndarray,
+                 indices: range) -> List[Tuple[int, np.ndarray, float]]:
+    """在当前线程内用私有 cutter 切割 indices 对应的截面。"""
+    plane = vtk.vtkPlane()
+    cutter = vtk.vtkCutter()
+    cutter.SetInputData(polydata)
+    cutter.SetCutFunction(plane)
+    mass = vtk.vtkMassProperties()
+
+    out = []
+    for idx in indices:
+        plane.SetOrigin(*origins[idx])
+        plane.SetNormal(*normals[idx])
+        cutter.Update()
+        poly = cutter.GetOutput()
+        n_pts = poly.GetNumberOfPoints()
+        if n_pts == 0:
+            out.append((idx, np.empty((0, 3)), 0.0))
+            continue
+        # vtk_to_numpy 返回对 VTK 缓冲区的视图；下一次 Update 会复用该缓冲区，故需 astype 拷出
+        pts = numpy_support.vtk_to_numpy(poly.GetPoints().GetData()).astype(np.float64)
+        # cutter 对三角面片输出的是线段；vtkMassProperties 只接受三角形，
+        # 对线段结果面积恒为 0（原脚本的等效半径因此退化为 1.0），这里直接跳过
+        area = 0.0
+        if n_pts >= MIN_PTS_PER_SLICE and poly.GetNumberOfPolys() > 0:
+            mass.SetInputData(poly)
+            mass.Update()
+            area = mass.GetSurfaceArea()
+        out.append((idx, pts, area))
+    return out
+
+
+def slice_polydata(polydata: vtk.vtkPolyData, origins: np.ndarray, normals: np.ndarray,
+                   max_workers: Optional[int] = None) -> SliceBatch:
+    """
+    用 N 个平面 (origins[i], normals[i]) 切割 polydata，返回全部截面。
+
+    参数:
+        polydata    : 腔体表面（只读，不会被修改）
+        origins     : (N,3) 平面原点
+        normals     : (N,3) 平面法线（内部会归一化）
+        max_workers : 线程数；None 时取 os.cpu_count()
+    """
+    origins = np.ascontiguousarray(origins, dtype=np.float64).reshape(-1, 3)
+    normals = normalize_rows(np.asarray(normals, dtype=np.float64).reshape(-1, 3))
+    if origins.shape != normals.shape:
+        raise ValueError(f"origins {origins.shape} 与 normals {normals.shape} 形状不一致")
+
+    n_sec = len(origins)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    n_chunks = max(1, min(max_workers, n_sec))
+    bounds = np.linspace(0, n_sec, n_chunks + 1).astype(int)
+
+    # 每个线程各用一份浅拷贝，数据数组共享，cell/link 等懒构建结构相互独立
+    inputs = []
+    for _ in range(n_chunks):
+        shallow = vtk.vtkPolyData()
+        shallow.ShallowCopy(polydata)
+        inputs.append(shallow)
+
+    results: List[Tuple[int, np.ndarray, float]] = []
+    if n_chunks == 1:
+        results = _slice_chunk(inputs[0], origins, normals, range(n_sec))
+    else:
+        with ThreadPoolExecutor(max_workers=n_chunks) as pool:
+            futures = [
+                pool.submit(_slice_chunk, inputs[k], origins, normals, range(bounds[k], bounds[k + 1]))
+                for k in range(n_chunks)
+            ]
+            for fut in futures:
+                results.extend(fut.result())
+
+    results.sort(key=lambda r: r[0])
+    counts = np.array([len(r[1]) for r in results], dtype=np.int64)
+    offsets = np.zeros(n_sec + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    points = np.concatenate([r[1] for r in results]) if n_sec else np.empty((0, 3))
+    areas = np.array([r[2] for r in results], dtype=np.float64)
+    return SliceBatch(points=points, offsets=offsets, areas=areas, origins=origins, normals=normals)
+
+
+def project_local(batch: SliceBatch, idx: int, t_axis: np.ndarray, b_axis: np.ndarray):
+    """将截面 idx 的点投影到局部基 (t, b)，返回 (local_y, local_z)"""
+    rel = batch.section_points(idx) - batch.origins[idx]
+    return rel @ t_axis, rel @ b_axis
+
+
+# ----------------- 增量切割缓存 -----------------
+
+_HASH_PRIMES = np.array([0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9], dtype=np.uint64)
+_KEY_BIAS = 1 << 20      # 桶整数坐标偏移，使 21 bit 可容纳负坐标
+
+
+@dataclass
+class MeshBuckets:
+    """
+    按单元重心把网格分进边长 size 的立方桶，每个桶记录单元内容哈希与单元实际包围盒。
+    两次导出之间比较桶哈希即可定位网格变化的区域。
+    """
+    size: float
+    keys: np.ndarray      # (B,) int64，桶坐标编码，升序
+    hashes: np.ndarray    # (B,) uint64，桶内单元顶点坐标的无序哈希和
+    box_min: np.ndarray   # (B,3)
+    box_max: np.ndarray   # (B,3)
+
+
+def mesh_buckets(polydata: vtk.vtkPolyData, size: Optional[float] = None) -> MeshBuckets:
+    """计算 polydata 的分桶哈希；size 为 None 时取包围盒最长边 / BUCKETS_PER_AXIS。"""
+    n_pts = polydata.GetNumberOfPoints()
+    polys = polydata.GetPolys()
+    if n_pts == 0 or polys.GetNumberOfCells() == 0:
+        empty = np.empty((0, 3))
+        return MeshBuckets(size or 1.0, np.empty(0, np.int64), np.empty(0, np.uint64), empty, empty)
+    pts = numpy_support.vtk_to_numpy(polydata.GetPoints().GetData()).astype(np.float64)
+    offsets = numpy_support.vtk_to_numpy(polys.GetOffsetsArray()).astype(np.int64)
+    conn = numpy_support.vtk_to_numpy(polys.GetConnectivityArray()).astype(np.int64)
+    if size is None:
+        size = float(np.ptp(pts, axis=0).max()) / BUCKETS_PER_AXIS or 1.0
+
+    # 单元哈希：顶点坐标的位模式按轴、按单元内位置混合后求和（uint64 自然回绕）
+    counts = np.diff(offsets)
+    cell_pts = pts[conn]
+    position = (np.arange(len(conn)) - np.repeat(offsets[:-1], counts)).astype(np.uint64)
+    entry = (np.ascontiguousarray(cell_pts).view(np.uint64) * _HASH_PRIMES).sum(axis=1, dtype=np.uint64)
+    entry = entry * (position * np.uint64(2) + np.uint64(1))
+    starts = offsets[:-1]
+    cell_hash = np.add.reduceat(entry, starts, dtype=np.uint64)
+    cell_hash ^= cell_hash >> np.uint64(31)
+
+    centroid = np.add.reduceat(cell_pts, starts, axis=0) / counts[:, None]
+    ijk = np.floor(centroid / size).astype(np.int64) + _KEY_BIAS
+    cell_key = (ijk[:, 0] << 42) | (ijk[:, 1] << 21) | ijk[:, 2]
+    keys, inv = np.unique(cell_key, return_inverse=True)
+    hashes = np.zeros(len(keys), dtype=np.uint64)
+    np.add.at(hashes, inv, cell_hash)
+    box_min = np.full((len(keys), 3), np.inf)
+    box_max = np.full((len(keys), 3), -np.inf)
+    np.minimum.at(box_min, inv, np.minimum.reduceat(cell_pts, starts, axis=0))
+    np.maximum.at(box_max, inv, np.maximum.reduceat(cell_pts, starts, axis=0))
+    return MeshBuckets(size, keys, hashes, box_min, box_max)
+
+
+def changed_boxes(old: MeshBuckets, new: MeshBuckets) -> Tuple[np.ndarray, np.ndarray]:
+    """新旧分桶之间内容不同的区域（新增/删除/哈希变化的桶），返回包围盒 (min, max)。"""
+    _, i_old, i_new = np.intersect1d(old.keys, new.keys, assume_unique=True, return_indices=True)
+    differ = old.hashes[i_old] != new.hashes[i_new]
+    only_old = np.setdiff1d(np.arange(len(old.keys)), i_old)
+    only_new = np.setdiff1d(np.arange(len(new.keys)), i_new)
+    box_min = np.concatenate((np.minimum(old.box_min[i_old[differ]], new.box_min[i_new[differ]]),
+                              old.box_min[only_old], new.box_min[only_new]))
+    box_max = np.concatenate((np.maximum(old.box_max[i_old[differ]], new.box_max[i_new[differ]]),
+                              old.box_max[only_old], new.box_max[only_new]))
+    return box_min, box_max
+
+
+def planes_hit_boxes(origins: np.ndarray, normals: np.ndarray, box_min: np.ndarray,
+                     box_max: np.ndarray) -> np.ndarray:
+    """(N,) bool：平面 i 是否与任一包围盒相交（vtkCutter 切的是无限大平面）。"""
+    if not len(box_min) or not len(origins):
+        return np.zeros(len(origins), dtype=bool)
+    center = 0.5 * (box_min + box_max)
+    half = 0.5 * (box_max - box_min)
+    dist = np.abs(normals @ center.T - np.sum(normals * origins, axis=1)[:, None])   # (N,B)
+    reach = np.abs(normals) @ half.T
+    return np.any(dist <= reach + MIN_DIST, axis=1)
+
+
+def _plane_keys(origins: np.ndarray, normals: np.ndarray) -> List[bytes]:
+    planes = np.ascontiguousarray(np.hstack((origins, normals)), dtype=np.float64)
+    return [row.tobytes() for row in planes]
+
+
+# 同一 Slicer 会话内重复 exec 导出脚本时，polydata 未修改 (MTime 不变) 则跳过网格哈希
+_session_buckets: Dict[str, Tuple[Tuple[int, int], MeshBuckets]] = {}
+
+
+class SliceCache:
+    """
+    截面切割结果的磁盘缓存（.npz），键为 (平面原点, 法线) 与网格分桶哈希。
+
+    lookup 时：
+      - 平面不在缓存中 → 重切；
+      - 网格某些桶的内容变化 → 与这些桶的包围盒相交的截面重切；
+      - 其余截面直接复用缓存的点与面积。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.stats = {"sections": 0, "reused": 0, "recut": 0, "changed_buckets": 0, "seconds": 0.0}
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with np.load(self.path) as data:
+                if int(data["version"]) != CACHE_VERSION:
+                    return None
+                batch = SliceBatch(points=data["points"], offsets=data["offsets"], areas=data["areas"],
+                                   origins=data["origins"], normals=data["normals"])
+                buckets = MeshBuckets(float(data["bucket_size"]), data["bucket_keys"], data["bucket_hashes"],
+                                      data["bucket_min"], data["bucket_max"])
+            return batch, buckets
+        except (OSError, KeyError, ValueError) as exc:
+            print(f"[SliceCache] 忽略无法读取的缓存 {self.path}: {exc}")
+            return None
+
+    def _save(self, batch: SliceBatch, buckets: MeshBuckets) -> None:
+        tmp = self.path + ".tmp.npz"
+        np.savez(tmp, version=CACHE_VERSION, points=batch.points, offsets=batch.offsets, areas=batch.areas,
+                 origins=batch.origins, normals=batch.normals, bucket_size=buckets.size,
+                 bucket_keys=buckets.keys, bucket_hashes=buckets.hashes,
+                 bucket_min=buckets.box_min, bucket_max=buckets.box_max)
+        os.replace(tmp, self.path)
+
+    def _buckets(self, polydata: vtk.vtkPolyData, size: Optional[float]) -> MeshBuckets:
+        stamp = (id(polydata), polydata.GetMTime())
+        cached = _session_buckets.get(self.path)
+        if cached is not None and cached[0] == stamp and (size is None or cached[1].size == size):
+            return cached[1]
+        buckets = mesh_buckets(polydata, size)
+        _session_buckets[self.path] = (stamp, buckets)
+        return buckets
+
+    def slice(self, polydata: vtk.vtkPolyData, origins: np.ndarray, normals: np.ndarray,
+              max_workers: Optional[int] = None) -> SliceBatch:
+        """与 slice_polydata 相同的结果，只重切变化的截面，并更新缓存文件。"""
+        t0 = time.perf_counter()
+        origins = np.ascontiguousarray(origins, dtype=np.float64).reshape(-1, 3)
+        normals = normalize_rows(np.asarray(normals, dtype=np.float64).reshape(-1, 3))
+        n_sec = len(origins)
+
+        previous = self._load()
+        buckets = self._buckets(polydata, previous[1].size if previous else None)
+        source = np.full(n_sec, -1, dtype=np.int64)          # 每个截面在旧缓存中的索引，-1 为需重切
+        if previous is not None:
+            old_batch, old_buckets = previous
+            lookup = {key: i for i, key in enumerate(_plane_keys(old_batch.origins, old_batch.normals))}
+            source = np.array([lookup.get(key, -1) for key in _plane_keys(origins, normals)], dtype=np.int64)
+            box_min, box_max = changed_boxes(old_buckets, buckets)
+            self.stats["changed_buckets"] = len(box_min)
+            source[planes_hit_boxes(origins, normals, box_min, box_max)] = -1
+
+        recut = np.flatnonzero(source < 0)
+        fresh = slice_polydata(polydata, origins[recut], normals[recut], max_workers=max_workers) if len(recut) else None
+
+        # 合并：复用旧截面的点段，插入新切的截面
+        parts: List[np.ndarray] = []
+        areas = np.zeros(n_sec)
+        recut_pos = np.full(n_sec, -1, dtype=np.int64)
+        recut_pos[recut] = np.arange(len(recut))
+        for i in range(n_sec):
+            if source[i] >= 0:
+                parts.append(old_batch.section_points(source[i]))
+                areas[i] = old_batch.areas[source[i]]
+            else:
+                parts.append(fresh.section_points(recut_pos[i]))
+                areas[i] = fresh.areas[recut_pos[i]]
+        counts = np.array([len(p) for p in parts], dtype=np.int64)
+        offsets = np.zeros(n_sec + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        points = np.concatenate(parts) if n_sec else np.empty((0, 3))
+        batch = SliceBatch(points=np.asarray(points, dtype=np.float64), offsets=offsets, areas=areas,
+                           origins=origins, normals=normals)
+        self._save(batch, buckets)
+
+        self.stats.update(sections=n_sec, reused=n_sec - len(recut), recut=len(recut),
+                          seconds=time.perf_counter() - t0)
+        return batch
+
+
+def slice_polydata_cached(polydata: vtk.vtkPolyData, origins: np.ndarray, normals: np.ndarray,
+                          cache_path: str, max_workers: Optional[int] = None) -> SliceBatch:
+    """slice_polydata 的增量版本；cache_path 为缓存 .npz，统计信息打印到控制台。"""
+    cache = SliceCache(cache_path)
+    batch = cache.slice(polydata, origins, normals, max_workers=max_workers)
+    st = cache.stats
+    print(f"[SliceCache] {st['sections']} 截面：复用 {st['reused']}，重切 {st['recut']}"
+          f"（网格变化桶 {st['changed_buckets']}），{st['seconds']:.2f} s")
+    return batch
+
+
+def cache_path_for(output_csv: str) -> str:
+    """导出 CSV 对应的切割缓存路径"""
+    return output_csv + ".slicecache.npz"
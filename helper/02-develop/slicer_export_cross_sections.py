@@ -0,0 +1,79 @@
+"""
+用 Cross-section analysis 模块的 C++ 多线程截面计算导出 VTL3D 轮廓 CSV。
+
+与 slicer_generate_vtl3d_csv.py 的 vtkCutter 批量切割不同，这里沿中心线曲线
+（或 VMTK 中心线模型）的每个点，由 vtkCrossSectionCompute 一次性求出全部截面
+多边形（只保留外轮廓、按顺序排列），腔体表面只提取/变换一次。
+截面坐标系取中心线的平行移动标架 (normal, binormal)，scale 为等面积圆半径。
+
+在 Slicer Python Console 中调整参数后 exec 运行。
+"""
+import os
+import sys
+
+import numpy as np
+
+try:
+    import slicer  # type: ignore
+    import slicer.util  # type: ignore
+except ImportError:
+    print("[错误] 本脚本需在 3D Slicer 的 Python 环境中运行！", file=sys.stderr)
+    sys.exit(1)
+
+# =============================================================================
+# 可自定义参数
+# =============================================================================
+
+curveName    = "Centerline curve (0)"     # 中心线（曲线或 VMTK 中心线模型）
+modelName    = "MyBox"                    # 腔体模型或分割节点
+segmentName  = None                       # 分割节点时的段名（None -> 第一个段）
+outputDir    = r"/home/jqwang/Work/03-Slicer-to-vocalTab/02-develop"
+outputCsv    = os.path.join(outputDir, "contour_cross_sections.csv")
+writeBinarySidecar = False                # 同时写出同名 .vtlc
+saveBuffers  = False                      # 另存全部截面多边形 (.npz)
+helperDir    = None                       # contour_io.py 所在目录（None -> 本脚本所在目录）
+# =============================================================================
+
+if helperDir is None:
+    if "__file__" not in globals():
+        # exec(open(...).read()) 运行时没有 __file__，无法推断本脚本所在目录
+        raise RuntimeError("无法确定 contour_io.py 所在目录：请设置 helperDir，"
+                           '或以 exec(code, {"__file__": path}) 方式运行本脚本')
+    helperDir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.isfile(os.path.join(helperDir, "contour_io.py")):
+    raise RuntimeError(f"helperDir 中没有 contour_io.py：{helperDir}")
+if helperDir not in sys.path:
+    sys.path.insert(0, helperDir)
+from contour_io import open_contour_writer  # noqa: E402
+
+
+def log(msg: str) -> None:
+    print(f"[CrossSections] {msg}")
+
+
+curve_node = slicer.util.getNode(curveName)
+lumen_node = slicer.util.getNode(modelName)
+segment_id = ""
+if lumen_node.IsA("vtkMRMLSegmentationNode"):
+    segmentation = lumen_node.GetSegmentation()
+    segment_id = (segmentation.GetSegmentIdBySegmentName(segmentName) if segmentName
+                  else segmentation.GetNthSegmentID(0))
+
+logic = slicer.util.getModuleLogic("CrossSectionAnalysis")
+logic.setInputCenterlineNode(curve_node)
+logic.setLumenSurface(lumen_node, segment_id)
+
+os.makedirs(outputDir, exist_ok=True)
+with open_contour_writer(outputCsv, sidecar=writeBinarySidecar) as writer:
+    sections = logic.computeCrossSectionContours(writer)
+    saved = writer.n_sections
+
+n = len(sections["areas"])
+if len(sections["emptySectionIds"]):
+    log(f"[!] 空截面: {sections['emptySectionIds'].tolist()}")
+log(f"[✓] {saved}/{n} 条截面写入 CSV -> {outputCsv}")
+
+if saveBuffers:
+    npz_path = os.path.splitext(outputCsv)[0] + "_sections.npz"
+    np.savez(npz_path, **sections)
+    log(f"截面多边形 -> {npz_path}")
@@ -13,7 +13,8 @@ CSV 结构（每两个连续行 = 1 个截面）：
 2. 偶数行：center.Y ; normal.Y ; scale_end   ; localZ0 ; localZ1 ; ...
 
 使用方法：在 Slicer Python Console 执行：
-    >>> exec(open('/path/to/slicer_extract_contour_csv_no_endpoints.py').read())
+    >>> path = '/path/to/slicer_extract_contour_csv_no_endpoints.py'
+    >>> exec(open(path).read(), {'__file__': path})
 """
 
 import os, sys, math, csv
@@ -37,11 +38,28 @@ clockwiseContour = False                # 轮廓排序方向 True=顺时针 Fals
 use_cm_unit      = True                 # 是否将世界坐标 mm → cm
 scale_by_radius  = False                # 若 True, 以等效半径归一化 local 坐标
 use_curve_endpoints = True              # False 时忽略曲线首尾两个点
+write_binary_sidecar = False            # True 时在 CSV 旁写出同名 .vtlc 二进制
+slice_workers    = None                 # 批量切割线程数（None -> CPU 核数）
+incremental_slicing = True              # True 时缓存切割结果，重跑只重切平面/网格变化的截面
+helper_dir       = None                 # contour_slicing.py 所在目录（None -> 本脚本所在目录）
 
 # =============================================================================
 MIN_PTS_PER_SLICE = 3
 EPS = 1e-6
 
+if helper_dir is None:
+    if '__file__' not in globals():
+        # exec(open(...).read()) 运行时没有 __file__，无法推断本脚本所在目录
+        raise RuntimeError('无法确定 contour_slicing.py 所在目录：请设置 helper_dir，'
+                           '或以 exec(code, {"__file__": path}) 方式运行本脚本')
+    helper_dir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.isfile(os.path.join(helper_dir, 'contour_slicing.py')):
+    raise RuntimeError(f'helper_dir 中没有 contour_slicing.py：{helper_dir}')
+if helper_dir not in sys.path:
+    sys.path.insert(0, helper_dir)
+from contour_slicing import cache_path_for, slice_polydata, slice_polydata_cached  # noqa: E402
+from contour_io import open_contour_writer  # noqa: E402
+
 # ----------------------------- 工具函数 --------------------------------------
 
 def log(msg: str) -> None:
@@ -61,11 +79,6 @@ def compute_reference_axes(n_vec: np.ndarray):
     return t, b
 
 
-def equivalent_radius(poly: 'vtk.vtkPolyData') -> float:
-    mp = vtk.vtkMassProperties(); mp.SetInputData(poly); mp.Update()
-    area = mp.GetSurfaceArea()
-    return math.sqrt(area / math.pi) if area > 0 else 1.0
-
 # ---------------------- 切向量（3 点滑动均值） -------------------------------
 
 def compute_tangents(points: np.ndarray) -> np.ndarray:
@@ -113,31 +126,28 @@ if not use_curve_endpoints and pts.shape[0] > 2:
 
 tangents = compute_tangents(pts)
 
-# ----------------------------- 3) 设置 cutter ---------------------------------
+# ----------------------------- 3) 批量切割 -----------------------------------
 
-plane = vtk.vtkPlane()
-cutter = vtk.vtkCutter()
-cutter.SetInputData(lumen_node.GetPolyData())
-cutter.SetCutFunction(plane)
+if incremental_slicing:
+    batch = slice_polydata_cached(lumen_node.GetPolyData(), pts, tangents,
+                                  cache_path_for(outputCsv), max_workers=slice_workers)
+else:
+    batch = slice_polydata(lumen_node.GetPolyData(), pts, tangents, max_workers=slice_workers)
+slice_counts = batch.counts()
+radii_mm = batch.equivalent_radii()
 
 # ----------------------------- 4) 写 CSV -------------------------------------
 
 saved = 0
 centerline_out: List[List[float]] = []
-with open(outputCsv, 'w', newline='') as f_csv:
-    writer = csv.writer(f_csv, delimiter=';')
+with open_contour_writer(outputCsv, sidecar=write_binary_sidecar) as writer:
 
     for idx, (P, N) in enumerate(zip(pts, tangents)):
-        plane.SetOrigin(*P)
-        plane.SetNormal(*N)
-        cutter.Update()
-
-        poly = vtk.vtkPolyData(); poly.DeepCopy(cutter.GetOutput())
-        if poly.GetNumberOfPoints() < MIN_PTS_PER_SLICE:
+        if slice_counts[idx] < MIN_PTS_PER_SLICE:
             log(f'[!] Slice {idx:03d}: 无交线，跳过')
             continue
 
-        pts_np = np.array([poly.GetPoint(i) for i in range(poly.GetNumberOfPoints())])
+        pts_np = batch.section_points(idx)
         N_vec = normalize(N)
 
         # 计算局部基 t / b
@@ -146,12 +156,11 @@ with open(outputCsv, 'w', newline='') as f_csv:
         local_z = (pts_np - P) @ b_axis
 
         # 是否等效半径归一化
-        if scale_by_radius:
-            r_mm = equivalent_radius(poly)
-            if r_mm > EPS:
-                local_y /= r_mm
-                local_z /= r_mm
-        scale_val = 1.0 if not scale_by_radius else equivalent_radius(poly) / (10.0 if use_cm_unit else 1.0)
+        r_mm = radii_mm[idx]
+        if scale_by_radius and r_mm > EPS:
+            local_y /= r_mm
+            local_z /= r_mm
+        scale_val = 1.0 if not scale_by_radius else r_mm / (10.0 if use_cm_unit else 1.0)
 
         # 按极角排序保证顺/逆时针一致
         angles = np.arctan2(local_z, local_y)
@@ -165,8 +174,7 @@ with open(outputCsv, 'w', newline='') as f_csv:
         P_out = P / 10.0 if use_cm_unit else P.copy()
 
         # 写两行：法线改为 t_axis 在 XY 的分量（平面内指向 'local Y' 轴）
-        writer.writerow([P_out[0], t_axis[0], scale_val, *local_y])
-        writer.writerow([P_out[1], t_axis[1], scale_val, *local_z])
+        writer.write_section(P_out, t_axis, scale_val, local_y, local_z)
 
         saved += 1
         centerline_out.append(P_out.tolist())
@@ -37,8 +37,29 @@ rotateLocalDeg = 0
 rotateGlobalDeg = 0
 # 新增：写入 CSV 前是否交换 norm_y 和 norm_z (True = 交换)
 swapLocalYZBeforeWrite = False
+# 是否在 CSV 旁同时写出可内存映射的二进制 sidecar（同名 .vtlc）
+writeBinarySidecar = False
+# 批量切割线程数（None -> CPU 核数）
+sliceWorkers = None
+# 增量切割：缓存每个截面的切割结果，重跑时只重切平面移动或网格变化处的截面
+incrementalSlicing = True
+# contour_slicing.py 所在目录（None -> 本脚本所在目录）
+helperDir    = None
 # =============================================================================
 
+if helperDir is None:
+    if "__file__" not in globals():
+        # exec(open(...).read()) 运行时没有 __file__，无法推断本脚本所在目录
+        raise RuntimeError("无法确定 contour_slicing.py 所在目录：请设置 helperDir，"
+                           '或以 exec(code, {"__file__": path}) 方式运行本脚本')
+    helperDir = os.path.dirname(os.path.abspath(__file__))
+if not os.path.isfile(os.path.join(helperDir, "contour_slicing.py")):
+    raise RuntimeError(f"helperDir 中没有 contour_slicing.py：{helperDir}")
+if helperDir not in sys.path:
+    sys.path.insert(0, helperDir)
+from contour_slicing import cache_path_for, slice_polydata, slice_polydata_cached  # noqa: E402
+from contour_io import open_contour_writer  # noqa: E402
+
 # ----------------- 内部常量 -----------------
 MIN_PTS_PER_SLICE = 3    # polydata 至少 3 点才算有效切片
 MIN_DIST = 1e-6          # 向量归一化判定阈值
@@ -81,15 +102,6 @@ def compute_reference_axes(n_vec: np.ndarray):
     return t, b
 
 
-def equivalent_radius(poly: vtk.vtkPolyData) -> float:
-    """使用曲面面积计算等效半径 r = sqrt(A/pi)"""
-    mp = vtk.vtkMassProperties()
-    mp.SetInputData(poly)
-    mp.Update()
-    area = mp.GetSurfaceArea()
-    return math.sqrt(area / math.pi) if area > 0 else 1.0
-
-
 def rotate_xy(vec: np.ndarray, deg: float) -> np.ndarray:
     """顺时针旋转 vec 的 XY 分量；Z 保持不变。vec 可以是 (N,3) 或 (3,)"""
     if abs(deg) < 1e-6:
@@ -136,34 +148,29 @@ pts = np.vstack((P_start, curve_pts, P_end))  # shape=(33,3)
 # 2) 切向量 ---------------------------------------------------------------
 tangents = compute_tangents(pts)
 
-# 3) 设置 cutter ----------------------------------------------------------
-cutter = vtk.vtkCutter()
-cutter.SetInputData(lumen_node.GetPolyData())
-plane = vtk.vtkPlane()
-cutter.SetCutFunction(plane)
+# 3) 批量切割全部截面 ------------------------------------------------------
+if incrementalSlicing:
+    batch = slice_polydata_cached(lumen_node.GetPolyData(), pts, tangents, cache_path_for(outputCsv),
+                                  max_workers=sliceWorkers)
+else:
+    batch = slice_polydata(lumen_node.GetPolyData(), pts, tangents, max_workers=sliceWorkers)
+radii_mm = batch.equivalent_radii()
+slice_counts = batch.counts()
 
-# 4) 准备 CSV writer ------------------------------------------------------
-with open(outputCsv, "w", newline="") as f_csv:
-    writer = csv.writer(f_csv, delimiter=";")
+# 4) 流式写出截面（CSV，可选 .vtlc sidecar） -------------------------------
+with open_contour_writer(outputCsv, sidecar=writeBinarySidecar) as writer:
 
     saved_slices = 0
     centerline_out: List[List[float]] = []
     center_points: List[np.ndarray] = []
 
     for idx, (P, N_tangent) in enumerate(zip(pts, tangents)): # Renamed N to N_tangent to avoid clash with N_vec
-        plane.SetOrigin(*P)
-        plane.SetNormal(*N_tangent) # Use N_tangent here
-        cutter.Update()
-
-        poly_slice = vtk.vtkPolyData()
-        poly_slice.DeepCopy(cutter.GetOutput())
-
-        if poly_slice.GetNumberOfPoints() < MIN_PTS_PER_SLICE:
+        if slice_counts[idx] < MIN_PTS_PER_SLICE:
             log(f"[!] Slice {idx:03d}: 无交线，跳过")
             continue
 
         # -- 计算等效半径 & 局部坐标 --------------------------------------
-        pts_np = np.array([poly_slice.GetPoint(i) for i in range(poly_slice.GetNumberOfPoints())])
+        pts_np = batch.section_points(idx)
         ctr_pt = np.asarray(P)  # 当前切平面原点
         
 
@@ -185,7 +192,7 @@ with open(outputCsv, "w", newline="") as f_csv:
             local_y, local_z = rot_y, rot_z
 
         # 等效缩放因子（曲线半径，mm)  ------------------------------------
-        l_scale_mm = equivalent_radius(poly_slice)
+        l_scale_mm = radii_mm[idx]
         l_scale = l_scale_mm / 10.0  # 转成 cm 以符合 VTL3D 约定
 
         # 将世界坐标从 mm → cm
@@ -216,14 +223,12 @@ with open(outputCsv, "w", newline="") as f_csv:
         if swapLocalYZBeforeWrite: # 当前为 False, 此块不执行
             # 将代表"高度"(来自 t) 的 norm_y 写入 Z 行 (偶数行)
             # 将代表"宽度"(来自 b) 的 norm_z 写入 Y 行 (奇数行)
-            writer.writerow([ctr_rot_cm[0], N_rot[0], l_scale, *norm_z])
-            writer.writerow([ctr_rot_cm[1], N_rot[1], l_scale, *norm_y])
+            writer.write_section(ctr_rot_cm, N_rot, l_scale, norm_z, norm_y)
         else:
             # 保持原始对应关系，但法线分量按要求交换
             # 奇数行: 中心点X, 原始法线Y, scale, norm_y (来自t)
             # 偶数行: 中心点Y, 原始法线X, scale, norm_z (来自b)
-            writer.writerow([ctr_rot_cm[0], N_vec[1], l_scale, *norm_y])
-            writer.writerow([ctr_rot_cm[1], N_vec[0], l_scale, *norm_z])
+            writer.write_section(ctr_rot_cm, (N_vec[1], N_vec[0]), l_scale, norm_y, norm_z)
 
         saved_slices += 1
         centerline_out.append(ctr_rot_cm.tolist()) # rotated cm coordinates
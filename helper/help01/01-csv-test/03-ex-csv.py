@@ -5,6 +5,13 @@ import os
 import math
 from matplotlib import font_manager
 
+# 共享的轮廓 CSV 解析器: helper/02-develop/contour_io.py
+_develop_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd(),
+                            '..', '..', '02-develop')
+if _develop_dir not in sys.path:
+    sys.path.insert(0, _develop_dir)
+from contour_io import load_contours  # noqa: E402
+
 # --- 字体设置 ---
 # 获取脚本所在目录
 # 注意: __file__ 在某些环境 (如交互式解释器) 中可能未定义
@@ -133,39 +140,12 @@ def calculate_outlet_geometry(s_prime_i, n_hat_i, L_i, R_i, alpha_i):
 
 
 # --- 数据加载与准备 (修改后) ---
-def load_and_prepare_section_data(line_odd, line_even):
+def prepare_section_data(head, local_contour_y, local_contour_z):
     """
-    解析CSV行对, 模拟 C++ 中的数据加载、几何中心调整和必要的数据准备。
+    基于 contour_io 解析出的截面 (head 六元组 + 局部 Y/Z 列表), 模拟 C++ 中的数据加载、几何中心调整和必要的数据准备。
     返回包含原始数据和调整后数据的字典。
     """
-    local_contour_y = []
-    local_contour_z = []
-    center_x, center_y = 0.0, 0.0
-    normal_x, normal_y = 1.0, 0.0
-    scale_in, scale_out = 1.0, 1.0
-    try:
-        parts_odd = line_odd.strip().split(';')
-        if len(parts_odd) < 4: raise ValueError("奇数行字段不足")
-        center_x = float(parts_odd[0])
-        normal_x = float(parts_odd[1])
-        scale_in = float(parts_odd[2])
-        local_contour_y = [float(p) for p in parts_odd[3:] if p.strip()]
-    except (IndexError, ValueError) as e:
-        print(f"错误: 解析奇数行失败: {e}\n行: {line_odd.strip()}")
-        return None
-    try:
-        parts_even = line_even.strip().split(';')
-        if len(parts_even) < 4: raise ValueError("偶数行字段不足")
-        center_y = float(parts_even[0])
-        normal_y = float(parts_even[1])
-        scale_out = float(parts_even[2])
-        local_contour_z = [float(p) for p in parts_even[3:] if p.strip()]
-    except (IndexError, ValueError) as e:
-        print(f"错误: 解析偶数行失败: {e}\n行: {line_even.strip()}")
-        return None
-    if len(local_contour_y) != len(local_contour_z):
-        print(f"错误: 轮廓点数量不匹配 ({len(local_contour_y)} vs {len(local_contour_z)})" )
-        return None
+    center_x, normal_x, scale_in, center_y, normal_y, scale_out = (float(v) for v in head)
     if not local_contour_y:
         print("警告: 未找到轮廓点")
 
@@ -313,15 +293,12 @@ if not os.path.exists(csv_filename):
 
 all_sections_data = []
 try:
-    with open(csv_filename, 'r') as f:
-        lines = f.readlines()
-        if len(lines) % 2 != 0:
-            print(f"警告：CSV 文件 '{csv_filename}' 的行数不是偶数，可能数据不完整。")
-        for i in range(0, len(lines), 2):
-            if i + 1 < len(lines):
-                section = load_and_prepare_section_data(lines[i], lines[i+1])
-                if section:
-                    all_sections_data.append(section)
+    contours = load_contours(csv_filename)
+    for i in range(len(contours)):
+        contour_y, contour_z = contours.section(i)
+        section = prepare_section_data(contours.head[i], contour_y.tolist(), contour_z.tolist())
+        if section:
+            all_sections_data.append(section)
 except Exception as e:
     print(f"错误：读取或处理文件 '{csv_filename}' 时出错: {e}")
     sys.exit(1)
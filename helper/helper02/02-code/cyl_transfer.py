@@ -10,14 +10,23 @@
     - air        (空气)
     - water      (淡水)
 
+多段面积函数 (AreaFunction):
+    N 段串联圆柱的 ABCD 矩阵在 (频率 x 分段) 上批量计算并以成对归约求积，
+    可选 visco-thermal 壁面损耗；Tube 为其单段特例。
+    面积函数可直接由轮廓 CSV (slicer_generate_vtl3d_csv.py 输出) 生成。
+
 作者: 自动生成
 """
 from __future__ import annotations
 import argparse
+import os
+import sys
 import numpy as np
 import matplotlib.pyplot as plt
 from dataclasses import dataclass
 
+FREQ_BLOCK = 1024  # 多段求积时每块的频点数，限制 (频率 x 分段) 复数数组的内存
+
 # ----------------------------- 物理参数 -----------------------------
 
 def air_density(Tc: float = 20.0) -> float:
@@ -69,6 +78,43 @@ def sound_speed_water(Tc: float = 20.0) -> float:
         return 1482 # fallback to 20C value
 
 
+def air_viscosity(Tc: float = 20.0) -> float:
+    """空气动力黏度 (Pa·s)，Sutherland 公式。"""
+    T = Tc + 273.15
+    return 1.716e-5 * (T / 273.15)**1.5 * (273.15 + 110.4) / (T + 110.4)
+
+def water_viscosity(Tc: float = 20.0) -> float:
+    """淡水动力黏度 (Pa·s)，Vogel 经验式，0~100°C 误差约 1%。"""
+    return 2.414e-5 * 10**(247.8 / (Tc + 273.15 - 140.0))
+
+# 比热比 gamma 与 Prandtl 数 (visco-thermal 损耗用)，取常温典型值
+HEAT_CAPACITY_RATIO = {"air": 1.402, "water": 1.007}
+PRANDTL_NUMBER = {"air": 0.71, "water": 7.0}
+
+def medium_properties(medium: str, Tc: float):
+    """返回介质的 (rho, c)。"""
+    if medium.lower() == "air":
+        return air_density(Tc), sound_speed_air(Tc)
+    elif medium.lower() == "water":
+        return water_density(Tc), sound_speed_water(Tc)
+    else:
+        raise ValueError(f"Unknown medium: {medium}")
+
+def viscothermal_attenuation(freq: np.ndarray, r: np.ndarray, medium: str, Tc: float) -> np.ndarray:
+    """
+    Kirchhoff 宽管近似的壁面衰减系数 alpha (Np/m)，形状 (频率, 分段)：
+        alpha = sqrt(omega*nu/2) / (r*c) * (1 + (gamma-1)/sqrt(Pr))
+    传播常数取 Gamma = jk + alpha*(1+j)。
+    """
+    rho, c = medium_properties(medium, Tc)
+    mu = air_viscosity(Tc) if medium.lower() == "air" else water_viscosity(Tc)
+    gamma = HEAT_CAPACITY_RATIO[medium.lower()]
+    prandtl = PRANDTL_NUMBER[medium.lower()]
+    omega = 2 * np.pi * np.asarray(freq, dtype=float)[:, None]
+    boundary = np.sqrt(omega * (mu / rho) / 2)
+    return boundary / (np.asarray(r, dtype=float)[None, :] * c) * (1 + (gamma - 1) / np.sqrt(prandtl))
+
+
 # ----------------------------- 阻抗模型 -----------------------------
 
 def radiation_impedance(r: float, freq: np.ndarray, rho: float, c: float) -> np.ndarray:
@@ -116,6 +162,147 @@ def radiation_impedance(r: float, freq: np.ndarray, rho: float, c: float) -> np.
 
     return Z_rad
 
+def load_impedance(kind: str, freq: np.ndarray, rho: float, c: float, a: float, Z0: float):
+    """端口负载声阻抗；a 为端口半径，Z0 为端口处特性阻抗 rho*c/S。"""
+    kind = kind.lower()
+    if kind == "hard":
+        return 1e9 * Z0 * np.ones_like(freq) # 极大阻抗
+    elif kind == "zero":
+        return 1e-9 * Z0 * np.ones_like(freq) # 极小阻抗
+    elif kind == "radiation":
+        # radiation_impedance 返回 specific impedance，乘以面积得到与 Z0=rho*c/S 一致的声阻抗
+        Z_specific_rad = radiation_impedance(a, freq, rho, c)
+        return Z_specific_rad * (np.pi * a**2)
+    else:
+        raise ValueError(f"Unknown boundary kind: {kind}")
+
+
+# ----------------------------- ABCD 级联 -----------------------------
+
+def segment_matrices(freq: np.ndarray, areas: np.ndarray, lengths: np.ndarray, rho: float, c: float,
+                     alpha: np.ndarray | None = None):
+    """
+    每个分段的 ABCD 矩阵元素 (A, B, C, D)，形状均为 (频率, 分段)。
+    alpha 为 None 时为无损硬壁管 (cos / j sin)，否则用复传播常数的 cosh / sinh。
+    """
+    k = 2 * np.pi * np.asarray(freq, dtype=float)[:, None] / c
+    k_eff = np.where(k == 0, 1e-12, k)
+    Z0 = rho * c / np.asarray(areas, dtype=float)[None, :]
+    kl = k_eff * np.asarray(lengths, dtype=float)[None, :]
+    if alpha is None:
+        cos_kl = np.cos(kl)
+        sin_kl = np.sin(kl)
+        return cos_kl, 1j * Z0 * sin_kl, 1j * sin_kl / Z0, cos_kl
+    gl = 1j * kl + alpha * (1 + 1j) * np.asarray(lengths, dtype=float)[None, :]
+    cosh_gl = np.cosh(gl)
+    sinh_gl = np.sinh(gl)
+    return cosh_gl, Z0 * sinh_gl, sinh_gl / Z0, cosh_gl
+
+def chain_product(A: np.ndarray, B: np.ndarray, C: np.ndarray, D: np.ndarray):
+    """
+    沿最后一维 (分段，从左到右) 求 2x2 矩阵连乘 M_0 M_1 ... M_{N-1}。
+    成对归约：每轮把相邻两段合并，共 log2(N) 轮，每轮对全部频点与分段向量化。
+    """
+    while A.shape[-1] > 1:
+        n_pair = A.shape[-1] // 2
+        l, r = slice(0, 2 * n_pair, 2), slice(1, 2 * n_pair, 2)
+        A1, B1, C1, D1 = A[..., l], B[..., l], C[..., l], D[..., l]
+        A2, B2, C2, D2 = A[..., r], B[..., r], C[..., r], D[..., r]
+        merged = (A1 * A2 + B1 * C2, A1 * B2 + B1 * D2, C1 * A2 + D1 * C2, C1 * B2 + D1 * D2)
+        if A.shape[-1] % 2:
+            # 奇数段：最后一段原样进入下一轮
+            merged = tuple(np.concatenate((m, X[..., -1:]), axis=-1) for m, X in zip(merged, (A, B, C, D)))
+        A, B, C, D = merged
+    return A[..., 0], B[..., 0], C[..., 0], D[..., 0]
+
+
+@dataclass
+class AreaFunction:
+    """
+    N 段串联圆柱 (面积函数) 的平面波模型，从左 (分段 0) 到右 (分段 N-1)。
+    areas 为各段截面积 (m^2)，lengths 为各段长度 (m)。
+    """
+    areas: np.ndarray
+    lengths: np.ndarray
+    T: float   # 温度(ºC)
+    medium: str = "air"      # "air" or "water"
+    end_left: str  = "hard"     # 'radiation' / 'hard' / 'zero'
+    end_right: str = "radiation"
+    wall_losses: bool = False   # 是否计入 visco-thermal 壁面损耗
+
+    def __post_init__(self):
+        self.areas = np.atleast_1d(np.asarray(self.areas, dtype=float))
+        self.lengths = np.atleast_1d(np.asarray(self.lengths, dtype=float))
+        if self.areas.shape != self.lengths.shape or self.areas.ndim != 1:
+            raise ValueError(f"areas {self.areas.shape} 与 lengths {self.lengths.shape} 形状不一致")
+        if not len(self.areas) or np.any(self.areas <= 0):
+            raise ValueError("areas 必须非空且全部为正")
+
+    @classmethod
+    def from_contours(cls, path: str, T: float, unit: float = 1e-2, **kwargs) -> "AreaFunction":
+        """
+        由轮廓 CSV / .vtlc 生成面积函数：截面 i 与 i+1 之间为一段，长度为中心线弧长，
+        面积取入口 |A_i|*scale_in^2 与出口 |A_i|*scale_out^2 的几何平均。
+        unit 为轮廓坐标到米的换算 (导出脚本按 VTL3D 约定写 cm；轮廓为 scale 归一化后的无量纲坐标)。
+        """
+        develop_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "02-develop")
+        if develop_dir not in sys.path:
+            sys.path.insert(0, develop_dir)
+        from contour_io import load_contours
+        from contour_geometry import analyse_contours
+
+        sections, segments = analyse_contours(load_contours(path))
+        if len(segments) == 0:
+            raise ValueError(f"{path}: 至少需要 2 个截面")
+        a = np.abs(sections["signed_area"][:-1])
+        areas = a * sections["scale_in"][:-1] * sections["scale_out"][:-1] * unit**2
+        return cls(areas=areas, lengths=segments["length"] * unit, T=T, **kwargs)
+
+    def characteristic(self):
+        rho, c = medium_properties(self.medium, self.T)
+        return rho, c
+
+    def chain_matrix(self, freq: np.ndarray):
+        """整条声道的 ABCD 矩阵 (A, B, C, D)，形状均为 (频率,)；按 FREQ_BLOCK 分块计算。"""
+        freq = np.asarray(freq, dtype=float)
+        rho, c = self.characteristic()
+        radii = np.sqrt(self.areas / np.pi)
+        out = [np.empty(freq.shape, dtype=complex) for _ in range(4)]
+        for start in range(0, len(freq), FREQ_BLOCK):
+            f = freq[start:start + FREQ_BLOCK]
+            alpha = viscothermal_attenuation(f, radii, self.medium, self.T) if self.wall_losses else None
+            for dst, src in zip(out, chain_product(*segment_matrices(f, self.areas, self.lengths, rho, c, alpha))):
+                dst[start:start + FREQ_BLOCK] = src
+        return tuple(out)
+
+    def port_impedances(self, freq: np.ndarray):
+        """左/右端负载阻抗 (ZL, ZR)，分别按首/末段的面积计算。"""
+        rho, c = self.characteristic()
+        ends = []
+        for kind, S in ((self.end_left, self.areas[0]), (self.end_right, self.areas[-1])):
+            ends.append(load_impedance(kind, freq, rho, c, np.sqrt(S / np.pi), rho * c / S))
+        return tuple(ends)
+
+    def transfer_function(self, freq: np.ndarray):
+        """
+        计算 H(f)=P_right/P_left (平面波平均压)。
+        左端视为理想声压源，H = ZR / (A*ZR + B)，与 ZL 无关 (推导见 Tube.transfer_function 的历史版本)。
+        """
+        freq = np.asarray(freq, dtype=float)
+        _, ZR = self.port_impedances(freq)
+        A, B, _, _ = self.chain_matrix(freq)
+        # 分母保护，ZR可能为0或极小 (zero pressure case)
+        ZR_eff = np.where(np.abs(ZR) < 1e-9, 1e-9 * np.sign(ZR) if np.any(ZR) else 1e-9, ZR)
+        return ZR_eff / (A * ZR_eff + B)
+
+    def input_impedance(self, freq: np.ndarray):
+        """左端看进去的输入阻抗 Zin = (A*ZR + B) / (C*ZR + D)。"""
+        freq = np.asarray(freq, dtype=float)
+        _, ZR = self.port_impedances(freq)
+        A, B, C, D = self.chain_matrix(freq)
+        return (A * ZR + B) / (C * ZR + D)
+
+
 @dataclass
 class Tube:
     D: float   # 直径 (m)
@@ -124,246 +311,29 @@ class Tube:
     medium: str = "air"      # "air" or "water"
     end_left: str  = "hard"     # 'radiation' / 'hard' / 'zero'
     end_right: str = "radiation"
+    wall_losses: bool = False   # 是否计入 visco-thermal 壁面损耗
 
     def characteristic(self):
         a = self.D / 2
-        if self.medium.lower() == "air":
-            c = sound_speed_air(self.T)
-            rho = air_density(self.T)
-        elif self.medium.lower() == "water":
-            c = sound_speed_water(self.T)
-            rho = water_density(self.T)
-        else:
-            raise ValueError(f"Unknown medium: {self.medium}")
-        
+        rho, c = medium_properties(self.medium, self.T)
         Z0 = rho * c / (np.pi * a**2) # 特性阻抗 (声阻抗率 / 面积)
         return rho, c, a, Z0
 
     def load_impedance(self, kind: str, freq: np.ndarray, rho: float, c: float, a: float, Z0: float):
-        kind = kind.lower()
-        if kind == "hard":
-            return 1e9 * Z0 * np.ones_like(freq) # 极大阻抗
-        elif kind == "zero":
-            return 1e-9 * Z0 * np.ones_like(freq) # 极小阻抗
-        elif kind == "radiation":
-            # 辐射阻抗本身是 specific acoustic impedance (rho*c*normalized_Z)
-            # 但在此模型中，Z0已经是 rho*c/Area，所以这里的 ZL, ZR 应该是普通的声阻抗
-            # 因此，radiation_impedance 返回 specific Z, 需要乘以面积S得到普通阻抗
-            # 或者，若 Z0 是 rho*c (平面波阻抗率)，则 radiation_impedance 也应是 rho*c*normalized_Z
-            # 从公式 B = 1j * Z0 * np.sin(k*L) 看，Z0是普通的声阻抗 rho*c/S
-            # 所以 radiation_impedance(a, freq, rho, c) 返回的是 Z_specific
-            # 我们需要 Z_load = Z_specific * Area = radiation_impedance * (pi*a^2)
-            Z_specific_rad = radiation_impedance(a, freq, rho, c)
-            return Z_specific_rad * (np.pi * a**2) 
-        else:
-            raise ValueError(f"Unknown boundary kind: {kind}")
+        return load_impedance(kind, freq, rho, c, a, Z0)
 
-    def transfer_function(self, freq: np.ndarray):
-        """计算 H(f)=P_right/P_left (平面波平均压)。"""
-        rho, c, a, Z0 = self.characteristic()
-        k = 2 * np.pi * freq / c
-        
-        # 确保k非零，特别是在freq包含0时 (linspace从1开始，但以防万一)
-        k_eff = np.where(k == 0, 1e-12, k)
-
-        ZL = self.load_impedance(self.end_left, freq, rho, c, a, Z0)
-        ZR = self.load_impedance(self.end_right, freq, rho, c, a, Z0)
-
-        # ABCD矩阵
-        cos_kl = np.cos(k_eff * self.L)
-        sin_kl = np.sin(k_eff * self.L)
-        
-        A = cos_kl
-        B = 1j * Z0 * sin_kl
-        C = 1j * sin_kl / Z0 
-        D_abcd = cos_kl # ABCD矩阵中的D项
-
-        # Zin = (A*ZR + B) / (C*ZR + D_abcd)
-        # P_left = Zin (假设单位体积速度源 U_left = 1)
-        # P_right 来自 P_left = A*P_right + B*U_right 和 U_left = C*P_right + D_abcd*U_right
-        # 以及 P_right = ZR * U_right  => U_right = P_right / ZR
-        # P_left = A*P_right + B*(P_right/ZR) = P_right * (A + B/ZR)
-        # H = P_right / P_left = 1 / (A + B/ZR)
-        # 这是假设输入端是理想压力源 P_left，求 P_right/P_left
-        # 如果是 P_left / U_glottis, 那么 U_glottis 是输入。
-        # 此处 P_right / P_left 表示的是系统对输入压力的响应。
-
-        # 原来的求解方式：
-        # denom = A*D_abcd - B*C # 这应该是1对于无耗系统
-        # P_right = (P_left_assumed_from_Zin * D_abcd - B * U_left_assumed_1) / denom
-        # P_left_assumed_from_Zin = Zin * U_left_assumed_1
-        # H = P_right / P_left_assumed_from_Zin
-        # 这个推导似乎有点绕。更直接的是：
-        # H(omega) = P_out / P_in = ZR / (A*ZR + B) for voltage driven (pressure driven) source
-        # Or H(omega) = P_out / U_in = ZR / (C*ZR + D) for current driven (velocity driven) source
-        # 脚本的注释说 "计算 H(f)=P_right/P_left (平面波平均压)"，这通常意味着 P_left 是输入。
-        # 如果 P_left 是输入（理想声压源），则 U_left = (P_left - D*P_right) / B。 P_right = U_right*ZR。
-        # 经典传输线：H = P_right / P_left = ZR / (A*ZR + B)
-        # 另一种形式，如果 ZL 是源阻抗，P_s 是源开路电压：
-        # P_left = P_s * Zin / (Zs + Zin)
-        # H_overall = P_right / P_s
-        
-        # 根据 P_right = (P_left*D - B*U_left) / (A*D - B*C)
-        # 且 P_left = ZL * U_left
-        # 若我们定义 H = P_right (at ZR) / P_left (at ZL)
-        # P_left = A P_right + B U_right
-        # U_left = C P_right + D U_right
-        # P_right = ZR U_right => U_right = P_right / ZR
-        # P_left = A P_right + B P_right / ZR = P_right * (A + B/ZR)
-        # H = P_right / P_left = 1 / (A + B/ZR)
-        # 这个公式是标准的，假设 P_left 是已知的输入压力。
-        
-        # 分母保护，ZR可能为0或极小 (zero pressure case)
-        ZR_eff = np.where(np.abs(ZR) < 1e-9, 1e-9 * np.sign(ZR) if np.any(ZR) else 1e-9, ZR)
+    def as_area_function(self) -> AreaFunction:
+        """单段面积函数"""
+        return AreaFunction(areas=[np.pi * (self.D / 2)**2], lengths=[self.L], T=self.T, medium=self.medium,
+                            end_left=self.end_left, end_right=self.end_right, wall_losses=self.wall_losses)
 
-        H = 1.0 / (A + B / ZR_eff)
-        
-        # 如果左端不是理想声压源，而是有负载 ZL。
-        # 整个管道看作一个二端口网络，左端接 ZL，右端接 ZR。
-        # 如果源是 P_source 开路电压，内阻 Z_source。
-        # 此处 ZL 是一个负载，不是源的一部分。
-        # 如果考虑 ZL 的反射：
-        # Gamma_L = (ZL - Z0) / (ZL + Z0)
-        # Gamma_R = (ZR - Z0) / (ZR + Z0)
-        # H = ( (1+Gamma_R)*np.exp(-1j*k_eff*L) ) / ( 1 - Gamma_L*Gamma_R*np.exp(-2j*k_eff*L) ) * (Z0 / (Z0+ZL)) if ZL acts as part of source term
-        # 但是ABCD矩阵法更通用。
-        # 上面的 H = 1 / (A + B/ZR) 是 P_right/P_left(x=0)
-        # 如果 P_left(x=0) 本身受到 ZL 的影响 (e.g. P_left = P_source * Z_input_at_0 / (Z_source + Z_input_at_0))
-        # 这里的 ZL 是一个固定的左端边界条件，就像 ZR 一样。
-        # 传递函数定义为 P(L) / P(0) 在特定左端条件 P(0)=ZL*U(0) 下。
-        # 这需要重新思考定义。
-        # 通常, H = p(L)/p(0) (声压比) 或 p(L)/U(0) (转移阻抗) 或 V(L)/V(0) (体积速度比) 或 V(L)/p(0) (转移导纳)
-        # 脚本的 P_left = Zin, P_right = (P_left*D - B) / denom, return P_right/P_left
-        # Zin_pipe_terminated_by_ZR = (A*ZR + B) / (C*ZR + D)
-        # If U_at_x=0 is 1 (source): P_at_x=0 = Zin_pipe_terminated_by_ZR * 1
-        # P_at_x=L = P_at_x=0 * H (where H is the previously derived 1/(A+B/ZR) ) is NOT quite right.
-        # Let's use the definition based on forward and backward waves if ABCD is confusing.
-        # P(x) = P_plus * exp(-jkx) + P_minus * exp(jkx)
-        # U(x) = (1/Z0) * (P_plus * exp(-jkx) - P_minus * exp(jkx))
-        # At x=L: P(L) = ZR * U(L)
-        # At x=0: P(0) = ZL * U(0) -- this is problematic if ZL is 'hard' or 'zero' unless it represents a source.
-        # It's more standard that ZL is a load at x=-L if source is at x=0, or ZL is load at x=0 if source is "behind" it.
-        # Assuming the script intends for ZL to be the load at x=0 if the wave comes from "further left".
-        # Let's assume the original derivation of H_orig = (D_abcd - B/Zin_pipe_terminated_by_ZR) / denom was for P_right/P_left with U_left=1.
-        # H_orig was ( (A*D-B*C) = 1 ): P_right / P_left = (D - B/Z_in_L)
-        # Z_in_L = P_left / U_left.
-        # P_left = A*P_right + B*U_right
-        # U_left = C*P_right + D*U_right
-        # If we want H = P_right/P_source_voltage (assuming source at left end before ZL)
-        # Then P_left = P_source * ZL / (Z_source + ZL) - this is too complex.
-
-        # Let's use the most common definition for a tube with loads ZL (at x=0) and ZR (at x=L):
-        # Transfer function P(L)/P(0) given P(0) is the pressure at the input x=0
-        # H = 1 / (cos(kL) + j*(Z0/ZR)*sin(kL))
-        # This is P(L)/P_forward_wave_amplitude_at_x=0 if ZL is matched (Z0).
-        # If ZL is not matched, it causes reflections.
-
-        # Re-evaluating the original script's `P_right/P_left` after `P_left=Zin`:
-        # Zin = (A*ZR + B)/(C*ZR + D) is the input impedance at x=0 looking into the tube terminated by ZR.
-        # P_left = Zin * U_left. If U_left=1, then P_left=Zin.
-        # The matrix relation is [P_left; U_left] = M * [P_right; U_right]
-        # So [P_right; U_right] = M_inv * [P_left; U_left]
-        # M_inv = (1/det(M)) * [D, -B; -C, A]. det(M) = AD-BC = 1 for reciprocal lossless.
-        # P_right = D*P_left - B*U_left
-        # U_right = -C*P_left + A*U_left
-        # If U_left = 1 and P_left = Zin:
-        # P_right = D*Zin - B
-        # H = P_right / P_left = (D*Zin - B) / Zin = D - B/Zin
-        # This gives P_right in terms of P_left when U_left=1.
-        
-        Zin_at_0_looking_right = (A * ZR_eff + B) / (C * ZR_eff + D_abcd)
-        
-        # Avoid division by zero if Zin_at_0_looking_right is zero (e.g. specific L and ZR)
-        Zin_eff = np.where(np.abs(Zin_at_0_looking_right) < 1e-9, 1e-9*np.sign(Zin_at_0_looking_right) if np.any(Zin_at_0_looking_right) else 1e-9, Zin_at_0_looking_right)
-
-        H_pressure_ratio = D_abcd - B / Zin_eff # This is P_L / P_0 if U_0=1.
-                                              # P_L = P(x=L), P_0 = P(x=0)
-
-        # Now, consider the left boundary ZL. It means P(0) = ZL * U(0).
-        # The H above is P(L)/P(0) if U(0) = 1.
-        # If P(0) = ZL * U(0), then H = P(L) / (ZL * U(0))
-        # The script implies it computes P_R/P_L.
-        # The calculated H_pressure_ratio is P_right / Zin_at_0_looking_right
-        # If P_left IS Zin_at_0_looking_right (because U_left=1), then this is the H.
-        # What is ZL used for? The problem is that ZL and ZR are both loads.
-        # A typical setup is a source, then the tube, then a load.
-        # Or source, ZL, tube, ZR.
-        # Let's assume the formula H = 1 / (A + B/ZR_eff) is P(L)/P(0) assuming P(0) is the input pressure.
-        # And the left boundary ZL means that P(0) = ZL * U(0).
-        # If the system is driven by a velocity source U_s at x=0, such that U(0)=U_s.
-        # Then P(0) = ZL * U_s.
-        # And P(L) = P(0) * H_voltage_gain = (ZL * U_s) * (1 / (A + B/ZR_eff)).
-        # Transfer function U_s to P(L) would be ZL / (A + B/ZR_eff).
-
-        # Let's use a well-known formula for two-port network loaded with ZL and ZR,
-        # driven by a source Vs with source impedance Zs.
-        # Input impedance of tube+ZR is Zin_R = (A*ZR+B)/(C*ZR+D)
-        # Input voltage P_in = Vs * Zin_R / (Zs + Zin_R)
-        # Output voltage P_out = P_in / (A + B/ZR)
-        # If Zs=0 (ideal voltage source), P_in = Vs. Then H = P_out/Vs = 1/(A+B/ZR).
-        # This seems to be the most standard "voltage gain" or "pressure gain".
-        # The ZL parameter is not used in this specific definition.
-        # If ZL defines how P_in relates to an assumed U_in, that's different.
-
-        # The original script had ZL and ZR.
-        # A general formula for H = p_L / p_S (source voltage p_S before Z_S, where tube input impedance is Z_in_total)
-        # Z_in_total is Z_L in series with (Z_pipe_terminated_by_ZR) ? No.
-        # Let Z_L be the impedance at x=0, Z_R the impedance at x=L.
-        # H = p(L)/p(0) can be 1 / (cos(kL) + j*(Z0_char_medium/ZR)*sin(kL))
-        # Here Z0_char_medium = rho*c. But the Z0 in ABCD is rho*c/S.
-        # Let Zc = rho*c (impedance per unit area). S = pi*a^2.
-        # Z0_ABCD = Zc/S.
-        # A = cos(kL), B = j (Zc/S) sin(kL), C = j (S/Zc) sin(kL), D = cos(kL)
-        # H_pressure_gain = 1 / (A + B/ZR)
-        # This definition does not use ZL.
-        # The problem statement H=P_right/P_left means ZL is effectively a source impedance or part of source model.
-        # If P_left is the pressure at the input (x=0) *after* any source impedance ZL.
-
-        # Sticking to the definition that seems implied by the ABCD matrix usage:
-        # P_right / P_left = D - B/Zin_at_0_looking_right
-        # This is equivalent to 1 / (A + B/ZR) only if Zin_at_0_looking_right = ZR / (D*ZR - C*B) ... not simple.
-
-        # Let's use the formula from earlier: H = P_right / P_left = D_abcd - B / Zin_at_0_looking_right
-        # This assumes U_left=1. P_left becomes Zin_at_0_looking_right.
-        # The ZL parameter then seems to define the *actual* P_left based on U_left=1.
-        # P_left_actual = ZL (if U_left=1).
-        # So, P_right_final = (D_abcd*ZL - B) ? This changes meaning.
-        # It is most likely that ZL and ZR are loads and the TF is defined for a source at one end.
-        # If source is voltage source at left, P_left is given. H = P_right/P_left = 1/(A+B/ZR).
-        # This is independent of ZL. ZL would only matter if we compute U_left.
-        # If source is current source U_left at left, P_left = ZL*U_left. P_right = (D*P_left - B*U_left)/(AD-BC).
-        # P_right = (D*ZL*U_left - B*U_left) = U_left*(D*ZL-B).
-        # Then P_right/P_left = (D*ZL-B)/ZL = D - B/ZL. This makes ZL the input impedance. This is circular.
-
-        # The most robust way is often via reflection coefficients for simple tubes.
-        # Gamma_L = (ZL/ (np.pi * a**2) - Z0_medium) / (ZL/(np.pi*a**2) + Z0_medium) where Z0_medium = rho*c
-        # Let's use the common definition H = p(L)/p(0) = 1 / (cos(kL) + j * (Z0_ABCD / ZR) * sin(kL))
-        # And assume ZL is not used in this definition of H.
-        # If the problem is from a textbook that defines H with ZL and ZR as terminations of a passive tube:
-        # H = V_out/V_in = Z_R / (A*Z_R + B) if input is ideal voltage source.
-        # This definition seems most standard for P_right/P_left.
-
-        H_tf = ZR_eff / (A * ZR_eff + B) # This assumes input is voltage source, ZL not used.
-
-        # What if ZL is the actual input impedance of the system when driven by an ideal voltage source? No.
-        # What if ZL *is* the source impedance?
-        # Source V_s, Z_s=ZL. Input impedance of tube+ZR is Z_in_R = (A*ZR+B)/(C*ZR+D).
-        # P_left = V_s * Z_in_R / (ZL + Z_in_R).
-        # P_right = P_left * (1/(A+B/ZR)).
-        # Then H = P_right / V_s. This uses ZL.
-
-        # The script's prior use of `P_left = Zin` suggests `Zin` is `P_left` for `U_left=1`.
-        # And `P_right = D*P_left - B*U_left` (with `U_left=1`) means `P_right = D*Zin - B`.
-        # So `H = P_right/P_left = (D*Zin - B)/Zin = D - B/Zin`.
-        # This ZL seems to be unused.
-        # If ZL is truly the load at the left end, and we are looking at transmission from "far left" through ZL, then tube, then ZR.
-        # This is not standard for a simple H=P_right/P_left.
-        # Let's trust the structure ZL and ZR are loads at x=0 and x=L.
-        # And the TF is related to pressure ratio.
-        # The expression H = ZR / (A*ZR + B) is P_L / P_S where P_S is a source voltage at x=0.
-        # This makes P_left = P_S.
-        # This seems the most plausible interpretation for P_right/P_left.
-        return H_tf
+    def transfer_function(self, freq: np.ndarray):
+        """
+        计算 H(f)=P_right/P_left (平面波平均压)。
+        左端视为理想声压源: H = ZR / (A*ZR + B)，A = cos(kL)，B = j*Z0*sin(kL)；
+        ZL 不进入该定义。等价于单段 AreaFunction。
+        """
+        return self.as_area_function().transfer_function(freq)
 
 
 def main():
@@ -376,11 +346,20 @@ def main():
     parser.add_argument("--n", type=int, default=2000, help="Number of freq samples")
     parser.add_argument("--left", choices=["hard","zero","radiation"], default="hard")
     parser.add_argument("--right", choices=["hard","zero","radiation"], default="radiation")
+    parser.add_argument("--losses", action="store_true", help="Include visco-thermal wall losses")
+    parser.add_argument("--contours", help="Contour CSV/.vtlc: use its area function instead of a single tube")
+    parser.add_argument("--unit", type=float, default=1e-2, help="Contour coordinate unit in m (default 1e-2, cm as written by the exporters)")
     parser.add_argument("--plot", action="store_true", help="Plot magnitude and phase")
     args = parser.parse_args()
 
     freq = np.linspace(1, args.fmax, args.n) # Avoid freq=0 for k
-    tube = Tube(D=args.D, L=args.L, T=args.T, medium=args.medium, end_left=args.left, end_right=args.right)
+    if args.contours:
+        tube = AreaFunction.from_contours(args.contours, T=args.T, unit=args.unit, medium=args.medium,
+                                          end_left=args.left, end_right=args.right, wall_losses=args.losses)
+        print(f"# {args.contours}: {len(tube.areas)} segments, total length {tube.lengths.sum()*100:.2f} cm")
+    else:
+        tube = Tube(D=args.D, L=args.L, T=args.T, medium=args.medium, end_left=args.left, end_right=args.right,
+                    wall_losses=args.losses)
     H = tube.transfer_function(freq)
     if args.plot:
         fig, ax = plt.subplots(2,1, figsize=(8,6), sharex=True)
@@ -390,7 +369,10 @@ def main():
         ax[1].set_ylabel("Phase (rad)")
         ax[1].set_xlabel("Frequency (Hz)")
         ax[0].grid(); ax[1].grid()
-        title = f"Tube D={args.D*1e3:.1f} mm, L={args.L*100:.1f} cm, Med={args.medium}, T={args.T}C\nLeft={args.left}, Right={args.right}"
+        if args.contours:
+            title = f"{os.path.basename(args.contours)}, Med={args.medium}, T={args.T}C\nLeft={args.left}, Right={args.right}"
+        else:
+            title = f"Tube D={args.D*1e3:.1f} mm, L={args.L*100:.1f} cm, Med={args.medium}, T={args.T}C\nLeft={args.left}, Right={args.right}"
         fig.suptitle(title) # Use suptitle for main title
         plt.tight_layout(rect=[0, 0, 1, 0.96]) # Adjust layout for suptitle
         plt.show()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""mode_table.py
+================================
+圆管横向模态表 (硬壁)：psi_nm = J_n(gamma_nm * r/R) * sin(n*theta)，
+截止频率 fc_nm = c * gamma_nm / (2*pi*R)，gamma_nm 为 J_n' 的第 m 个零点。
+
+- J_n' 零点按 (n_max, m_max) 只计算一次并缓存；
+- cut_on / first_cut_on 对任意形状的半径、声速数组一次广播求值，
+  适合对声道每个截面 (等效半径) 批量求首个高阶模态截止频率；
+- 模态形状在归一化单位圆网格上计算 (与 R 无关)，网格、三角剖分与形状均懒计算
+  并缓存，只计算被请求的模态。
+
+用法:
+    >>> from mode_table import ModeTable
+    >>> table = ModeTable()
+    >>> table.first_cut_on(0.0295 / 2, 346.9)          # ≈ 6.9 kHz
+    >>> fc = table.cut_on(radii[:, None], c[None, :])  # (..., n_max, m_max)
+"""
+from __future__ import annotations
+import argparse
+from functools import lru_cache
+
+import numpy as np
+from scipy import special
+
+N_MAX, M_MAX = 5, 5  # 默认阶数: n = 0..N_MAX-1 (周向)，m = 1..M_MAX (径向)
+
+
+@lru_cache(maxsize=None)
+def bessel_derivative_zeros(n_max: int, m_max: int) -> np.ndarray:
+    """(n_max, m_max) 数组，[n, m-1] 为 J_n' 的第 m 个正零点；结果只读。"""
+    gamma = np.array([special.jnp_zeros(n, m_max) for n in range(n_max)])
+    gamma.setflags(write=False)
+    return gamma
+
+
+@lru_cache(maxsize=None)
+def unit_disk_grid(Nr: int = 180, Nth: int = 360):
+    """单位圆极坐标网格 (rho, theta, x, y)，均为展平后的一维只读数组。"""
+    rho, th = np.meshgrid(np.linspace(0, 1, Nr), np.linspace(0, 2 * np.pi, Nth, endpoint=False), indexing="ij")
+    grid = (rho.ravel(), th.ravel(), (rho * np.cos(th)).ravel(), (rho * np.sin(th)).ravel())
+    for a in grid:
+        a.setflags(write=False)
+    return grid
+
+
+@lru_cache(maxsize=None)
+def unit_disk_triangles(Nr: int = 180, Nth: int = 360) -> np.ndarray:
+    """
+    unit_disk_grid 的三角剖分 (n_tri, 3)：相邻两圈之间每格两个三角形，
+    圆心一圈 (rho=0) 每格一个。结构化网格直接给出连接关系，无需 Delaunay。
+    """
+    idx = np.arange(Nr * Nth).reshape(Nr, Nth)
+    a, b = idx[:-1], np.roll(idx[:-1], -1, axis=1)          # 内圈 j, j+1
+    c, d = idx[1:], np.roll(idx[1:], -1, axis=1)            # 外圈 j, j+1
+    tris = np.concatenate((
+        np.stack((a[0], c[0], d[0]), axis=-1),
+        np.stack((a[1:], c[1:], d[1:]), axis=-1).reshape(-1, 3),
+        np.stack((a[1:], d[1:], b[1:]), axis=-1).reshape(-1, 3),
+    ))
+    tris.setflags(write=False)
+    return tris
+
+
+class ModeTable:
+    """给定阶数 (n_max, m_max) 的圆管模态表。"""
+
+    def __init__(self, n_max: int = N_MAX, m_max: int = M_MAX, Nr: int = 180, Nth: int = 360):
+        self.n_max, self.m_max = n_max, m_max
+        self.Nr, self.Nth = Nr, Nth
+        self.gamma = bessel_derivative_zeros(n_max, m_max)
+        self._shapes: dict[tuple[int, int], np.ndarray] = {}
+
+    def cut_on(self, radius, c) -> np.ndarray:
+        """全部 (n, m) 的截止频率，形状为 broadcast(radius, c).shape + (n_max, m_max)。"""
+        scale = np.asarray(c, dtype=float) / (2 * np.pi * np.asarray(radius, dtype=float))
+        return scale[..., None, None] * self.gamma
+
+    def first_cut_on(self, radius, c) -> np.ndarray:
+        """首个高阶模态 (n=1, m=1, gamma≈1.8412) 的截止频率，形状为 broadcast(radius, c).shape。"""
+        return np.asarray(c, dtype=float) * self.gamma.min() / (2 * np.pi * np.asarray(radius, dtype=float))
+
+    def modes(self, radius: float, c: float, fc_max: float = np.inf):
+        """单个截面 fc <= fc_max 的模态列表 [(m, n, gamma, fc)]，含平面波 (0,0)，按 fc 升序。"""
+        fc = self.cut_on(radius, c)
+        n_idx, m_idx = np.nonzero(fc <= fc_max)
+        modes = [(0, 0, 0.0, 0.0)]  # 平面波
+        modes += [(int(m) + 1, int(n), float(self.gamma[n, m]), float(fc[n, m])) for n, m in zip(n_idx, m_idx)]
+        modes.sort(key=lambda x: x[3])
+        return modes
+
+    def grid(self):
+        """(rho, theta, x, y) 单位圆网格；实际坐标乘以半径 R 即可。"""
+        return unit_disk_grid(self.Nr, self.Nth)
+
+    def triangles(self) -> np.ndarray:
+        """grid() 对应的三角形顶点索引，可直接用于 tripcolor。"""
+        return unit_disk_triangles(self.Nr, self.Nth)
+
+    def shape(self, n: int, m: int) -> np.ndarray:
+        """模态 (n, m) 在单位圆网格上的形状 (只读)，首次请求时计算；m=0 为平面波。"""
+        key = (n, m)
+        if key not in self._shapes:
+            rho, th, _, _ = self.grid()
+            if m == 0:
+                psi = np.ones_like(rho)
+            else:
+                J = special.jv(n, self.gamma[n, m - 1] * rho)
+                psi = J if n == 0 else J * np.sin(n * th)
+            psi.setflags(write=False)
+            self._shapes[key] = psi
+        return self._shapes[key]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Circular duct cut-on frequencies")
+    parser.add_argument("--D", type=float, nargs="+", default=[0.0295], help="Diameters in m")
+    parser.add_argument("--c", type=float, nargs="+", default=[346.9], help="Sound speeds in m/s")
+    parser.add_argument("--fmax", type=float, default=20e3, help="List modes up to this frequency (Hz)")
+    args = parser.parse_args()
+
+    table = ModeTable()
+    for c in args.c:
+        for D in args.D:
+            modes = table.modes(D / 2, c, args.fmax)
+            print(f"c={c:.1f} m/s  D={D*1e3:.1f} mm  first cut-on={table.first_cut_on(D / 2, c):.1f} Hz")
+            for m, n, gm, fc in modes[1:]:
+                print(f"    (n={n}, m={m})  gamma={gm:.4f}  fc={fc:.1f} Hz")
+
+
+if __name__ == "__main__":
+    main()
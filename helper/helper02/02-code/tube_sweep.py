@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""tube_sweep.py
+================================
+圆管传递函数的参数扫描:
+    (直径, 长度, 温度, 介质, 左端边界, 右端边界, 壁面损耗) x 频率网格
+
+- 各工况在 ProcessPoolExecutor 中并行计算 (cyl_transfer.Tube)；
+- 每个工况的结果按参数哈希缓存到磁盘 (<cache>/<key>.npy)，重跑时只计算变化的工况；
+- 全部结果写入一个列式 .npz：参数各占一列，H 为 (工况, 频率) 复数矩阵。
+
+用法:
+    python tube_sweep.py --D 0.0295 --L 0.25758 --T 26.5 --medium air water \\
+        --left hard zero --right hard zero -o sweep.npz
+    >>> from tube_sweep import expand_grid, run_sweep
+    >>> cases = expand_grid(D=[0.0295], L=[0.1, 0.2], T=[26.5], medium=["air"])
+    >>> H = run_sweep(cases, np.linspace(1, 10000, 2000), cache_dir=".sweep_cache")
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import itertools
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, fields
+
+import numpy as np
+
+import cyl_transfer
+from cyl_transfer import Tube
+
+SWEEP_VERSION = 1  # 缓存格式变化时递增，使旧缓存失效
+# cyl_transfer.py 源码的哈希也计入缓存键：改动传递函数模型后旧缓存自动失效，无需手动递增 SWEEP_VERSION
+with open(cyl_transfer.__file__, "rb") as _f:
+    MODEL_SOURCE_HASH = hashlib.sha1(_f.read(), usedforsecurity=False).hexdigest()
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sweep_cache")
+
+
+@dataclass(frozen=True)
+class SweepCase:
+    D: float   # 直径 (m)
+    L: float   # 长度 (m)
+    T: float   # 温度(ºC)
+    medium: str = "air"
+    end_left: str = "hard"
+    end_right: str = "radiation"
+    wall_losses: bool = False
+
+    def tube(self) -> Tube:
+        return Tube(**asdict(self))
+
+    def label(self) -> str:
+        return f"{self.end_left[0].upper()}-{self.end_right[0].upper()} ({self.medium})"
+
+
+def expand_grid(D, L, T, medium=("air",), end_left=("hard",), end_right=("radiation",),
+                wall_losses=(False,)) -> list[SweepCase]:
+    """参数笛卡尔积，顺序与参数列表一致 (最后一个参数变化最快)。"""
+    return [SweepCase(*values) for values in itertools.product(D, L, T, medium, end_left, end_right, wall_losses)]
+
+
+def case_key(case: SweepCase, freq: np.ndarray) -> str:
+    """工况 + 频率网格 + 模型版本 + 模型源码哈希的 SHA1，作为缓存文件名。"""
+    h = hashlib.sha1(usedforsecurity=False)
+    params = {k: (round(v, 12) if isinstance(v, float) else v) for k, v in asdict(case).items()}
+    h.update(json.dumps({"version": SWEEP_VERSION, "model": MODEL_SOURCE_HASH, **params}, sort_keys=True).encode())
+    h.update(np.ascontiguousarray(freq, dtype=np.float64).tobytes())
+    return h.hexdigest()
+
+
+def _compute_case(case: SweepCase, freq: np.ndarray) -> np.ndarray:
+    return case.tube().transfer_function(freq)
+
+
+def _cache_path(cache_dir: str, key: str) -> str:
+    return os.path.join(cache_dir, key + ".npy")
+
+
+def _write_cache(cache_dir: str, key: str, H: np.ndarray) -> None:
+    # 先写临时文件再替换，避免并发/中断留下半个文件
+    tmp = _cache_path(cache_dir, key) + f".{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        np.save(f, H)
+    os.replace(tmp, _cache_path(cache_dir, key))
+
+
+def run_sweep(cases: list[SweepCase], freq: np.ndarray, cache_dir: str | None = DEFAULT_CACHE_DIR,
+              max_workers: int | None = None, verbose: bool = False) -> np.ndarray:
+    """
+    计算全部工况的 H(f)，返回 (工况, 频率) 复数矩阵。
+    cache_dir 为 None 时不读写缓存；max_workers=1 时在当前进程内计算。
+    """
+    freq = np.asarray(freq, dtype=np.float64)
+    H = np.empty((len(cases), len(freq)), dtype=complex)
+    keys = [case_key(c, freq) for c in cases]
+
+    todo = []
+    for i, key in enumerate(keys):
+        if cache_dir and os.path.exists(_cache_path(cache_dir, key)):
+            H[i] = np.load(_cache_path(cache_dir, key))
+        else:
+            todo.append(i)
+    if verbose:
+        print(f"{len(cases)} cases: {len(cases) - len(todo)} cached, {len(todo)} to compute")
+
+    if todo:
+        # 相同参数只算一次
+        unique = {}
+        for i in todo:
+            unique.setdefault(keys[i], i)
+        idx = list(unique.values())
+        if max_workers == 1 or len(idx) == 1:
+            results = [_compute_case(cases[i], freq) for i in idx]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                results = list(pool.map(_compute_case, [cases[i] for i in idx], itertools.repeat(freq)))
+        computed = dict(zip((keys[i] for i in idx), results))
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            for key, h in computed.items():
+                _write_cache(cache_dir, key, h)
+        for i in todo:
+            H[i] = computed[keys[i]]
+    return H
+
+
+def save_sweep(path: str, cases: list[SweepCase], freq: np.ndarray, H: np.ndarray) -> None:
+    """列式保存：每个 SweepCase 字段一列 + freq + H。"""
+    columns = {f.name: np.array([getattr(c, f.name) for c in cases]) for f in fields(SweepCase)}
+    np.savez(path, freq=np.asarray(freq), H=H, key=np.array([case_key(c, freq) for c in cases]), **columns)
+
+
+def load_sweep(path: str):
+    """读取 save_sweep 的结果，返回 (cases, freq, H)。"""
+    with np.load(path) as data:
+        n = len(data["H"])
+        cols = {f.name: data[f.name] for f in fields(SweepCase)}
+        cases = [SweepCase(**{k: v[i].item() for k, v in cols.items()}) for i in range(n)]
+        return cases, data["freq"], data["H"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep of finite circular tube transfer functions")
+    parser.add_argument("--D", type=float, nargs="+", default=[0.0295], help="Diameters in m")
+    parser.add_argument("--L", type=float, nargs="+", default=[0.1], help="Lengths in m")
+    parser.add_argument("--T", type=float, nargs="+", default=[26.5], help="Temperatures in Celsius")
+    parser.add_argument("--medium", nargs="+", choices=["air", "water"], default=["air"])
+    parser.add_argument("--left", nargs="+", choices=["hard", "zero", "radiation"], default=["hard"])
+    parser.add_argument("--right", nargs="+", choices=["hard", "zero", "radiation"], default=["radiation"])
+    parser.add_argument("--losses", action="store_true", help="Include visco-thermal wall losses")
+    parser.add_argument("--fmin", type=float, default=1, help="Min frequency Hz (default 1, avoids k=0)")
+    parser.add_argument("--fmax", type=float, default=10000, help="Max frequency Hz")
+    parser.add_argument("--n", type=int, default=2000, help="Number of freq samples")
+    parser.add_argument("-o", "--output", default="tube_sweep.npz", help="Output .npz")
+    parser.add_argument("--cache", default=DEFAULT_CACHE_DIR, help="Cache directory")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the cache")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    freq = np.linspace(args.fmin, args.fmax, args.n)
+    cases = expand_grid(args.D, args.L, args.T, args.medium, args.left, args.right, [args.losses])
+    H = run_sweep(cases, freq, cache_dir=None if args.no_cache else args.cache, max_workers=args.jobs, verbose=True)
+    save_sweep(args.output, cases, freq, H)
+    print(f"Saved {len(cases)} cases x {len(freq)} frequencies to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
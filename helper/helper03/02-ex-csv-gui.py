@@ -2,14 +2,25 @@ import tkinter as tk
 from tkinter import filedialog, messagebox
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from matplotlib.path import Path
+from matplotlib.collections import LineCollection
+from matplotlib.lines import Line2D
 import numpy as np
 import sys
 import os
 import math
+import time
+from concurrent.futures import ThreadPoolExecutor
 from matplotlib import font_manager  # 新增导入
 from matplotlib.patches import Arrow # 用于绘制箭头
 
+# 共享的轮廓 CSV 解析器: helper/02-develop/contour_io.py
+_develop_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)) if '__file__' in globals() else os.getcwd(),
+                            '..', '02-develop')
+if _develop_dir not in sys.path:
+    sys.path.insert(0, _develop_dir)
+from contour_io import load_contours  # noqa: E402
+from contour_geometry import analyse_contours, issue_labels, segment_quads  # noqa: E402
+
 # --- 字体设置 (全局变量) ---
 zh_font_prop = None
 try:
@@ -34,6 +45,11 @@ except NameError:
 # --- Constants ---
 MINIMAL_DISTANCE = 1e-6 # 用于比较浮点数或角度是否接近零
 NORMAL_VECTOR_SCALE = 0.1 # 可视化法线箭头的长度因子
+LOAD_POLL_MS = 50 # 后台加载时主线程轮询进度的间隔 (ms)
+ISSUE_COLOR = 'orange'
+# 矢状面配色：(入口, 出口, 下侧, 上侧, 中心线, 选中, 法线填充, 法线边框)
+ADJUSTED_COLORS = ('gray', 'darkgray', 'green', 'blue', 'gray', 'red', 'cyan', 'blue')
+ORIGINAL_COLORS = ('lightgray', 'silver', 'lightgreen', 'lightblue', 'darkorange', 'magenta', 'yellow', 'orange')
 
 # --- Helper Functions (全局检测函数移到这里) ---
 
@@ -197,39 +213,13 @@ def calculate_outlet_geometry(s_prime_i, n_hat_i, L_i, R_i, alpha_i):
 
 
 # --- 数据加载与准备 ---
-def load_and_prepare_section_data(line_odd, line_even):
+def prepare_section_data(head, local_contour_y, local_contour_z):
     """
-    解析CSV行对, 模拟 C++ 中的数据加载、几何中心调整和必要的数据准备。
+    基于 contour_io 解析出的截面 (head 六元组 + 局部 Y/Z 列表), 模拟 C++ 中的数据加载、几何中心调整和必要的数据准备。
     返回包含原始和调整后数据的字典。
+    逐截面参考实现：GUI 已改用 build_section_dicts，此函数供基准对照使用。
     """
-    local_contour_y = []
-    local_contour_z = []
-    center_x, center_y = 0.0, 0.0
-    normal_x, normal_y = 1.0, 0.0
-    scale_in, scale_out = 1.0, 1.0
-    try:
-        parts_odd = line_odd.strip().split(';')
-        if len(parts_odd) < 4: raise ValueError("奇数行字段不足")
-        center_x = float(parts_odd[0])
-        normal_x = float(parts_odd[1])
-        scale_in = float(parts_odd[2]) # 这是 CSV 第三列
-        local_contour_y = [float(p) for p in parts_odd[3:] if p.strip()]
-    except Exception as e:
-        print(f"错误: 解析奇数行失败: {e}\n行: {line_odd.strip()}")
-        return None
-    try:
-        parts_even = line_even.strip().split(';')
-        if len(parts_even) < 4: raise ValueError("偶数行字段不足")
-        center_y = float(parts_even[0])
-        normal_y = float(parts_even[1])
-        scale_out = float(parts_even[2]) # 这是 CSV 第三列
-        local_contour_z = [float(p) for p in parts_even[3:] if p.strip()]
-    except Exception as e:
-        print(f"错误: 解析偶数行失败: {e}\n行: {line_even.strip()}")
-        return None
-    if len(local_contour_y) != len(local_contour_z):
-        print(f"错误: 轮廓点数量不匹配 ({len(local_contour_y)} vs {len(local_contour_z)})" )
-        return None
+    center_x, normal_x, scale_in, center_y, normal_y, scale_out = (float(v) for v in head)
     if not local_contour_y:
         print("警告: 未找到轮廓点")
 
@@ -311,58 +301,149 @@ def load_and_prepare_section_data(line_odd, line_even):
         "issues": [] # 初始化issues列表
     }
 
-# --- 角点计算 ---
-def get_segment_points(section_data_i):
+def compute_segment_geometry_scalar(all_sections_data):
     """
-    使用段 i 的 *调整后* 几何数据计算四个角点的全局坐标。
+    逐段计算分段几何属性（长度、曲率、出口点/法线）和潜在问题，直接写回截面字典。
+    这是原先的 Python 逐段路径，GUI 已改用 contour_geometry 的向量化实现；
+    保留它作为对照基准 (02-develop/bench_contour_geometry.py)。
     """
-    ptIn = section_data_i["ctrLinePtIn_adj"]
-    normalIn = section_data_i["normalIn_adj"] # 使用归一化法线
-    scaleIn = section_data_i["scaleIn"]       # 使用入口半径
-    # 使用 Z 轴居中后的范围来确定高度
-    zmin_local = section_data_i["zMinAdj_local"]
-    zmax_local = section_data_i["zMaxAdj_local"]
-    ptOut = section_data_i["ctrLinePtOut"] # 使用计算出的出口点
-    normalOut = section_data_i["normalOut"] # 使用计算出的出口法线
-    scaleOut = section_data_i["scaleOut"]     # 使用出口半径
-    # 入口角点
-    ptInMin = (ptIn[0] + normalIn[0] * zmin_local * scaleIn,
-               ptIn[1] + normalIn[1] * zmin_local * scaleIn)
-    ptInMax = (ptIn[0] + normalIn[0] * zmax_local * scaleIn,
-               ptIn[1] + normalIn[1] * zmax_local * scaleIn)
-    # 出口角点
-    ptOutMin = (ptOut[0] + normalOut[0] * zmin_local * scaleOut,
-                ptOut[1] + normalOut[1] * zmin_local * scaleOut)
-    ptOutMax = (ptOut[0] + normalOut[0] * zmax_local * scaleOut,
-                ptOut[1] + normalOut[1] * zmax_local * scaleOut)
-    return ptInMin, ptInMax, ptOutMin, ptOutMax
-
-# --- 原始角点计算 (更新) ---
-def get_segment_points_original(section_data_i):
+    num_segments = max(len(all_sections_data) - 1, 0)
+    for i in range(num_segments):
+        data_i = all_sections_data[i]
+        data_i_plus_1 = all_sections_data[i+1]
+        s_prime_i = data_i["ctrLinePtIn_adj"]
+        s_prime_i_plus_1 = data_i_plus_1["ctrLinePtIn_adj"]
+        n_hat_i = data_i["normalIn_adj"]
+        n_hat_i_plus_1 = data_i_plus_1["normalIn_adj"]
+
+        # 计算调整后中心线段长度
+        length = np.sqrt((s_prime_i_plus_1[0] - s_prime_i[0])**2 + (s_prime_i_plus_1[1] - s_prime_i[1])**2)
+        data_i["length"] = length
+
+        # 计算调整后几何的曲率
+        radius, angle = calculate_curvature(s_prime_i, n_hat_i, s_prime_i_plus_1, n_hat_i_plus_1)
+        data_i["curvatureRadius"] = radius
+        data_i["curvatureAngle"] = angle
+
+        # 计算调整后几何的出口点和法线
+        s_out_i, n_hat_out_i = calculate_outlet_geometry(
+            s_prime_i, n_hat_i, length, radius, angle
+        )
+        data_i["ctrLinePtOut"] = s_out_i
+        data_i["normalOut"] = n_hat_out_i
+
+        # ---- 计算原始几何的属性 ----
+        s_orig_i = data_i["original_center"]
+        s_orig_i_plus_1 = data_i_plus_1["original_center"]
+        n_orig_out_i = rotate_vector(n_hat_i, angle) 
+        data_i["normalOut_orig"] = normalize_vector(n_orig_out_i[0], n_orig_out_i[1])
+
+        length_orig = np.sqrt((s_orig_i_plus_1[0] - s_orig_i[0])**2 + (s_orig_i_plus_1[1] - s_orig_i[1])**2)
+        s_out_i_orig, _ = calculate_outlet_geometry( 
+             s_orig_i, n_hat_i, length_orig, radius, angle 
+        )
+        data_i["ctrLinePtOut_orig"] = s_out_i_orig
+        
+        # ---- 检测问题 ----
+        data_i["issues"] = analyse_section_pair(data_i, data_i_plus_1)
+        if data_i["issues"]:
+            print(f"分段 {i} (截面 {i} 和 {i+1}) 发现问题: {data_i['issues']}")
+
+def build_section_dicts(contours, sections, segments):
     """
-    使用段 i 的 *原始* 几何数据计算四个角点的全局坐标。
+    把 contour_geometry 算出的截面/分段结构化数组组装成 GUI 使用的截面字典（信息打印用）。
+    轮廓坐标保留为 NumPy 数组（Y 为 contours 的视图），闭合绘图用的数组在绘制时再生成。
     """
-    ptIn = section_data_i["original_center"]
-    normalIn = section_data_i["normalIn_adj"] # 仍使用归一化法线用于方向
-    scaleIn = section_data_i["scaleIn"]
-    # 使用原始 Z 范围
-    zmin_local = section_data_i["zMinLocal_orig"]
-    zmax_local = section_data_i["zMaxLocal_orig"]
-    # 使用计算出的 *原始* 出口点和法线
-    ptOut = section_data_i["ctrLinePtOut_orig"]
-    normalOut = section_data_i["normalOut_orig"] # 使用原始出口法线
-    scaleOut = section_data_i["scaleOut"]
-
-    ptInMin = (ptIn[0] + normalIn[0] * zmin_local * scaleIn,
-               ptIn[1] + normalIn[1] * zmin_local * scaleIn)
-    ptInMax = (ptIn[0] + normalIn[0] * zmax_local * scaleIn,
-               ptIn[1] + normalIn[1] * zmax_local * scaleIn)
-    ptOutMin = (ptOut[0] + normalOut[0] * zmin_local * scaleOut,
-                ptOut[1] + normalOut[1] * zmin_local * scaleOut)
-    ptOutMax = (ptOut[0] + normalOut[0] * zmax_local * scaleOut,
-                ptOut[1] + normalOut[1] * zmax_local * scaleOut)
-    return ptInMin, ptInMax, ptOutMin, ptOutMax
-
+    num_segments = len(segments)
+    all_sections_data = []
+    for i, sec in enumerate(sections):
+        contour_y, contour_z = contours.section(i)
+        ctr_adj = tuple(sec["center_adj"].tolist())
+        normal = tuple(sec["normal"].tolist())
+        data = {
+            "ctrLinePtIn_adj": ctr_adj,
+            "normalIn_adj": normal,
+            "scaleIn": float(sec["scale_in"]),
+            "scaleOut": float(sec["scale_out"]),
+            "contourY_local_adj": contour_y,
+            "contourZ_local_adj": contour_z - sec["z_c"],
+            "original_contourY": contour_y,
+            "original_contourZ": contour_z,
+            "z_c_local": float(sec["z_c"]),
+            "zMinAdj_local": float(sec["z_min_adj"]),
+            "zMaxAdj_local": float(sec["z_max_adj"]),
+            "yMinAdj_local": float(sec["y_min"]),
+            "yMaxAdj_local": float(sec["y_max"]),
+            "original_center": tuple(sec["center_orig"].tolist()),
+            "normalIn_orig": tuple(contours.normals[i].tolist()),
+            "zMinLocal_orig": float(sec["z_min_orig"]),
+            "zMaxLocal_orig": float(sec["z_max_orig"]),
+            "ctrLinePtOut_orig": tuple(sec["center_orig"].tolist()),
+            "normalOut_orig": normal,
+            "length": 0.0,
+            "curvatureRadius": float('inf'),
+            "curvatureAngle": 0.0,
+            "ctrLinePtOut": ctr_adj,
+            "normalOut": normal,
+            "signed_area": float(sec["signed_area"]),
+            "orientation": int(sec["orientation"]),
+            "issues": [],
+        }
+        if i < num_segments:
+            seg = segments[i]
+            data["length"] = float(seg["length"])
+            data["curvatureRadius"] = float(seg["curvature_radius"])
+            data["curvatureAngle"] = float(seg["curvature_angle"])
+            data["ctrLinePtOut"] = tuple(seg["pt_out"].tolist())
+            data["normalOut"] = tuple(seg["normal_out"].tolist())
+            data["ctrLinePtOut_orig"] = tuple(seg["pt_out_orig"].tolist())
+            data["normalOut_orig"] = tuple(seg["normal_out_orig"].tolist())
+            data["issues"] = issue_labels(seg["issues"])
+            if data["issues"]:
+                print(f"分段 {i} (截面 {i} 和 {i+1}) 发现问题: {data['issues']}")
+        all_sections_data.append(data)
+    return all_sections_data
+
+def closed_contour(values):
+    """首点追加到末尾，便于绘制闭合轮廓"""
+    return np.append(values, values[:1]) if len(values) else values
+
+# --- 分段梯形 (矢状面) ---
+def sagittal_quads(sections, segments, original=False):
+    """
+    全部分段的矢状面梯形顶点 (n_seg, 4, 2)，顶点顺序 inMin, inMax, outMax, outMin（闭合多边形）。
+    original=True 时使用原始中心与原始出口几何，否则使用 Z 居中后的调整几何。
+    """
+    a = sections[:-1]
+    if original:
+        p_in, p_out, n_out = a["center_orig"], segments["pt_out_orig"], segments["normal_out_orig"]
+        z_min, z_max = a["z_min_orig"], a["z_max_orig"]
+    else:
+        p_in, p_out, n_out = a["center_adj"], segments["pt_out"], segments["normal_out"]
+        z_min, z_max = a["z_min_adj"], a["z_max_adj"]
+    in_min, in_max, out_min, out_max = segment_quads(
+        p_in, a["normal"], a["scale_in"], p_out, n_out, a["scale_out"], z_min, z_max)
+    return np.stack((in_min, in_max, out_max, out_min), axis=1)
+
+def quads_containing(quads, x, y):
+    """返回包含点 (x, y) 的分段索引（射线法，奇偶规则，对自相交梯形同样适用）"""
+    v0 = quads
+    v1 = np.roll(quads, -1, axis=1)
+    crosses = (v0[..., 1] > y) != (v1[..., 1] > y)
+    dy = np.where(crosses, v1[..., 1] - v0[..., 1], 1.0)
+    x_int = v0[..., 0] + (y - v0[..., 1]) * (v1[..., 0] - v0[..., 0]) / dy
+    inside = np.count_nonzero(crosses & (x < x_int), axis=1) % 2 == 1
+    return np.flatnonzero(inside)
+
+def quad_edges(quads):
+    """梯形四条边 (n_seg, 4, 2, 2)：入口、出口、下侧、上侧"""
+    in_min, in_max, out_max, out_min = (quads[:, k] for k in range(4))
+    return np.stack((
+        np.stack((in_min, in_max), axis=1),
+        np.stack((out_min, out_max), axis=1),
+        np.stack((in_min, out_min), axis=1),
+        np.stack((in_max, out_max), axis=1),
+    ), axis=1)
 
 # --- GUI Application Class ---
 class VocalTractViewerApp:
@@ -376,11 +457,18 @@ class VocalTractViewerApp:
         self.all_sections_data = []
         self.num_segments = 0
         self.selected_segment_index = -1
-        self.adjusted_segment_lines = []
-        self.original_segment_lines = [] # 新增
-        self.adjusted_normal_arrows = [] # 新增: 存储调整后法线箭头
-        self.original_normal_arrows = [] # 新增: 存储原始法线箭头
+        self.contours = None
+        self.sections = None # contour_geometry.SECTION_DTYPE 数组
+        self.segments = None # contour_geometry.SEGMENT_DTYPE 数组
+        self.quads = {} # 轴 -> (n_seg, 4, 2) 分段梯形，用于绘制与点击检测
+        self.highlight_artists = {} # 轴 -> (选中梯形 LineCollection, 选中中心线 Line2D)
+        self.cross_section_artists = None
+        self._background = None # 不含 animated 图元的整幅画布缓存，用于 blit
+        self.last_frame_ms = 0.0
         self.loaded_csv_basename = ""
+        self._loader = ThreadPoolExecutor(max_workers=1) # 后台加载线程
+        self._load_future = None
+        self._load_progress = 0.0
 
         # --- Top Frame for Controls ---
         self.control_frame = tk.Frame(master)
@@ -449,6 +537,8 @@ class VocalTractViewerApp:
 
         # --- Connect Click Event ---
         self.fig.canvas.mpl_connect('button_press_event', self.on_click)
+        # 任何完整重绘（缩放、平移、窗口尺寸变化）后重新缓存背景
+        self.fig.canvas.mpl_connect('draw_event', self.on_draw)
 
     def on_closing(self):
         """处理窗口关闭事件"""
@@ -457,28 +547,54 @@ class VocalTractViewerApp:
         print("Closing application...")
         # 清理 matplotlib 图形，防止内存泄漏 (可选但推荐)
         plt.close(self.fig)
+        self._loader.shutdown(wait=False)
         self.master.destroy()
 
     def load_csv(self):
+        if self._load_future is not None and not self._load_future.done():
+            return # 上一次加载尚未结束
         filepath = filedialog.askopenfilename(
             title="Select CSV File",
-            filetypes=(("CSV files", "*.csv"), ("All files", "*.*"))
+            filetypes=(("CSV files", "*.csv"), ("Contour binary", "*.vtlc"), ("All files", "*.*"))
         )
         if not filepath:
             return
         self.loaded_csv_basename = os.path.splitext(os.path.basename(filepath))[0]
         self.status_label.config(text=f"Loading: {os.path.basename(filepath)}...")
-        self.master.update_idletasks()
-        self.all_sections_data = []
+        self.btn_load["state"] = "disabled"
+        self._load_progress = 0.0
+        # 解析与几何计算放到后台线程，Tk 主线程只负责轮询进度并在完成后绘图
+        self._load_future = self._loader.submit(self._load_sections, filepath)
+        self.master.after(LOAD_POLL_MS, self._poll_load, filepath)
+
+    def _set_load_progress(self, fraction):
+        """后台线程进度回调：只记录数值，由 _poll_load 在主线程显示"""
+        self._load_progress = fraction
+
+    def _load_sections(self, filepath):
+        """
+        在后台线程中运行：解析 CSV 并计算各分段几何与问题列表。
+        不得触碰 Tk 控件或 matplotlib 对象。
+        """
+        contours = load_contours(filepath, progress=lambda f: self._set_load_progress(0.9 * f))
+        sections, segments = analyse_contours(contours)
+        section_dicts = build_section_dicts(contours, sections, segments)
+        self._set_load_progress(1.0)
+        return contours, sections, segments, section_dicts
+
+    def _poll_load(self, filepath):
+        future = self._load_future
+        if future is None:
+            return
+        if not future.done():
+            self.status_label.config(text=f"Loading: {os.path.basename(filepath)}... {self._load_progress:.0%}")
+            self.master.after(LOAD_POLL_MS, self._poll_load, filepath)
+            return
+        self.btn_load["state"] = "normal"
         try:
-            with open(filepath, 'r') as f:
-                lines = f.readlines()
-            if len(lines) % 2 != 0: print("Warning: Odd number of lines in CSV.")
-            for i in range(0, len(lines), 2):
-                if i + 1 < len(lines):
-                    section = load_and_prepare_section_data(lines[i], lines[i+1])
-                    if section: self.all_sections_data.append(section)
+            self.contours, self.sections, self.segments, self.all_sections_data = future.result()
         except Exception as e:
+            self.all_sections_data = []
             messagebox.showerror("Error", f"Failed to load or process file:\n{e}")
             self.status_label.config(text="Error loading file.")
             self.loaded_csv_basename = ""; self.btn_save["state"] = "disabled"
@@ -492,50 +608,9 @@ class VocalTractViewerApp:
         self.num_segments = len(self.all_sections_data) - 1
         if self.num_segments < 0: self.num_segments = 0
 
-        # 计算每个分段的几何属性（长度、曲率、出口点/法线）和潜在问题
-        for i in range(self.num_segments):
-            data_i = self.all_sections_data[i]
-            data_i_plus_1 = self.all_sections_data[i+1]
-            s_prime_i = data_i["ctrLinePtIn_adj"]
-            s_prime_i_plus_1 = data_i_plus_1["ctrLinePtIn_adj"]
-            n_hat_i = data_i["normalIn_adj"]
-            n_hat_i_plus_1 = data_i_plus_1["normalIn_adj"]
-
-            # 计算调整后中心线段长度
-            length = np.sqrt((s_prime_i_plus_1[0] - s_prime_i[0])**2 + (s_prime_i_plus_1[1] - s_prime_i[1])**2)
-            data_i["length"] = length
-
-            # 计算调整后几何的曲率
-            radius, angle = calculate_curvature(s_prime_i, n_hat_i, s_prime_i_plus_1, n_hat_i_plus_1)
-            data_i["curvatureRadius"] = radius
-            data_i["curvatureAngle"] = angle
-
-            # 计算调整后几何的出口点和法线
-            s_out_i, n_hat_out_i = calculate_outlet_geometry(
-                s_prime_i, n_hat_i, length, radius, angle
-            )
-            data_i["ctrLinePtOut"] = s_out_i
-            data_i["normalOut"] = n_hat_out_i
-
-            # ---- 计算原始几何的属性 ----
-            s_orig_i = data_i["original_center"]
-            s_orig_i_plus_1 = data_i_plus_1["original_center"]
-            n_orig_out_i = rotate_vector(n_hat_i, angle) 
-            data_i["normalOut_orig"] = normalize_vector(n_orig_out_i[0], n_orig_out_i[1])
-
-            length_orig = np.sqrt((s_orig_i_plus_1[0] - s_orig_i[0])**2 + (s_orig_i_plus_1[1] - s_orig_i[1])**2)
-            s_out_i_orig, _ = calculate_outlet_geometry( 
-                 s_orig_i, n_hat_i, length_orig, radius, angle 
-            )
-            data_i["ctrLinePtOut_orig"] = s_out_i_orig
-            
-            # ---- 检测问题 ----
-            data_i["issues"] = analyse_section_pair(data_i, data_i_plus_1)
-            if data_i["issues"]:
-                print(f"分段 {i} (截面 {i} 和 {i+1}) 发现问题: {data_i['issues']}")
-
         self.selected_segment_index = 0 if self.num_segments > 0 else -1
-        self.update_plots() 
+        self.build_plots()
+        self.update_plots()
         self.status_label.config(text=f"已加载 {len(self.all_sections_data)} 个截面 ({self.num_segments} 个分段).")
         self.btn_save["state"] = "normal"
         if self.num_segments > 0:
@@ -556,6 +631,9 @@ class VocalTractViewerApp:
             filetypes=[("PNG", "*.png"), ("JPEG", "*.jpg"), ("PDF", "*.pdf"), ("SVG", "*.svg"), ("All", "*.*")]
         )
         if output_filepath:
+            # animated 图元不参与常规绘制，保存前临时取消以便写入文件
+            animated = self._animated_artists()
+            for artist in animated: artist.set_animated(False)
             try:
                 self.fig.savefig(output_filepath, dpi=300, bbox_inches='tight')
                 self.status_label.config(text=f"Plot saved to: {os.path.basename(output_filepath)}")
@@ -563,212 +641,170 @@ class VocalTractViewerApp:
             except Exception as e:
                 messagebox.showerror("Save Error", f"Failed to save plot:\n{e}")
                 self.status_label.config(text="Error saving plot.")
+            finally:
+                for artist in animated: artist.set_animated(True)
+                self.canvas.draw()
+
+    # --- 持久图元：加载后一次性创建，切换选中分段时只更新高亮图元 ---
+    def _setup_sagittal_axis(self, ax, title, original):
+        ax.clear()
+        ax.set_title(title, fontproperties=self.font_prop)
+        ax.set_xlabel('全局 X', fontproperties=self.font_prop)
+        ax.set_ylabel('全局 Y', fontproperties=self.font_prop)
+        ax.set_aspect('equal', adjustable='datalim')
+        ax.grid(True)
+
+        colors = ORIGINAL_COLORS if original else ADJUSTED_COLORS
+        c_in, c_out, c_lower, c_upper, c_center, c_selected, arrow_fc, arrow_ec = colors
+        quads = sagittal_quads(self.sections, self.segments, original=original)
+        self.quads[ax] = quads
+        n_seg = len(quads)
+        has_issues = self.segments["issues"] != 0
+
+        # 全部分段的四条边：一个 LineCollection，问题分段整体标为橙色
+        edge_colors = np.tile(np.array([c_in, c_out, c_lower, c_upper], dtype=object), (n_seg, 1))
+        edge_colors[has_issues] = ISSUE_COLOR
+        edge_widths = np.repeat(np.where(has_issues, 2.0, 1.0), 4)
+        ax.add_collection(LineCollection(quad_edges(quads).reshape(-1, 2, 2), colors=list(edge_colors.ravel()),
+                                         linewidths=edge_widths, zorder=5))
+
+        # 中心线段与入口法线箭头
+        p_in = self.sections["center_orig" if original else "center_adj"][:-1]
+        p_out = self.segments["pt_out_orig" if original else "pt_out"]
+        ax.add_collection(LineCollection(np.stack((p_in, p_out), axis=1), colors=c_center,
+                                         linestyles=':' if original else '--', linewidths=0.8, zorder=9))
+        normals = self.sections["normal"][:-1]
+        arrow_len = NORMAL_VECTOR_SCALE * self.sections["scale_in"][:-1]
+        ax.quiver(p_in[:, 0], p_in[:, 1], normals[:, 0] * arrow_len, normals[:, 1] * arrow_len,
+                  color=np.where(has_issues, 'gold', arrow_fc), edgecolor=np.where(has_issues, 'darkorange', arrow_ec),
+                  linewidth=0.5, angles='xy', scale_units='xy', scale=1, width=0.003, zorder=20)
+
+        # 选中分段的高亮图元（animated，只参与 blit）
+        sel_edges = LineCollection(np.zeros((4, 2, 2)), colors=c_selected, linewidths=2.0, zorder=15, animated=True)
+        # 占位线段不参与数据范围计算，视图只按实际几何自动缩放
+        ax.add_collection(sel_edges, autolim=False)
+        sel_center, = ax.plot([], [], color=c_selected, linestyle=':' if original else '--',
+                              marker='x' if original else '.', markersize=4, linewidth=1.5, zorder=11, animated=True)
+        self.highlight_artists[ax] = (sel_edges, sel_center, original)
+
+        ax.autoscale_view()
+        legend_handles = [
+            Line2D([0], [0], color=arrow_fc, marker='>', linestyle='None', markersize=5),
+            Line2D([0], [0], color=c_center, linestyle=':' if original else '--', lw=0.8),
+            Line2D([0], [0], color=c_selected, linestyle='-', lw=2.0),
+            Line2D([0], [0], color=ISSUE_COLOR, linestyle='-', lw=2.0),
+        ]
+        legend_labels = ['入口法线方向', '原始中心线' if original else '计算中心线', '选中分段', '存在问题']
+        ax.legend(legend_handles, legend_labels, fontsize='small', prop=self.font_prop)
+
+    def _setup_cross_section_axis(self):
+        ax = self.ax_right
+        ax.clear()
+        ax.set_xlabel('局部 Y', fontproperties=self.font_prop)
+        ax.set_ylabel('局部 Z', fontproperties=self.font_prop)
+        ax.set_aspect('equal', adjustable='datalim')
+        ax.grid(True)
+        ax.axhline(y=0, color='black', linestyle='--', zorder=5, label='局部原点/居中Z')
+        orig_line, = ax.plot([], [], marker='.', markersize=3, linestyle='--', color='lightcoral', label='原始轮廓', animated=True)
+        adj_line, = ax.plot([], [], marker='o', markersize=4, linestyle='-', color='darkblue', label='居中轮廓', animated=True)
+        zc_line, = ax.plot([], [], color='purple', linestyle='--', zorder=6, label='原始Z中心', animated=True)
+        ax.title.set_animated(True)
+        ax.title.set_fontproperties(self.font_prop)
+        ax.legend(fontsize='small', prop=self.font_prop)
+
+        # 固定为全部截面的联合范围：切换截面时无需重绘坐标轴，可直接 blit
+        sec = self.sections
+        x_lo, x_hi = min(sec["y_min"].min(), 0.0), max(sec["y_max"].max(), 0.0)
+        y_lo = min(sec["z_min_orig"].min(), sec["z_min_adj"].min(), 0.0)
+        y_hi = max(sec["z_max_orig"].max(), sec["z_max_adj"].max(), 0.0)
+        pad_x = 0.1 * ((x_hi - x_lo) or 1.0) + 0.5
+        pad_y = 0.1 * ((y_hi - y_lo) or 1.0) + 0.5
+        ax.set_xlim(x_lo - pad_x, x_hi + pad_x)
+        ax.set_ylim(y_lo - pad_y, y_hi + pad_y)
+        self.cross_section_artists = (orig_line, adj_line, zc_line)
+
+    def build_plots(self):
+        """加载数据后创建全部持久图元，并做一次完整绘制"""
+        self.quads = {}
+        self.highlight_artists = {}
+        self._background = None
+        if self.num_segments > 0:
+            self._setup_sagittal_axis(self.ax_left, '调整后矢状面视图', original=False)
+            self._setup_sagittal_axis(self.ax_mid, '原始矢状面视图', original=True)
+        else:
+            self.ax_left.clear(); self.ax_left.set_title('调整后矢状面视图 (无分段)', fontproperties=self.font_prop)
+            self.ax_mid.clear(); self.ax_mid.set_title('原始矢状面视图 (无分段)', fontproperties=self.font_prop)
+        self._setup_cross_section_axis()
+        self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
+        self.canvas.draw() # 触发 on_draw 缓存背景
+
+    def _animated_artists(self):
+        artists = []
+        for sel_edges, sel_center, _ in self.highlight_artists.values():
+            artists.extend((sel_edges, sel_center))
+        if self.cross_section_artists:
+            artists.extend(self.cross_section_artists)
+            artists.append(self.ax_right.title)
+        return artists
+
+    def _update_highlight(self):
+        i = self.selected_segment_index
+        valid = 0 <= i < self.num_segments
+        for ax, (sel_edges, sel_center, original) in self.highlight_artists.items():
+            if valid:
+                sel_edges.set_segments(quad_edges(self.quads[ax][i:i + 1])[0])
+                p_in = self.sections["center_orig" if original else "center_adj"][i]
+                p_out = self.segments["pt_out_orig" if original else "pt_out"][i]
+                sel_center.set_data([p_in[0], p_out[0]], [p_in[1], p_out[1]])
+            else:
+                sel_edges.set_segments([])
+                sel_center.set_data([], [])
 
-    # --- 修改后的绘图函数，增加法线绘制 ---
-    def draw_segment_sagittal_gui(self, ax, section_data_i, segment_index, is_selected):
-        ptInMin, ptInMax, ptOutMin, ptOutMax = get_segment_points(section_data_i)
-        ptIn = section_data_i["ctrLinePtIn_adj"]
-        normalIn = section_data_i["normalIn_adj"]
-        
-        has_issues = bool(section_data_i.get("issues"))
-
-        color_in = 'orange' if has_issues else ('red' if is_selected else 'gray')
-        color_out = 'orange' if has_issues else ('red' if is_selected else 'darkgray')
-        color_upper = 'orange' if has_issues else ('red' if is_selected else 'blue')
-        color_lower = 'orange' if has_issues else ('red' if is_selected else 'green')
-        
-        linewidth = 2.0 if is_selected or has_issues else 1.0
-        zorder = 16 if has_issues else (15 if is_selected else 5)
-        
-        lines = []
-        lines.extend(ax.plot([ptInMin[0], ptInMax[0]], [ptInMin[1], ptInMax[1]], color=color_in, linestyle='-', linewidth=linewidth, zorder=zorder))
-        lines.extend(ax.plot([ptOutMin[0], ptOutMax[0]], [ptOutMin[1], ptOutMax[1]], color=color_out, linestyle='-', linewidth=linewidth, zorder=zorder))
-        lines.extend(ax.plot([ptInMin[0], ptOutMin[0]], [ptInMin[1], ptOutMin[1]], color=color_lower, linestyle='-', linewidth=linewidth, zorder=zorder))
-        lines.extend(ax.plot([ptInMax[0], ptOutMax[0]], [ptInMax[1], ptOutMax[1]], color=color_upper, linestyle='-', linewidth=linewidth, zorder=zorder))
-        
-        arrow_len = NORMAL_VECTOR_SCALE * section_data_i.get("scaleIn", 0.1) 
-        arrow_fc = 'gold' if has_issues else 'cyan'
-        arrow_ec = 'darkorange' if has_issues else 'blue'
-        arrow = ax.arrow(ptIn[0], ptIn[1], normalIn[0] * arrow_len, normalIn[1] * arrow_len,
-                         head_width=arrow_len*0.3, head_length=arrow_len*0.4, fc=arrow_fc, ec=arrow_ec, zorder=20,
-                         label='_nolegend_' if segment_index > 0 else '入口法线')
-        return lines, arrow 
-
-    def draw_segment_sagittal_original_gui(self, ax, section_data_i, segment_index, is_selected):
-        ptInMin, ptInMax, ptOutMin, ptOutMax = get_segment_points_original(section_data_i)
-        ptIn = section_data_i["original_center"]
-        normalIn = section_data_i["normalIn_adj"] 
-        
-        has_issues = bool(section_data_i.get("issues")) # 检查是否存在问题
-
-        color_in = 'orange' if has_issues else ('magenta' if is_selected else 'lightgray')
-        color_out = 'orange' if has_issues else ('magenta' if is_selected else 'silver')
-        color_upper = 'orange' if has_issues else ('magenta' if is_selected else 'lightblue')
-        color_lower = 'orange' if has_issues else ('magenta' if is_selected else 'lightgreen')
-        linestyle = '-'
-        linewidth = 2.0 if is_selected or has_issues else 1.0
-        zorder = 16 if has_issues else (15 if is_selected else 5)
-
-        lines = []
-        lines.extend(ax.plot([ptInMin[0], ptInMax[0]], [ptInMin[1], ptInMax[1]], color=color_in, linestyle=linestyle, linewidth=linewidth, zorder=zorder))
-        lines.extend(ax.plot([ptOutMin[0], ptOutMax[0]], [ptOutMin[1], ptOutMax[1]], color=color_out, linestyle=linestyle, linewidth=linewidth, zorder=zorder))
-        lines.extend(ax.plot([ptInMin[0], ptOutMin[0]], [ptInMin[1], ptOutMin[1]], color=color_lower, linestyle=linestyle, linewidth=linewidth, zorder=zorder))
-        lines.extend(ax.plot([ptInMax[0], ptOutMax[0]], [ptInMax[1], ptOutMax[1]], color=color_upper, linestyle=linestyle, linewidth=linewidth, zorder=zorder))
-        
-        arrow_len = NORMAL_VECTOR_SCALE * section_data_i.get("scaleIn", 0.1)
-        arrow_fc = 'gold' if has_issues else 'yellow'
-        arrow_ec = 'darkorange' if has_issues else 'orange'
-        arrow = ax.arrow(ptIn[0], ptIn[1], normalIn[0] * arrow_len, normalIn[1] * arrow_len,
-                         head_width=arrow_len*0.3, head_length=arrow_len*0.4, fc=arrow_fc, ec=arrow_ec, zorder=20,
-                         label='_nolegend_' if segment_index > 0 else '原始入口法线')
-        return lines, arrow
-
-    def update_adjusted_sagittal_plot(self):
-        self.ax_left.clear()
-        self.adjusted_segment_lines = []
-        self.adjusted_normal_arrows = [] # 清空旧箭头
-
-        if not self.all_sections_data:
-            self.ax_left.set_title('调整后矢状面视图 (无数据)', fontproperties=self.font_prop)
-            return
-
-        # 先绘制所有未选中的分段
-        for i in range(self.num_segments):
-            if i != self.selected_segment_index:
-                data_i = self.all_sections_data[i]
-                lines, arrow = self.draw_segment_sagittal_gui(self.ax_left, data_i, i, False)
-                self.adjusted_segment_lines.append(lines)
-                self.adjusted_normal_arrows.append(arrow)
-                s_prime_i = data_i["ctrLinePtIn_adj"]
-                s_out_i = data_i["ctrLinePtOut"]
-                self.ax_left.plot([s_prime_i[0], s_out_i[0]], [s_prime_i[1], s_out_i[1]],
-                                  color='gray', linestyle='--', marker=None, linewidth=0.8, zorder=9)
-
-        # 最后绘制选中的分段 (使其在最上层)
-        if self.selected_segment_index >= 0 and self.selected_segment_index < self.num_segments:
-             data_i = self.all_sections_data[self.selected_segment_index]
-             lines, arrow = self.draw_segment_sagittal_gui(self.ax_left, data_i, self.selected_segment_index, True)
-             self.adjusted_segment_lines.append(lines) # 替换或添加到列表末尾
-             self.adjusted_normal_arrows.append(arrow)
-             s_prime_i = data_i["ctrLinePtIn_adj"]
-             s_out_i = data_i["ctrLinePtOut"]
-             self.ax_left.plot([s_prime_i[0], s_out_i[0]], [s_prime_i[1], s_out_i[1]],
-                               color='red', linestyle='--', marker='.', markersize=4,
-                               linewidth=1.5, zorder=11, label='计算中心线 (选中)')
-
-        # 添加图例（如果需要，可以创建自定义图例项）
-        self.ax_left.plot([], [], color='cyan', marker='>', linestyle='None', markersize=5, label='入口法线方向') # 图例占位符
-        self.ax_left.set_title('调整后矢状面视图', fontproperties=self.font_prop)
-        self.ax_left.set_xlabel('全局 X', fontproperties=self.font_prop)
-        self.ax_left.set_ylabel('全局 Y', fontproperties=self.font_prop)
-        self.ax_left.set_aspect('equal', adjustable='datalim')
-        self.ax_left.grid(True)
-        handles, labels = self.ax_left.get_legend_handles_labels()
-        # by_label = dict(zip(labels, handles)) # 可能导致重复标签被覆盖
-        unique_labels = {}
-        for h, l in zip(handles, labels):
-            if l not in unique_labels:
-                unique_labels[l] = h
-        if self.num_segments > 0 and '计算中心线 (选中)' not in unique_labels:
-             # 如果没有选中项被绘制，也添加一个灰色中心线图例
-             unique_labels['计算中心线'] = plt.Line2D([0],[0], color='gray', linestyle='--', lw=0.8)
-
-        self.ax_left.legend(unique_labels.values(), unique_labels.keys(), fontsize='small', prop=self.font_prop)
-
-
-    def update_original_sagittal_plot(self):
-        self.ax_mid.clear()
-        self.original_segment_lines = []
-        self.original_normal_arrows = []
-
-        if not self.all_sections_data:
-            self.ax_mid.set_title('原始矢状面视图 (无数据)', fontproperties=self.font_prop)
+    def _update_cross_section(self):
+        if not self.cross_section_artists:
             return
-
-        for i in range(self.num_segments):
-            if i != self.selected_segment_index:
-                data_i = self.all_sections_data[i]
-                lines, arrow = self.draw_segment_sagittal_original_gui(self.ax_mid, data_i, i, False)
-                self.original_segment_lines.append(lines)
-                self.original_normal_arrows.append(arrow)
-                s_prime_i = data_i["original_center"]
-                s_out_i = data_i["ctrLinePtOut_orig"]
-                self.ax_mid.plot([s_prime_i[0], s_out_i[0]], [s_prime_i[1], s_out_i[1]],
-                                  color='darkorange', linestyle=':', marker=None, linewidth=0.8, zorder=9)
-
-        if self.selected_segment_index >= 0 and self.selected_segment_index < self.num_segments:
-             data_i = self.all_sections_data[self.selected_segment_index]
-             lines, arrow = self.draw_segment_sagittal_original_gui(self.ax_mid, data_i, self.selected_segment_index, True)
-             self.original_segment_lines.append(lines)
-             self.original_normal_arrows.append(arrow)
-             s_prime_i = data_i["original_center"]
-             s_out_i = data_i["ctrLinePtOut_orig"]
-             self.ax_mid.plot([s_prime_i[0], s_out_i[0]], [s_prime_i[1], s_out_i[1]],
-                               color='orange', linestyle=':', marker='x', markersize=4,
-                               linewidth=1.5, zorder=11, label='原始中心线 (选中)')
-
-        self.ax_mid.plot([], [], color='yellow', marker='>', linestyle='None', markersize=5, label='入口法线方向')
-        self.ax_mid.set_title('原始矢状面视图', fontproperties=self.font_prop)
-        self.ax_mid.set_xlabel('全局 X', fontproperties=self.font_prop)
-        self.ax_mid.set_ylabel('全局 Y', fontproperties=self.font_prop)
-        self.ax_mid.set_aspect('equal', adjustable='datalim')
-        self.ax_mid.grid(True)
-        handles, labels = self.ax_mid.get_legend_handles_labels()
-        # by_label = dict(zip(labels, handles))
-        unique_labels = {}
-        for h, l in zip(handles, labels):
-             if l not in unique_labels: unique_labels[l] = h
-        if self.num_segments > 0 and '原始中心线 (选中)' not in unique_labels:
-             unique_labels['原始中心线'] = plt.Line2D([0],[0], color='darkorange', linestyle=':', lw=0.8)
-        self.ax_mid.legend(unique_labels.values(), unique_labels.keys(), fontsize='small', prop=self.font_prop)
-
-    def update_cross_section_plot(self):
-        self.ax_right.clear()
+        orig_line, adj_line, zc_line = self.cross_section_artists
         plot_index = self.selected_segment_index
         if plot_index < 0 and len(self.all_sections_data) > 0:
             plot_index = 0
-        elif plot_index < 0:
+        if plot_index < 0 or plot_index >= len(self.all_sections_data):
             self.ax_right.set_title('截面视图 (无数据)', fontproperties=self.font_prop)
+            for line in self.cross_section_artists: line.set_data([], [])
             return
-
-        if plot_index >= len(self.all_sections_data):
-             self.ax_right.set_title(f'截面视图 (索引 {plot_index} 无效)', fontproperties=self.font_prop)
-             return
-
         section_data = self.all_sections_data[plot_index]
+        orig_line.set_data(closed_contour(section_data["original_contourY"]), closed_contour(section_data["original_contourZ"]))
+        adj_line.set_data(closed_contour(section_data["contourY_local_adj"]), closed_contour(section_data["contourZ_local_adj"]))
+        z_c = section_data["z_c_local"]
+        zc_line.set_data(self.ax_right.get_xlim(), [z_c, z_c])
         title_suffix = f" (选中分段入口: {self.selected_segment_index})" if self.selected_segment_index == plot_index and self.num_segments > 0 else " (默认入口)"
-        current_title = f'截面 {plot_index}{title_suffix}'
-
-        if section_data.get("original_contourY_plot"):
-             self.ax_right.plot(section_data["original_contourY_plot"], section_data["original_contourZ_plot"], marker='.', markersize=3, linestyle='--', color='lightcoral', label='原始轮廓')
-        if section_data.get("contourY_plot_adj"):
-             self.ax_right.plot(section_data["contourY_plot_adj"], section_data["contourZ_plot_adj"], marker='o', markersize=4, linestyle='-', color='darkblue', label='居中轮廓')
-        self.ax_right.axhline(y=0, color='black', linestyle='--', zorder=5, label='局部原点/居中Z')
-        z_c = section_data.get("z_c_local")
-        if z_c is not None:
-             self.ax_right.axhline(y=z_c, color='purple', linestyle='--', zorder=6, label=f'原始Z中心 ({z_c:.2f})')
-
-        self.ax_right.set_title(current_title, fontproperties=self.font_prop)
-        self.ax_right.set_xlabel('局部 Y', fontproperties=self.font_prop)
-        self.ax_right.set_ylabel('局部 Z', fontproperties=self.font_prop)
-        self.ax_right.set_aspect('equal', adjustable='datalim')
-        self.ax_right.grid(True)
-        handles, labels = self.ax_right.get_legend_handles_labels()
-        by_label = dict(zip(labels, handles))
-        self.ax_right.legend(by_label.values(), by_label.keys(), fontsize='small', prop=self.font_prop)
-
-        all_x, all_y = [0], [0]
-        if section_data.get("original_contourY_plot"): all_x.extend(section_data["original_contourY_plot"])
-        if section_data.get("original_contourZ_plot"): all_y.extend(section_data["original_contourZ_plot"])
-        if section_data.get("contourY_plot_adj"): all_x.extend(section_data["contourY_plot_adj"])
-        if section_data.get("contourZ_plot_adj"): all_y.extend(section_data["contourZ_plot_adj"])
-        if z_c is not None: all_y.append(z_c)
-        if len(all_x) > 1:
-            min_x, max_x = min(all_x), max(all_x); range_x = max_x - min_x or 1.0
-            pad_x = 0.1 * range_x + 0.5; self.ax_right.set_xlim(min_x - pad_x, max_x + pad_x)
-        if len(all_y) > 1:
-            min_y, max_y = min(all_y), max(all_y); range_y = max_y - min_y or 1.0
-            pad_y = 0.1 * range_y + 0.5; self.ax_right.set_ylim(min_y - pad_y, max_y + pad_y)
+        self.ax_right.set_title(f'截面 {plot_index}{title_suffix}  Z中心 {z_c:.2f}', fontproperties=self.font_prop)
+
+    def on_draw(self, event):
+        """完整重绘后缓存不含 animated 图元的背景，再把高亮图元补画上去"""
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._animated_artists():
+            artist.axes.draw_artist(artist)
+
+    def update_plots(self):
+        """更新选中分段：只改高亮/截面图元的数据，恢复背景后 blit，不重建任何图元"""
+        t0 = time.perf_counter()
+        self._update_highlight()
+        self._update_cross_section()
+        if self._background is None:
+            self.canvas.draw()
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_animated()
+            self.canvas.blit(self.fig.bbox)
+        self.last_frame_ms = (time.perf_counter() - t0) * 1000.0
+        # 打印选中截面信息
+        self.print_selected_section_info()
+
+    def _show_selection_status(self):
+        self.status_label.config(text=f"选中分段: {self.selected_segment_index} | 帧耗时 {self.last_frame_ms:.1f} ms")
 
     def print_selected_section_info(self):
         """打印选中分段的起始截面信息到控制台"""
@@ -806,54 +842,26 @@ class VocalTractViewerApp:
         print("-" * (20 + len(str(self.selected_segment_index))*2))
 
 
-    def update_plots(self):
-        self.update_adjusted_sagittal_plot()
-        self.update_original_sagittal_plot()
-        self.update_cross_section_plot()
-        self.fig.tight_layout(rect=[0, 0.03, 1, 0.95])
-        self.canvas.draw()
-        # 打印选中截面信息
-        self.print_selected_section_info()
-
     def on_click(self, event):
-        if event.inaxes not in [self.ax_left, self.ax_mid] or not self.all_sections_data or self.num_segments == 0:
+        if event.inaxes not in self.quads or not self.all_sections_data or self.num_segments == 0:
             return
         click_x, click_y = event.xdata, event.ydata
         if click_x is None or click_y is None: return
-        clicked_segment = -1
-        min_dist_sq = float('inf') # 用于处理重叠区域，选择最近的中心点
 
         # 根据点击的轴选择使用哪个几何数据进行碰撞检测
-        target_ax = event.inaxes
-        get_points_func = get_segment_points if target_ax == self.ax_left else get_segment_points_original
-        center_key = "ctrLinePtIn_adj" if target_ax == self.ax_left else "original_center"
-
-        possible_segments = []
-        for i in range(self.num_segments):
-            data_i = self.all_sections_data[i]
-            pts = get_points_func(data_i)
-            poly_path = Path([pts[0], pts[1], pts[3], pts[2], pts[0]]) # 确保是闭合路径
-            if poly_path.contains_point((click_x, click_y)):
-                 possible_segments.append(i)
-
-        if not possible_segments: return # 没有点中任何分段
+        possible_segments = quads_containing(self.quads[event.inaxes], click_x, click_y)
+        if not possible_segments.size: return # 没有点中任何分段
 
         # 如果点中了多个（重叠区域），选择入口中心点离点击位置最近的那个
-        if len(possible_segments) > 1:
-            for i in possible_segments:
-                 center = self.all_sections_data[i][center_key]
-                 dist_sq = (click_x - center[0])**2 + (click_y - center[1])**2
-                 if dist_sq < min_dist_sq:
-                      min_dist_sq = dist_sq
-                      clicked_segment = i
-        else:
-            clicked_segment = possible_segments[0]
-
+        center_key = "center_orig" if event.inaxes == self.ax_mid else "center_adj"
+        centers = self.sections[center_key][possible_segments]
+        dist_sq = (centers[:, 0] - click_x)**2 + (centers[:, 1] - click_y)**2
+        clicked_segment = int(possible_segments[np.argmin(dist_sq)])
 
-        if clicked_segment != -1 and clicked_segment != self.selected_segment_index:
+        if clicked_segment != self.selected_segment_index:
             self.selected_segment_index = clicked_segment
             self.update_plots()
-            self.status_label.config(text=f"选中分段: {self.selected_segment_index}")
+            self._show_selection_status()
 
 
     def select_prev_segment(self):
@@ -861,14 +869,14 @@ class VocalTractViewerApp:
         self.selected_segment_index -= 1
         if self.selected_segment_index < 0: self.selected_segment_index = self.num_segments - 1
         self.update_plots()
-        self.status_label.config(text=f"选中分段: {self.selected_segment_index}")
+        self._show_selection_status()
 
     def select_next_segment(self):
         if not self.all_sections_data or self.num_segments <= 0: return
         self.selected_segment_index += 1
         if self.selected_segment_index >= self.num_segments: self.selected_segment_index = 0
         self.update_plots()
-        self.status_label.config(text=f"选中分段: {self.selected_segment_index}")
+        self._show_selection_status()
 
 # --- Main Execution ---
 if __name__ == "__main__":
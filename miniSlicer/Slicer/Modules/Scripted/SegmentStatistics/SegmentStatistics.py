@@ -8,6 +8,7 @@ import slicer
 from slicer.ScriptedLoadableModule import *
 from slicer.i18n import tr as _
 from slicer.i18n import translate
+from slicer.util import VTKObservationMixin
 
 from SegmentStatisticsPlugins import *
 
@@ -128,6 +129,11 @@ class SegmentStatisticsWidget(ScriptedLoadableModuleWidget):
 
         outputFormLayout.addRow(_("Output table:"), self.outputTableSelector)
 
+        self.autoUpdateCheckBox = qt.QCheckBox()
+        self.autoUpdateCheckBox.setToolTip(_("Update the output table automatically when segments are modified."
+                                             " Only the modified segments are recomputed."))
+        outputFormLayout.addRow(_("Auto-update:"), self.autoUpdateCheckBox)
+
         # Parameter set
         parametersCollapsibleButton = ctk.ctkCollapsibleButton()
         parametersCollapsibleButton.text = _("Advanced")
@@ -155,6 +161,7 @@ class SegmentStatisticsWidget(ScriptedLoadableModuleWidget):
 
         # connections
         self.applyButton.connect("clicked()", self.onApply)
+        self.autoUpdateCheckBox.connect("toggled(bool)", self.onAutoUpdateToggled)
         self.scalarSelector.connect("currentNodeChanged(vtkMRMLNode*)", self.onNodeSelectionChanged)
         self.segmentationSelector.connect("currentNodeChanged(vtkMRMLNode*)", self.onNodeSelectionChanged)
         self.outputTableSelector.connect("currentNodeChanged(vtkMRMLNode*)", self.onNodeSelectionChanged)
@@ -178,6 +185,8 @@ class SegmentStatisticsWidget(ScriptedLoadableModuleWidget):
     def cleanup(self):
         if self.parameterNode and self.parameterNodeObserver:
             self.parameterNode.RemoveObserver(self.parameterNodeObserver)
+        self.logic.setAutoUpdate(False)
+        self.logic.cleanup()
 
     def onNodeSelectionChanged(self):
         self.applyButton.enabled = (self.segmentationSelector.currentNode() is not None and
@@ -185,26 +194,30 @@ class SegmentStatisticsWidget(ScriptedLoadableModuleWidget):
         if self.segmentationSelector.currentNode():
             self.outputTableSelector.baseName = self.segmentationSelector.currentNode().GetName() + " statistics"
 
+    def updateLogicInputs(self):
+        """Set input and output nodes in the parameter node (creates output table if needed)"""
+        if not self.outputTableSelector.currentNode():
+            newTable = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLTableNode")
+            self.outputTableSelector.setCurrentNode(newTable)
+        self.logic.getParameterNode().SetParameter("Segmentation", self.segmentationSelector.currentNode().GetID())
+        if self.scalarSelector.currentNode():
+            self.logic.getParameterNode().SetParameter("ScalarVolume", self.scalarSelector.currentNode().GetID())
+        else:
+            self.logic.getParameterNode().UnsetParameter("ScalarVolume")
+        self.logic.getParameterNode().SetParameter("MeasurementsTable", self.outputTableSelector.currentNode().GetID())
+
     def onApply(self):
         """Calculate the label statistics"""
 
         with slicer.util.tryWithErrorDisplay(_("Failed to compute results."), waitCursor=True):
-            if not self.outputTableSelector.currentNode():
-                newTable = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLTableNode")
-                self.outputTableSelector.setCurrentNode(newTable)
             # Lock GUI
             self.applyButton.text = _("Working...")
             self.applyButton.setEnabled(False)
             slicer.app.processEvents()
             # set up parameters for computation
-            self.logic.getParameterNode().SetParameter("Segmentation", self.segmentationSelector.currentNode().GetID())
-            if self.scalarSelector.currentNode():
-                self.logic.getParameterNode().SetParameter("ScalarVolume", self.scalarSelector.currentNode().GetID())
-            else:
-                self.logic.getParameterNode().UnsetParameter("ScalarVolume")
-            self.logic.getParameterNode().SetParameter("MeasurementsTable", self.outputTableSelector.currentNode().GetID())
-            # Compute statistics
-            self.logic.computeStatistics()
+            self.updateLogicInputs()
+            # Compute statistics (only segments that changed since the last computation are recomputed)
+            self.logic.updateStatistics()
             self.logic.exportToTable(self.outputTableSelector.currentNode())
             self.logic.showTable(self.outputTableSelector.currentNode())
 
@@ -212,6 +225,15 @@ class SegmentStatisticsWidget(ScriptedLoadableModuleWidget):
         self.applyButton.setEnabled(True)
         self.applyButton.text = _("Apply")
 
+    def onAutoUpdateToggled(self, enabled):
+        if enabled and not self.applyButton.enabled:
+            # inputs are not selected yet
+            self.autoUpdateCheckBox.checked = False
+            return
+        self.logic.setAutoUpdate(enabled)
+        if enabled:
+            self.onApply()
+
     def onEditParameters(self, pluginName=None):
         """Open dialog box to edit plugin's parameters"""
         if self.parameterNodeSelector.currentNode():
@@ -258,6 +280,11 @@ class SegmentStatisticsWidget(ScriptedLoadableModuleWidget):
     def updateGuiFromParameterNode(self, caller=None, event=None):
         if not self.parameterNode:
             return
+        autoUpdate = self.parameterNode.GetParameter("autoUpdate") == "True"
+        if self.autoUpdateCheckBox.checked != autoUpdate:
+            previousState = self.autoUpdateCheckBox.blockSignals(True)
+            self.autoUpdateCheckBox.checked = autoUpdate
+            self.autoUpdateCheckBox.blockSignals(previousState)
         for plugin in self.logic.plugins:
             pluginName = plugin.__class__.__name__
             parameter = pluginName + ".enabled"
@@ -352,11 +379,15 @@ class SegmentStatisticsParameterEditorDialog(qt.QDialog):
                 self.parametersLayout.addRow(pluginOptionsCollapsibleButton)
 
 
-class SegmentStatisticsLogic(ScriptedLoadableModuleLogic):
+class SegmentStatisticsLogic(ScriptedLoadableModuleLogic, VTKObservationMixin):
     """Implement the logic to calculate label statistics.
     Nodes are passed in as arguments.
     Results are stored as 'statistics' instance variable.
     Additional plugins for computation of other statistical measurements may be registered.
+    Results of each segment are cached: updateStatistics only recomputes segments that have been
+    modified since the last computation, and in auto-update mode this happens whenever a segment is modified.
+    updateStatistics and auto-update observe the segmentation node: call cleanup() when the logic is no longer used.
+    computeStatistics recomputes all segments and does not add observers.
     Uses ScriptedLoadableModuleLogic base class, available at:
     https://github.com/Slicer/Slicer/blob/main/Base/Python/slicer/ScriptedLoadableModule.py
     """
@@ -367,6 +398,13 @@ class SegmentStatisticsLogic(ScriptedLoadableModuleLogic):
     segmentColumnName = "Segment"
     segmentColumnTitle = _("Segment")
 
+    # Segmentation node events that mark segments as modified
+    segmentationModifiedEvents = [slicer.vtkSegmentation.SegmentModified, slicer.vtkSegmentation.RepresentationModified,
+                                  slicer.vtkSegmentation.SourceRepresentationModified, slicer.vtkSegmentation.SegmentRemoved]
+
+    # Delay of automatic update after the last segment modification, in milliseconds
+    autoUpdateDelayMsec = 500
+
     @staticmethod
     def registerPlugin(plugin):
         """Register a subclass of SegmentStatisticsPluginBase for calculation of additional measurements"""
@@ -384,6 +422,7 @@ class SegmentStatisticsLogic(ScriptedLoadableModuleLogic):
 
     def __init__(self, parent=None):
         ScriptedLoadableModuleLogic.__init__(self, parent)
+        VTKObservationMixin.__init__(self)
         self.plugins = [x() for x in SegmentStatisticsLogic.registeredPlugins]
 
         self.isSingletonParameterNode = False
@@ -391,6 +430,19 @@ class SegmentStatisticsLogic(ScriptedLoadableModuleLogic):
 
         self.keys = [SegmentStatisticsLogic.segmentColumnName]
         self.notAvailableValueString = ""
+        # Labelmap statistics shared by all plugins while computeStatistics is running
+        self.labelStatistics = None
+        # Labelmap statistics kept between updateStatisticsForSegment calls made outside computeStatistics
+        self.fallbackLabelStatistics = None
+
+        # Per-segment results of the last computation: segmentID -> {"key", "values", "measurementInfo"}
+        self.segmentStatisticsCache = {}
+        # Content fingerprint of each segment and the MTime of its labelmap when it was computed
+        self.segmentFingerprints = {}
+        # Segments reported modified by segmentation node events since the last computation
+        self.dirtySegmentIDs = set()
+        self.observedSegmentationNode = None
+        self.autoUpdateTimer = None
         self.reset()
 
     def getParameterNode(self):
@@ -414,6 +466,8 @@ class SegmentStatisticsLogic(ScriptedLoadableModuleLogic):
             plugin.setDefaultParameters(parameterNode)
         if not parameterNode.GetParameter("visibleSegmentsOnly"):
             parameterNode.SetParameter("visibleSegmentsOnly", str(True))
+        if not parameterNode.GetParameter("autoUpdate"):
+            parameterNode.SetParameter("autoUpdate", str(False))
 
     def getStatistics(self):
         """Get the calculated statistical measurements"""
@@ -432,12 +486,41 @@ class SegmentStatisticsLogic(ScriptedLoadableModuleLogic):
 
     def computeStatistics(self):
         """Compute statistical measures for all (visible) segments"""
-        self.reset()
-
+        self.segmentStatisticsCache = {}
+        self.segmentFingerprints = {}
+        self.updateStatistics(observeSegmentation=False)
+
+    def updateStatistics(self, observeSegmentation=True):
+        """Compute statistical measures for all (visible) segments, reusing the results of unchanged segments.
+        A segment is recomputed if it was reported modified since the last computation, or if its content,
+        the parameters, the scalar volume or the transforms changed.
+        :param observeSegmentation: observe the segmentation node to find modified segments (see cleanup)
+        Returns the list of recomputed segment IDs.
+        """
         segmentationNode = slicer.mrmlScene.GetNodeByID(self.getParameterNode().GetParameter("Segmentation"))
+        if observeSegmentation:
+            self.observeSegmentation(segmentationNode)
+
+        # Get segment ID list
+        visibleSegmentIds = vtk.vtkStringArray()
+        if self.getParameterNode().GetParameter("visibleSegmentsOnly") == "True":
+            segmentationNode.GetDisplayNode().GetVisibleSegmentIDs(visibleSegmentIds)
+        else:
+            segmentationNode.GetSegmentation().GetSegmentIDs(visibleSegmentIds)
+        segmentIDs = [visibleSegmentIds.GetValue(segmentIndex) for segmentIndex in range(visibleSegmentIds.GetNumberOfValues())]
+        if not segmentIDs:
+            logging.debug("computeStatistics will not return any results: there are no visible segments")
+
+        # Find segments that need to be recomputed
+        segmentKeys = self.getSegmentKeys(segmentationNode, segmentIDs)
+        modifiedSegmentIDs = [segmentID for segmentID in segmentIDs
+                              if segmentID in self.dirtySegmentIDs
+                              or self.segmentStatisticsCache.get(segmentID, {}).get("key") != segmentKeys[segmentID]]
+
+        self.reset()
         transformedSegmentationNode = None
         try:
-            if not segmentationNode.GetParentTransformNode() is None:
+            if modifiedSegmentIDs and not segmentationNode.GetParentTransformNode() is None:
                 # Create a temporary segmentation and harden the transform to ensure that the statistics are calculated
                 # in world coordinates
                 transformedSegmentationNode = slicer.vtkMRMLSegmentationNode()
@@ -447,25 +530,145 @@ class SegmentStatisticsLogic(ScriptedLoadableModuleLogic):
                 transformedSegmentationNode.HardenTransform()
                 self.getParameterNode().SetParameter("Segmentation", transformedSegmentationNode.GetID())
 
-            # Get segment ID list
-            visibleSegmentIds = vtk.vtkStringArray()
-            if self.getParameterNode().GetParameter("visibleSegmentsOnly") == "True":
-                segmentationNode.GetDisplayNode().GetVisibleSegmentIDs(visibleSegmentIds)
-            else:
-                segmentationNode.GetSegmentation().GetSegmentIDs(visibleSegmentIds)
-            if visibleSegmentIds.GetNumberOfValues() == 0:
-                logging.debug("computeStatistics will not return any results: there are no visible segments")
-
-            # update statistics for all segment IDs
-            for segmentIndex in range(visibleSegmentIds.GetNumberOfValues()):
-                segmentID = visibleSegmentIds.GetValue(segmentIndex)
-                self.updateStatisticsForSegment(segmentID)
+            # update statistics of modified segments and restore the others from the cache
+            # (labelmap statistics of all modified segments are computed in a single pass, on first request of a plugin)
+            self.labelStatistics = SegmentLabelStatistics(
+                slicer.mrmlScene.GetNodeByID(self.getParameterNode().GetParameter("Segmentation")), modifiedSegmentIDs)
+            statistics = self.getStatistics()
+            for segmentID in segmentIDs:
+                if segmentID in modifiedSegmentIDs:
+                    self.updateStatisticsForSegment(segmentID)
+                    self.segmentStatisticsCache[segmentID] = {
+                        "key": segmentKeys[segmentID],
+                        "values": {key: statistics[segmentID, key] for key in self.keys if (segmentID, key) in statistics},
+                        "measurementInfo": {key: statistics["MeasurementInfo"][key] for key in self.keys
+                                            if (segmentID, key) in statistics and key in statistics["MeasurementInfo"]}}
+                else:
+                    cachedStatistics = self.segmentStatisticsCache[segmentID]
+                    statistics["SegmentIDs"].append(segmentID)
+                    for key, value in cachedStatistics["values"].items():
+                        statistics[segmentID, key] = value
+                    statistics["MeasurementInfo"].update(cachedStatistics["measurementInfo"])
+                    # segment name is not part of the key
+                    statistics[segmentID, SegmentStatisticsLogic.segmentColumnName] = segmentationNode.GetSegmentation().GetSegment(segmentID).GetName()
         finally:
+            self.labelStatistics = None
             if transformedSegmentationNode is not None:
                 # We made a copy and hardened the segmentation transform
                 self.getParameterNode().SetParameter("Segmentation", segmentationNode.GetID())
                 slicer.mrmlScene.RemoveNode(transformedSegmentationNode)
 
+        self.dirtySegmentIDs.difference_update(modifiedSegmentIDs)
+        logging.debug(f"updateStatistics recomputed {len(modifiedSegmentIDs)} of {len(segmentIDs)} segments")
+        return modifiedSegmentIDs
+
+    def getParametersKey(self, segmentationNode):
+        """Key of everything other than segment content that the statistics of all segments depend on"""
+        parameterNode = self.getParameterNode()
+        parameters = tuple((name, parameterNode.GetParameter(name)) for name in sorted(parameterNode.GetParameterNames())
+                           if name not in ("MeasurementsTable", "autoUpdate"))
+        nodes = [segmentationNode]
+        scalarVolumeNode = slicer.mrmlScene.GetNodeByID(parameterNode.GetParameter("ScalarVolume"))
+        if scalarVolumeNode:
+            nodes.append(scalarVolumeNode)
+        nodesKey = []
+        for node in nodes:
+            if node.IsA("vtkMRMLVolumeNode"):
+                # volume geometry and voxels
+                imageData = node.GetImageData()
+                nodesKey.append((node.GetID(), node.GetMTime(), imageData.GetMTime() if imageData else 0))
+            transformNode = node.GetParentTransformNode()
+            while transformNode:
+                nodesKey.append((transformNode.GetID(), transformNode.GetMTime()))
+                transformNode = transformNode.GetParentTransformNode()
+        return (parameters, tuple(nodesKey))
+
+    def getSegmentKeys(self, segmentationNode, segmentIDs):
+        """Keys of the current content of the segments: statistics of a segment are valid while its key is unchanged.
+
+        Segments may share a labelmap, therefore a modified labelmap does not mean that all of its segments changed:
+        content of the modified segments is identified by a fingerprint of their voxels, which is only computed
+        if the labelmap MTime changed since the last computation.
+        """
+        import vtkSegmentationCorePython as vtkSegmentationCore
+
+        closedSurfaceName = vtkSegmentationCore.vtkSegmentationConverter.GetSegmentationClosedSurfaceRepresentationName()
+        parametersKey = self.getParametersKey(segmentationNode)
+        labelStatistics = SegmentLabelStatistics(segmentationNode)
+        segmentKeys = {}
+        for segmentID in segmentIDs:
+            labelmap = labelStatistics.getSegmentLabelmap(segmentID)[0]
+            labelmapMTime = labelmap.GetMTime() if labelmap else 0
+            if segmentID in self.segmentFingerprints and self.segmentFingerprints[segmentID][0] == labelmapMTime:
+                fingerprint = self.segmentFingerprints[segmentID][1]
+            else:
+                fingerprint = labelStatistics.getContentFingerprint(segmentID)
+                self.segmentFingerprints[segmentID] = (labelmapMTime, fingerprint)
+            closedSurface = segmentationNode.GetSegmentation().GetSegment(segmentID).GetRepresentation(closedSurfaceName)
+            segmentKeys[segmentID] = (parametersKey, fingerprint, closedSurface.GetMTime() if closedSurface else 0)
+        return segmentKeys
+
+    def observeSegmentation(self, segmentationNode):
+        """Observe segment modifications of the segmentation node, to find segments that need to be recomputed"""
+        if segmentationNode == self.observedSegmentationNode:
+            return
+        if self.observedSegmentationNode:
+            for event in self.segmentationModifiedEvents:
+                self.removeObserver(self.observedSegmentationNode, event, self.onSegmentModified)
+        self.observedSegmentationNode = segmentationNode
+        # cached results belong to the previous segmentation
+        self.segmentStatisticsCache = {}
+        self.segmentFingerprints = {}
+        self.dirtySegmentIDs = set()
+        self.fallbackLabelStatistics = None
+        if self.observedSegmentationNode:
+            for event in self.segmentationModifiedEvents:
+                self.addObserver(self.observedSegmentationNode, event, self.onSegmentModified)
+
+    def cleanup(self):
+        """Stop auto-update and remove the observers of the segmentation node, so that the logic can be deleted"""
+        if self.autoUpdateTimer:
+            self.autoUpdateTimer.stop()
+            self.autoUpdateTimer = None
+        self.observeSegmentation(None)
+        self.removeObservers()
+
+    @vtk.calldata_type(vtk.VTK_STRING)
+    def onSegmentModified(self, caller, event, callData):
+        if event == slicer.vtkSegmentation.RepresentationModified and callData:
+            self.dirtySegmentIDs.add(callData)
+        elif event == slicer.vtkSegmentation.SegmentRemoved and callData:
+            self.segmentStatisticsCache.pop(callData, None)
+            self.segmentFingerprints.pop(callData, None)
+            self.dirtySegmentIDs.discard(callData)
+        # Segment name/color changes (SegmentModified) and edits of shared labelmaps (SourceRepresentationModified,
+        # which does not tell which segment changed) are found by comparing segment keys.
+        if self.autoUpdateTimer and self.getParameterNode().GetParameter("autoUpdate") == "True":
+            self.autoUpdateTimer.start()
+
+    def setAutoUpdate(self, enabled):
+        """Enable/disable automatic update of the statistics (and the output table) when segments are modified"""
+        self.getParameterNode().SetParameter("autoUpdate", str(bool(enabled)))
+        if enabled and not self.autoUpdateTimer:
+            # Segment editor effects modify the segmentation many times during an interaction,
+            # update only after modifications have stopped
+            self.autoUpdateTimer = qt.QTimer()
+            self.autoUpdateTimer.setSingleShot(True)
+            self.autoUpdateTimer.setInterval(self.autoUpdateDelayMsec)
+            self.autoUpdateTimer.connect("timeout()", self.onAutoUpdate)
+        elif not enabled and self.autoUpdateTimer:
+            self.autoUpdateTimer.stop()
+
+    def onAutoUpdate(self):
+        if self.getParameterNode().GetParameter("autoUpdate") != "True":
+            return
+        if not slicer.mrmlScene.GetNodeByID(self.getParameterNode().GetParameter("Segmentation")):
+            return
+        self.updateStatistics()
+        table = slicer.mrmlScene.GetNodeByID(self.getParameterNode().GetParameter("MeasurementsTable"))
+        if table:
+            self.exportToTable(table)
+
     def updateStatisticsForSegment(self, segmentID):
         """
         Update statistical measures for specified segment.
@@ -484,11 +687,20 @@ class SegmentStatisticsLogic(ScriptedLoadableModuleLogic):
             statistics["SegmentIDs"].append(segmentID)
         statistics[segmentID, SegmentStatisticsLogic.segmentColumnName] = segment.GetName()
 
-        # apply all enabled plugins
+        # apply all enabled plugins, sharing the labelmap statistics between them
+        labelStatistics = self.labelStatistics
+        if not labelStatistics:
+            # results of the layers that were not modified since the previous call are reused
+            self.fallbackLabelStatistics = SegmentLabelStatistics.reuse(self.fallbackLabelStatistics, segmentationNode)
+            labelStatistics = self.fallbackLabelStatistics
         for plugin in self.plugins:
             pluginName = plugin.__class__.__name__
             if self.getParameterNode().GetParameter(pluginName + ".enabled") == "True":
-                stats = plugin.computeStatistics(segmentID)
+                plugin.labelStatistics = labelStatistics
+                try:
+                    stats = plugin.computeStatistics(segmentID)
+                finally:
+                    plugin.labelStatistics = None
                 for key in stats:
                     statistics[segmentID, pluginName + "." + key] = stats[key]
                     statistics["MeasurementInfo"][pluginName + "." + key] = plugin.getMeasurementInfo(key)
@@ -775,6 +987,12 @@ class SegmentStatisticsTest(ScriptedLoadableModuleTest):
         self.setUp()
         self.test_SegmentStatisticsPlugins()
 
+        self.setUp()
+        self.test_SegmentStatisticsSharedLabelmap()
+
+        self.setUp()
+        self.test_SegmentStatisticsIncremental()
+
     def test_SegmentStatisticsBasic(self):
         """This tests some aspects of the label statistics"""
 
@@ -992,6 +1210,119 @@ class SegmentStatisticsTest(ScriptedLoadableModuleTest):
 
         self.delayDisplay("test_SegmentStatisticsPlugins passed!")
 
+    def test_SegmentStatisticsSharedLabelmap(self):
+        """Test that statistics computed for all segments at once match per-segment NumPy results"""
+
+        self.delayDisplay("Starting test_SegmentStatisticsSharedLabelmap")
+
+        import numpy as np
+        import SampleData
+        from SegmentStatistics import SegmentStatisticsLogic
+
+        sourceVolumeNode = SampleData.downloadSample("MRBrainTumor1")
+
+        # Segments are created in a single shared labelmap layer (non-overlapping spheres)
+        segmentationNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLSegmentationNode")
+        segmentationNode.CreateDefaultDisplayNodes()
+        segmentationNode.SetReferenceImageGeometryParameterFromVolumeNode(sourceVolumeNode)
+        segmentGeometries = [[10, -6, 30, 28], [20, 0, 65, 32], [15, 1, -14, 30], [5, 0, 30, 64]]
+        for segmentGeometry in segmentGeometries:
+            sphereSource = vtk.vtkSphereSource()
+            sphereSource.SetRadius(segmentGeometry[0])
+            sphereSource.SetCenter(segmentGeometry[1], segmentGeometry[2], segmentGeometry[3])
+            sphereSource.Update()
+            segmentationNode.AddSegmentFromClosedSurfaceRepresentation(sphereSource.GetOutput())
+        segmentationNode.SetSourceRepresentationToBinaryLabelmap()
+
+        segStatLogic = SegmentStatisticsLogic()
+        segStatLogic.getParameterNode().SetParameter("Segmentation", segmentationNode.GetID())
+        segStatLogic.getParameterNode().SetParameter("ScalarVolume", sourceVolumeNode.GetID())
+        segStatLogic.getParameterNode().SetParameter("ScalarVolumeSegmentStatisticsPlugin.percentile_10.enabled", str(True))
+        segStatLogic.computeStatistics()
+        statistics = segStatLogic.getStatistics()
+
+        volumeArray = slicer.util.arrayFromVolume(sourceVolumeNode)
+        for segmentID in statistics["SegmentIDs"]:
+            segmentArray = slicer.util.arrayFromSegmentBinaryLabelmap(segmentationNode, segmentID, sourceVolumeNode)
+            values = np.sort(volumeArray[segmentArray > 0])
+            key = "ScalarVolumeSegmentStatisticsPlugin."
+            self.assertEqual(statistics[segmentID, key + "voxel_count"], len(values))
+            self.assertEqual(statistics[segmentID, key + "min"], values[0])
+            self.assertEqual(statistics[segmentID, key + "max"], values[-1])
+            self.assertAlmostEqual(statistics[segmentID, key + "mean"], values.mean(), places=6)
+            self.assertAlmostEqual(statistics[segmentID, key + "stdev"], values.std(ddof=1), places=6)
+            self.assertEqual(statistics[segmentID, key + "median"], np.percentile(values, 50, method="inverted_cdf"))
+            self.assertEqual(statistics[segmentID, key + "percentile_10"], np.percentile(values, 10, method="inverted_cdf"))
+            self.assertEqual(statistics[segmentID, "LabelmapSegmentStatisticsPlugin.voxel_count"],
+                             np.count_nonzero(slicer.util.arrayFromSegmentBinaryLabelmap(segmentationNode, segmentID)))
+
+        # computeStatistics does not observe the segmentation node
+        self.assertFalse(segStatLogic.hasObserver(segmentationNode, slicer.vtkSegmentation.SegmentModified, segStatLogic.onSegmentModified))
+        segStatLogic.cleanup()
+        self.delayDisplay("test_SegmentStatisticsSharedLabelmap passed!")
+
+    def test_SegmentStatisticsIncremental(self):
+        """Test that updateStatistics only recomputes modified segments"""
+
+        self.delayDisplay("Starting test_SegmentStatisticsIncremental")
+
+        import numpy as np
+        import SampleData
+        from SegmentStatistics import SegmentStatisticsLogic
+
+        sourceVolumeNode = SampleData.downloadSample("MRBrainTumor1")
+
+        segmentationNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLSegmentationNode")
+        segmentationNode.CreateDefaultDisplayNodes()
+        segmentationNode.SetReferenceImageGeometryParameterFromVolumeNode(sourceVolumeNode)
+        segmentGeometries = [[10, -6, 30, 28], [20, 0, 65, 32], [15, 1, -14, 30], [5, 0, 30, 64]]
+        for segmentGeometry in segmentGeometries:
+            sphereSource = vtk.vtkSphereSource()
+            sphereSource.SetRadius(segmentGeometry[0])
+            sphereSource.SetCenter(segmentGeometry[1], segmentGeometry[2], segmentGeometry[3])
+            sphereSource.Update()
+            segmentationNode.AddSegmentFromClosedSurfaceRepresentation(sphereSource.GetOutput())
+        segmentationNode.SetSourceRepresentationToBinaryLabelmap()
+        segmentIDs = [segmentationNode.GetSegmentation().GetNthSegmentID(i) for i in range(len(segmentGeometries))]
+
+        segStatLogic = SegmentStatisticsLogic()
+        segStatLogic.getParameterNode().SetParameter("Segmentation", segmentationNode.GetID())
+        segStatLogic.getParameterNode().SetParameter("ScalarVolume", sourceVolumeNode.GetID())
+        self.assertEqual(segStatLogic.updateStatistics(), segmentIDs)
+        voxelCounts = {segmentID: segStatLogic.getStatistics()[segmentID, "LabelmapSegmentStatisticsPlugin.voxel_count"]
+                       for segmentID in segmentIDs}
+
+        # Nothing changed
+        self.assertEqual(segStatLogic.updateStatistics(), [])
+
+        # Remove one voxel from a segment of the shared labelmap: only that segment is recomputed
+        segmentArray = slicer.util.arrayFromSegmentBinaryLabelmap(segmentationNode, segmentIDs[1], sourceVolumeNode)
+        segmentArray[tuple(np.argwhere(segmentArray)[0])] = 0
+        slicer.util.updateSegmentBinaryLabelmapFromArray(segmentArray, segmentationNode, segmentIDs[1], sourceVolumeNode)
+        self.assertEqual(segStatLogic.updateStatistics(), [segmentIDs[1]])
+        statistics = segStatLogic.getStatistics()
+        self.assertEqual(statistics["SegmentIDs"], segmentIDs)
+        for segmentID in segmentIDs:
+            expectedVoxelCount = voxelCounts[segmentID] - 1 if segmentID == segmentIDs[1] else voxelCounts[segmentID]
+            self.assertEqual(statistics[segmentID, "LabelmapSegmentStatisticsPlugin.voxel_count"], expectedVoxelCount)
+            self.assertEqual(statistics[segmentID, "ScalarVolumeSegmentStatisticsPlugin.voxel_count"], expectedVoxelCount)
+
+        # Renaming does not require recomputation
+        segmentationNode.GetSegmentation().GetSegment(segmentIDs[2]).SetName("Renamed")
+        self.assertEqual(segStatLogic.updateStatistics(), [])
+        self.assertEqual(segStatLogic.getStatistics()[segmentIDs[2], SegmentStatisticsLogic.segmentColumnName], "Renamed")
+
+        # Changed parameters invalidate all segments
+        segStatLogic.getParameterNode().SetParameter("ScalarVolumeSegmentStatisticsPlugin.percentile_10.enabled", str(True))
+        self.assertEqual(segStatLogic.updateStatistics(), segmentIDs)
+        self.assertTrue((segmentIDs[0], "ScalarVolumeSegmentStatisticsPlugin.percentile_10") in segStatLogic.getStatistics())
+
+        # Observers of the segmentation node are removed by cleanup
+        segStatLogic.cleanup()
+        self.assertFalse(segStatLogic.hasObserver(segmentationNode, slicer.vtkSegmentation.SegmentModified, segStatLogic.onSegmentModified))
+
+        self.delayDisplay("test_SegmentStatisticsIncremental passed!")
+
 
 class Slicelet:
     """A slicer slicelet is a module widget that comes up in stand alone mode
@@ -59,46 +59,24 @@ class LabelmapSegmentStatisticsPlugin(SegmentStatisticsPluginBase):
         if not containsLabelmapRepresentation:
             return {}
 
-        segmentLabelmap = slicer.vtkOrientedImageData()
-        segmentationNode.GetBinaryLabelmapRepresentation(segmentID, segmentLabelmap)
-        if (not segmentLabelmap
-            or not segmentLabelmap.GetPointData()
-                or not segmentLabelmap.GetPointData().GetScalars()):
+        # Voxel counts of all segments are computed at once from the shared labelmaps
+        labelStatistics = self.getLabelStatistics()
+        voxelCount = labelStatistics.getVoxelCount(segmentID)
+        if voxelCount is None:
             # No input label data
             return {}
-
-        # We need to know exactly the value of the segment voxels, apply threshold to make force the selected label value
-        labelValue = 1
-        backgroundValue = 0
-        thresh = vtk.vtkImageThreshold()
-        thresh.SetInputData(segmentLabelmap)
-        thresh.ThresholdByLower(0)
-        thresh.SetInValue(backgroundValue)
-        thresh.SetOutValue(labelValue)
-        thresh.SetOutputScalarType(vtk.VTK_UNSIGNED_CHAR)
-        thresh.Update()
-
-        #  Use binary labelmap as a stencil
-        stencil = vtk.vtkImageToImageStencil()
-        stencil.SetInputData(thresh.GetOutput())
-        stencil.ThresholdByUpper(labelValue)
-        stencil.Update()
-
-        stat = vtk.vtkImageAccumulate()
-        stat.SetInputData(thresh.GetOutput())
-        stat.SetStencilData(stencil.GetOutput())
-        stat.Update()
+        segmentLabelmap = labelStatistics.getSegmentLabelmap(segmentID)[0]
 
         # Add data to statistics list
         cubicMMPerVoxel = reduce(lambda x, y: x * y, segmentLabelmap.GetSpacing())
         ccPerCubicMM = 0.001
         stats = {}
         if "voxel_count" in requestedKeys:
-            stats["voxel_count"] = stat.GetVoxelCount()
+            stats["voxel_count"] = voxelCount
         if "volume_mm3" in requestedKeys:
-            stats["volume_mm3"] = stat.GetVoxelCount() * cubicMMPerVoxel
+            stats["volume_mm3"] = voxelCount * cubicMMPerVoxel
         if "volume_cm3" in requestedKeys:
-            stats["volume_cm3"] = stat.GetVoxelCount() * cubicMMPerVoxel * ccPerCubicMM
+            stats["volume_cm3"] = voxelCount * cubicMMPerVoxel * ccPerCubicMM
 
         calculateShapeStats = False
         for shapeKey in self.shapeKeys:
@@ -107,6 +85,20 @@ class LabelmapSegmentStatisticsPlugin(SegmentStatisticsPluginBase):
                 break
 
         if calculateShapeStats:
+            segmentLabelmap = slicer.vtkOrientedImageData()
+            segmentationNode.GetBinaryLabelmapRepresentation(segmentID, segmentLabelmap)
+
+            # We need to know exactly the value of the segment voxels, apply threshold to make force the selected label value
+            labelValue = 1
+            backgroundValue = 0
+            thresh = vtk.vtkImageThreshold()
+            thresh.SetInputData(segmentLabelmap)
+            thresh.ThresholdByLower(0)
+            thresh.SetInValue(backgroundValue)
+            thresh.SetOutValue(labelValue)
+            thresh.SetOutputScalarType(vtk.VTK_UNSIGNED_CHAR)
+            thresh.Update()
+
             directions = vtk.vtkMatrix4x4()
             segmentLabelmap.GetDirectionMatrix(directions)
 
@@ -31,72 +31,61 @@ class ScalarVolumeSegmentStatisticsPlugin(SegmentStatisticsPluginBase):
         if len(requestedKeys) == 0:
             return {}
 
-        stencil = self.getStencilForVolume(segmentationNode, segmentID, grayscaleNode)
-        if not stencil:
+        if not self.hasLabelmapAndScalarVolume(segmentationNode, grayscaleNode):
+            return {}
+
+        # Statistics of all segments are computed at once from the shared labelmaps
+        segmentStats = self.getLabelStatistics().getScalarVolumeStatistics(segmentID, grayscaleNode)
+        if segmentStats is None:
+            # No input label data
             return {}
 
         cubicMMPerVoxel = reduce(lambda x, y: x * y, grayscaleNode.GetSpacing())
         ccPerCubicMM = 0.001
 
-        stat = vtk.vtkImageAccumulate()
-        stat.SetInputData(grayscaleNode.GetImageData())
-        stat.SetStencilData(stencil.GetOutput())
-        stat.Update()
-
-        histogram = vtk.vtkImageHistogramStatistics()
-        histogram.SetInputData(grayscaleNode.GetImageData())
-        histogram.SetStencilData(stencil.GetOutput())
-        histogram.SetAutoRangePercentiles(5, 95)
-        histogram.SetAutoRangeExpansionFactors(0, 0)  # compute exact percentiles (do not add margin)
-        histogram.Update()
-
         # create statistics list
         stats = {}
+        voxelCount = segmentStats["voxel_count"]
         if "voxel_count" in requestedKeys:
-            stats["voxel_count"] = stat.GetVoxelCount()
+            stats["voxel_count"] = voxelCount
         if "volume_mm3" in requestedKeys:
-            stats["volume_mm3"] = stat.GetVoxelCount() * cubicMMPerVoxel
+            stats["volume_mm3"] = voxelCount * cubicMMPerVoxel
         if "volume_cm3" in requestedKeys:
-            stats["volume_cm3"] = stat.GetVoxelCount() * cubicMMPerVoxel * ccPerCubicMM
-        if stat.GetVoxelCount() > 0:
-            if "min" in requestedKeys:
-                stats["min"] = stat.GetMin()[0]
-            if "max" in requestedKeys:
-                stats["max"] = stat.GetMax()[0]
-            if "mean" in requestedKeys:
-                stats["mean"] = stat.GetMean()[0]
-            if "stdev" in requestedKeys:
-                stats["stdev"] = stat.GetStandardDeviation()[0]
-            if "median" in requestedKeys:
-                stats["median"] = histogram.GetMedian()
-            if "percentile_05" or "percentile_95" in requestedKeys:
-                # percentiles for 5 and 95 are already computed
-                if "percentile_05" in requestedKeys:
-                    stats["percentile_05"] = histogram.GetAutoRange()[0]
-                if "percentile_95" in requestedKeys:
-                    stats["percentile_95"] = histogram.GetAutoRange()[1]
-            if "percentile_10" or "percentile_90" in requestedKeys:
-                histogram.SetAutoRangePercentiles(10, 90)
-                histogram.Update()
-                if "percentile_10" in requestedKeys:
-                    stats["percentile_10"] = histogram.GetAutoRange()[0]
-                if "percentile_90" in requestedKeys:
-                    stats["percentile_90"] = histogram.GetAutoRange()[1]
+            stats["volume_cm3"] = voxelCount * cubicMMPerVoxel * ccPerCubicMM
+        if voxelCount > 0:
+            for key in ["min", "max", "mean", "stdev"]:
+                if key in requestedKeys:
+                    stats[key] = segmentStats[key]
+            percentileKeys = {"percentile_05": 5, "percentile_10": 10, "median": 50, "percentile_90": 90, "percentile_95": 95}
+            for key, percentile in percentileKeys.items():
+                if key in requestedKeys:
+                    stats[key] = segmentStats["percentiles"][percentile]
         return stats
 
-    def getStencilForVolume(self, segmentationNode, segmentID, grayscaleNode):
+    @staticmethod
+    def hasLabelmapAndScalarVolume(segmentationNode, grayscaleNode):
         import vtkSegmentationCorePython as vtkSegmentationCore
 
         containsLabelmapRepresentation = segmentationNode.GetSegmentation().ContainsRepresentation(
             vtkSegmentationCore.vtkSegmentationConverter.GetSegmentationBinaryLabelmapRepresentationName())
         if not containsLabelmapRepresentation:
-            return None
+            return False
 
         if (not grayscaleNode
             or not grayscaleNode.GetImageData()
             or not grayscaleNode.GetImageData().GetPointData()
             or not grayscaleNode.GetImageData().GetPointData().GetScalars()):
             # Input grayscale node does not contain valid image data
+            return False
+        return True
+
+    def getStencilForVolume(self, segmentationNode, segmentID, grayscaleNode):
+        """Stencil of a single segment in the geometry of the grayscale volume.
+        computeStatistics uses the shared SegmentLabelStatistics instead.
+        """
+        import vtkSegmentationCorePython as vtkSegmentationCore
+
+        if not self.hasLabelmapAndScalarVolume(segmentationNode, grayscaleNode):
             return None
 
         # Get geometry of grayscale volume node as oriented image data
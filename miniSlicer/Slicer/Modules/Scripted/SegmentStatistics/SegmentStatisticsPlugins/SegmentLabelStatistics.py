@@ -0,0 +1,259 @@
+import hashlib
+import logging
+
+import numpy as np
+import vtk
+import slicer
+from vtk.util.numpy_support import vtk_to_numpy
+
+
+class SegmentLabelStatistics:
+    """Labelmap based statistics of all segments of a segmentation, shared by the statistics plugins.
+
+    Segments that share a binary labelmap (layer) are processed together: the labelmap is resampled
+    into the reference geometry once, as a multi-label array, and voxel counts, min/max/mean/stdev
+    and exact percentiles of all of its segments are computed in one pass with NumPy.
+    Results are computed on first request and kept until the object is deleted or, for labelmaps
+    that have been modified since then, until discardModifiedLayers() is called.
+    Scalar volume statistics are recomputed when the scalar volume or the transforms change.
+    If segmentIDs is specified then scalar volume statistics are only computed for those segments.
+    """
+
+    #: percentiles computed for each segment (keys of the "percentiles" result)
+    percentiles = (5, 10, 50, 90, 95)
+
+    def __init__(self, segmentationNode, segmentIDs=None):
+        self.segmentationNode = segmentationNode
+        self.segmentIDs = set(segmentIDs) if segmentIDs is not None else None
+        self._segmentLabelmaps = None  # segmentID -> (binary labelmap, labelValue)
+        self._voxelCounts = {}  # binary labelmap -> voxel count per label value
+        self._scalarStatistics = {}  # (binary labelmap, scalar volume node ID) -> {labelValue: statistics}
+        self._contentFingerprints = {}  # binary labelmap -> {labelValue: fingerprint}
+        self._layerModifiedTimes = {}  # binary labelmap -> MTime when its results were computed
+
+    def _updateLabelmapSegments(self):
+        import vtkSegmentationCorePython as vtkSegmentationCore
+
+        self._segmentLabelmaps = {}
+        segmentation = self.segmentationNode.GetSegmentation()
+        binaryLabelmapName = vtkSegmentationCore.vtkSegmentationConverter.GetSegmentationBinaryLabelmapRepresentationName()
+        if not segmentation.ContainsRepresentation(binaryLabelmapName):
+            return
+        for segmentIndex in range(segmentation.GetNumberOfSegments()):
+            segmentID = segmentation.GetNthSegmentID(segmentIndex)
+            segment = segmentation.GetSegment(segmentID)
+            labelmap = segment.GetRepresentation(binaryLabelmapName)
+            if (not labelmap
+                or not labelmap.GetPointData()
+                    or not labelmap.GetPointData().GetScalars()):
+                continue
+            # segments in the same layer share the labelmap object
+            self._segmentLabelmaps[segmentID] = (labelmap, segment.GetLabelValue())
+
+    def getSegmentLabelmap(self, segmentID):
+        """Returns (shared binary labelmap, label value) of the segment or (None, 0) if it has no labelmap"""
+        if self._segmentLabelmaps is None:
+            self._updateLabelmapSegments()
+        labelmap, labelValue = self._segmentLabelmaps.get(segmentID, (None, 0))
+        if labelmap is not None:
+            self._layerModifiedTimes.setdefault(labelmap, labelmap.GetMTime())
+        return labelmap, labelValue
+
+    @classmethod
+    def reuse(cls, labelStatistics, segmentationNode):
+        """Returns labelStatistics, without the results of modified layers, if it belongs to segmentationNode,
+        otherwise a new object for segmentationNode
+        """
+        if labelStatistics is None or labelStatistics.segmentationNode != segmentationNode:
+            return cls(segmentationNode)
+        labelStatistics.discardModifiedLayers()
+        return labelStatistics
+
+    def discardModifiedLayers(self):
+        """Forget the results of binary labelmaps (layers) that were modified or removed since they were computed.
+        Results of the other layers are kept, so that the object can be reused while the segmentation is edited.
+        """
+        self._updateLabelmapSegments()
+        currentLabelmaps = {labelmap for labelmap, _labelValue in self._segmentLabelmaps.values()}
+        for labelmap, modifiedTime in list(self._layerModifiedTimes.items()):
+            if labelmap in currentLabelmaps and labelmap.GetMTime() == modifiedTime:
+                continue
+            del self._layerModifiedTimes[labelmap]
+            self._voxelCounts.pop(labelmap, None)
+            self._contentFingerprints.pop(labelmap, None)
+            for cacheKey in [cacheKey for cacheKey in self._scalarStatistics if cacheKey[0] == labelmap]:
+                del self._scalarStatistics[cacheKey]
+
+    @staticmethod
+    def _imageArray(imageData):
+        """Scalars (first component) of the image as a (k, j, i) array; no copy is made"""
+        extent = imageData.GetExtent()
+        shape = (extent[5] - extent[4] + 1, extent[3] - extent[2] + 1, extent[1] - extent[0] + 1)
+        scalars = vtk_to_numpy(imageData.GetPointData().GetScalars())
+        if scalars.ndim > 1:
+            scalars = scalars[:, 0]
+        return scalars.reshape(shape)
+
+    @staticmethod
+    def _overlap(imageData, extent):
+        """Slices of the image array that fall into the extent, or None if they don't overlap"""
+        imageExtent = imageData.GetExtent()
+        slices = []
+        for axis in (2, 1, 0):
+            first = max(imageExtent[2 * axis], extent[2 * axis])
+            last = min(imageExtent[2 * axis + 1], extent[2 * axis + 1])
+            if first > last:
+                return None
+            slices.append(slice(first - imageExtent[2 * axis], last - imageExtent[2 * axis] + 1))
+        return tuple(slices)
+
+    def getVoxelCount(self, segmentID):
+        """Number of voxels of the segment in its binary labelmap or None if it has no labelmap"""
+        labelmap, labelValue = self.getSegmentLabelmap(segmentID)
+        if labelmap is None:
+            return None
+        if labelmap not in self._voxelCounts:
+            labels = self._imageArray(labelmap)
+            self._voxelCounts[labelmap] = np.bincount(labels.ravel()) if labels.size else np.zeros(0, dtype=int)
+        voxelCounts = self._voxelCounts[labelmap]
+        return int(voxelCounts[labelValue]) if labelValue < len(voxelCounts) else 0
+
+    def getContentFingerprint(self, segmentID):
+        """Digest of the voxels of the segment in its binary labelmap or None if it has no labelmap.
+
+        The digest only changes when voxels of this segment change, even if the labelmap is shared
+        with other segments or its extent changes. It is computed for all segments of the labelmap
+        at once, from the absolute (i, j, k) indices of all voxels of each segment.
+        """
+        labelmap, labelValue = self.getSegmentLabelmap(segmentID)
+        if labelmap is None:
+            return None
+        if labelmap not in self._contentFingerprints:
+            self._contentFingerprints[labelmap] = self._computeContentFingerprints(labelmap)
+        return self._contentFingerprints[labelmap].get(labelValue, "")
+
+    def _computeContentFingerprints(self, labelmap):
+        labels = self._imageArray(labelmap).ravel()
+        flatIndices = np.flatnonzero(labels)
+        if not flatIndices.size:
+            return {}
+        extent = labelmap.GetExtent()
+        # Group voxels by label value; the stable sort keeps the voxels of each label in (k, j, i) order
+        voxelLabels = labels[flatIndices]
+        order = np.argsort(voxelLabels, kind="stable")
+        voxelLabels = voxelLabels[order]
+        # Absolute voxel indices, so that the fingerprint does not depend on the labelmap extent
+        shape = (extent[5] - extent[4] + 1, extent[3] - extent[2] + 1, extent[1] - extent[0] + 1)
+        k, j, i = np.unravel_index(flatIndices[order], shape)
+        ijk = np.column_stack((i + extent[0], j + extent[2], k + extent[4])).astype(np.int64)
+        labelValues, firstVoxels = np.unique(voxelLabels, return_index=True)
+        lastVoxels = np.append(firstVoxels[1:], len(voxelLabels))
+        fingerprints = {}
+        for labelValue, first, last in zip(labelValues, firstVoxels, lastVoxels):
+            fingerprints[int(labelValue)] = hashlib.sha1(ijk[first:last].tobytes(), usedforsecurity=False).hexdigest()
+        return fingerprints
+
+    def getScalarVolumeStatistics(self, segmentID, scalarVolumeNode):
+        """Statistics of the scalar volume voxels within the segment.
+
+        Returns dictionary with voxel_count, min, max, mean, stdev and percentiles (percentile -> value)
+        or None if the segment has no binary labelmap. Only voxel_count is set for empty segments.
+        Percentiles are exact: the smallest voxel value that is greater or equal to the given
+        percentage of voxel values within the segment.
+        """
+        labelmap, labelValue = self.getSegmentLabelmap(segmentID)
+        if labelmap is None:
+            return None
+        cacheKey = (labelmap, scalarVolumeNode.GetID())
+        volumeKey = self._scalarVolumeKey(scalarVolumeNode)
+        if self._scalarStatistics.get(cacheKey, (None, None))[0] != volumeKey:
+            self._scalarStatistics[cacheKey] = (volumeKey, self._computeScalarVolumeStatistics(labelmap, scalarVolumeNode))
+        return self._scalarStatistics[cacheKey][1].get(labelValue, {"voxel_count": 0})
+
+    def _scalarVolumeKey(self, scalarVolumeNode):
+        """Modification times of the scalar volume (geometry and voxels) and of the transforms of the volume and the segmentation"""
+        imageData = scalarVolumeNode.GetImageData()
+        key = [scalarVolumeNode.GetMTime(), imageData.GetMTime() if imageData else 0]
+        for node in (scalarVolumeNode, self.segmentationNode):
+            transformNode = node.GetParentTransformNode()
+            while transformNode:
+                key.append((transformNode.GetID(), transformNode.GetMTime()))
+                transformNode = transformNode.GetParentTransformNode()
+        return tuple(key)
+
+    def _computeScalarVolumeStatistics(self, labelmap, scalarVolumeNode):
+        import vtkSegmentationCorePython as vtkSegmentationCore
+
+        # Get geometry of scalar volume node as oriented image data
+        # reference geometry in reference node coordinate system
+        scalarImageData = scalarVolumeNode.GetImageData()
+        referenceGeometry_Reference = vtkSegmentationCore.vtkOrientedImageData()
+        referenceGeometry_Reference.SetExtent(scalarImageData.GetExtent())
+        ijkToRasMatrix = vtk.vtkMatrix4x4()
+        scalarVolumeNode.GetIJKToRASMatrix(ijkToRasMatrix)
+        referenceGeometry_Reference.SetGeometryFromImageToWorldMatrix(ijkToRasMatrix)
+
+        # Get transform between scalar volume and segmentation
+        segmentationToReferenceGeometryTransform = vtk.vtkGeneralTransform()
+        slicer.vtkMRMLTransformNode.GetTransformBetweenNodes(self.segmentationNode.GetParentTransformNode(),
+                                                             scalarVolumeNode.GetParentTransformNode(), segmentationToReferenceGeometryTransform)
+
+        # Resample all labels at once (nearest neighbor interpolation keeps the label values)
+        labelmap_Reference = vtkSegmentationCore.vtkOrientedImageData()
+        vtkSegmentationCore.vtkOrientedImageDataResample.ResampleOrientedImageToReferenceOrientedImage(
+            labelmap, referenceGeometry_Reference, labelmap_Reference,
+            False,  # nearest neighbor interpolation
+            False,  # no padding
+            segmentationToReferenceGeometryTransform)
+        if not labelmap_Reference.GetPointData() or not labelmap_Reference.GetPointData().GetScalars():
+            return {}
+
+        # Only voxels where the labelmap and the scalar volume overlap are taken into account
+        labelSlices = self._overlap(labelmap_Reference, scalarImageData.GetExtent())
+        scalarSlices = self._overlap(scalarImageData, labelmap_Reference.GetExtent())
+        if labelSlices is None or scalarSlices is None:
+            return {}
+        labelValues = None
+        if self.segmentIDs is not None:
+            labelValues = [labelValue for segmentID, (segmentLabelmap, labelValue) in self._segmentLabelmaps.items()
+                           if segmentID in self.segmentIDs and segmentLabelmap == labelmap]
+        statistics = self.labelValueStatistics(self._imageArray(labelmap_Reference)[labelSlices].ravel(),
+                                               self._imageArray(scalarImageData)[scalarSlices].ravel(), labelValues)
+        logging.debug(f"SegmentLabelStatistics: computed scalar statistics of {len(statistics)} labels")
+        return statistics
+
+    @classmethod
+    def labelValueStatistics(cls, labels, values, labelValues=None):
+        """Statistics of values for each non-zero label value of the labels array (same shape as values).
+        If labelValues is specified then only those labels are processed.
+        """
+        inside = np.flatnonzero(labels if labelValues is None else np.isin(labels, labelValues))
+        labels = labels[inside]
+        values = values[inside]
+        del inside
+
+        # Group voxel values by label: stable sort of the (small integer) labels, then sort each group
+        order = np.argsort(labels, kind="stable")
+        labels = labels[order]
+        values = values[order]
+        del order
+
+        statistics = {}
+        labelValues = np.unique(labels)
+        starts = np.searchsorted(labels, labelValues, side="left")
+        ends = np.searchsorted(labels, labelValues, side="right")
+        for labelValue, start, end in zip(labelValues.tolist(), starts.tolist(), ends.tolist()):
+            segmentValues = np.sort(values[start:end])
+            voxelCount = end - start
+            segmentValuesDouble = segmentValues.astype(np.float64)
+            ranks = np.clip(np.ceil(np.array(cls.percentiles) / 100.0 * voxelCount).astype(int) - 1, 0, voxelCount - 1)
+            statistics[labelValue] = {
+                "voxel_count": voxelCount,
+                "min": segmentValues[0].item(),
+                "max": segmentValues[-1].item(),
+                "mean": float(segmentValuesDouble.mean()),
+                # sample standard deviation, same as vtkImageAccumulate
+                "stdev": float(segmentValuesDouble.std(ddof=1)) if voxelCount > 1 else 0.0,
+                "percentiles": {percentile: segmentValues[rank].item() for percentile, rank in zip(cls.percentiles, ranks.tolist())},
+            }
+        return statistics
@@ -2,6 +2,7 @@ import vtk
 import qt
 import slicer
 from slicer.i18n import tr as _
+from SegmentStatisticsPlugins.SegmentLabelStatistics import SegmentLabelStatistics
 
 
 class SegmentStatisticsPluginBase:
@@ -62,6 +63,10 @@ class SegmentStatisticsPluginBase:
         self.requestedKeysCheckboxes = {}
         self.parameterNode = None
         self.parameterNodeObserver = None
+        #: labelmap statistics shared by all plugins, set by SegmentStatisticsLogic during computation
+        self.labelStatistics = None
+        #: labelmap statistics kept between computeStatistics calls when labelStatistics is not set
+        self.fallbackLabelStatistics = None
 
     def __del__(self):
         if self.parameterNode and self.parameterNodeObserver:
@@ -73,6 +78,18 @@ class SegmentStatisticsPluginBase:
         """
         pass
 
+    def getLabelStatistics(self):
+        """Get the labelmap statistics shared between plugins (computed once for all segments).
+        If the logic did not provide one then the plugin keeps its own object for the current segmentation,
+        so that computeStatistics calls for each segment still process each layer only once:
+        results of layers that have been modified since the previous call are recomputed.
+        """
+        segmentationNode = slicer.mrmlScene.GetNodeByID(self.getParameterNode().GetParameter("Segmentation"))
+        if self.labelStatistics is not None and self.labelStatistics.segmentationNode == segmentationNode:
+            return self.labelStatistics
+        self.fallbackLabelStatistics = SegmentLabelStatistics.reuse(self.fallbackLabelStatistics, segmentationNode)
+        return self.fallbackLabelStatistics
+
     def getMeasurementInfo(self, key):
         """Get information (name, description, units, ...) about the measurement for the given key.
         Utilize createMeasurementInfo() to create the dictionary containing the measurement information.
@@ -1,3 +1,4 @@
+from .SegmentLabelStatistics import *
 from .SegmentStatisticsPluginBase import *
 
 from .ClosedSurfaceSegmentStatisticsPlugin import *
@@ -0,0 +1,177 @@
+"""
+Load test of the Slicer web server: many concurrent clients requesting slices and volumes.
+
+Each client thread sends --requests requests on its own connection (reconnecting for each request with
+--no-keep-alive), cycling through the requested paths. With --pipeline N, a client sends N requests
+before reading the responses. Throughput and latency percentiles are reported for each path.
+
+Start the web server in Slicer (Web Server module, or `WebServerLogic().start()` in the Python console)
+and load a volume (e.g. MRHead sample data), then run with any Python 3:
+    python WebServerLoadTest.py --url http://localhost:2016 [--clients 16] [--requests 50] [--pipeline 4]
+"""
+
+import argparse
+import socket
+import sys
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+DEFAULT_PATHS = [
+    "/slicer/slice?view=red&orientation=axial&scrollTo=0.5&size=512",
+    "/slicer/slice?view=yellow&orientation=sagittal&scrollTo=0.5&size=512",
+    "/slicer/volume?id=vtkMRMLScalarVolumeNode1",
+]
+
+
+class Connection:
+    """Minimal HTTP/1.1 client connection that can pipeline requests"""
+
+    def __init__(self, host, port, keepAlive=True):
+        self.address = (host, port)
+        self.keepAlive = keepAlive
+        self.socket = None
+        self.buffer = bytearray()
+
+    def connect(self):
+        self.socket = socket.create_connection(self.address)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.buffer = bytearray()
+
+    def close(self):
+        if self.socket:
+            self.socket.close()
+        self.socket = None
+
+    def sendRequests(self, paths):
+        if self.socket is None:
+            self.connect()
+        connection = b"keep-alive" if self.keepAlive else b"close"
+        self.socket.sendall(b"".join(
+            b"GET %s HTTP/1.1\r\nHost: %s\r\nConnection: %s\r\n\r\n" % (path.encode(), self.address[0].encode(), connection)
+            for path in paths))
+
+    def _fill(self):
+        data = self.socket.recv(1024 * 1024)
+        if not data:
+            raise ConnectionError("connection closed by server")
+        self.buffer += data
+
+    def _take(self, size):
+        while len(self.buffer) < size:
+            self._fill()
+        data = self.buffer[:size]
+        del self.buffer[:size]
+        return data
+
+    def _takeLine(self):
+        while True:
+            endOfLine = self.buffer.find(b"\r\n")
+            if endOfLine != -1:
+                return bytes(self._take(endOfLine + 2)[:-2])
+            self._fill()
+
+    def readResponse(self):
+        """Returns (status code, body size); the body is discarded"""
+        status = int(self._takeLine().split(b" ")[1])
+        headers = {}
+        while True:
+            line = self._takeLine()
+            if not line:
+                break
+            name, _separator, value = line.partition(b":")
+            headers[name.strip().lower()] = value.strip().lower()
+        if b"content-length" in headers:
+            bodySize = len(self._take(int(headers[b"content-length"])))
+        elif headers.get(b"transfer-encoding") == b"chunked":
+            bodySize = 0
+            while True:
+                chunkSize = int(self._takeLine().split(b";")[0], 16)
+                if chunkSize == 0:
+                    while self._takeLine():
+                        pass
+                    break
+                bodySize += len(self._take(chunkSize))
+                self._takeLine()
+        else:
+            # body ends when the connection is closed
+            bodySize = len(self.buffer)
+            try:
+                while True:
+                    self._fill()
+            except ConnectionError:
+                bodySize = len(self.buffer)
+            self.buffer = bytearray()
+        if headers.get(b"connection") == b"close":
+            self.close()
+        return status, bodySize
+
+
+def runClient(host, port, paths, numberOfRequests, keepAlive, pipeline, results, clientIndex):
+    """Send requests and append (path, status, body size, latency) to results"""
+    connection = Connection(host, port, keepAlive)
+    requestIndex = 0
+    try:
+        while requestIndex < numberOfRequests:
+            batch = [paths[(clientIndex + requestIndex + i) % len(paths)]
+                     for i in range(min(pipeline if keepAlive else 1, numberOfRequests - requestIndex))]
+            startTime = time.perf_counter()
+            connection.sendRequests(batch)
+            for path in batch:
+                status, bodySize = connection.readResponse()
+                # latency of a pipelined request includes waiting for the responses before it
+                results.append((path, status, bodySize, time.perf_counter() - startTime))
+            requestIndex += len(batch)
+            if not keepAlive:
+                connection.close()
+    except OSError as e:
+        results.append((None, 0, 0, 0.0))
+        print(f"Client {clientIndex}: {e}", file=sys.stderr)
+    finally:
+        connection.close()
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Load test of the Slicer web server")
+    parser.add_argument("--url", default="http://localhost:2016", help="Web server URL")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS, help="Requested paths (used in turn)")
+    parser.add_argument("--clients", type=int, default=16, help="Number of concurrent clients")
+    parser.add_argument("--requests", type=int, default=50, help="Number of requests per client")
+    parser.add_argument("--pipeline", type=int, default=1, help="Requests sent at once on a connection")
+    parser.add_argument("--no-keep-alive", dest="keepAlive", action="store_false", help="New connection for each request")
+    args = parser.parse_args(argv)
+
+    parsedURL = urllib.parse.urlparse(args.url)
+    host, port = parsedURL.hostname, parsedURL.port or 80
+
+    results = []
+    threads = [threading.Thread(target=runClient,
+                                args=(host, port, args.paths, args.requests, args.keepAlive, args.pipeline, results, clientIndex))
+               for clientIndex in range(args.clients)]
+    startTime = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsedTime = time.perf_counter() - startTime
+
+    failedClients = sum(1 for path, _status, _bodySize, _latency in results if path is None)
+    print(f"{args.clients} clients x {args.requests} requests, keep-alive: {args.keepAlive}, pipeline: {args.pipeline}, "
+          f"{elapsedTime:.2f} s, failed clients: {failedClients}")
+    print(f"{'path':<70} {'requests':>8} {'errors':>6} {'req/s':>8} {'MB/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    for path in [*args.paths, "all"]:
+        pathResults = [result for result in results if result[0] is not None and path in (result[0], "all")]
+        if not pathResults:
+            continue
+        latencies = np.array([latency for _path, _status, _bodySize, latency in pathResults]) * 1000.0
+        errors = sum(1 for _path, status, _bodySize, _latency in pathResults if status >= 400)
+        megabytes = sum(bodySize for _path, _status, bodySize, _latency in pathResults) / 1e6
+        print(f"{path[-70:]:<70} {len(pathResults):>8} {errors:>6} {len(pathResults) / elapsedTime:>8.1f} "
+              f"{megabytes / elapsedTime:>8.1f} {np.percentile(latencies, 50):>9.1f} {np.percentile(latencies, 99):>9.1f}")
+    return 1 if failedClients else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,7 +1,12 @@
+import collections
+import email.utils
+import inspect
 import logging
 import os
 import sys
 import socket
+import ssl
+import struct
 import urllib
 from http.server import HTTPServer
 from typing import Callable, Optional
@@ -15,7 +20,8 @@ from slicer.i18n import translate
 from slicer.ScriptedLoadableModule import *
 from slicer.util import settingsValue, toBool
 
-from WebServerLib.BaseRequestHandler import BaseRequestHandler, BaseRequestLoggingFunction
+from WebServerLib import WebSocket
+from WebServerLib.BaseRequestHandler import BaseRequestHandler, BaseRequestLoggingFunction, FileResponseBody
 
 logger = logging.getLogger(__name__)
 
@@ -301,7 +307,6 @@ class SlicerHTTPServer(HTTPServer):
         self.timeout = 1.0
         if certfile and keyfile:
             # https://docs.python.org/3/library/ssl.html#ssl.SSLContext.wrap_socket
-            import ssl
             context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
             context.load_cert_chain(certfile, keyfile)
             self.socket = context.wrap_socket(self.socket, server_side=True)
@@ -314,207 +319,700 @@ class SlicerHTTPServer(HTTPServer):
     class DummyRequestHandler:
         pass
 
+    class FileSender:
+        """
+        File-backed part of a response in the send queue of a connection.
+        It is sent with os.sendfile (kernel copies the file to the socket), or is iterated to read it in chunks.
+        .. note:: this is an internal class of the web server
+        """
+
+        chunkSize = 1024 * 1024
+
+        def __init__(self, file, offset, length):
+            self.file = file
+            self.offset = offset
+            self.remaining = length
+
+        def sendfile(self, connectionSocket, maxSize):
+            """Send the next part of the file on the (non-blocking) socket, return the number of bytes sent"""
+            sent = os.sendfile(connectionSocket.fileno(), self.file.fileno(), self.offset, min(self.remaining, maxSize))
+            if sent == 0:
+                raise OSError("file %s is shorter than expected" % self.file.name)
+            self.offset += sent
+            self.remaining -= sent
+            return sent
+
+        def __iter__(self):
+            return self
+
+        def __next__(self):
+            if self.remaining <= 0:
+                self.close()
+                raise StopIteration
+            self.file.seek(self.offset)
+            chunk = self.file.read(min(self.remaining, self.chunkSize))
+            if not chunk:
+                raise OSError("file %s is shorter than expected" % self.file.name)
+            self.offset += len(chunk)
+            self.remaining -= len(chunk)
+            return chunk
+
+        def close(self):
+            self.file.close()
+
     class SlicerRequestCommunicator:
         """
-        Encapsulate elements for handling event driven read of request.
+        Encapsulate elements for handling event driven read of requests and write of responses.
         An instance is created for each client connection to our web server.
-        This class handles event driven chunking of the communication.
+        The connection is kept open between requests (HTTP/1.1 keep-alive) and requests that the client
+        sends without waiting for the previous response (pipelining) are answered in order.
+        Response bodies are sent from memoryviews, without copying. A response body may also be an iterable
+        of bytes-like chunks, which is sent with chunked transfer encoding as the socket becomes writable,
+        so that large responses do not have to be held in memory at once.
+        If a request handler returns a WebSocketSession as response body of a WebSocket upgrade request
+        then the connection is switched to the WebSocket protocol and the session is used for all further messages.
         .. note:: this is an internal class of the web server
         """
 
+        # Idle time (in seconds) after which a keep-alive connection is closed
+        keepAliveTimeout = 15
+        # Maximum number of requests served on one connection
+        maxKeepAliveRequests = 1000
+        # Reading of further (pipelined) requests is paused while this many response bytes are waiting to be sent
+        maxPendingResponseSize = 64 * 1024 * 1024
+        # Response bodies up to this size are sent in the same packet as the header
+        maxCoalescedBodySize = 64 * 1024
+        # Maximum size of a request header
+        maxRequestHeaderSize = 64 * 1024
+        # Maximum size of a message received on a WebSocket connection
+        maxWebSocketMessageSize = 1024 * 1024
+
+        # Exceptions of non-blocking socket operations that mean: try again when the socket is ready
+        wouldBlockErrors = (BlockingIOError, InterruptedError, ssl.SSLWantReadError, ssl.SSLWantWriteError)
+
         def __init__(self,
                      connectionSocket:socket.socket,
                      requestHandlers:list[BaseRequestHandler],
                      docroot:str,
                      logMessage:BaseRequestLoggingFunction,
-                     enableCORS:bool):
+                     enableCORS:bool,
+                     onClosed:Optional[Callable]=None):
             """
             :param connectionSocket: socket for this request
             :param docroot: for handling static pages content
             :param logMessage: callable
+            :param onClosed: called with this communicator when the connection is closed
             """
             self.connectionSocket = connectionSocket
             self.docroot = docroot
             self.logMessage = logMessage
             self.enableCORS = enableCORS
+            self.onClosed = onClosed
             self.bufferSize = 1024 * 1024
+            self.maxSendSize = 64 * self.bufferSize
             self.requestHandlers = []
+            self.requestHeadersHandlers = set()
             for requestHandler in requestHandlers:
                 self.registerRequestHandler(requestHandler)
+
+            # Receive state: bytes received so far and the parsed header of the request being received
+            self.receiveBuffer = bytearray()
+            self.headerSearchStart = 0
+            self.requestHeader = None
             self.expectedRequestSize = -1
-            self.requestSoFar = b""
-            fileno = self.connectionSocket.fileno()
-            self.readNotifier = qt.QSocketNotifier(fileno, qt.QSocketNotifier.Read)
+            # decoded chunks of a chunked request body (complete chunks are removed from the receive buffer)
+            self.requestBodyChunks = []
+            self.numberOfRequests = 0
+            self.clientClosed = False
+
+            # Send state: memoryviews and streamed bodies (iterators) of the queued responses, in order
+            self.sendQueue = collections.deque()
+            self.sendOffset = 0
+            self.pendingResponseSize = 0
+            self.closeWhenSent = False
+            # file-backed bodies are copied to the socket by the kernel (not possible on encrypted connections)
+            self.useSendfile = hasattr(os, "sendfile") and not isinstance(connectionSocket, ssl.SSLSocket)
+
+            # WebSocket state: session (after a successful upgrade) and fragments of the message being received
+            self.webSocketSession = None
+            self.webSocketMessageOpcode = None
+            self.webSocketMessageParts = []
+
+            self.connectionSocket.setblocking(False)
+            try:
+                # headers and bodies of small responses are sent as soon as they are ready
+                self.connectionSocket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            except OSError:
+                pass
+            self.fileno = self.connectionSocket.fileno()
+            self.readNotifier = qt.QSocketNotifier(self.fileno, qt.QSocketNotifier.Read)
             self.readNotifier.connect("activated(int)", self.onReadable)
-            self.logMessage("Waiting on %d..." % fileno)
+            self.writeNotifier = qt.QSocketNotifier(self.fileno, qt.QSocketNotifier.Write)
+            self.writeNotifier.setEnabled(False)
+            self.writeNotifier.connect("activated(int)", self.onWritable)
+            self.idleTimer = qt.QTimer()
+            self.idleTimer.setSingleShot(True)
+            self.idleTimer.setInterval(int(self.keepAliveTimeout * 1000))
+            self.idleTimer.connect("timeout()", self.onIdleTimeout)
+            self.idleTimer.start()
+            self.logMessage("Waiting on %d..." % self.fileno)
 
         def registerRequestHandler(self, handler: BaseRequestHandler):
             self.requestHandlers.append(handler)
             handler.logMessage = self.logMessage
+            # request header fields are only passed to handlers that accept them
+            parameters = inspect.signature(handler.handleRequest).parameters.values()
+            if any(parameter.name == "requestHeaders" or parameter.kind == parameter.VAR_KEYWORD for parameter in parameters):
+                self.requestHeadersHandlers.add(handler)
 
         def onReadable(self, fileno):
-            self.logMessage("Reading...")
-            requestHeader = b""
-            requestBody = b""
-            requestComplete = False
-            requestPart = ""
+            if self.connectionSocket is None:
+                return
+            receivedSize = 0
             try:
-                requestPart = self.connectionSocket.recv(self.bufferSize)
-                self.logMessage("Just received... %d bytes in this part" % len(requestPart))
-                self.requestSoFar += requestPart
-                endOfHeader = self.requestSoFar.find(b"\r\n\r\n")
-                if self.expectedRequestSize > 0:
-                    self.logMessage("received... %d of %d expected" % (len(self.requestSoFar), self.expectedRequestSize))
-                    if len(self.requestSoFar) >= self.expectedRequestSize:
-                        requestHeader = self.requestSoFar[: endOfHeader + 2]
-                        requestBody = self.requestSoFar[4 + endOfHeader :]
-                        requestComplete = True
-                else:
-                    if endOfHeader != -1:
-                        self.logMessage("Looking for content in header...")
-                        contentLengthTag = self.requestSoFar.find(b"Content-Length:")
-                        if contentLengthTag != -1:
-                            tag = self.requestSoFar[contentLengthTag:]
-                            numberStartIndex = tag.find(b" ")
-                            numberEndIndex = tag.find(b"\r\n")
-                            contentLength = int(tag[numberStartIndex:numberEndIndex])
-                            self.expectedRequestSize = 4 + endOfHeader + contentLength
-                            self.logMessage("Expecting a body of %d, total size %d" % (contentLength, self.expectedRequestSize))
-                            if len(requestPart) == self.expectedRequestSize:
-                                requestHeader = requestPart[: endOfHeader + 2]
-                                requestBody = requestPart[4 + endOfHeader :]
-                                requestComplete = True
-                        else:
-                            self.logMessage("Found end of header with no content, so body is empty")
-                            requestHeader = self.requestSoFar[:-2]
-                            requestComplete = True
+                # read everything that is available (SSL sockets may have buffered more than the notification indicated)
+                while receivedSize < 16 * self.bufferSize:
+                    requestPart = self.connectionSocket.recv(self.bufferSize)
+                    if not requestPart:
+                        self.logMessage("Connection closed by client on %d" % fileno)
+                        self.clientClosed = True
+                        break
+                    self.receiveBuffer += requestPart
+                    receivedSize += len(requestPart)
+            except self.wouldBlockErrors:
+                pass
             except OSError as e:
-                print("Socket error: ", e)
-                print("So far:\n", self.requestSoFar)
-                requestComplete = True
-
-            if len(requestPart) == 0 or requestComplete:
-                self.logMessage("Got complete message of header size %d, body size %d" % (len(requestHeader), len(requestBody)))
-                self.readNotifier.disconnect("activated(int)", self.onReadable)
-                self.readNotifier.setEnabled(False)
-
-                if len(self.requestSoFar) == 0:
-                    self.logMessage("Ignoring empty request")
-                    return
-
-                method, uri, version = [b"GET", b"/", b"HTTP/1.1"]  # defaults
-                requestLines = requestHeader.split(b"\r\n")
+                self.logMessage("Socket error while receiving: %s" % e)
+                self.close()
+                return
+            self.logMessage("Just received... %d bytes" % receivedSize)
+            self.idleTimer.start()
+            self.processRequests()
+
+        def processRequests(self):
+            """Handle the complete requests of the receive buffer, in order"""
+            while (self.webSocketSession is None and not self.closeWhenSent
+                   and self.pendingResponseSize < self.maxPendingResponseSize):
+                request = self.nextRequest()
+                if request is None:
+                    break
+                self.handleRequest(*request)
+            if self.webSocketSession is not None:
+                self.processWebSocketFrames()
+            if self.clientClosed:
+                # no more requests will arrive, but the client may still be reading the responses
+                self.closeWhenSent = True
+            # reading is paused while responses of pipelined requests are waiting to be sent
+            self.readNotifier.setEnabled(not self.closeWhenSent and self.pendingResponseSize < self.maxPendingResponseSize)
+            if self.sendQueue:
+                self.writeNotifier.setEnabled(True)
+            elif self.closeWhenSent:
+                self.close()
+
+        def nextRequest(self):
+            """Remove the next complete request from the receive buffer.
+            :return: tuple of (method, uri, version, headers, body) or None if no complete request has been received yet.
+                Header names are lowercase.
+            """
+            if self.requestHeader is None:
+                # blank lines are allowed before a request
+                while self.receiveBuffer[:2] == b"\r\n":
+                    del self.receiveBuffer[:2]
+                endOfHeader = self.receiveBuffer.find(b"\r\n\r\n", self.headerSearchStart)
+                if endOfHeader == -1:
+                    self.headerSearchStart = max(0, len(self.receiveBuffer) - 3)
+                    if len(self.receiveBuffer) > self.maxRequestHeaderSize:
+                        self.queueErrorResponse("431 Request Header Fields Too Large")
+                    return None
+                self.headerSearchStart = 0
+                requestLines = bytes(self.receiveBuffer[:endOfHeader]).split(b"\r\n")
                 self.logMessage(requestLines[0])
-                try:
-                    method, uri, version = requestLines[0].split(b" ")
-                    method = method.decode()
-                except ValueError as e:
-                    self.logMessage("Could not interpret first request lines: ", requestLines)
-
-                if requestLines == "":
-                    self.logMessage("Assuming empty string is HTTP/1.1 GET of /.")
-
-                if version != b"HTTP/1.1":
-                    self.logMessage("Warning, we don't speak %s", version)
-                    return
-
-                methods = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-                if method not in methods:
-                    self.logMessage("Warning, we only handle %s" % methods)
-                    return
-
-                parsedURL = urllib.parse.urlparse(uri)
-                request = parsedURL.path
-                if parsedURL.query != b"":
-                    request += b"?" + parsedURL.query
-                self.logMessage("Parsing url request: ", parsedURL)
-                self.logMessage(" request is: %s" % request)
-
-                highestConfidenceHandler = None
-                highestConfidence = 0.0
-                for handler in self.requestHandlers:
-                    confidence = handler.canHandleRequest(method=method, uri=uri, requestBody=requestBody)
-                    if confidence > highestConfidence:
-                        highestConfidenceHandler = handler
-                        highestConfidence = confidence
-
-                httpStatus = "200 OK"
-                if highestConfidenceHandler is not None and highestConfidence > 0.0 and method != "OPTIONS":
+                headers = {}
+                for line in requestLines[1:]:
+                    name, _separator, value = line.partition(b":")
+                    headers[name.strip().lower()] = value.strip()
+                self.requestHeader = (requestLines[0], headers)
+                del self.receiveBuffer[:endOfHeader + 4]
+                if b"chunked" in headers.get(b"transfer-encoding", b"").lower():
+                    self.expectedRequestSize = -1
+                else:
                     try:
-                        contentType, responseBody = highestConfidenceHandler.handleRequest(method=method, uri=uri, requestBody=requestBody)
-                    except Exception as e:
-                        etype, value, tb = sys.exc_info()
-
-                        import traceback
-
-                        for frame in traceback.format_tb(tb):
-                            self.logMessage(frame)
-                        self.logMessage(etype, value)
-
-                        import json
-
-                        contentType = b"application/json"
-                        responseBody = json.dumps({"success": False, "message": "Server error: " + str(e)}).encode()
-                        httpStatus = "500 Internal Server Error"
+                        self.expectedRequestSize = int(headers.get(b"content-length", b"0"))
+                    except ValueError:
+                        self.queueErrorResponse("400 Bad Request")
+                        return None
+                    if self.expectedRequestSize > 0:
+                        self.logMessage("Expecting a body of %d" % self.expectedRequestSize)
+
+            if self.expectedRequestSize >= 0:
+                if len(self.receiveBuffer) < self.expectedRequestSize:
+                    self.logMessage("received... %d of %d expected" % (len(self.receiveBuffer), self.expectedRequestSize))
+                    return None
+                if len(self.receiveBuffer) == self.expectedRequestSize:
+                    # the buffer holds just the body (typical for large uploads): pass it on without copying
+                    requestBody = self.receiveBuffer
+                    self.receiveBuffer = bytearray()
                 else:
+                    requestBody = bytes(self.receiveBuffer[:self.expectedRequestSize])
+                    del self.receiveBuffer[:self.expectedRequestSize]
+            else:
+                requestBody = self.takeChunkedRequestBody()
+                if requestBody is None:
+                    return None
+
+            requestLine, headers = self.requestHeader
+            self.requestHeader = None
+            self.expectedRequestSize = -1
+            self.logMessage("Got complete message, body size %d" % len(requestBody))
+            try:
+                method, uri, version = requestLine.split(b" ")
+            except ValueError:
+                self.logMessage("Could not interpret first request line: ", requestLine)
+                method, uri, version = [b"", b"/", b""]
+            return method.decode(errors="replace"), uri, version, headers, requestBody
+
+        def takeChunkedRequestBody(self):
+            """Remove a complete chunked transfer encoded body (and trailer) from the receive buffer.
+            Complete chunks are decoded and removed from the receive buffer as they arrive,
+            so that each received byte is only parsed once.
+            :return: decoded body or None if the body has not been completely received yet
+            """
+            while True:
+                endOfLine = self.receiveBuffer.find(b"\r\n")
+                if endOfLine == -1:
+                    return None
+                try:
+                    chunkSize = int(bytes(self.receiveBuffer[:endOfLine]).split(b";")[0], 16)
+                except ValueError:
+                    self.queueErrorResponse("400 Bad Request")
+                    return None
+                if chunkSize == 0:
+                    # the trailer ends with an empty line (which directly follows the last chunk if there is no trailer)
+                    endOfTrailer = self.receiveBuffer.find(b"\r\n\r\n", endOfLine)
+                    if endOfTrailer == -1:
+                        return None
+                    del self.receiveBuffer[:endOfTrailer + 4]
+                    requestBody = b"".join(self.requestBodyChunks)
+                    self.requestBodyChunks = []
+                    return requestBody
+                endOfChunk = endOfLine + 2 + chunkSize
+                if len(self.receiveBuffer) < endOfChunk + 2:
+                    return None
+                self.requestBodyChunks.append(bytes(self.receiveBuffer[endOfLine + 2:endOfChunk]))
+                # removing from the start of a bytearray does not move the remaining bytes
+                del self.receiveBuffer[:endOfChunk + 2]
+
+        def handleRequest(self, method, uri, version, headers, requestBody):
+            """Find the request handler with the highest confidence and queue its response"""
+            self.numberOfRequests += 1
+            connection = headers.get(b"connection", b"").lower()
+            if version == b"HTTP/1.1":
+                keepAlive = b"close" not in connection
+            elif version == b"HTTP/1.0":
+                keepAlive = b"keep-alive" in connection
+            else:
+                self.logMessage("Warning, we don't speak %s" % version)
+                self.queueErrorResponse("505 HTTP Version Not Supported")
+                return
+            keepAlive = keepAlive and self.numberOfRequests < self.maxKeepAliveRequests and not self.clientClosed
+
+            methods = ["GET", "POST", "PUT", "DELETE", "OPTIONS"]
+            if method not in methods:
+                self.logMessage("Warning, we only handle %s" % methods)
+                self.queueErrorResponse("501 Not Implemented")
+                return
+
+            parsedURL = urllib.parse.urlparse(uri)
+            request = parsedURL.path
+            if parsedURL.query != b"":
+                request += b"?" + parsedURL.query
+            self.logMessage("Parsing url request: ", parsedURL)
+            self.logMessage(" request is: %s" % request)
+
+            highestConfidenceHandler = None
+            highestConfidence = 0.0
+            for handler in self.requestHandlers:
+                confidence = handler.canHandleRequest(method=method, uri=uri, requestBody=requestBody)
+                if confidence > highestConfidence:
+                    highestConfidenceHandler = handler
+                    highestConfidence = confidence
+
+            httpStatus = "200 OK"
+            responseHeaders = {}
+            if highestConfidenceHandler is not None and highestConfidence > 0.0 and method != "OPTIONS":
+                try:
+                    handlerArguments = {"requestHeaders": headers} if highestConfidenceHandler in self.requestHeadersHandlers else {}
+                    response = highestConfidenceHandler.handleRequest(method=method, uri=uri, requestBody=requestBody, **handlerArguments)
+                    contentType, responseBody = response[:2]
+                    if len(response) > 2:
+                        responseHeaders = response[2]
+                except Exception as e:
+                    etype, value, tb = sys.exc_info()
+
+                    import traceback
+
+                    for frame in traceback.format_tb(tb):
+                        self.logMessage(frame)
+                    self.logMessage(etype, value)
+
+                    import json
+
+                    contentType = b"application/json"
+                    responseBody = json.dumps({"success": False, "message": "Server error: " + str(e)}).encode()
+                    httpStatus = "500 Internal Server Error"
+                    responseHeaders = {}
+            else:
+                contentType = b"text/plain"
+                responseBody = b""
+
+            if isinstance(responseBody, WebSocket.WebSocketSession):
+                self.acceptWebSocket(method, headers, responseBody, keepAlive)
+                return
+            if isinstance(responseBody, FileResponseBody):
+                try:
+                    responseBody, fileHeaders = self.openFileResponseBody(responseBody, headers)
+                    # header fields set by the handler take precedence
+                    responseHeaders = {**fileHeaders, **responseHeaders}
+                except OSError as e:
+                    self.logMessage("Cannot open response file: %s" % e)
                     contentType = b"text/plain"
-                    responseBody = b""
-
-                if responseBody:
-                    self.response = f"HTTP/1.1 {httpStatus}\r\n".encode()
-                    if self.enableCORS:
-                        self.response += b"Access-Control-Allow-Origin: *\r\n"
-                    self.response += b"Content-Type: %s\r\n" % contentType
-                    self.response += b"Content-Length: %d\r\n" % len(responseBody)
-                    self.response += b"Cache-Control: no-cache\r\n"
-                    self.response += b"\r\n"
-                    self.response += responseBody
-                elif method == "OPTIONS":
-                    self.response = b"HTTP/1.1 204 No Content\r\n"
-                    self.response += b"Connection: keep-alive\r\n"
-                    if self.enableCORS:
-                        self.response += b"Access-Control-Allow-Origin: *\r\n"
-                        self.response += b"Access-Control-Allow-Methods: POST, GET, OPTIONS, DELETE, PUT\r\n"
-                        self.response += b"Access-Control-Allow-Headers: Accept\r\n"
-                        self.response += b"Access-Control-Max-Age: 86400\r\n"
+                    responseBody = None
+                    responseHeaders = {}
+
+            if isinstance(responseBody, str):
+                responseBody = responseBody.encode()
+            if isinstance(responseBody, (bytes, bytearray, memoryview)):
+                # flat byte view of the body, no copy is made
+                responseBody = memoryview(responseBody).cast("B") if len(responseBody) else None
+
+            # header fields set by the handler ("Status" sets the status line, as in CGI)
+            handlerHeaderLines = []
+            contentLength = None
+            for name, value in responseHeaders.items():
+                name = name if isinstance(name, bytes) else name.encode()
+                value = value if isinstance(value, bytes) else str(value).encode()
+                if name.lower() == b"status":
+                    httpStatus = value.decode()
+                elif name.lower() == b"content-length":
+                    contentLength = int(value)
                 else:
-                    self.response = b"HTTP/1.1 404 Not Found\r\n"
-                    self.response += b"\r\n"
-
-                self.toSend = len(self.response)
-                self.sentSoFar = 0
-                fileno = self.connectionSocket.fileno()
-                self.writeNotifier = qt.QSocketNotifier(fileno, qt.QSocketNotifier.Write)
-                self.writeNotifier.connect("activated(int)", self.onWritable)
+                    handlerHeaderLines.append(name + b": " + value)
+            handlerHeaderNames = {line.partition(b":")[0].lower() for line in handlerHeaderLines}
+
+            headerLines = [f"HTTP/1.1 {httpStatus}".encode()]
+            if responseBody is not None or responseHeaders:
+                if self.enableCORS:
+                    headerLines.append(b"Access-Control-Allow-Origin: *")
+                    headerLines.append(b"Access-Control-Expose-Headers: Content-Range, Content-Encoding, ETag")
+                if httpStatus[:3] in ("204", "304"):
+                    # no body is allowed
+                    responseBody = None
+                else:
+                    headerLines.append(b"Content-Type: %s" % contentType)
+                    if responseBody is None:
+                        responseBody = memoryview(b"")
+                if b"cache-control" not in handlerHeaderNames:
+                    headerLines.append(b"Cache-Control: no-cache")
+                headerLines += handlerHeaderLines
+            elif method == "OPTIONS":
+                headerLines = [b"HTTP/1.1 204 No Content"]
+                if self.enableCORS:
+                    headerLines.append(b"Access-Control-Allow-Origin: *")
+                    headerLines.append(b"Access-Control-Allow-Methods: POST, GET, OPTIONS, DELETE, PUT")
+                    headerLines.append(b"Access-Control-Allow-Headers: Accept, Accept-Encoding, Range")
+                    headerLines.append(b"Access-Control-Max-Age: 86400")
+            else:
+                headerLines = [b"HTTP/1.1 404 Not Found"]
+                responseBody = memoryview(b"")
+            self.queueResponse(headerLines, responseBody, keepAlive, chunkedEncoding=(version == b"HTTP/1.1"), contentLength=contentLength)
+
+        def openFileResponseBody(self, fileBody, requestHeaders):
+            """Open the file of a file-backed response body and check if the client's copy is still valid.
+            :return: tuple of the body to queue (None if not modified) and response header fields
+            """
+            file = open(fileBody.path, "rb")
+            try:
+                fileStat = os.fstat(file.fileno())
+                offset = fileBody.offset
+                length = max(0, fileStat.st_size - offset) if fileBody.length is None else fileBody.length
+                lastModified = int(fileStat.st_mtime)
+                entityTag = '"%x-%x-%x-%x"' % (fileStat.st_ino, fileStat.st_mtime_ns, offset, length)
+                responseHeaders = {"ETag": entityTag, "Last-Modified": email.utils.formatdate(lastModified, usegmt=True)}
+                if self.isNotModified(requestHeaders, entityTag, lastModified):
+                    file.close()
+                    responseHeaders["Status"] = "304 Not Modified"
+                    return None, responseHeaders
+            except BaseException:
+                file.close()
+                raise
+            responseHeaders["Content-Length"] = length
+            return SlicerHTTPServer.FileSender(file, offset, length), responseHeaders
+
+        @staticmethod
+        def isNotModified(requestHeaders, entityTag, lastModified):
+            """Whether the client's copy, identified by If-None-Match or If-Modified-Since, is still valid"""
+            ifNoneMatch = requestHeaders.get(b"if-none-match")
+            if ifNoneMatch is not None:
+                tags = [tag.strip().removeprefix("W/") for tag in ifNoneMatch.decode(errors="replace").split(",")]
+                return entityTag in tags or "*" in tags
+            ifModifiedSince = requestHeaders.get(b"if-modified-since")
+            if ifModifiedSince is not None:
+                try:
+                    return lastModified <= email.utils.parsedate_to_datetime(ifModifiedSince.decode()).timestamp()
+                except (TypeError, ValueError):
+                    return False
+            return False
+
+        def queueErrorResponse(self, httpStatus):
+            """Queue an error response without body and close the connection when it is sent"""
+            self.queueResponse([f"HTTP/1.1 {httpStatus}".encode()], memoryview(b""), keepAlive=False)
+
+        def queueResponse(self, headerLines, responseBody, keepAlive, chunkedEncoding=True, contentLength=None):
+            """Queue a response to be sent when the socket is writable.
+            :param headerLines: status line and header fields (without Content-Length, Transfer-Encoding, Connection)
+            :param responseBody: memoryview of the body, iterable of bytes-like chunks of the body (including FileSender),
+                or None if the response has no body (e.g., 204 No Content)
+            :param keepAlive: if False then the connection is closed after the response is sent
+            :param chunkedEncoding: an iterable body of unknown length is sent with chunked transfer encoding
+                (if False then the end of body is indicated by closing the connection)
+            :param contentLength: total size of an iterable body, if known
+            """
+            headerLines = list(headerLines)
+            if isinstance(responseBody, memoryview):
+                headerLines.append(b"Content-Length: %d" % responseBody.nbytes)
+            elif responseBody is not None and contentLength is not None:
+                headerLines.append(b"Content-Length: %d" % contentLength)
+            elif responseBody is not None:
+                if chunkedEncoding:
+                    headerLines.append(b"Transfer-Encoding: chunked")
+                    responseBody = self.chunkedEncoder(responseBody)
+                else:
+                    keepAlive = False
+            if keepAlive:
+                headerLines.append(b"Connection: keep-alive")
+                headerLines.append(b"Keep-Alive: timeout=%d" % self.keepAliveTimeout)
+            else:
+                headerLines.append(b"Connection: close")
+                self.closeWhenSent = True
+            header = b"\r\n".join(headerLines) + b"\r\n\r\n"
+
+            if isinstance(responseBody, memoryview) and responseBody.nbytes <= self.maxCoalescedBodySize:
+                self.queueData(memoryview(header + responseBody))
+            else:
+                self.queueData(memoryview(header))
+                if isinstance(responseBody, memoryview):
+                    self.queueData(responseBody)
+                elif responseBody is not None:
+                    self.sendQueue.append(iter(responseBody))
+            self.writeNotifier.setEnabled(True)
+
+        def queueData(self, data):
+            self.sendQueue.append(data)
+            self.pendingResponseSize += data.nbytes
+
+        @staticmethod
+        def chunkedEncoder(chunks):
+            """Chunked transfer encoding of an iterable of bytes-like chunks"""
+            for chunk in chunks:
+                chunk = memoryview(chunk).cast("B")
+                if chunk.nbytes:
+                    yield b"%X\r\n" % chunk.nbytes
+                    yield chunk
+                    yield b"\r\n"
+            yield b"0\r\n\r\n"
 
         def onWritable(self, fileno):
-            self.logMessage("Sending on %d..." % (fileno))
-            sendError = False
+            if self.connectionSocket is None:
+                return
+            self.idleTimer.start()
+            sentSize = 0
             try:
-                sent = self.connectionSocket.send(self.response[: 500 * self.bufferSize])
-                self.response = self.response[sent:]
-                self.sentSoFar += sent
-                self.logMessage("sent: %d (%d of %d, %f%%)" % (sent, self.sentSoFar, self.toSend, 100. * self.sentSoFar / self.toSend))
-            except OSError as e:
-                self.logMessage("Socket error while sending: %s" % e)
-                sendError = True
-
-            if self.sentSoFar >= self.toSend or sendError:
-                self.writeNotifier.disconnect("activated(int)", self.onWritable)
+                while self.sendQueue:
+                    data = self.sendQueue[0]
+                    if isinstance(data, SlicerHTTPServer.FileSender) and self.useSendfile:
+                        if data.remaining <= 0:
+                            data.close()
+                            self.sendQueue.popleft()
+                            continue
+                        # raises BlockingIOError when the socket buffer is full
+                        sentSize += data.sendfile(self.connectionSocket, self.maxSendSize)
+                        continue
+                    if not isinstance(data, memoryview):
+                        # get the next part of a streamed body
+                        try:
+                            chunk = next(data)
+                        except StopIteration:
+                            self.sendQueue.popleft()
+                            continue
+                        chunk = memoryview(chunk).cast("B")
+                        self.sendQueue.appendleft(chunk)
+                        self.pendingResponseSize += chunk.nbytes
+                        continue
+                    sent = self.connectionSocket.send(data[self.sendOffset:self.sendOffset + self.maxSendSize])
+                    self.sendOffset += sent
+                    self.pendingResponseSize -= sent
+                    sentSize += sent
+                    if self.sendOffset < data.nbytes:
+                        # socket buffer is full
+                        break
+                    self.sendQueue.popleft()
+                    self.sendOffset = 0
+            except self.wouldBlockErrors:
+                pass
+            except Exception as e:
+                # socket error or error while generating a streamed body: the response cannot be completed
+                self.logMessage("Error while sending: %s" % e)
+                self.close()
+                return
+            self.logMessage("sent: %d on %d (%d bytes pending)" % (sentSize, fileno, self.pendingResponseSize))
+
+            if not self.sendQueue:
                 self.writeNotifier.setEnabled(False)
+                # handle pipelined requests that were waiting for the responses to be sent
+                self.processRequests()
+            elif not self.readNotifier.isEnabled() and self.pendingResponseSize < self.maxPendingResponseSize:
+                self.processRequests()
+
+        def acceptWebSocket(self, method, headers, session, keepAlive):
+            """Complete the WebSocket opening handshake and hand over the connection to the session"""
+            if not WebSocket.isUpgradeRequest(method, headers):
+                self.queueResponse([b"HTTP/1.1 426 Upgrade Required", b"Upgrade: websocket", b"Sec-WebSocket-Version: 13"],
+                                   memoryview(b""), keepAlive)
+                return
+            self.queueData(memoryview(b"\r\n".join([
+                b"HTTP/1.1 101 Switching Protocols",
+                b"Upgrade: websocket",
+                b"Connection: Upgrade",
+                b"Sec-WebSocket-Accept: " + WebSocket.acceptKey(headers[b"sec-websocket-key"]),
+            ]) + b"\r\n\r\n"))
+            self.writeNotifier.setEnabled(True)
+            self.webSocketSession = session
+            self.logMessage("WebSocket connection opened on %d" % self.fileno)
+            session.onOpen(self)
+
+        def processWebSocketFrames(self):
+            """Handle the complete WebSocket frames of the receive buffer"""
+            while self.webSocketSession is not None and not self.closeWhenSent:
+                try:
+                    frame = WebSocket.decodeFrame(self.receiveBuffer, self.maxWebSocketMessageSize)
+                except ValueError as e:
+                    self.logMessage("Invalid WebSocket frame: %s" % e)
+                    self.closeWebSocket(WebSocket.CLOSE_PROTOCOL_ERROR)
+                    return
+                if frame is None:
+                    return
+                final, opcode, payload, frameSize = frame
+                del self.receiveBuffer[:frameSize]
+                if opcode == WebSocket.OPCODE_PING:
+                    self.queueWebSocketFrame(WebSocket.OPCODE_PONG, payload)
+                elif opcode == WebSocket.OPCODE_CLOSE:
+                    self.closeWebSocket(WebSocket.CLOSE_NORMAL)
+                elif opcode in (WebSocket.OPCODE_TEXT, WebSocket.OPCODE_BINARY, WebSocket.OPCODE_CONTINUATION):
+                    if opcode != WebSocket.OPCODE_CONTINUATION:
+                        self.webSocketMessageOpcode = opcode
+                        self.webSocketMessageParts = []
+                    self.webSocketMessageParts.append(payload)
+                    if sum(len(part) for part in self.webSocketMessageParts) > self.maxWebSocketMessageSize:
+                        self.closeWebSocket(WebSocket.CLOSE_MESSAGE_TOO_BIG)
+                        return
+                    if final:
+                        message = b"".join(self.webSocketMessageParts)
+                        self.webSocketMessageParts = []
+                        try:
+                            self.webSocketSession.onMessage(message, binary=(self.webSocketMessageOpcode == WebSocket.OPCODE_BINARY))
+                        except Exception as e:
+                            self.logMessage("Error while handling WebSocket message: %s" % e)
+
+        def queueWebSocketFrame(self, opcode, payload):
+            payload = memoryview(payload).cast("B")
+            header = WebSocket.frameHeader(opcode, payload.nbytes)
+            if payload.nbytes <= self.maxCoalescedBodySize:
+                self.queueData(memoryview(header + payload))
+            else:
+                self.queueData(memoryview(header))
+                self.queueData(payload)
+            self.writeNotifier.setEnabled(True)
+
+        def sendMessage(self, payload, binary=True):
+            """Queue a WebSocket message (bytes-like payload, or str for a text message)"""
+            if self.webSocketSession is None or self.closeWhenSent or self.connectionSocket is None:
+                return
+            if isinstance(payload, str):
+                payload = payload.encode()
+                binary = False
+            self.queueWebSocketFrame(WebSocket.OPCODE_BINARY if binary else WebSocket.OPCODE_TEXT, payload)
+
+        def hasPendingData(self):
+            """Whether previously queued data is still waiting to be sent (the client is slower than the server)"""
+            return bool(self.sendQueue)
+
+        def closeWebSocket(self, code=WebSocket.CLOSE_NORMAL):
+            """Send a close frame, end the WebSocket session, and close the connection when everything is sent"""
+            session = self.webSocketSession
+            if session is None:
+                return
+            self.webSocketSession = None
+            if self.connectionSocket is not None and not self.closeWhenSent:
+                self.queueWebSocketFrame(WebSocket.OPCODE_CLOSE, struct.pack("!H", code))
+            self.closeWhenSent = True
+            self.readNotifier.setEnabled(False)
+            session.onClose()
+
+        def onIdleTimeout(self):
+            if self.sendQueue:
+                # still sending to a slow client
+                self.idleTimer.start()
+                return
+            if self.webSocketSession is not None:
+                # WebSocket connections are kept open, ping to keep intermediate proxies from closing them
+                self.queueWebSocketFrame(WebSocket.OPCODE_PING, b"")
+                self.idleTimer.start()
+                return
+            self.logMessage("Closing idle connection on %d" % self.fileno)
+            self.close()
+
+        def close(self):
+            """Close the connection (unsent responses are dropped)"""
+            if self.connectionSocket is None:
+                return
+            self.readNotifier.setEnabled(False)
+            self.writeNotifier.setEnabled(False)
+            self.idleTimer.stop()
+            if self.webSocketSession is not None:
+                session = self.webSocketSession
+                self.webSocketSession = None
+                session.onClose()
+            for data in self.sendQueue:
+                if hasattr(data, "close"):
+                    # release resources of streamed bodies
+                    data.close()
+            self.sendQueue.clear()
+            self.receiveBuffer = bytearray()
+            self.requestBodyChunks = []
+            try:
                 self.connectionSocket.close()
-                self.logMessage("closed fileno %d" % (fileno))
+            except OSError:
+                pass
+            self.connectionSocket = None
+            self.logMessage("closed fileno %d" % self.fileno)
+            if self.onClosed:
+                self.onClosed(self)
 
     def onServerSocketNotify(self, fileno):
         self.logMessage("got request on %d" % fileno)
         try:
             (connectionSocket, clientAddress) = self.socket.accept()
             fileno = connectionSocket.fileno()
-            self.requestCommunicators[fileno] = self.SlicerRequestCommunicator(connectionSocket, self.requestHandlers, self.docroot, self.logMessage, self.enableCORS)
+            self.requestCommunicators[fileno] = self.SlicerRequestCommunicator(connectionSocket, self.requestHandlers, self.docroot, self.logMessage, self.enableCORS,
+                                                                               onClosed=self.onCommunicatorClosed)
             self.logMessage("Connected on %s fileno %d" % (connectionSocket, connectionSocket.fileno()))
         except OSError as e:
             self.logMessage("Socket Error", OSError, e)
 
+    def onCommunicatorClosed(self, communicator):
+        if self.requestCommunicators.get(communicator.fileno) is communicator:
+            del self.requestCommunicators[communicator.fileno]
+
     def start(self):
         """start the server
         Uses one thread since we are event driven
@@ -530,6 +1028,8 @@ class SlicerHTTPServer(HTTPServer):
             self.stop()
 
     def stop(self):
+        for communicator in list(self.requestCommunicators.values()):
+            communicator.close()
         self.socket.close()
         if self.notifier:
             self.notifier.disconnect("activated(int)", self.onServerSocketNotify)
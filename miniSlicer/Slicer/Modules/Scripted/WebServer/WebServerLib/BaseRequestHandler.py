@@ -8,6 +8,26 @@ BaseRequestLoggingFunction = Callable[[list[any]], None]
 """Function signature for an external handle for message logging."""
 
 
+class FileResponseBody:
+    """
+    Response body that is sent from a file (or a part of it) without reading it into memory.
+
+    The web server sends the file with `os.sendfile` where available (falls back to reading
+    it in chunks, e.g., on encrypted connections), adds Last-Modified and ETag response header fields,
+    and returns 304 Not Modified if the client's copy is still valid (If-None-Match, If-Modified-Since).
+    """
+
+    def __init__(self, path: str, offset: int = 0, length: Optional[int] = None):
+        """
+        :param path: path of the file
+        :param offset: position of the first byte to send
+        :param length: number of bytes to send (default: until the end of the file)
+        """
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+
 class BaseRequestHandler(abc.ABC):
     """
     Abstract base class (ABC) defining the `SlicerRequestHandler` virtual interface.
@@ -51,13 +71,17 @@ class BaseRequestHandler(abc.ABC):
     @abc.abstractmethod
     def handleRequest(
         self, method: str, uri: bytes, requestBody: bytes,
-    ) -> tuple[bytes, bytes]:
+    ) -> tuple:
         """
         Do the work of handling the incoming request.
 
         SlicerWebServer guarantees that `handleRequest` _may_ be called
         only if `canHandleRequest` indicated a nonzero confidence.
 
+        If the handler's `handleRequest` method has a `requestHeaders` parameter (or accepts
+        arbitrary keyword arguments) then the request header fields are passed in it, as a dict
+        of lowercase field names to values (both bytes), e.g. `{b"accept-encoding": b"gzip"}`.
+
         :param method: The HTTP request method. 'GET', 'POST', etc.
         :param uri: The request URI to parse.
             For example, b'http://127.0.0.1:2016/slicer/test?key=value'
@@ -66,6 +90,12 @@ class BaseRequestHandler(abc.ABC):
             0. The response body MIME type.
                 For example, "application/json" or "text/plain".
                 See: https://developer.mozilla.org/en-US/docs/Web/HTTP/Basics_of_HTTP/MIME_types
-            1. The response body content.
+            1. The response body content: bytes-like object, or an iterable of bytes-like chunks
+                that is sent as it is consumed (without holding the whole body in memory).
+                A `FileResponseBody` to send (a part of) a file without reading it into memory.
+                For WebSocket upgrade requests, a `WebSocket.WebSocketSession` object that takes over the connection.
+            2. Optional dict of additional response header fields. As in CGI, a "Status" field
+                sets the response status (e.g., "206 Partial Content"). "Content-Length" may be
+                set for an iterable body, otherwise it is sent with chunked transfer encoding.
         """
         pass
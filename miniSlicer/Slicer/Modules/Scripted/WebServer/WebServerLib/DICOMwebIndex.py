@@ -0,0 +1,392 @@
+"""Persistent index of the DICOM database for the DICOMweb endpoints of the Slicer WebServer module."""
+
+import logging
+import os
+import sqlite3
+
+import pydicom
+
+logger = logging.getLogger(__name__)
+
+
+class DICOMwebIndex:
+    """
+    Study and series summaries and instance metadata of a DICOM database, stored in an SQLite
+    file next to the DICOM database, so that QIDO-RS and metadata requests do not read DICOM files.
+
+    Studies are summarized (attributes of a representative instance, modalities, number of related
+    series and instances) when they are added to the DICOM database. Instance metadata (all attributes
+    except pixel data, as DICOM JSON) is cached when it is first requested and read again if the file changes.
+    The index follows the DICOM database using its instanceAdded and databaseChanged signals;
+    `update` must be called before queries to apply the changes.
+    """
+
+    schemaVersion = 1
+    indexFileName = "DICOMwebIndex.sql"
+    # Study query parameters (lowercase keyword or tag) -> column of the Studies table
+    studyQueryColumns = {
+        "studyinstanceuid": "StudyInstanceUID", "0020000d": "StudyInstanceUID",
+        "patientid": "PatientID", "00100020": "PatientID",
+        "patientname": "PatientName", "00100010": "PatientName",
+        "studydate": "StudyDate", "00080020": "StudyDate",
+        "accessionnumber": "AccessionNumber", "00080050": "AccessionNumber",
+        "studyid": "StudyID", "00200010": "StudyID",
+        "modalitiesinstudy": "ModalitiesInStudy", "00080061": "ModalitiesInStudy",
+    }
+    # Attributes returned by instance QIDO-RS searches
+    instanceSummaryKeywords = ["SOPClassUID", "SOPInstanceUID", "StudyInstanceUID", "SeriesInstanceUID",
+                               "InstanceNumber", "Rows", "Columns", "BitsAllocated", "BitsStored", "HighBit"]
+
+    _indexes = {}  # database filename -> shared index
+
+    @classmethod
+    def forDatabase(cls, dicomDatabase):
+        """Index of the DICOM database, shared by all request handlers (None if the database is not open)"""
+        if not dicomDatabase or not dicomDatabase.isOpen:
+            return None
+        index = cls._indexes.get(dicomDatabase.databaseFilename)
+        if index is None:
+            databaseDirectory = dicomDatabase.databaseDirectory
+            indexFilename = os.path.join(databaseDirectory, cls.indexFileName) if databaseDirectory else ":memory:"
+            index = cls(dicomDatabase, indexFilename)
+            cls._indexes[dicomDatabase.databaseFilename] = index
+        return index
+
+    def __init__(self, dicomDatabase, indexFilename: str):
+        """
+        :param dicomDatabase: ctkDICOMDatabase to index
+        :param indexFilename: path of the SQLite file of the index
+        """
+        self.dicomDatabase = dicomDatabase
+        self.connection = sqlite3.connect(indexFilename)
+        self.createTables()
+        self.addedInstanceUIDs = []
+        # studies may have been added or removed since the index was last updated
+        self.reconcileStudies = True
+        self.retrieveURLTag = pydicom.tag.Tag(0x00080190)
+        self.numberOfStudyRelatedSeriesTag = pydicom.tag.Tag(0x00200206)
+        self.numberOfStudyRelatedInstancesTag = pydicom.tag.Tag(0x00200208)
+        self.numberOfSeriesRelatedInstancesTag = pydicom.tag.Tag(0x00201209)
+        dicomDatabase.connect("instanceAdded(QString)", self.onInstanceAdded)
+        dicomDatabase.connect("databaseChanged()", self.onDatabaseChanged)
+
+    def createTables(self):
+        (version,) = self.connection.execute("PRAGMA user_version").fetchone()
+        if version != self.schemaVersion:
+            self.connection.executescript("""
+                DROP TABLE IF EXISTS Studies;
+                DROP TABLE IF EXISTS Series;
+                DROP TABLE IF EXISTS Instances;
+                """)
+        self.connection.executescript(f"""
+            CREATE TABLE IF NOT EXISTS Studies (
+                StudyInstanceUID TEXT PRIMARY KEY, PatientID TEXT, PatientName TEXT, StudyDate TEXT,
+                AccessionNumber TEXT, StudyID TEXT, ModalitiesInStudy TEXT, Json TEXT);
+            CREATE INDEX IF NOT EXISTS StudiesPatientID ON Studies (PatientID);
+            CREATE INDEX IF NOT EXISTS StudiesStudyDate ON Studies (StudyDate);
+            CREATE TABLE IF NOT EXISTS Series (
+                SeriesInstanceUID TEXT PRIMARY KEY, StudyInstanceUID TEXT, Json TEXT);
+            CREATE INDEX IF NOT EXISTS SeriesStudy ON Series (StudyInstanceUID);
+            CREATE TABLE IF NOT EXISTS Instances (
+                SOPInstanceUID TEXT PRIMARY KEY, SeriesInstanceUID TEXT, StudyInstanceUID TEXT,
+                Filename TEXT, FileModifiedTime REAL, FileSize INTEGER, Summary TEXT, Metadata TEXT);
+            CREATE INDEX IF NOT EXISTS InstancesSeries ON Instances (SeriesInstanceUID);
+            CREATE INDEX IF NOT EXISTS InstancesStudy ON Instances (StudyInstanceUID);
+            PRAGMA user_version = {self.schemaVersion};
+            """)
+        self.connection.commit()
+
+    def onInstanceAdded(self, instanceUID):
+        self.addedInstanceUIDs.append(instanceUID)
+
+    def onDatabaseChanged(self):
+        self.reconcileStudies = True
+
+    #
+    # Index update
+    #
+
+    def update(self):
+        """Index studies that were added or modified and remove studies that were removed from the DICOM database"""
+        if not self.addedInstanceUIDs and not self.reconcileStudies:
+            return
+        studyUIDs = {}  # ordered set, studies are listed in the order of the DICOM database
+        seriesStudies = {}
+        for instanceUID in self.addedInstanceUIDs:
+            seriesUID = self.dicomDatabase.seriesForFile(self.dicomDatabase.fileForInstance(instanceUID))
+            if seriesUID not in seriesStudies:
+                seriesStudies[seriesUID] = self.dicomDatabase.studyForSeries(seriesUID)
+            studyUIDs[seriesStudies[seriesUID]] = None
+        self.addedInstanceUIDs = []
+        if self.reconcileStudies:
+            currentStudyUIDs = {}
+            for patient in self.dicomDatabase.patients():
+                currentStudyUIDs.update(dict.fromkeys(self.dicomDatabase.studiesForPatient(patient)))
+            indexedStudyUIDs = {row[0] for row in self.connection.execute(
+                "SELECT StudyInstanceUID FROM Studies UNION SELECT DISTINCT StudyInstanceUID FROM Instances")}
+            for studyUID in indexedStudyUIDs - currentStudyUIDs.keys():
+                self.removeStudy(studyUID)
+            studyUIDs.update((studyUID, None) for studyUID in currentStudyUIDs if studyUID not in indexedStudyUIDs)
+            self.reconcileStudies = False
+        studyUIDs.pop("", None)
+        if studyUIDs:
+            logger.debug(f"DICOMwebIndex: indexing {len(studyUIDs)} studies")
+        for studyUID in studyUIDs:
+            self.indexStudy(studyUID)
+        self.connection.commit()
+
+    def removeStudy(self, studyUID):
+        for table in ["Studies", "Series", "Instances"]:
+            self.connection.execute(f"DELETE FROM {table} WHERE StudyInstanceUID = ?", (studyUID,))
+
+    def indexStudy(self, studyUID):
+        """Summarize the study and its series (one representative instance is read per series).
+        Rows of studies and series that are already indexed are updated in place, to keep their order (rowid).
+        """
+        indexedInstanceUIDs = {row[0] for row in self.connection.execute(
+            "SELECT SOPInstanceUID FROM Instances WHERE StudyInstanceUID = ?", (studyUID,))}
+        studyInstanceUIDs = set()
+        summarizedSeriesUIDs = []
+        representativeDataset = None
+        modalitiesInStudy = []
+        numberOfStudyRelatedSeries = 0
+        for seriesUID in self.dicomDatabase.seriesForStudy(studyUID):
+            numberOfStudyRelatedSeries += 1
+            instanceUIDs = self.dicomDatabase.instancesForSeries(seriesUID)
+            # instances are inserted in the order of the DICOM database, metadata of indexed instances is kept
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO Instances (SOPInstanceUID, SeriesInstanceUID, StudyInstanceUID) VALUES (?, ?, ?)",
+                [(instanceUID, seriesUID, studyUID) for instanceUID in instanceUIDs if instanceUID not in indexedInstanceUIDs])
+            studyInstanceUIDs.update(instanceUIDs)
+            if not instanceUIDs:
+                continue
+            dataset = self.readInstance(instanceUIDs[0])
+            if dataset is None:
+                continue
+            if representativeDataset is None:
+                # Use the first valid data set as representative series data
+                representativeDataset = dataset
+            modality = getattr(dataset, "Modality", None)
+            if modality and modality not in modalitiesInStudy:
+                modalitiesInStudy.append(modality)
+            self.connection.execute(
+                "INSERT INTO Series VALUES (?, ?, ?) ON CONFLICT (SeriesInstanceUID) DO UPDATE"
+                " SET StudyInstanceUID = excluded.StudyInstanceUID, Json = excluded.Json",
+                (seriesUID, studyUID, self.seriesSummary(dataset, len(instanceUIDs))))
+            summarizedSeriesUIDs.append(seriesUID)
+        self.connection.execute(
+            "DELETE FROM Series WHERE StudyInstanceUID = ? AND SeriesInstanceUID NOT IN (%s)" % ",".join("?" * len(summarizedSeriesUIDs)),
+            [studyUID] + summarizedSeriesUIDs)
+        self.connection.executemany("DELETE FROM Instances WHERE SOPInstanceUID = ?",
+                                    [(instanceUID,) for instanceUID in indexedInstanceUIDs - studyInstanceUIDs])
+        if representativeDataset is None:
+            logger.debug("DICOMwebIndex: could not find any instances for study %s" % studyUID)
+            self.connection.execute("DELETE FROM Studies WHERE StudyInstanceUID = ?", (studyUID,))
+            return
+        dataset = representativeDataset
+        try:
+            studyJson = self.studySummary(dataset, modalitiesInStudy or ["OT"], numberOfStudyRelatedSeries, len(studyInstanceUIDs))
+        except AttributeError:
+            logger.debug(f"DICOMwebIndex: skipping study {studyUID} with missing attribute")
+            self.connection.execute("DELETE FROM Studies WHERE StudyInstanceUID = ?", (studyUID,))
+            return
+        self.connection.execute(
+            "INSERT INTO Studies VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (StudyInstanceUID) DO UPDATE"
+            " SET PatientID = excluded.PatientID, PatientName = excluded.PatientName, StudyDate = excluded.StudyDate,"
+            " AccessionNumber = excluded.AccessionNumber, StudyID = excluded.StudyID,"
+            " ModalitiesInStudy = excluded.ModalitiesInStudy, Json = excluded.Json",
+            (studyUID, str(dataset.PatientID), str(dataset.PatientName), str(dataset.StudyDate),
+             str(dataset.AccessionNumber), str(getattr(dataset, "StudyID", "")),
+             "\\" + "\\".join(modalitiesInStudy) + "\\", studyJson))
+
+    def studySummary(self, dataset, modalitiesInStudy, numberOfStudyRelatedSeries, numberOfStudyRelatedInstances):
+        """DICOM JSON of the study level attributes (raises AttributeError if a required attribute is missing)"""
+        studyDataset = pydicom.dataset.Dataset()
+        studyDataset.SpecificCharacterSet = ["ISO_IR 100"]
+        studyDataset.StudyDate = dataset.StudyDate
+        studyDataset.StudyTime = dataset.StudyTime
+        studyDataset.StudyDescription = getattr(dataset, "StudyDescription", None)
+        studyDataset.StudyInstanceUID = dataset.StudyInstanceUID
+        studyDataset.AccessionNumber = dataset.AccessionNumber
+        studyDataset.InstanceAvailability = "ONLINE"
+        studyDataset.ModalitiesInStudy = list(modalitiesInStudy)
+        studyDataset.ReferringPhysicianName = dataset.ReferringPhysicianName
+        studyDataset[self.retrieveURLTag] = pydicom.dataelem.DataElement(
+            0x00080190, "UR", "http://example.com")  # TODO: provide WADO-RS RetrieveURL
+        studyDataset.PatientName = dataset.PatientName
+        studyDataset.PatientID = dataset.PatientID
+        studyDataset.PatientBirthDate = dataset.PatientBirthDate
+        studyDataset.PatientSex = dataset.PatientSex
+        studyDataset.StudyID = getattr(dataset, "StudyID", None)
+        studyDataset[self.numberOfStudyRelatedSeriesTag] = pydicom.dataelem.DataElement(
+            self.numberOfStudyRelatedSeriesTag, "IS", str(numberOfStudyRelatedSeries))
+        studyDataset[self.numberOfStudyRelatedInstancesTag] = pydicom.dataelem.DataElement(
+            self.numberOfStudyRelatedInstancesTag, "IS", str(numberOfStudyRelatedInstances))
+        return studyDataset.to_json()
+
+    def seriesSummary(self, dataset, numberOfSeriesRelatedInstances):
+        """DICOM JSON of the series level attributes"""
+        seriesDataset = pydicom.dataset.Dataset()
+        seriesDataset.SpecificCharacterSet = ["ISO_IR 100"]
+        seriesDataset.SeriesInstanceUID = dataset.SeriesInstanceUID
+        # Required (type 1) field, but we don't disqualify the series if it does not have it
+        seriesDataset.Modality = getattr(dataset, "Modality", "OT")
+        # Required (type 2) field, but we don't disqualify the series if it does not have it
+        seriesDataset.SeriesNumber = getattr(dataset, "SeriesNumber", "")
+        if hasattr(dataset, "PerformedProcedureStepStartDate"):
+            seriesDataset.PerformedProcedureStepStartDate = dataset.PerformedProcedureStepStartDate
+        if hasattr(dataset, "PerformedProcedureStepStartTime"):
+            seriesDataset.PerformedProcedureStepStartTime = dataset.PerformedProcedureStepStartTime
+        seriesDataset[self.numberOfSeriesRelatedInstancesTag] = pydicom.dataelem.DataElement(
+            self.numberOfSeriesRelatedInstancesTag, "IS", str(numberOfSeriesRelatedInstances))
+        return seriesDataset.to_json()
+
+    def instanceSummary(self, dataset):
+        """DICOM JSON of the attributes returned by instance searches"""
+        instanceDataset = pydicom.dataset.Dataset()
+        instanceDataset.SpecificCharacterSet = ["ISO_IR 100"]
+        instanceDataset.InstanceAvailability = "ONLINE"
+        instanceDataset[self.retrieveURLTag] = pydicom.dataelem.DataElement(
+            0x00080190, "UR", "http://example.com")  # TODO: provide WADO-RS RetrieveURL
+        for keyword in self.instanceSummaryKeywords:
+            if keyword in dataset:
+                instanceDataset[keyword] = dataset[keyword]
+        return instanceDataset.to_json()
+
+    def readInstance(self, instanceUID, filename=None):
+        """Read the instance (without pixel data) and cache its metadata in the index.
+        :return: pydicom dataset or None if the file cannot be read
+        """
+        if filename is None:
+            filename = self.dicomDatabase.fileForInstance(instanceUID)
+        try:
+            fileStat = os.stat(filename)
+            dataset = pydicom.dcmread(filename, stop_before_pixels=True)
+            metadata = dataset.to_json()
+            summary = self.instanceSummary(dataset)
+        except Exception as e:
+            logger.debug(f'DICOMwebIndex: error while attempting to read instance {instanceUID} from file "{filename}": {e}')
+            return None
+        self.connection.execute(
+            "UPDATE Instances SET Filename = ?, FileModifiedTime = ?, FileSize = ?, Summary = ?, Metadata = ? WHERE SOPInstanceUID = ?",
+            (filename, fileStat.st_mtime, fileStat.st_size, summary, metadata, instanceUID))
+        return dataset
+
+    #
+    # Queries
+    #
+
+    def searchStudies(self, query: dict, offset: int = 0, limit: int = 100) -> bytes:
+        """QIDO-RS study search.
+        :param query: query parameters (lowercase keyword or tag -> value). Values may contain * and ? wildcards,
+            StudyDate may be a range (20200101-20201231), StudyInstanceUID a comma separated list.
+        :return: JSON array of matching studies
+        """
+        conditions = []
+        parameters = []
+        for name, value in query.items():
+            column = self.studyQueryColumns.get(name)
+            if column is None or value == "":
+                continue
+            if column == "StudyInstanceUID":
+                uids = [uid.strip() for uid in value.replace("\\", ",").split(",")]
+                conditions.append("StudyInstanceUID IN (%s)" % ",".join("?" * len(uids)))
+                parameters += uids
+            elif column == "ModalitiesInStudy":
+                modalities = value.replace(",", "\\").split("\\")
+                conditions.append("(%s)" % " OR ".join(["ModalitiesInStudy LIKE ? ESCAPE '!'"] * len(modalities)))
+                parameters += ["%\\" + self.likePattern(modality.strip(), wildcards=False) + "\\%" for modality in modalities]
+            elif column == "StudyDate" and "-" in value:
+                first, last = value.split("-", 1)
+                conditions.append("StudyDate BETWEEN ? AND ?")
+                parameters += [first.strip() or "00000000", last.strip() or "99999999"]
+            elif "*" in value or "?" in value:
+                conditions.append(f"{column} LIKE ? ESCAPE '!'")
+                parameters.append(self.likePattern(value))
+            else:
+                conditions.append(f"{column} = ?")
+                parameters.append(value)
+        sql = "SELECT Json FROM Studies"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY rowid LIMIT ? OFFSET ?"
+        rows = self.connection.execute(sql, parameters + [limit, offset])
+        return self.jsonArray(row[0] for row in rows)
+
+    def searchSeries(self, studyUID: str) -> bytes:
+        """QIDO-RS series search in a study (JSON array)"""
+        self.checkStudy(studyUID)
+        rows = self.connection.execute("SELECT Json FROM Series WHERE StudyInstanceUID = ? ORDER BY rowid", (studyUID,))
+        return self.jsonArray(row[0] for row in rows)
+
+    def searchInstances(self, seriesUID: str) -> bytes:
+        """QIDO-RS instance search in a series (JSON array)"""
+        return self.jsonArray(self.instancesJson("SeriesInstanceUID", seriesUID, "Summary"))
+
+    def metadata(self, studyUID: str = None, seriesUID: str = None, instanceUID: str = None) -> bytes:
+        """WADO-RS metadata of all instances of a study, a series, or a single instance (JSON array)"""
+        if instanceUID is not None:
+            if not self.connection.execute("SELECT 1 FROM Instances WHERE SOPInstanceUID = ?", (instanceUID,)).fetchone():
+                # not indexed (yet), read it directly
+                dataset = pydicom.dcmread(self.dicomDatabase.fileForInstance(instanceUID), stop_before_pixels=True)
+                return self.jsonArray([dataset.to_json()])
+            return self.jsonArray(self.instancesJson("SOPInstanceUID", instanceUID, "Metadata"))
+        if seriesUID is not None:
+            return self.jsonArray(self.instancesJson("SeriesInstanceUID", seriesUID, "Metadata"))
+        return self.jsonArray(self.instancesJson("StudyInstanceUID", studyUID, "Metadata"))
+
+    def instancesJson(self, column, uid, field):
+        """Cached summary or metadata of the selected instances; instances that are new or modified are read"""
+        if column == "SeriesInstanceUID":
+            self.checkSeries(uid)
+        elif column == "StudyInstanceUID":
+            self.checkStudy(uid)
+        rows = self.connection.execute(
+            f"SELECT SOPInstanceUID, Filename, FileModifiedTime, FileSize, {field} FROM Instances WHERE {column} = ? ORDER BY rowid",
+            (uid,)).fetchall()
+        jsonStrings = []
+        for instanceUID, filename, fileModifiedTime, fileSize, cachedJson in rows:
+            if cachedJson is not None:
+                try:
+                    fileStat = os.stat(filename)
+                    if fileStat.st_mtime == fileModifiedTime and fileStat.st_size == fileSize:
+                        jsonStrings.append(cachedJson)
+                        continue
+                except OSError:
+                    pass
+            if self.readInstance(instanceUID) is None:
+                continue
+            (cachedJson,) = self.connection.execute(f"SELECT {field} FROM Instances WHERE SOPInstanceUID = ?", (instanceUID,)).fetchone()
+            jsonStrings.append(cachedJson)
+        self.connection.commit()
+        return jsonStrings
+
+    def checkStudy(self, studyUID):
+        """Re-index the study if its series differ from the DICOM database (e.g., a series was removed)"""
+        indexedSeriesUIDs = {row[0] for row in self.connection.execute(
+            "SELECT DISTINCT SeriesInstanceUID FROM Instances WHERE StudyInstanceUID = ?", (studyUID,))}
+        if indexedSeriesUIDs != set(self.dicomDatabase.seriesForStudy(studyUID)):
+            self.indexStudy(studyUID)
+            self.connection.commit()
+
+    def checkSeries(self, seriesUID):
+        """Re-index the study of the series if the instances of the series differ from the DICOM database"""
+        indexedInstanceUIDs = {row[0] for row in self.connection.execute(
+            "SELECT SOPInstanceUID FROM Instances WHERE SeriesInstanceUID = ?", (seriesUID,))}
+        if indexedInstanceUIDs != set(self.dicomDatabase.instancesForSeries(seriesUID)):
+            studyUID = self.dicomDatabase.studyForSeries(seriesUID)
+            if studyUID:
+                self.indexStudy(studyUID)
+                self.connection.commit()
+
+    @staticmethod
+    def likePattern(value, wildcards=True):
+        """SQL LIKE pattern (escape character: !) of a DICOM attribute matching value"""
+        pattern = value.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+        if wildcards:
+            pattern = pattern.replace("*", "%").replace("?", "_")
+        return pattern
+
+    @staticmethod
+    def jsonArray(jsonStrings):
+        return b"[" + ",".join(jsonStrings).encode() + b"]"
@@ -0,0 +1,60 @@
+"""Cache of encoded rendered frames (slice and 3D view images) of the Slicer WebServer module."""
+
+import collections
+import hashlib
+import uuid
+
+
+class FrameCache:
+    """
+    Least recently used cache of encoded frames, limited by the total size of the frames.
+
+    Frames are identified by a key that captures everything the frame depends on
+    (view state hash, request parameters, image format). The entity tag of a key
+    identifies the frame even after it has been evicted from the cache, so that
+    requests of a client that already has the frame can be answered without
+    rendering (304 Not Modified).
+    """
+
+    def __init__(self, maxSize: int = 64 * 1024 * 1024):
+        """
+        :param maxSize: maximum total size of the cached frames in bytes (0 disables caching)
+        """
+        self.maxSize = maxSize
+        self.size = 0
+        self.frames = collections.OrderedDict()  # key -> (contentType, body, responseHeaders)
+        # MTime based keys are only unique within a Slicer session
+        self.sessionToken = uuid.uuid4().hex
+
+    def entityTag(self, key) -> str:
+        """Quoted entity tag (ETag header value) of the frame identified by key"""
+        return '"%s"' % hashlib.sha1(repr((self.sessionToken, key)).encode(), usedforsecurity=False).hexdigest()[:24]
+
+    def get(self, key):
+        """Returns the cached (contentType, body, responseHeaders) of the frame or None"""
+        frame = self.frames.get(key)
+        if frame is not None:
+            self.frames.move_to_end(key)
+        return frame
+
+    def add(self, key, contentType: bytes, body: bytes, responseHeaders: dict = None):
+        """Cache a frame and evict the least recently used frames that do not fit"""
+        frame = (contentType, body, responseHeaders or {})
+        if len(body) > self.maxSize:
+            return frame
+        self.remove(key)
+        self.frames[key] = frame
+        self.size += len(body)
+        while self.size > self.maxSize:
+            _key, (_contentType, evictedBody, _responseHeaders) = self.frames.popitem(last=False)
+            self.size -= len(evictedBody)
+        return frame
+
+    def remove(self, key):
+        frame = self.frames.pop(key, None)
+        if frame is not None:
+            self.size -= len(frame[1])
+
+    def clear(self):
+        self.frames.clear()
+        self.size = 0
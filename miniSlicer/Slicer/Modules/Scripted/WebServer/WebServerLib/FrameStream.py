@@ -0,0 +1,152 @@
+"""Streaming of rendered views to WebSocket clients of the Slicer WebServer module."""
+
+import json
+import struct
+
+import numpy
+import qt
+import vtk
+import vtk.util.numpy_support
+
+from .WebSocket import WebSocketSession
+
+
+class FrameStream(WebSocketSession):
+    """
+    Push the image of a view to a WebSocket client whenever the view changes.
+
+    The view state is checked at most maxFramesPerSecond times per second and the view is only
+    rendered if its state changed. Only the rectangle that differs from the previously sent frame
+    is sent (dirty rectangle). While the previous frame is still being sent (slow client or network),
+    no frame is rendered: frames are dropped instead of queued and the next frame contains all changes.
+
+    Each frame is a binary message: 4-byte big-endian header size, JSON header, encoded pixels of the rectangle.
+    Header fields: frame (sequence number), width and height (of the view image), x, y, w, h (rectangle,
+    origin at the top left corner), format (raw: RGBA pixels, top row first), keyFrame (rectangle is the whole image).
+
+    The client may send text messages with a JSON object containing
+    fps (maximum frame rate) and/or keyFrame (true to request a complete frame).
+    """
+
+    minFramesPerSecond = 0.1
+    maxFramesPerSecond = 60.0
+
+    def __init__(self, stateKey, render, encodeImage, imageFormat="raw", quality=90, framesPerSecond=10.0, logMessage=None):
+        """
+        :param stateKey: function that returns a hashable description of the view state (the view is only rendered if it changes)
+        :param render: function that renders the view and returns the image as vtkImageData (or None)
+        :param encodeImage: function (imageData, imageFormat, quality) -> (contentType, encoded image, response header fields)
+        :param imageFormat: encoding of the rectangles (raw, png, jpeg, webp)
+        :param quality: quality of jpeg and webp encoding
+        :param framesPerSecond: maximum frame rate (can be changed by the client)
+        """
+        WebSocketSession.__init__(self)
+        self.stateKey = stateKey
+        self.render = render
+        self.encodeImage = encodeImage
+        self.imageFormat = imageFormat
+        self.quality = quality
+        self.logMessage = logMessage or (lambda *args: None)
+        self.lastStateKey = None
+        self.previousPixels = None
+        self.keyFrameRequested = True
+        self.frameIndex = 0
+        self.droppedFrames = 0
+        self.timer = qt.QTimer()
+        self.timer.connect("timeout()", self.onTimer)
+        self.setFramesPerSecond(framesPerSecond)
+
+    def setFramesPerSecond(self, framesPerSecond):
+        framesPerSecond = min(max(float(framesPerSecond), self.minFramesPerSecond), self.maxFramesPerSecond)
+        self.timer.setInterval(int(1000 / framesPerSecond))
+
+    def onOpen(self, connection):
+        WebSocketSession.onOpen(self, connection)
+        self.timer.start()
+        self.onTimer()
+
+    def onMessage(self, payload, binary):
+        if binary:
+            return
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            self.logMessage("FrameStream: invalid message %s" % payload[:100])
+            return
+        if "fps" in message:
+            self.setFramesPerSecond(message["fps"])
+        if message.get("keyFrame"):
+            self.keyFrameRequested = True
+
+    def onClose(self):
+        self.timer.stop()
+        self.previousPixels = None
+        self.logMessage("FrameStream: closed after %d frames (%d dropped)" % (self.frameIndex, self.droppedFrames))
+        WebSocketSession.onClose(self)
+
+    def onTimer(self):
+        if self.connection is None:
+            return
+        stateKey = self.stateKey()
+        if stateKey == self.lastStateKey and not self.keyFrameRequested:
+            return
+        if self.connection.hasPendingData():
+            # the client has not received the previous frame yet, drop this one
+            self.droppedFrames += 1
+            return
+        self.lastStateKey = stateKey
+        imageData = self.render()
+        if not imageData:
+            return
+        pixels = self.rgbaPixels(imageData)
+        rectangle = self.changedRectangle(pixels)
+        if rectangle is None:
+            # state changed but the image did not
+            return
+        self.sendFrame(pixels, rectangle)
+
+    @staticmethod
+    def rgbaPixels(imageData):
+        """Copy of the image pixels as a (height, width, 4) RGBA array, top row first"""
+        width, height, _depth = imageData.GetDimensions()
+        pixels = vtk.util.numpy_support.vtk_to_numpy(imageData.GetPointData().GetScalars()).reshape(height, width, -1)
+        if pixels.shape[2] == 3:
+            return numpy.dstack([pixels[::-1], numpy.full((height, width), 255, dtype=pixels.dtype)])
+        return numpy.ascontiguousarray(pixels[::-1, :, :4])
+
+    def changedRectangle(self, pixels):
+        """(x, y, width, height) of the smallest rectangle that contains all changed pixels, or None if nothing changed"""
+        height, width = pixels.shape[:2]
+        if self.keyFrameRequested or self.previousPixels is None or self.previousPixels.shape != pixels.shape:
+            return 0, 0, width, height
+        changed = (self.previousPixels != pixels).any(axis=2)
+        rows = numpy.flatnonzero(changed.any(axis=1))
+        if not rows.size:
+            return None
+        columns = numpy.flatnonzero(changed.any(axis=0))
+        return int(columns[0]), int(rows[0]), int(columns[-1] - columns[0] + 1), int(rows[-1] - rows[0] + 1)
+
+    def sendFrame(self, pixels, rectangle):
+        x, y, w, h = rectangle
+        rectanglePixels = pixels[y:y + h, x:x + w]
+        if self.imageFormat == "raw":
+            encodedPixels = numpy.ascontiguousarray(rectanglePixels).tobytes()
+        else:
+            rectangleImage = vtk.vtkImageData()
+            rectangleImage.SetDimensions(w, h, 1)
+            rectangleImage.AllocateScalars(vtk.VTK_UNSIGNED_CHAR, 4)
+            # vtkImageData rows are stored from bottom to top
+            vtk.util.numpy_support.vtk_to_numpy(rectangleImage.GetPointData().GetScalars())[:] = rectanglePixels[::-1].reshape(-1, 4)
+            encodedPixels = self.encodeImage(rectangleImage, self.imageFormat, self.quality)[1]
+        header = json.dumps({
+            "frame": self.frameIndex,
+            "width": pixels.shape[1],
+            "height": pixels.shape[0],
+            "x": x, "y": y, "w": w, "h": h,
+            "format": self.imageFormat,
+            "keyFrame": (w, h) == (pixels.shape[1], pixels.shape[0]),
+        }).encode()
+        self.connection.sendMessage(struct.pack("!I", len(header)) + header + encodedPixels)
+        self.frameIndex += 1
+        self.keyFrameRequested = False
+        self.previousPixels = pixels
@@ -4,12 +4,18 @@ Docs/user_guide/modules/webserver.md
 """
 
 
+import functools
+import gzip
+import hashlib
+import io
 import json
 import logging
 import numpy
 import os
+import sys
 import time
 import urllib
+import zlib
 from typing import Optional
 
 import qt
@@ -17,10 +23,35 @@ import vtk.util.numpy_support
 
 import slicer
 from .BaseRequestHandler import BaseRequestHandler, BaseRequestLoggingFunction
+from .FrameCache import FrameCache
+from .FrameStream import FrameStream
+
+try:
+    import zstandard
+except ImportError:
+    # zstd content encoding is not available
+    zstandard = None
 
 logger = logging.getLogger(__name__)
 
 
+class MemoryReader(io.RawIOBase):
+    """Read-only file-like object of a bytes-like object, without copying it"""
+
+    def __init__(self, data):
+        self.data = memoryview(data).cast("B")
+        self.position = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(len(buffer), self.data.nbytes - self.position)
+        buffer[:size] = self.data[self.position : self.position + size]
+        self.position += size
+        return size
+
+
 class SlicerRequestHandler(BaseRequestHandler):
     """Implements the Slicer REST api"""
 
@@ -41,6 +72,8 @@ class SlicerRequestHandler(BaseRequestHandler):
         self.enableExec = enableExec
         self.sampleDataLogic = None  # used for progress reporting during download
         self.logMessage = logMessage or self.defaultLogMessage
+        # encoded /slice and /threeD images, reused while the view state does not change
+        self.frameCache = FrameCache()
 
     def canHandleRequest(self, uri: bytes, **kwargs) -> float:
         """
@@ -54,13 +87,14 @@ class SlicerRequestHandler(BaseRequestHandler):
         return 0.5 if route.startswith(b"/slicer") else 0.0
 
     def handleRequest(
-        self, method: str, uri: bytes, requestBody: bytes,
-    ) -> tuple[bytes, bytes]:
+        self, method: str, uri: bytes, requestBody: bytes, requestHeaders: Optional[dict] = None,
+    ) -> tuple[bytes, bytes, dict]:
         """Handle a slicer api request.
         TODO: better routing (add routing plugins)
         :param request: request portion of the URL
         :param requestBody: binary data that came with request
-        :return: tuple of (mime) type and responseBody (binary)
+        :param requestHeaders: request header fields (lowercase names)
+        :return: tuple of (mime) type, responseBody (binary or iterable of binary chunks) and response header fields
         """
         parsedURL = urllib.parse.urlparse(uri)
         request = parsedURL.path
@@ -71,6 +105,7 @@ class SlicerRequestHandler(BaseRequestHandler):
 
         responseBody = None
         contentType = b"text/plain"
+        responseHeaders = {}
         if self.enableExec and request.find(b"/exec") == 0:
             responseBody, contentType = self.exec(request, requestBody)
         elif request.find(b"/timeimage") == 0:
@@ -82,11 +117,13 @@ class SlicerRequestHandler(BaseRequestHandler):
         elif request.find(b"/screenshot") == 0:
             responseBody, contentType = self.screenshot(request)
         elif request.find(b"/slice") == 0:
-            responseBody, contentType = self.slice(request)
+            responseBody, contentType, responseHeaders = self.slice(request, requestHeaders)
         elif request.find(b"/threeDGraphics") == 0:
             responseBody, contentType = self.threeDGraphics(request)
         elif request.find(b"/threeD") == 0:
-            responseBody, contentType = self.threeD(request)
+            responseBody, contentType, responseHeaders = self.threeD(request, requestHeaders)
+        elif request.find(b"/stream") == 0:
+            responseBody, contentType = self.stream(request)
         elif request.find(b"/mrml") == 0:
             responseBody, contentType = self.mrml(method, request)
         elif request.find(b"/tracking") == 0:
@@ -98,12 +135,11 @@ class SlicerRequestHandler(BaseRequestHandler):
         elif request.find(b"/volumes") == 0:
             responseBody, contentType = self.volumes(request, requestBody)
         elif request.find(b"/volume") == 0:
-            responseBody, contentType = self.volume(request, requestBody)
+            responseBody, contentType, responseHeaders = self.volume(request, requestBody, requestHeaders)
         elif request.find(b"/gridTransforms") == 0:
             responseBody, contentType = self.gridTransforms(request, requestBody)
         elif request.find(b"/gridTransform") == 0:
-            responseBody, contentType = self.gridTransform(request, requestBody)
-            print("responseBody", len(responseBody))
+            responseBody, contentType, responseHeaders = self.gridTransform(request, requestBody, requestHeaders)
         elif request.find(b"/fiducials") == 0:
             responseBody, contentType = self.fiducials(request, requestBody)
         elif request.find(b"/fiducial") == 0:
@@ -117,7 +153,7 @@ class SlicerRequestHandler(BaseRequestHandler):
             responseBody, contentType = self.accessDICOMwebStudy(request, requestBody)
         else:
             raise RuntimeError(f'unknown command "{request}"')
-        return contentType, responseBody
+        return contentType, responseBody, responseHeaders
 
     def exec(self, request, requestBody):
         """Handle requests with path: /exec"""
@@ -299,7 +335,7 @@ class SlicerRequestHandler(BaseRequestHandler):
             volumes.append({"name": volumeNode.GetName(), "id": volumeNode.GetID()})
         return (json.dumps(volumes).encode()), b"application/json"
 
-    def volume(self, request, requestBody):
+    def volume(self, request, requestBody, requestHeaders=None):
         """
         Handle requests with path: /volume
 
@@ -307,6 +343,8 @@ class SlicerRequestHandler(BaseRequestHandler):
         and put it in the scene, either in an existing node or a new one.
 
         If there is no request body then the binary of the nrrd is returned for the given id.
+        The optional slab=first,last parameter selects a range of slices (k index, inclusive).
+        :return: tuple of response body, content type, response header fields
         """
         p = urllib.parse.urlparse(request.decode())
         q = urllib.parse.parse_qs(p.query)
@@ -316,9 +354,14 @@ class SlicerRequestHandler(BaseRequestHandler):
             volumeID = "vtkMRMLScalarVolumeNode*"
 
         if requestBody:
-            return self.postNRRD(volumeID, requestBody)
+            return (*self.postNRRD(volumeID, requestBody, requestHeaders), {})
         else:
-            return self.getNRRD(volumeID)
+            slab = None
+            if "slab" in q:
+                slab = tuple(map(int, q["slab"][0].split(",")))
+                if len(slab) != 2:
+                    raise RuntimeError("slab must be specified as first,last slice index")
+            return self.getNRRD(volumeID, requestHeaders, slab)
 
     def gridTransforms(self, request, requestBody):
         """
@@ -332,7 +375,7 @@ class SlicerRequestHandler(BaseRequestHandler):
             gridTransforms.append({"name": gridTransform.GetName(), "id": gridTransform.GetID()})
         return (json.dumps(gridTransforms).encode()), b"application/json"
 
-    def gridTransform(self, request, requestBody):
+    def gridTransform(self, request, requestBody, requestHeaders=None):
         """
         Handle requests with path: /gridtransform
         If there is a request body, this tries to parse the binary as nrrd grid transform
@@ -351,48 +394,79 @@ class SlicerRequestHandler(BaseRequestHandler):
             # return self.postTransformNRRD(transformID, requestBody)
             raise RuntimeError("POST griddtransform is not implemented")
         else:
-            return self.getTransformNRRD(transformID)
+            return self.getTransformNRRD(transformID, requestHeaders)
 
-    def postNRRD(self, volumeID, requestBody):
+    def postNRRD(self, volumeID, requestBody, requestHeaders=None):
         """Convert a binary blob of nrrd data into a node in the scene.
         Overwrite volumeID if it exists, otherwise create new
         :param volumeID: mrml id of the volume to update (new is created if id is invalid)
         :param requestBody: the binary of the nrrd.
-        .. note:: only a subset of valid nrrds are supported (just scalar volumes and grid transforms)
+        :param requestHeaders: request header fields, the body may be gzip or zstd compressed (Content-Encoding)
+        .. note:: only a subset of valid nrrds are supported (3D scalar volumes with raw or gzip encoding)
+        Voxels are decoded directly into the volume's image data, without intermediate copies of the whole volume.
         """
-
-        if requestBody[:4] != b"NRRD":
-            raise RuntimeError("Cannot load non-nrrd file (magic is %s)" % requestBody[:4])
+        contentEncoding = (requestHeaders or {}).get(b"content-encoding", b"identity").strip().lower()
+        if contentEncoding == b"identity":
+            reader = None
+            body = memoryview(requestBody).cast("B")
+            endOfHeader = requestBody.find(b"\n\n")
+            if endOfHeader == -1:
+                raise RuntimeError("Cannot find end of nrrd header")
+            header = bytes(body[:endOfHeader])
+            data = body[endOfHeader + 2 :]
+        else:
+            # read the header from the decoded stream, then decode the voxels into the image
+            reader = self.decodingReader(MemoryReader(requestBody), contentEncoding)
+            header = b""
+            while header.find(b"\n\n") == -1:
+                block = reader.read(64 * 1024)
+                if not block:
+                    raise RuntimeError("Cannot find end of nrrd header")
+                header += block
+            endOfHeader = header.find(b"\n\n")
+            data = memoryview(header)[endOfHeader + 2 :]
+            header = header[:endOfHeader]
+
+        if header[:4] != b"NRRD":
+            raise RuntimeError("Cannot load non-nrrd file (magic is %s)" % header[:4])
 
         fields = {}
-        endOfHeader = requestBody.find(b"\n\n")  # TODO: could be \r\n
-        header = requestBody[:endOfHeader]
         self.logMessage(header)
-        for line in header.split(b"\n"):
+        for line in header.replace(b"\r\n", b"\n").split(b"\n"):
             colonIndex = line.find(b":")
-            if line[0] != "#" and colonIndex != -1:
+            if not line.startswith(b"#") and colonIndex != -1:
                 key = line[:colonIndex]
-                value = line[colonIndex + 2 :]
+                value = line[colonIndex + 1 :].lstrip(b"=").strip()
                 fields[key] = value
 
-        if fields[b"type"] not in [b"short", b"short int", b"signed short", b"signed short int", b"int16", b"int16_t"]:
-            raise RuntimeError("Can only read short volumes")
+        dtype = None
+        for dtypeName, nrrdTypes in self.nrrdTypes.items():
+            if fields[b"type"].decode() in nrrdTypes:
+                dtype = numpy.dtype(dtypeName)
+        if dtype is None:
+            raise RuntimeError("Unsupported scalar type %s" % fields[b"type"])
         if fields[b"dimension"] != b"3":
             raise RuntimeError("Can only read 3D, 1 component volumes")
-        if fields[b"endian"] != b"little":
-            raise RuntimeError("Can only read little endian")
-        if fields[b"encoding"] != b"raw":
-            raise RuntimeError("Can only read raw encoding")
-        if fields[b"space"] != b"left-posterior-superior":
-            raise RuntimeError("Can only read space in LPS")
+        if dtype.itemsize > 1:
+            if fields.get(b"endian") not in [b"little", b"big"]:
+                raise RuntimeError("Endian must be little or big")
+            dtype = dtype.newbyteorder("<" if fields[b"endian"] == b"little" else ">")
+        if fields[b"encoding"] not in [b"raw", b"gzip", b"gz"]:
+            raise RuntimeError("Can only read raw or gzip encoding")
+        if fields[b"encoding"] != b"raw" and reader is not None:
+            raise RuntimeError("Cannot read gzip encoded nrrd with Content-Encoding")
+        if fields[b"space"] not in [b"left-posterior-superior", b"right-anterior-superior"]:
+            raise RuntimeError("Can only read space in LPS or RAS")
+        # LPS to RAS sign of the first two axes
+        lpsToRAS = -1 if fields[b"space"] == b"left-posterior-superior" else 1
 
         imageData = vtk.vtkImageData()
-        imageData.SetDimensions(list(map(int, fields[b"sizes"].split(b" "))))
-        imageData.AllocateScalars(vtk.VTK_SHORT, 1)
+        imageData.SetDimensions(list(map(int, fields[b"sizes"].split())))
+        imageData.AllocateScalars(vtk.util.numpy_support.get_vtk_array_type(dtype.newbyteorder("=")), 1)
 
         origin = list(map(float, fields[b"space origin"].replace(b"(", b"").replace(b")", b"").split(b",")))
-        origin[0] *= -1
-        origin[1] *= -1
+        origin[0] *= lpsToRAS
+        origin[1] *= lpsToRAS
 
         directions = []
         directionParts = fields[b"space directions"].split(b")")[:3]
@@ -407,9 +481,24 @@ class SlicerRequestHandler(BaseRequestHandler):
             for column in range(3):
                 element = directions[column][row]
                 if row < 2:
-                    element *= -1
+                    element *= lpsToRAS
                 ijkToRAS.SetElement(row, column, element)
 
+        # Decode voxels directly into the image data
+        voxels = vtk.util.numpy_support.vtk_to_numpy(imageData.GetPointData().GetScalars())
+        voxelBytes = memoryview(voxels).cast("B")
+        if fields[b"encoding"] != b"raw":
+            reader = self.decodingReader(MemoryReader(data), b"gzip")
+            data = b""
+        receivedSize = min(len(data), voxelBytes.nbytes)
+        voxelBytes[:receivedSize] = data[:receivedSize]
+        if reader is not None:
+            receivedSize += self.readInto(reader, voxelBytes[receivedSize:])
+        if receivedSize < voxelBytes.nbytes:
+            raise RuntimeError("Voxel data is incomplete: %d of %d bytes received" % (receivedSize, voxelBytes.nbytes))
+        if not dtype.isnative:
+            voxels.byteswap(inplace=True)
+
         try:
             node = slicer.util.getNode(volumeID)
         except slicer.util.MRMLNodeNotFoundException:
@@ -422,11 +511,6 @@ class SlicerRequestHandler(BaseRequestHandler):
         node.SetAndObserveImageData(imageData)
         node.SetIJKToRASMatrix(ijkToRAS)
 
-        pixels = numpy.frombuffer(requestBody[endOfHeader + 2 :], dtype=numpy.dtype("int16"))
-        array = slicer.util.array(node.GetID())
-        array[:] = pixels.reshape(array.shape)
-        imageData.GetPointData().GetScalars().Modified()
-
         displayNode = node.GetDisplayNode()
         displayNode.ProcessMRMLEvents(displayNode, vtk.vtkCommand.ModifiedEvent, "")
         # TODO: this could be optional
@@ -435,38 +519,74 @@ class SlicerRequestHandler(BaseRequestHandler):
 
         return b"{'status': 'success'}", b"application/json"
 
-    def getNRRD(self, volumeID):
-        """Return a nrrd binary blob with contents of the volume node
+    def getNRRD(self, volumeID, requestHeaders=None, slab=None):
+        """Return a nrrd stream with contents of the volume node
         :param volumeID: must be a valid mrml id
+        :param requestHeaders: request header fields, for content encoding and byte range selection
+        :param slab: optional (first, last) slice (k) index range of the volume to return
+        :return: tuple of response body, content type, response header fields
+        The nrrd is streamed from the image data of the volume in the volume's scalar type, without copying it.
         """
         volumeNode = slicer.util.getNode(volumeID)
-        volumeArray = slicer.util.array(volumeID)
 
-        if volumeNode is None or volumeArray is None:
+        if volumeNode is None or volumeNode.GetImageData() is None or volumeNode.GetImageData().GetPointData().GetScalars() is None:
             self.logMessage("Could not find requested volume")
-            return None
+            return None, b"text/plain", {}
         supportedNodes = ["vtkMRMLScalarVolumeNode", "vtkMRMLLabelMapVolumeNode"]
         if not volumeNode.GetClassName() in supportedNodes:
             self.logMessage("Can only get scalar volumes")
-            return None
+            return None, b"text/plain", {}
 
         imageData = volumeNode.GetImageData()
+        scalars = imageData.GetPointData().GetScalars()
+        volumeArray = vtk.util.numpy_support.vtk_to_numpy(scalars)
+        numberOfComponents = scalars.GetNumberOfComponents()
+        sizes = list(imageData.GetDimensions())
 
-        supportedScalarTypes = ["short", "double"]
-        scalarType = imageData.GetScalarTypeAsString()
-        if scalarType not in supportedScalarTypes:
-            self.logMessage(f"Can only get volumes of types {str(supportedScalarTypes)}, not {scalarType}")
-            self.logMessage("Converting to short, but may cause data loss.")
-            volumeArray = numpy.array(volumeArray, dtype="int16")
-            scalarType = "short"
-
-        sizes = imageData.GetDimensions()
-        sizes = " ".join(list(map(str, sizes)))
-
-        originList = [0] * 3
-        directionLists = [[0] * 3, [0] * 3, [0] * 3]
         ijkToRAS = vtk.vtkMatrix4x4()
         volumeNode.GetIJKToRASMatrix(ijkToRAS)
+        firstSlice, lastSlice = 0, sizes[2] - 1
+        if slab is not None:
+            firstSlice = max(slab[0], 0)
+            lastSlice = min(slab[1], sizes[2] - 1)
+            if firstSlice > lastSlice:
+                raise RuntimeError(f"Invalid slab {slab[0]},{slab[1]} of a volume of {sizes[2]} slices")
+            # origin of the slab is its first slice
+            sliceOrigin = ijkToRAS.MultiplyPoint([0, 0, firstSlice, 1])
+            for row in range(3):
+                ijkToRAS.SetElement(row, 3, sliceOrigin[row])
+            sizes[2] = lastSlice - firstSlice + 1
+
+        nrrdHeader = self.nrrdHeader(volumeArray.dtype, sizes, numberOfComponents, ijkToRAS)
+        sliceSize = volumeArray.itemsize * numberOfComponents * sizes[0] * sizes[1]
+        voxelBytes = memoryview(volumeArray).cast("B")[firstSlice * sliceSize : (lastSlice + 1) * sliceSize]
+        responseBody, responseHeaders = self.streamingResponse([nrrdHeader, voxelBytes], requestHeaders, scalars)
+        return responseBody, b"application/octet-stream", responseHeaders
+
+    # NRRD type names of numpy scalar types, the first one is written
+    nrrdTypes = {
+        "int8": ["int8", "signed char", "int8_t"],
+        "uint8": ["uint8", "uchar", "unsigned char", "uint8_t"],
+        "int16": ["short", "short int", "signed short", "signed short int", "int16", "int16_t"],
+        "uint16": ["ushort", "unsigned short", "unsigned short int", "uint16", "uint16_t"],
+        "int32": ["int", "signed int", "int32", "int32_t"],
+        "uint32": ["uint", "unsigned int", "uint32", "uint32_t"],
+        "int64": ["longlong", "long long", "long long int", "signed long long", "signed long long int", "int64", "int64_t"],
+        "uint64": ["ulonglong", "unsigned long long", "unsigned long long int", "uint64", "uint64_t"],
+        "float32": ["float"],
+        "float64": ["double"],
+    }
+
+    @classmethod
+    def nrrdHeader(cls, dtype, sizes, numberOfComponents, ijkToRAS):
+        """Header of a raw encoded nrrd file of a volume in LPS space
+        :param dtype: numpy scalar type of the voxels
+        :param sizes: number of voxels along the i, j, k axes
+        :param numberOfComponents: number of components of the voxels
+        :param ijkToRAS: vtkMatrix4x4 of the volume geometry
+        """
+        originList = [0] * 3
+        directionLists = [[0] * 3, [0] * 3, [0] * 3]
         for row in range(3):
             originList[row] = ijkToRAS.GetElement(row, 3)
             for column in range(3):
@@ -477,46 +597,180 @@ class SlicerRequestHandler(BaseRequestHandler):
         originList[0] *= -1
         originList[1] *= -1
         origin = "(" + ",".join(list(map(str, originList))) + ")"
-        directions = ""
-        for directionList in directionLists:
-            direction = "(" + ",".join(list(map(str, directionList))) + ")"
-            directions += direction + " "
-        directions = directions[:-1]
+        directions = " ".join("(" + ",".join(list(map(str, directionList))) + ")" for directionList in directionLists)
 
         # should look like:
         # space directions: (0,1,0) (0,0,-1) (-1.2999954223632812,0,0)
         # space origin: (86.644897460937486,-133.92860412597656,116.78569793701172)
 
-        nrrdHeader = """NRRD0004
-# Complete NRRD file format specification at:
-# http://teem.sourceforge.net/nrrd/format.html
-type: %%scalarType%%
-dimension: 3
-space: left-posterior-superior
-sizes: %%sizes%%
-space directions: %%directions%%
-kinds: domain domain domain
-endian: little
-encoding: raw
-space origin: %%origin%%
+        if numberOfComponents > 1:
+            dimension = 4
+            sizes = [numberOfComponents] + list(sizes)
+            directions = "none " + directions
+            kinds = "vector domain domain domain"
+        else:
+            dimension = 3
+            kinds = "domain domain domain"
+        nrrdHeader = (
+            "NRRD0004\n"
+            "# Complete NRRD file format specification at:\n"
+            "# http://teem.sourceforge.net/nrrd/format.html\n"
+            f"type: {cls.nrrdTypes[numpy.dtype(dtype).name][0]}\n"
+            f"dimension: {dimension}\n"
+            "space: left-posterior-superior\n"
+            f"sizes: {' '.join(map(str, sizes))}\n"
+            f"space directions: {directions}\n"
+            f"kinds: {kinds}\n"
+            f"endian: {sys.byteorder}\n"
+            "encoding: raw\n"
+            f"space origin: {origin}\n"
+            "\n")
+        return nrrdHeader.encode()
+
+    # Size of the parts in which large responses are sent
+    streamChunkSize = 4 * 1024 * 1024
+    # Compression levels of content encodings (fast, as volumes are compressed while they are sent)
+    gzipCompressionLevel = 1
+    zstdCompressionLevel = 3
+
+    def streamingResponse(self, segments, requestHeaders=None, sourceArray=None):
+        """Response of the concatenation of bytes-like segments, streamed in chunks.
+        A single byte range may be requested (Range header), otherwise the content is compressed
+        if the client accepts gzip or zstd encoding (Accept-Encoding header).
+        :param segments: list of bytes-like objects, they are sent without copying them
+        :param requestHeaders: request header fields
+        :param sourceArray: vtkDataArray that the segments point into; sending is aborted if the array
+            is reallocated while the response is being sent
+        :return: tuple of response body (iterable of chunks) and response header fields
+        """
+        requestHeaders = requestHeaders or {}
+        segments = [memoryview(segment).cast("B") for segment in segments]
+        contentSize = sum(segment.nbytes for segment in segments)
+        responseHeaders = {"Accept-Ranges": "bytes"}
+
+        byteRange = self.parseByteRange(requestHeaders.get(b"range"), contentSize)
+        if byteRange == "unsatisfiable":
+            responseHeaders.update({"Status": "416 Range Not Satisfiable", "Content-Range": f"bytes */{contentSize}"})
+            return b"", responseHeaders
+        if byteRange is not None:
+            first, last = byteRange
+            responseHeaders.update({"Status": "206 Partial Content", "Content-Range": f"bytes {first}-{last}/{contentSize}",
+                                    "Content-Length": last - first + 1})
+            return self.segmentChunks(segments, first, last + 1, sourceArray), responseHeaders
+
+        contentEncoding = self.acceptedContentEncoding(requestHeaders.get(b"accept-encoding", b""))
+        chunks = self.segmentChunks(segments, 0, contentSize, sourceArray)
+        if contentEncoding is None:
+            responseHeaders["Content-Length"] = contentSize
+            return chunks, responseHeaders
+        responseHeaders["Content-Encoding"] = contentEncoding
+        return self.encodedChunks(chunks, contentEncoding), responseHeaders
 
-""".replace("%%scalarType%%", scalarType).replace("%%sizes%%", sizes).replace("%%directions%%", directions).replace("%%origin%%", origin)
+    @staticmethod
+    def parseByteRange(rangeHeader, contentSize):
+        """(first, last) byte positions of a single byte range request, "unsatisfiable", or None if the
+        whole content is to be sent (no range or multiple ranges are requested)"""
+        if not rangeHeader or not rangeHeader.startswith(b"bytes=") or b"," in rangeHeader:
+            return None
+        first, _separator, last = rangeHeader[len(b"bytes="):].strip().partition(b"-")
+        try:
+            if first:
+                first = int(first)
+                last = min(int(last), contentSize - 1) if last else contentSize - 1
+            else:
+                # suffix range: last N bytes
+                first = max(contentSize - int(last), 0)
+                last = contentSize - 1
+        except ValueError:
+            return None
+        if first > last or first >= contentSize:
+            return "unsatisfiable"
+        return first, last
+
+    def segmentChunks(self, segments, start, stop, sourceArray=None):
+        """Generate memoryviews of the [start, stop) byte range of the concatenated segments"""
+        if sourceArray is not None:
+            sourcePointer = sourceArray.GetVoidPointer(0)
+            sourceSize = sourceArray.GetNumberOfValues()
+        position = 0
+        for segment in segments:
+            segmentStart = max(start - position, 0)
+            segmentStop = min(stop - position, segment.nbytes)
+            for chunkStart in range(segmentStart, segmentStop, self.streamChunkSize):
+                # the segments are views of the array memory: it must still be valid when the chunk is sent
+                if sourceArray is not None and (sourceArray.GetVoidPointer(0) != sourcePointer or sourceArray.GetNumberOfValues() != sourceSize):
+                    raise RuntimeError("Data was reallocated while it was being sent")
+                yield segment[chunkStart : min(chunkStart + self.streamChunkSize, segmentStop)]
+            position += segment.nbytes
+
+    @staticmethod
+    def acceptedContentEncoding(acceptEncoding):
+        """Preferred content encoding ("zstd" or "gzip") of an Accept-Encoding header value or None"""
+        qualities = {}
+        for item in acceptEncoding.decode(errors="replace").lower().split(","):
+            coding, _separator, parameters = item.partition(";")
+            quality = 1.0
+            parameters = parameters.strip()
+            if parameters.startswith("q="):
+                try:
+                    quality = float(parameters[2:])
+                except ValueError:
+                    quality = 0.0
+            qualities[coding.strip()] = quality
+        for coding in ["zstd", "gzip"]:
+            if coding == "zstd" and zstandard is None:
+                continue
+            if qualities.get(coding, qualities.get("*", 0.0)) > 0.0:
+                return coding
+        return None
+
+    def encodedChunks(self, chunks, contentEncoding):
+        """Compress chunks with the content encoding ("gzip" or "zstd") as they are generated"""
+        if contentEncoding == "zstd":
+            compressor = zstandard.ZstdCompressor(level=self.zstdCompressionLevel).compressobj()
+        else:
+            # wbits=31: gzip container
+            compressor = zlib.compressobj(self.gzipCompressionLevel, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            encodedChunk = compressor.compress(chunk)
+            if encodedChunk:
+                yield encodedChunk
+        yield compressor.flush()
 
-        nrrdData = nrrdHeader.encode() + volumeArray.tobytes()
-        return nrrdData, b"application/octet-stream"
+    @staticmethod
+    def decodingReader(reader, contentEncoding):
+        """File-like object that decodes the gzip or zstd encoded content of reader"""
+        if contentEncoding in [b"gzip", b"x-gzip"]:
+            return gzip.GzipFile(fileobj=reader, mode="rb")
+        if contentEncoding == b"zstd" and zstandard is not None:
+            return zstandard.ZstdDecompressor().stream_reader(reader)
+        raise RuntimeError("Unsupported content encoding %s" % contentEncoding)
 
-    def getTransformNRRD(self, transformID):
-        """Return a nrrd binary blob with contents of the transform node"""
+    @staticmethod
+    def readInto(reader, buffer):
+        """Read from the file-like object until buffer is full or the end of data; returns the number of bytes read"""
+        size = 0
+        while size < buffer.nbytes:
+            readSize = reader.readinto(buffer[size:])
+            if not readSize:
+                break
+            size += readSize
+        return size
+
+    def getTransformNRRD(self, transformID, requestHeaders=None):
+        """Return a nrrd stream with contents of the transform node
+        :return: tuple of response body, content type, response header fields
+        """
         transformNode = slicer.util.getNode(transformID)
         transformArray = slicer.util.array(transformID)
 
         if transformNode is None or transformArray is None:
             self.logMessage("Could not find requested transform")
-            return None
+            return None, b"text/plain", {}
         supportedNodes = ["vtkMRMLGridTransformNode"]
         if not transformNode.GetClassName() in supportedNodes:
             self.logMessage("Can only get grid transforms")
-            return None
+            return None, b"text/plain", {}
 
         # map the vectors to be in the LPS measurement frame
         # (need to make a copy so as not to change the slicer transform)
@@ -562,8 +816,8 @@ space origin: %%origin%%
 
 """.replace("%%sizes%%", sizes).replace("%%directions%%", directions).replace("%%origin%%", origin)
 
-        nrrdData = nrrdHeader.encode() + lpsArray.tobytes()
-        return nrrdData, b"application/octet-stream"
+        responseBody, responseHeaders = self.streamingResponse([nrrdHeader.encode(), lpsArray], requestHeaders)
+        return responseBody, b"application/octet-stream", responseHeaders
 
     def fiducials(self, request, requestBody):
         """
@@ -881,10 +1135,11 @@ space origin: %%origin%%
 
         return b'{"success": true}', b"application/json"
 
-    def slice(self, request):
+    def slice(self, request, requestHeaders=None):
         """
         Handle requests with path: /slice
-        Return png of a slice view.
+        Return image of a slice view (png by default, see `frameResponse` for format options).
+        The image is only recomputed if the slice view or its volumes changed since the last identical request.
         """
 
         p = urllib.parse.urlparse(request.decode())
@@ -927,15 +1182,19 @@ space origin: %%origin%%
         # if mode == 'start' or not self.interactionState.has_key(offsetKey):
         #     self.interactionState[offsetKey] = sliceLogic.GetSliceOffset()
 
+        # slice offset is only set if it changes, to keep the slice node unmodified for cached frames
         if scrollTo:
             volumeNode = sliceLogic.GetBackgroundLayer().GetVolumeNode()
             bounds = [0] * 6
             sliceLogic.GetVolumeSliceBounds(volumeNode, bounds)
-            sliceLogic.SetSliceOffset(bounds[4] + (scrollTo * (bounds[5] - bounds[4])))
+            newOffset = bounds[4] + (scrollTo * (bounds[5] - bounds[4]))
+            if abs(sliceLogic.GetSliceOffset() - newOffset) > 1e-6:
+                sliceLogic.SetSliceOffset(newOffset)
         if offset:
             # startOffset = self.interactionState[offsetKey]
             # sliceLogic.SetSliceOffset(startOffset + offset)
-            sliceLogic.SetSliceOffset(offset)
+            if abs(sliceLogic.GetSliceOffset() - offset) > 1e-6:
+                sliceLogic.SetSliceOffset(offset)
         if copySliceGeometryFrom:
             otherSliceLogic = layoutManager.sliceWidget(copySliceGeometryFrom.capitalize()).sliceLogic()
             otherSliceNode = otherSliceLogic.GetSliceNode()
@@ -960,13 +1219,14 @@ space origin: %%origin%%
             if orientation.lower() != previousOrientation:
                 sliceLogic.FitSliceToBackground()
 
-        imageData = sliceLogic.GetBlend().Update(0)
-        imageData = sliceLogic.GetBlend().GetOutputDataObject(0)
-        pngData = []
-        if imageData:
-            pngData = self.vtkImageDataToPNG(imageData)
-        self.logMessage("returning an image of %d length" % len(pngData))
-        return pngData, b"image/png"
+        stateKey = ("slice", view, size, self.sliceViewStateHash(sliceLogic))
+        return self.frameResponse(stateKey, lambda: self.sliceViewImage(sliceLogic), q, requestHeaders)
+
+    @staticmethod
+    def sliceViewImage(sliceLogic):
+        """Blended image of the layers of a slice view"""
+        sliceLogic.GetBlend().Update(0)
+        return sliceLogic.GetBlend().GetOutputDataObject(0)
 
     def threeDGraphics(self, request):
         """
@@ -1006,10 +1266,11 @@ space origin: %%origin%%
 
         return result.encode(), b"application/json"
 
-    def threeD(self, request):
+    def threeD(self, request, requestHeaders=None):
         """
         Handle requests with path: /threeD
-        Return a png for a threeD view.
+        Return an image of a threeD view (png by default, see `frameResponse` for format options).
+        The view is only rendered if the scene or the camera changed since the last identical request.
         """
 
         p = urllib.parse.urlparse(request.decode())
@@ -1053,7 +1314,6 @@ space origin: %%origin%%
 
         layoutManager = slicer.app.layoutManager()
         view = layoutManager.threeDWidget(0).threeDView()
-        view.renderEnabled = False
 
         if lookFromAxis:
             axes = ["None", "r", "l", "s", "i", "a", "p"]
@@ -1063,6 +1323,13 @@ space origin: %%origin%%
             except ValueError:
                 pass
 
+        stateKey = ("threeD", size, self.threeDViewStateHash(view))
+        return self.frameResponse(stateKey, lambda: self.threeDViewImage(view), q, requestHeaders)
+
+    @staticmethod
+    def threeDViewImage(view):
+        """Render a threeD view and return its RGB image (encodeImage adds an opaque alpha channel for raw frames)"""
+        view.renderEnabled = False
         view.renderWindow().Render()
         view.renderEnabled = True
         view.forceRender()
@@ -1070,11 +1337,191 @@ space origin: %%origin%%
         w2i.SetInput(view.renderWindow())
         w2i.SetReadFrontBuffer(0)
         w2i.Update()
-        imageData = w2i.GetOutput()
+        return w2i.GetOutput()
 
-        pngData = self.vtkImageDataToPNG(imageData)
-        self.logMessage("threeD returning an image of %d length" % len(pngData))
-        return pngData, b"image/png"
+    def stream(self, request):
+        """
+        Handle requests with path: /stream
+        Open a WebSocket connection that pushes the image of a view whenever the view changes.
+        Only the changed rectangle of the image is sent and frames are dropped for slow clients (see FrameStream).
+        Query parameters: view (red, yellow, green, or threeD), fps (maximum frame rate),
+        format (raw, png, jpeg, webp), quality (of jpeg and webp).
+        """
+        p = urllib.parse.urlparse(request.decode())
+        q = urllib.parse.parse_qs(p.query)
+        try:
+            view = q["view"][0].strip().lower()
+        except KeyError:
+            view = "red"
+        try:
+            framesPerSecond = float(q["fps"][0].strip())
+        except (KeyError, ValueError):
+            framesPerSecond = 10.0
+        try:
+            imageFormat = q["format"][0].strip().lower()
+        except KeyError:
+            imageFormat = "raw"
+        if imageFormat not in ["png", "jpeg", "jpg", "webp", "raw"]:
+            raise RuntimeError(f"image format {imageFormat} not supported")
+        try:
+            quality = int(q["quality"][0].strip())
+        except (KeyError, ValueError):
+            quality = 90
+
+        layoutManager = slicer.app.layoutManager()
+        if view == "threed":
+            threeDView = layoutManager.threeDWidget(0).threeDView()
+            stateKey = functools.partial(self.threeDViewStateHash, threeDView)
+            render = functools.partial(self.threeDViewImage, threeDView)
+        else:
+            if view not in ["red", "yellow", "green"]:
+                view = "red"
+            sliceLogic = layoutManager.sliceWidget(view.capitalize()).sliceLogic()
+            stateKey = functools.partial(self.sliceViewStateHash, sliceLogic)
+            render = functools.partial(self.sliceViewImage, sliceLogic)
+
+        frameStream = FrameStream(stateKey, render, self.encodeImage, imageFormat, quality, framesPerSecond, self.logMessage)
+        return frameStream, b"application/octet-stream"
+
+    def frameResponse(self, stateKey, render, query, requestHeaders=None):
+        """Encoded image of a view, from the frame cache if the view state is unchanged.
+
+        Query parameters:
+        - format: png (default), jpeg, webp (if supported by Qt image plugins) or raw (RGBA pixels,
+          rows from top to bottom, size in X-Image-Width and X-Image-Height response headers)
+        - quality: 0-100, quality of jpeg and webp images (default 90)
+
+        The response has an ETag; if the client sends it in If-None-Match and the view is unchanged
+        then 304 Not Modified is returned without rendering.
+
+        :param stateKey: hashable description of everything the rendered image depends on
+        :param render: function that renders the view and returns the image as vtkImageData (or None)
+        :return: tuple of response body, content type, response header fields
+        """
+        try:
+            imageFormat = query["format"][0].strip().lower()
+        except KeyError:
+            imageFormat = "png"
+        if imageFormat not in ["png", "jpeg", "jpg", "webp", "raw"]:
+            raise RuntimeError(f"image format {imageFormat} not supported")
+        try:
+            quality = int(query["quality"][0].strip())
+        except (KeyError, ValueError):
+            quality = 90
+        key = (stateKey, imageFormat, quality)
+        entityTag = self.frameCache.entityTag(key)
+
+        ifNoneMatch = (requestHeaders or {}).get(b"if-none-match", b"").decode(errors="replace")
+        if entityTag in [tag.strip() for tag in ifNoneMatch.split(",")]:
+            return b"", b"text/plain", {"Status": "304 Not Modified", "ETag": entityTag}
+
+        frame = self.frameCache.get(key)
+        if frame is None:
+            imageData = render()
+            if not imageData:
+                return None, b"text/plain", {}
+            frame = self.frameCache.add(key, *self.encodeImage(imageData, imageFormat, quality))
+        contentType, body, responseHeaders = frame
+        self.logMessage("returning an image of %d length" % len(body))
+        return body, contentType, {"ETag": entityTag, **responseHeaders}
+
+    @staticmethod
+    def nodeStateKey(node):
+        """MTimes of a node, its data, display and color nodes, and parent transforms"""
+        if node is None:
+            return None
+        key = [node.GetID(), node.GetMTime()]
+        for dataGetter in ["GetImageData", "GetMesh", "GetSegmentation"]:
+            data = getattr(node, dataGetter)() if hasattr(node, dataGetter) else None
+            if data is not None:
+                key.append(data.GetMTime())
+        if hasattr(node, "GetDisplayNode") and node.GetDisplayNode():
+            displayNode = node.GetDisplayNode()
+            key.append(displayNode.GetMTime())
+            if hasattr(displayNode, "GetColorNode") and displayNode.GetColorNode():
+                key.append(displayNode.GetColorNode().GetMTime())
+        transformNode = node.GetParentTransformNode() if hasattr(node, "GetParentTransformNode") else None
+        while transformNode:
+            key.append(transformNode.GetMTime())
+            transformNode = transformNode.GetParentTransformNode()
+        return tuple(key)
+
+    @classmethod
+    def sliceViewStateHash(cls, sliceLogic):
+        """Hash of the MRML state that the blended image of a slice view depends on"""
+        sliceNode = sliceLogic.GetSliceNode()
+        xyToRAS = sliceNode.GetXYToRAS()
+        state = [
+            # slice geometry by value, as setting an unchanged geometry modifies the slice node
+            tuple(xyToRAS.GetElement(row, column) for row in range(4) for column in range(4)),
+            tuple(sliceNode.GetDimensions()),
+            # display properties of the slice node that the layers are resampled and blended with
+            sliceNode.GetUseLabelOutline(),
+            sliceNode.GetSliceResolutionMode(),
+            tuple(sliceNode.GetUVWDimensions()),
+            tuple(sliceNode.GetUVWExtents()),
+            tuple(sliceNode.GetUVWOrigin()),
+            sliceLogic.GetSliceCompositeNode().GetMTime(),
+        ]
+        for layer in [sliceLogic.GetBackgroundLayer(), sliceLogic.GetForegroundLayer(), sliceLogic.GetLabelLayer()]:
+            state.append(cls.nodeStateKey(layer.GetVolumeNode()) if layer else None)
+        return hashlib.sha1(repr(state).encode(), usedforsecurity=False).hexdigest()
+
+    @classmethod
+    def threeDViewStateHash(cls, view):
+        """Hash of the MRML state (all nodes, by modification time) and the camera of a threeD view"""
+        renderWindow = view.renderWindow()
+        camera = renderWindow.GetRenderers().GetFirstRenderer().GetActiveCamera()
+        state = [
+            # camera by value, as camera nodes are modified whenever the camera is reset
+            camera.GetPosition(), camera.GetFocalPoint(), camera.GetViewUp(),
+            camera.GetViewAngle(), camera.GetParallelScale(), camera.GetParallelProjection(),
+            tuple(renderWindow.GetSize()),
+        ]
+        for nodeIndex in range(slicer.mrmlScene.GetNumberOfNodes()):
+            node = slicer.mrmlScene.GetNthNode(nodeIndex)
+            if not node.IsA("vtkMRMLCameraNode"):
+                state.append(cls.nodeStateKey(node))
+        return hashlib.sha1(repr(state).encode(), usedforsecurity=False).hexdigest()
+
+    def encodeImage(self, imageData, imageFormat="png", quality=90):
+        """Encode an RGB or RGBA image
+        :param imageData: vtkImageData of unsigned char scalars
+        :param imageFormat: png, jpeg, webp or raw
+        :param quality: quality of jpeg and webp images (0-100)
+        :return: tuple of content type, encoded image, response header fields
+        """
+        if imageFormat == "png":
+            return b"image/png", self.vtkImageDataToPNG(imageData), {}
+        if imageFormat in ["jpeg", "jpg"]:
+            rgb = vtk.vtkImageExtractComponents()
+            rgb.SetInputData(imageData)
+            rgb.SetComponents(0, 1, 2)
+            writer = vtk.vtkJPEGWriter()
+            writer.SetWriteToMemory(True)
+            writer.SetInputConnection(rgb.GetOutputPort())
+            writer.SetQuality(max(0, min(quality, 100)))
+            writer.Write()
+            return b"image/jpeg", vtk.util.numpy_support.vtk_to_numpy(writer.GetResult()).tobytes(), {}
+        if imageFormat == "webp":
+            if b"webp" not in [bytes(supportedFormat.data()) for supportedFormat in qt.QImageWriter.supportedImageFormats()]:
+                raise RuntimeError("webp format is not supported by the installed Qt image plugins")
+            image = qt.QImage()
+            slicer.qMRMLUtils().vtkImageDataToQImage(imageData, image)
+            byteArray = qt.QByteArray()
+            buffer = qt.QBuffer(byteArray)
+            buffer.open(qt.QIODevice.WriteOnly)
+            image.save(buffer, "WEBP", max(0, min(quality, 100)))
+            return b"image/webp", byteArray.data(), {}
+        if imageFormat == "raw":
+            width, height, _depth = imageData.GetDimensions()
+            pixels = vtk.util.numpy_support.vtk_to_numpy(imageData.GetPointData().GetScalars()).reshape(height, width, -1)
+            if pixels.shape[2] == 3:
+                pixels = numpy.dstack([pixels, numpy.full((height, width), 255, dtype=pixels.dtype)])
+            # vtkImageData rows are stored from bottom to top
+            rgba = numpy.ascontiguousarray(pixels[::-1, :, :4]).tobytes()
+            return b"application/octet-stream", rgba, {"X-Image-Width": width, "X-Image-Height": height}
+        raise RuntimeError(f"image format {imageFormat} not supported")
 
     def timeimage(self, request=""):
         """
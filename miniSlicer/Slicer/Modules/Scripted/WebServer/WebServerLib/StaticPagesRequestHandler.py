@@ -4,7 +4,7 @@ import os
 import re
 from typing import Optional
 
-from .BaseRequestHandler import BaseRequestHandler, BaseRequestLoggingFunction
+from .BaseRequestHandler import BaseRequestHandler, BaseRequestLoggingFunction, FileResponseBody
 
 logger = logging.getLogger(__name__)
 
@@ -54,12 +54,11 @@ class StaticPagesRequestHandler(BaseRequestHandler):
     def handleRequest(
         self, method: str, uri: bytes, requestBody: bytes,
     ) -> tuple[bytes, bytes]:
-        """Return directory listing or binary contents of files
-        TODO: other header fields like modified time
+        """Return directory listing or contents of files
 
         :param uri: portion of the url specifying the file path
         :param requestBody: binary data passed with the http request
-        :return: tuple of content type (based on file ext) and request body binary (contents of file)
+        :return: tuple of content type (based on file ext) and response body (directory listing or FileResponseBody)
         """
 
         # rewrite URL paths according to rules
@@ -91,10 +90,7 @@ class StaticPagesRequestHandler(BaseRequestHandler):
             ext = os.path.splitext(path)[-1].decode()
             if ext in mimetypes.types_map:
                 contentType = mimetypes.types_map[ext].encode()
-            try:
-                fp = open(path, "rb")
-                responseBody = fp.read()
-                fp.close()
-            except OSError:
-                responseBody = None
+            if os.path.isfile(path):
+                # sent by the server directly from the file
+                responseBody = FileResponseBody(path)
         return contentType, responseBody
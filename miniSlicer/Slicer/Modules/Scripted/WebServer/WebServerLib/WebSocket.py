@@ -0,0 +1,103 @@
+"""WebSocket protocol (RFC 6455) support of the Slicer WebServer module."""
+
+import base64
+import hashlib
+import struct
+
+# Frame opcodes
+OPCODE_CONTINUATION = 0x0
+OPCODE_TEXT = 0x1
+OPCODE_BINARY = 0x2
+OPCODE_CLOSE = 0x8
+OPCODE_PING = 0x9
+OPCODE_PONG = 0xA
+
+# Close status codes
+CLOSE_NORMAL = 1000
+CLOSE_PROTOCOL_ERROR = 1002
+CLOSE_MESSAGE_TOO_BIG = 1009
+
+_acceptKeyGUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class WebSocketSession:
+    """
+    Server side of a WebSocket connection.
+
+    A request handler accepts a WebSocket upgrade request by returning a session object as response body.
+    The web server then completes the opening handshake, calls `onOpen` with the connection,
+    which provides `sendMessage(payload, binary=True)`, `hasPendingData()` and `closeWebSocket(code)`,
+    and calls `onMessage` for each message received from the client and `onClose` when the connection is closed.
+    All methods are called from the main thread.
+    """
+
+    def __init__(self):
+        self.connection = None
+
+    def onOpen(self, connection):
+        self.connection = connection
+
+    def onMessage(self, payload: bytes, binary: bool):
+        pass
+
+    def onClose(self):
+        self.connection = None
+
+
+def isUpgradeRequest(method: str, headers: dict) -> bool:
+    """Whether the request (header names are lowercase bytes) is a valid WebSocket opening handshake"""
+    return (method == "GET"
+            and b"websocket" in headers.get(b"upgrade", b"").lower()
+            and b"upgrade" in headers.get(b"connection", b"").lower()
+            and headers.get(b"sec-websocket-version", b"") == b"13"
+            and bool(headers.get(b"sec-websocket-key")))
+
+
+def acceptKey(key: bytes) -> bytes:
+    """Value of the Sec-WebSocket-Accept response header for the Sec-WebSocket-Key of the request"""
+    return base64.b64encode(hashlib.sha1(key.strip() + _acceptKeyGUID, usedforsecurity=False).digest())
+
+
+def frameHeader(opcode: int, payloadSize: int) -> bytes:
+    """Header of a final, unmasked (server to client) frame"""
+    if payloadSize < 126:
+        return struct.pack("!BB", 0x80 | opcode, payloadSize)
+    if payloadSize < 65536:
+        return struct.pack("!BBH", 0x80 | opcode, 126, payloadSize)
+    return struct.pack("!BBQ", 0x80 | opcode, 127, payloadSize)
+
+
+def decodeFrame(buffer: bytearray, maxPayloadSize: int):
+    """Decode the first (client to server) frame of the buffer.
+    :return: tuple of (final, opcode, payload, frame size) or None if the frame is not completely received yet
+    :raises ValueError: if the frame is not masked or its payload is larger than maxPayloadSize
+    """
+    if len(buffer) < 2:
+        return None
+    final = bool(buffer[0] & 0x80)
+    opcode = buffer[0] & 0x0F
+    if not buffer[1] & 0x80:
+        raise ValueError("client frames must be masked")
+    payloadSize = buffer[1] & 0x7F
+    position = 2
+    if payloadSize == 126:
+        if len(buffer) < 4:
+            return None
+        payloadSize = struct.unpack_from("!H", buffer, 2)[0]
+        position = 4
+    elif payloadSize == 127:
+        if len(buffer) < 10:
+            return None
+        payloadSize = struct.unpack_from("!Q", buffer, 2)[0]
+        position = 10
+    if payloadSize > maxPayloadSize:
+        raise ValueError("frame payload of %d bytes is too large" % payloadSize)
+    frameSize = position + 4 + payloadSize
+    if len(buffer) < frameSize:
+        return None
+    mask = bytes(buffer[position:position + 4])
+    payload = bytes(buffer[position + 4:frameSize])
+    # unmask all bytes at once, as a big integer
+    repeatedMask = (mask * (payloadSize // 4 + 1))[:payloadSize]
+    payload = (int.from_bytes(payload, "little") ^ int.from_bytes(repeatedMask, "little")).to_bytes(payloadSize, "little")
+    return final, opcode, payload, frameSize
@@ -1,6 +1,8 @@
 import os
 import unittest
 import logging
+import collections
+import threading
 import vtk, qt, ctk, slicer
 from slicer.i18n import tr as _
 from slicer.i18n import translate
@@ -8,6 +10,7 @@ from slicer.i18n import translate
 import numpy as np
 from slicer.ScriptedLoadableModule import *
 from slicer.util import VTKObservationMixin
+from vtk.util.numpy_support import vtk_to_numpy
 
 """
   CrossSectionAnalysis: renamed from CenterlineMetrics, and merged with former deprecated CrossSectionAnalysis module.
@@ -211,6 +214,8 @@ class CrossSectionAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMix
     Called when the application closes and the module widget is destroyed.
     """
     self.removeObservers()
+    self.logic.removeObservers()
+    self.logic.crossSectionPolyDataCache.shutdown()
 
   def enter(self):
     # Make sure parameter node exists and observed
@@ -873,11 +878,183 @@ class CrossSectionAnalysisWidget(ScriptedLoadableModuleWidget, VTKObservationMix
     qasLogic.replaceSegmentByLargestRegion(segmentation, segmentID)
     self.onGetRegionsButton()
 
+#
+# CrossSectionPolyDataCache
+#
+
+class CrossSectionPolyDataCache:
+  """Memory-bounded LRU cache of cross-section polydata, keyed by centerline point index.
+
+  The least recently used sections are evicted when the total size exceeds
+  maximumBytes. Sections around the browsed point can be prefetched on a
+  worker thread. The worker never touches MRML nodes: it works on a source
+  snapshot (world surface polydata, centers and normals of all centerline
+  points) that the logic prepares on the main thread with setSource().
+  clear() drops the sections and the source; results of a prefetch that
+  was running at that time are discarded.
+  """
+  def __init__(self, maximumBytes = None, prefetchCount = None):
+    self.maximumBytes = CROSS_SECTION_CACHE_MAXIMUM_BYTES if maximumBytes is None else maximumBytes
+    self.prefetchCount = CROSS_SECTION_PREFETCH_COUNT if prefetchCount is None else prefetchCount
+    self.numberOfBytes = 0
+    self.hits = 0
+    self.misses = 0
+    self.prefetched = 0
+    self._items = collections.OrderedDict() # pointIndex -> (polydata, size)
+    self._condition = threading.Condition()
+    self._generation = 0
+    self._source = None
+    self._workerSource = None
+    self._pending = collections.deque()
+    self._current = None
+    self._worker = None
+    self._stopped = False
+
+  def __len__(self):
+    with self._condition:
+      return len(self._items)
+
+  def __contains__(self, pointIndex):
+    with self._condition:
+      return pointIndex in self._items
+
+  def get(self, pointIndex):
+    """Return the cached polydata and mark it as recently used, or None; updates the hit/miss counters."""
+    with self._condition:
+      item = self._items.get(pointIndex)
+      if item is None:
+        self.misses += 1
+        return None
+      self._items.move_to_end(pointIndex)
+      self.hits += 1
+      return item[0]
+
+  def put(self, pointIndex, polyData):
+    with self._condition:
+      self._store(pointIndex, polyData)
+
+  def clear(self):
+    with self._condition:
+      self._items.clear()
+      self.numberOfBytes = 0
+      self._source = None
+      self._workerSource = None
+      self._pending.clear()
+      self._generation += 1
+
+  def statistics(self):
+    with self._condition:
+      lookups = self.hits + self.misses
+      return {
+        "sections": len(self._items),
+        "bytes": self.numberOfBytes,
+        "hits": self.hits,
+        "misses": self.misses,
+        "prefetched": self.prefetched,
+        "hitRatio": (self.hits / lookups) if lookups else 0.0,
+        }
+
+  def getSource(self):
+    with self._condition:
+      return self._source
+
+  def setSource(self, source):
+    """source is a (surfacePolyData, centers, normals) tuple; centers and normals are (N, 3) arrays."""
+    with self._condition:
+      self._source = source
+      self._workerSource = None
+
+  def prefetch(self, pointIndex, numberOfPoints):
+    """Queue the prefetchCount sections after and before pointIndex, nearest first.
+    Pending requests of a previous position are dropped: only the latest scrub position matters.
+    """
+    with self._condition:
+      if self._source is None or self.prefetchCount <= 0 or self._stopped:
+        return
+      indices = []
+      for offset in range(1, self.prefetchCount + 1):
+        for index in (pointIndex + offset, pointIndex - offset):
+          if 0 <= index < numberOfPoints and index not in self._items:
+            indices.append(index)
+      self._current = pointIndex
+      self._pending.clear()
+      self._pending.extend(indices)
+      if not indices:
+        return
+      if self._worker is None or not self._worker.is_alive():
+        self._worker = threading.Thread(target = self._prefetchLoop, name = "CrossSectionPrefetch", daemon = True)
+        self._worker.start()
+      self._condition.notify()
+
+  def shutdown(self):
+    with self._condition:
+      self._stopped = True
+      self._pending.clear()
+      self._condition.notify_all()
+    if self._worker is not None and self._worker is not threading.current_thread():
+      self._worker.join()
+    self._worker = None
+
+  def _store(self, pointIndex, polyData):
+    # GetActualMemorySize() is in kibibytes.
+    size = polyData.GetActualMemorySize() * 1024
+    previous = self._items.pop(pointIndex, None)
+    if previous is not None:
+      self.numberOfBytes -= previous[1]
+    self._items[pointIndex] = (polyData, size)
+    self.numberOfBytes += size
+    # Evict the least recently used sections, but never the one just stored nor the browsed one.
+    protected = (pointIndex, self._current)
+    candidates = (index for index in list(self._items) if index not in protected)
+    while self.numberOfBytes > self.maximumBytes:
+      evictedIndex = next(candidates, None)
+      if evictedIndex is None:
+        break
+      _, evictedSize = self._items.pop(evictedIndex)
+      self.numberOfBytes -= evictedSize
+
+  def _prefetchLoop(self):
+    while True:
+      with self._condition:
+        while not self._pending and not self._stopped:
+          self._condition.wait()
+        if self._stopped:
+          return
+        pointIndex = self._pending.popleft()
+        if pointIndex in self._items or self._source is None:
+          continue
+        generation = self._generation
+        if self._workerSource is None:
+          # The worker slices its own copy of the surface; the main thread may slice the original concurrently.
+          surfacePolyData, centers, normals = self._source
+          workerSurfacePolyData = vtk.vtkPolyData()
+          workerSurfacePolyData.DeepCopy(surfacePolyData)
+          self._workerSource = (workerSurfacePolyData, centers, normals)
+        source = self._workerSource
+      polyData, _ = CrossSectionPolyDataCache.createCrossSection(source, pointIndex)
+      with self._condition:
+        if generation == self._generation and pointIndex not in self._items:
+          self._store(pointIndex, polyData)
+          self.prefetched += 1
+
+  @staticmethod
+  def createCrossSection(source, pointIndex):
+    """Cut the source surface at a centerline point; returns (polydata, empty)."""
+    surfacePolyData, centers, normals = source
+    plane = vtk.vtkPlane()
+    plane.SetOrigin(centers[pointIndex])
+    plane.SetNormal(normals[pointIndex])
+    result = vtk.vtkPolyData()
+    import vtkSlicerCrossSectionAnalysisModuleLogicPython as vtkSlicerCrossSectionAnalysisModuleLogic
+    crossSectionWorker = vtkSlicerCrossSectionAnalysisModuleLogic.vtkCrossSectionCompute()
+    ret = crossSectionWorker.CreateCrossSection(result, surfacePolyData, plane, crossSectionWorker.ClosestPoint, True)
+    return result, (ret == crossSectionWorker.Empty)
+
 #
 # CrossSectionAnalysisLogic
 #
 
-class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
+class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic, VTKObservationMixin):
   """This class should implement all the actual
   computation done by your module.  The interface
   should be such that other python code can import
@@ -888,9 +1065,14 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
   """
   def __init__(self):
     ScriptedLoadableModuleLogic.__init__(self)
+    VTKObservationMixin.__init__(self)
+    self.crossSectionPolyDataCache = None
     self.initMemberVariables()
 
   def initMemberVariables(self):
+    self.removeObservers(self.onCrossSectionInputModified)
+    if self.crossSectionPolyDataCache is not None:
+      self.crossSectionPolyDataCache.shutdown()
     # For a Shape markups node, inputCenterlineNode is the node itself: wall + invisible spline as centerline.
     self.inputCenterlineNode = None
     self.outputPlotSeriesNode = None
@@ -900,7 +1082,7 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
     self.coordinateSystemColumnRAS = True  # LPS or RAS
     self.lumenSurfaceNode = None
     self.currentSegmentID = ""
-    self.crossSectionPolyDataCache = {}
+    self.crossSectionPolyDataCache = CrossSectionPolyDataCache()
     self.crossSectionColor = [0.2, 0.2, 1.0]
     self.showCrossSection = False
     self.crossSectionModelNode = None
@@ -942,7 +1124,32 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
     parameterNode.SetParameter(ROLE_INITIALIZED, "1")
 
   def resetCrossSections(self):
-    self.crossSectionPolyDataCache = {}
+    self.crossSectionPolyDataCache.clear()
+    self.observeCrossSectionInputs()
+
+  def observeCrossSectionInputs(self):
+    """Invalidate the cached cross-sections when the centerline or the surface is modified.
+    """
+    self.removeObservers(self.onCrossSectionInputModified)
+    events = {
+      self.inputCenterlineNode : [vtk.vtkCommand.ModifiedEvent],
+      self.lumenSurfaceNode : [vtk.vtkCommand.ModifiedEvent],
+      }
+    if self.inputCenterlineNode and self.inputCenterlineNode.IsA("vtkMRMLMarkupsNode"):
+      events[self.inputCenterlineNode].append(slicer.vtkMRMLMarkupsNode.PointModifiedEvent)
+    for node in (self.inputCenterlineNode, self.lumenSurfaceNode):
+      if node and node.IsA("vtkMRMLModelNode"):
+        events[node].append(slicer.vtkMRMLModelNode.MeshModifiedEvent)
+    for node, nodeEvents in events.items():
+      if not node:
+        continue
+      for event in nodeEvents:
+        self.addObserver(node, event, self.onCrossSectionInputModified)
+    if self.lumenSurfaceNode and self.lumenSurfaceNode.IsA("vtkMRMLSegmentationNode"):
+      self.addObserver(self.lumenSurfaceNode.GetSegmentation(), slicer.vtkSegmentation.RepresentationModified, self.onCrossSectionInputModified)
+
+  def onCrossSectionInputModified(self, caller, event):
+    self.crossSectionPolyDataCache.clear()
 
   def setInputCenterlineNode(self, centerlineNode):
     if self.inputCenterlineNode == centerlineNode:
@@ -1173,76 +1380,25 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
     # Custom attribute for quick access to coordinates type.
     outputTable.SetAttribute("type", "RAS" if self.coordinateSystemColumnRAS else "LPS")
 
-    if (inputCenterline.IsTypeOf("vtkMRMLModelNode")):
-        pointsLocal = slicer.util.arrayFromModelPoints(inputCenterline)
-        points = np.zeros(pointsLocal.shape)
-        numberOfPoints = len(points)
-        for pointIndex in range(len(pointsLocal)):
-          inputCenterline.TransformPointToWorld(pointsLocal[pointIndex], points[pointIndex])
-        if inputCenterline.HasPointScalarName("Radius"):
-          radii = slicer.util.arrayFromModelPointData(inputCenterline, 'Radius')
-        else:
-          radii = np.zeros(0)
-    else: # Shape, VMTK curve centerline or arbitrary curve centerline
-        if (inputCenterline.IsTypeOf("vtkMRMLMarkupsShapeNode")):
-          trimmedSpline = vtk.vtkPolyData()
-          trimmedSplineAvailable = False
-          if not inputCenterline.GetTrimmedSplineWorld(trimmedSpline):
-            numberOfPoints = inputCenterline.GetSplineWorld().GetNumberOfPoints()
-          else:
-            numberOfPoints = trimmedSpline.GetNumberOfPoints()
-            trimmedSplineAvailable = True
-          points = np.zeros([numberOfPoints, 3])
-          for p in range(numberOfPoints):
-            point = np.zeros(3)
-            if not trimmedSplineAvailable:
-              inputCenterline.GetSplineWorld().GetPoint(p, point)
-            else:
-              trimmedSpline.GetPoint(p, point)
-            points[p] = point
-        else: # VMTK curve centerline or arbitrary curve centerline
-          points = slicer.util.arrayFromMarkupsCurvePoints(inputCenterline, world=True)
-          controlPointFloatIndices = inputCenterline.GetCurveWorld().GetPointData().GetArray('PedigreeIDs')
-          numberOfPoints = len(points)
-
-        radii = np.zeros(numberOfPoints)
-        radiusMeasurement = inputCenterline.GetMeasurement("Radius")
-        controlPointRadiusValues = vtk.vtkDoubleArray()
-        if radiusMeasurement: # VMTK curve centerline
-            controlPointRadiusValues = inputCenterline.GetMeasurement('Radius').GetControlPointValues()
-            for pointIndex in range(numberOfPoints-1):
-                controlPointFloatIndex = controlPointFloatIndices.GetValue(pointIndex)
-                controlPointIndexA = int(controlPointFloatIndex)
-                controlPointIndexB = controlPointIndexA + 1
-                radiusA = controlPointRadiusValues.GetValue(controlPointIndexA)
-                radiusB = controlPointRadiusValues.GetValue(controlPointIndexB)
-                radius = radiusA * (controlPointFloatIndex - controlPointIndexA) + radiusB * (controlPointIndexB - controlPointFloatIndex)
-                radii[pointIndex] = radius
-            radii[numberOfPoints-1] = controlPointRadiusValues.GetValue(controlPointRadiusValues.GetNumberOfValues()-1)
-        else:
-          radii = np.zeros(0)
+    stageTimes = []
+    stageStartTime = time.time()
+    points, radii = self.getCenterlinePointsAndRadii(inputCenterline)
+    numberOfPoints = len(points)
+    stageTimes.append(("centerline", time.time() - stageStartTime))
 
     outputTable.GetTable().SetNumberOfRows(numberOfPoints)
 
     """
     Fill in cross-section areas in C++ threads.
     """
+    stageStartTime = time.time()
     import vtkSlicerCrossSectionAnalysisModuleLogicPython as vtkSlicerCrossSectionAnalysisModuleLogic
     crossSectionCompute = vtkSlicerCrossSectionAnalysisModuleLogic.vtkCrossSectionCompute()
     # If numberOfThreads > number of cores, excessive threads would be in infinite loop.
     numberOfThreads = os.cpu_count() if (numberOfPoints >= os.cpu_count()) else numberOfPoints
     crossSectionCompute.SetNumberOfThreads(numberOfThreads)
     if self.isInputCenterlineValid():
-        if inputCenterline.IsTypeOf("vtkMRMLModelNode"):
-            crossSectionCompute.SetInputCenterlinePolyData(inputCenterline.GetPolyData())
-        elif inputCenterline.IsTypeOf("vtkMRMLMarkupsShapeNode"):
-            trimmedSpline = vtk.vtkPolyData()
-            if not inputCenterline.GetTrimmedSplineWorld(trimmedSpline):
-              crossSectionCompute.SetInputCenterlinePolyData(inputCenterline.GetSplineWorld())
-            else:
-              crossSectionCompute.SetInputCenterlinePolyData(trimmedSpline)
-        else:
-            crossSectionCompute.SetInputCenterlinePolyData(inputCenterline.GetCurveWorld())
+        crossSectionCompute.SetInputCenterlinePolyData(self.getCenterlinePolyData(inputCenterline))
     if self.lumenSurfaceNode:
         crossSectionCompute.SetInputSurfaceNode(self.lumenSurfaceNode, self.currentSegmentID)
         self.showStatusMessage((_("Waiting for background jobs..."), ))
@@ -1276,54 +1432,48 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
         raise RuntimeError("Failed to compute cross-sections.")
       self._informAboutEmptySections(wallEmptySectionIds, inputCenterline.GetName())
 
+    stageTimes.append(("cross-sections", time.time() - stageStartTime))
+
+    stageStartTime = time.time()
     cumArray = vtk.vtkDoubleArray()
     self.cumulateDistances(points, cumArray)
     relArray = vtk.vtkDoubleArray()
     self.updateCumulativeDistancesToRelativeOrigin(cumArray, relArray)
+    # Distance from relative origin
+    self.setArrayValues(distanceArray, vtk_to_numpy(relArray))
+    # Radii
+    if radii.size and misDiameterArray:
+      self.setArrayValues(misDiameterArray, radii * 2)
+    # Diameter and surface area stenosis
+    if (inputCenterline.IsTypeOf("vtkMRMLMarkupsShapeNode")) and self.lumenSurfaceNode:
+      # The resolution of the Tube may be too low and can be increased.
+      wallDiameters = vtk_to_numpy(wallDiameterArray)
+      wallCrossSectionAreas = vtk_to_numpy(wallCrossSectionAreaArray)
+      valid = (wallDiameters != 0) & (wallCrossSectionAreas != 0)
+      diameterStenosis = np.full(numberOfPoints, -1.0)
+      surfaceAreaStenosis = np.full(numberOfPoints, -1.0)
+      diameterStenosis[valid] = ((wallDiameters[valid] - vtk_to_numpy(ceDiameterArray)[valid]) / wallDiameters[valid]) * 100
+      surfaceAreaStenosis[valid] = ((wallCrossSectionAreas[valid] - vtk_to_numpy(crossSectionAreaArray)[valid]) / wallCrossSectionAreas[valid]) * 100
+      # vtkCrossSectionCompute has already provided the indices; don't flood the console.
+      self.setArrayValues(surfaceAreaStenosisArray, surfaceAreaStenosis)
+      self.setArrayValues(diameterStenosisArray, diameterStenosis)
+    # Convert the point coordinates
+    coordinateValues = points if self.coordinateSystemColumnRAS else points * [-1.0, -1.0, 1.0]
+    if self.coordinateSystemColumnSingle:
+      self.setArrayValues(coordinatesArray, coordinateValues)
+    else:
+      for component in range(3):
+        self.setArrayValues(coordinatesArray[component], coordinateValues[:, component])
 
-    for i in range(numberOfPoints):
-      if (((i + 1) % 25) == 0):
-          self.showStatusMessage((_("Updating table:"), str(i + 1), "/", str(numberOfPoints)))
-      # Distance from relative origin
-      distanceArray.SetValue(i, relArray.GetValue(i))
-      # Radii
-      if radii.size and misDiameterArray:
-            misDiameterArray.SetValue(i, radii[i] * 2)
-      # Diameter and surface area stenosis
-      if (inputCenterline.IsTypeOf("vtkMRMLMarkupsShapeNode")) and self.lumenSurfaceNode:
-        # The resolution of the Tube may be too low and can be increased.
-        diameterStenosis = -1.0
-        surfaceAreaStenosis = -1.0
-        if (wallDiameterArray.GetValue(i)) and (wallCrossSectionAreaArray.GetValue(i)):
-          diameterStenosis = ((wallDiameterArray.GetValue(i) - ceDiameterArray.GetValue(i)) / wallDiameterArray.GetValue(i)) * 100
-          surfaceAreaStenosis = ((wallCrossSectionAreaArray.GetValue(i) - crossSectionAreaArray.GetValue(i)) / wallCrossSectionAreaArray.GetValue(i)) * 100
-        # vtkCrossSectionCompute has already provided the indices; don't flood the console.
-        surfaceAreaStenosisArray.SetValue(i, surfaceAreaStenosis)
-        diameterStenosisArray.SetValue(i, diameterStenosis)
-      # Convert each point coordinate
-      if self.coordinateSystemColumnRAS:
-        coordinateValues = points[i]
-      else:
-        coordinateValues = [-points[i][0], -points[i][1], points[i][2]]
-      if self.coordinateSystemColumnSingle:
-          coordinatesArray.SetTuple3(i, coordinateValues[0], coordinateValues[1], coordinateValues[2])
-      else:
-          coordinatesArray[0].SetValue(i, coordinateValues[0])
-          coordinatesArray[1].SetValue(i, coordinateValues[1])
-          coordinatesArray[2].SetValue(i, coordinateValues[2])
-
-    distanceArray.Modified()
-    if misDiameterArray:
-      misDiameterArray.Modified()
     if (inputCenterline.IsTypeOf("vtkMRMLMarkupsShapeNode")):
       wallDiameterArray.Modified()
       wallCrossSectionAreaArray.Modified()
-      if self.lumenSurfaceNode:
-        surfaceAreaStenosisArray.Modified()
     if self.lumenSurfaceNode:
       crossSectionAreaArray.Modified()
       ceDiameterArray.Modified()
     outputTable.GetTable().Modified()
+    stageTimes.append(("table", time.time() - stageStartTime))
+    logging.info(_("Processing stages: {stages}").format(stages=", ".join("%s %.3f s" % stage for stage in stageTimes)))
 
     stopTime = time.time()
     durationValue = '%.2f' % (stopTime-startTime)
@@ -1331,6 +1481,151 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
     logging.info(message)
     slicer.util.showStatusMessage(message, 5000)
 
+  def getCenterlinePointsAndRadii(self, inputCenterline):
+    """World coordinates (N, 3) of the centerline points, and their radii (N,) or an empty array if unknown.
+    """
+    if (inputCenterline.IsTypeOf("vtkMRMLModelNode")):
+        # Transform all points to world at once.
+        pointsLocal = inputCenterline.GetPolyData().GetPoints()
+        if inputCenterline.GetParentTransformNode():
+          modelTransformToWorld = vtk.vtkGeneralTransform()
+          slicer.vtkMRMLTransformNode.GetTransformBetweenNodes(inputCenterline.GetParentTransformNode(), None, modelTransformToWorld)
+          pointsWorld = vtk.vtkPoints()
+          modelTransformToWorld.TransformPoints(pointsLocal, pointsWorld)
+        else:
+          pointsWorld = pointsLocal
+        points = np.array(vtk_to_numpy(pointsWorld.GetData()), dtype=float).reshape(-1, 3)
+        if inputCenterline.HasPointScalarName("Radius"):
+          radii = np.array(slicer.util.arrayFromModelPointData(inputCenterline, 'Radius'), dtype=float)
+        else:
+          radii = np.zeros(0)
+        return points, radii
+
+    if (inputCenterline.IsTypeOf("vtkMRMLMarkupsShapeNode")):
+      # Shape: no radius measurement.
+      splinePolyData = self.getCenterlinePolyData(inputCenterline)
+      points = np.array(vtk_to_numpy(splinePolyData.GetPoints().GetData()), dtype=float).reshape(-1, 3)
+      return points, np.zeros(0)
+
+    # VMTK curve centerline or arbitrary curve centerline
+    points = np.array(slicer.util.arrayFromMarkupsCurvePoints(inputCenterline, world=True), dtype=float)
+    radiusMeasurement = inputCenterline.GetMeasurement("Radius")
+    if not radiusMeasurement: # Arbitrary curve
+      return points, np.zeros(0)
+    # VMTK curve centerline: interpolate the control point radii at the curve points.
+    controlPointFloatIndices = vtk_to_numpy(inputCenterline.GetCurveWorld().GetPointData().GetArray('PedigreeIDs'))
+    controlPointRadii = vtk_to_numpy(radiusMeasurement.GetControlPointValues())
+    radii = np.interp(controlPointFloatIndices[:len(points)], np.arange(len(controlPointRadii)), controlPointRadii)
+    return points, radii
+
+  def setArrayValues(self, columnArray, values):
+    """Assign all values of a table column at once."""
+    columnValues = vtk_to_numpy(columnArray)
+    columnValues[:] = np.asarray(values, dtype=float).reshape(columnValues.shape)
+    columnArray.Modified()
+
+  def getCenterlinePolyData(self, inputCenterline):
+    """The centerline polydata that cross-sections are computed along, in world coordinates.
+    """
+    if inputCenterline.IsTypeOf("vtkMRMLModelNode"):
+        return inputCenterline.GetPolyData()
+    elif inputCenterline.IsTypeOf("vtkMRMLMarkupsShapeNode"):
+        trimmedSpline = vtk.vtkPolyData()
+        if not inputCenterline.GetTrimmedSplineWorld(trimmedSpline):
+          return inputCenterline.GetSplineWorld()
+        return trimmedSpline
+    else:
+        return inputCenterline.GetCurveWorld()
+
+  def computeCrossSectionContours(self, writer = None, unitScale = 0.1):
+    """Compute the polygons of all cross-sections along the centerline in one threaded pass.
+
+    The lumen surface is extracted and transformed once, and shared by all
+    sections. Returns a dictionary of NumPy arrays:
+      - points: (M, 3) ordered outer boundary points of all sections, in world coordinates;
+      - offsets: (N + 1,) section i spans points[offsets[i]:offsets[i + 1]];
+      - areas, ceDiameters: (N,) as in the output table;
+      - origins, tangents, normals, binormals: (N, 3) centerline frames;
+      - emptySectionIds: indices of the sections that have no polygon.
+
+    If writer is given, each non-empty section is also written with
+    writer.write_section(center, normal, scale, localY, localZ), the
+    interface of contour_io.open_contour_writer, following the VTL3D
+    contour convention: coordinates are multiplied by unitScale (mm to cm),
+    scale is the CE radius, and the local coordinates along the normal and
+    binormal are divided by it and sorted by polar angle.
+    """
+    if not self.isInputCenterlineValid():
+      raise ValueError(_("Input centerline is not valid."))
+    if not self.lumenSurfaceNode:
+      raise ValueError(_("Lumen surface node is not set."))
+    centerlinePolyData = self.getCenterlinePolyData(self.inputCenterlineNode)
+    numberOfPoints = centerlinePolyData.GetNumberOfPoints()
+
+    import vtkSlicerCrossSectionAnalysisModuleLogicPython as vtkSlicerCrossSectionAnalysisModuleLogic
+    crossSectionCompute = vtkSlicerCrossSectionAnalysisModuleLogic.vtkCrossSectionCompute()
+    crossSectionCompute.SetNumberOfThreads(max(1, min(os.cpu_count(), numberOfPoints)))
+    crossSectionCompute.SetInputCenterlinePolyData(centerlinePolyData)
+    crossSectionCompute.SetInputSurfaceNode(self.lumenSurfaceNode, self.currentSegmentID)
+
+    contourPoints = vtk.vtkPoints()
+    contourOffsets = vtk.vtkIdTypeArray()
+    crossSectionAreaArray = vtk.vtkDoubleArray()
+    ceDiameterArray = vtk.vtkDoubleArray()
+    emptySectionIds = vtk.vtkIdList()
+    self.showStatusMessage((_("Waiting for background jobs..."), ))
+    if not crossSectionCompute.ComputeContours(contourPoints, contourOffsets, crossSectionAreaArray, ceDiameterArray, emptySectionIds):
+      raise RuntimeError("Failed to compute cross-sections.")
+
+    frameGenerator = slicer.vtkParallelTransportFrame()
+    frameGenerator.SetInputData(centerlinePolyData)
+    frameGenerator.Update()
+    framePolyData = frameGenerator.GetOutput()
+    pointData = framePolyData.GetPointData()
+    result = {
+      "points": vtk_to_numpy(contourPoints.GetData()).reshape(-1, 3),
+      "offsets": vtk_to_numpy(contourOffsets).astype(np.int64),
+      "areas": vtk_to_numpy(crossSectionAreaArray),
+      "ceDiameters": vtk_to_numpy(ceDiameterArray),
+      "origins": vtk_to_numpy(framePolyData.GetPoints().GetData()).reshape(-1, 3),
+      "tangents": vtk_to_numpy(pointData.GetArray(frameGenerator.GetTangentsArrayName())).reshape(-1, 3),
+      "normals": vtk_to_numpy(pointData.GetArray(frameGenerator.GetNormalsArrayName())).reshape(-1, 3),
+      "binormals": vtk_to_numpy(pointData.GetArray(frameGenerator.GetBinormalsArrayName())).reshape(-1, 3),
+      "emptySectionIds": np.array([emptySectionIds.GetId(i) for i in range(emptySectionIds.GetNumberOfIds())], dtype=np.int64),
+      }
+    # vtk_to_numpy shares memory with the VTK arrays; keep copies only.
+    for key in result:
+      result[key] = np.array(result[key])
+
+    if writer is not None:
+      self.writeCrossSectionContours(result, writer, unitScale)
+    self.showStatusMessage((_("Cross-section contours computed: {count}").format(count = numberOfPoints), ))
+    return result
+
+  def writeCrossSectionContours(self, contours, writer, unitScale = 0.1):
+    """Stream the result of computeCrossSectionContours to a VTL3D contour writer.
+    Returns the number of sections written.
+    """
+    points, offsets = contours["points"], contours["offsets"]
+    written = 0
+    for i in range(len(offsets) - 1):
+      if offsets[i + 1] - offsets[i] < 3:
+        continue
+      radius = contours["ceDiameters"][i] / 2.0
+      relative = points[offsets[i]:offsets[i + 1]] - contours["origins"][i]
+      localY = relative @ contours["normals"][i]
+      localZ = relative @ contours["binormals"][i]
+      if radius > 1e-9:
+        localY = localY / radius
+        localZ = localZ / radius
+      order = np.argsort(np.arctan2(localZ, localY))
+      tangent = contours["tangents"][i]
+      # Same (Y, X) normal order as the VTL3D export scripts.
+      writer.write_section(contours["origins"][i] * unitScale, (tangent[1], tangent[0]), radius * unitScale,
+                           localY[order], localZ[order])
+      written += 1
+    return written
+
   def updatePlot(self, outputPlotSeries, outputTable):
 
     # Create plot
@@ -1424,21 +1719,18 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
     return False
 
   def cumulateDistances(self, arrPoints, cumArray):
+    arrPoints = np.asarray(arrPoints, dtype=float)
     cumArray.SetNumberOfValues(len(arrPoints))
-    previous = arrPoints[0]
-    dist = 0
-    for i, point in enumerate(arrPoints):
-      # https://stackoverflow.com/questions/1401712/how-can-the-euclidean-distance-be-calculated-with-numpy
-      dist += np.linalg.norm(point - previous)
-      cumArray.SetValue(i, dist)
-      previous = point
+    if not len(arrPoints):
+      return
+    steps = np.linalg.norm(np.diff(arrPoints, axis=0), axis=1)
+    self.setArrayValues(cumArray, np.concatenate(([0.0], np.cumsum(steps))))
 
   def updateCumulativeDistancesToRelativeOrigin(self, cumArray, relArray):
     distanceAtRelativeOrigin = cumArray.GetValue(self.relativeOriginPointIndex)
     numberOfValues = cumArray.GetNumberOfValues()
     relArray.SetNumberOfValues(numberOfValues)
-    for i in range(numberOfValues):
-      relArray.SetValue(i, cumArray.GetValue(i) - distanceAtRelativeOrigin)
+    self.setArrayValues(relArray, vtk_to_numpy(cumArray) - distanceAtRelativeOrigin)
 
   def getCurvePointPositionAtIndex(self, value):
     """Get the coordinates of a point of the centerline as RAS. value is index of point.
@@ -1585,18 +1877,12 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
     else:
       closedSurfacePolyData.DeepCopy(self.lumenSurfaceNode.GetPolyData())
 
-  def computeCrossSectionPolydata(self, pointIndex):
-    curvePointToWorld = self.getCurvePointToWorldTransformAtPointIndex(pointIndex)
-    center = np.zeros(3)
-    normal = np.zeros(3)
-    for i in range(3):
-      center[i] = curvePointToWorld.GetElement(i, 3)
-      normal[i] = curvePointToWorld.GetElement(i, 2)
-
-    # Place a plane perpendicular to the centerline
-    plane = vtk.vtkPlane()
-    plane.SetOrigin(center)
-    plane.SetNormal(normal)
+  def getCrossSectionSource(self):
+    """The world surface polydata and the centerline frames, prepared once for all cross-sections.
+    """
+    source = self.crossSectionPolyDataCache.getSource()
+    if source is not None:
+      return source
 
     closedSurfacePolyData = vtk.vtkPolyData()
     self.getClosedSurfacePolyData(closedSurfacePolyData)
@@ -1611,11 +1897,33 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
       transformFilterToWorld.Update()
       closedSurfacePolyData = transformFilterToWorld.GetOutput()
 
-    result = vtk.vtkPolyData()
-    import vtkSlicerCrossSectionAnalysisModuleLogicPython as vtkSlicerCrossSectionAnalysisModuleLogic
-    crossSectionWorker = vtkSlicerCrossSectionAnalysisModuleLogic.vtkCrossSectionCompute()
-    ret = crossSectionWorker.CreateCrossSection(result, closedSurfacePolyData, plane, crossSectionWorker.ClosestPoint, True)
-    if (ret == crossSectionWorker.Empty):
+    numberOfPoints = self.getNumberOfPoints()
+    centers = np.zeros([numberOfPoints, 3])
+    normals = np.zeros([numberOfPoints, 3])
+    if self.inputCenterlineNode.IsTypeOf("vtkMRMLModelNode") or self.inputCenterlineNode.IsTypeOf("vtkMRMLMarkupsShapeNode"):
+      # One parallel transport frame for all points.
+      curveCoordinateSystemGenerator = slicer.vtkParallelTransportFrame()
+      curveCoordinateSystemGenerator.SetInputData(self.getCenterlinePolyData(self.inputCenterlineNode))
+      curveCoordinateSystemGenerator.Update()
+      curvePoly = curveCoordinateSystemGenerator.GetOutput()
+      tangents = curvePoly.GetPointData().GetArray(curveCoordinateSystemGenerator.GetTangentsArrayName())
+      centers[:] = vtk_to_numpy(curvePoly.GetPoints().GetData()).reshape(-1, 3)[:numberOfPoints]
+      normals[:] = vtk_to_numpy(tangents).reshape(-1, 3)[:numberOfPoints]
+    else:
+      curvePointToWorld = vtk.vtkMatrix4x4()
+      for pointIndex in range(numberOfPoints):
+        self.inputCenterlineNode.GetCurvePointToWorldTransformAtPointIndex(pointIndex, curvePointToWorld)
+        for i in range(3):
+          centers[pointIndex, i] = curvePointToWorld.GetElement(i, 3)
+          normals[pointIndex, i] = curvePointToWorld.GetElement(i, 2)
+
+    source = (closedSurfacePolyData, centers, normals)
+    self.crossSectionPolyDataCache.setSource(source)
+    return source
+
+  def computeCrossSectionPolydata(self, pointIndex):
+    result, empty = CrossSectionPolyDataCache.createCrossSection(self.getCrossSectionSource(), pointIndex)
+    if empty:
       logging.error(_("Error creating a cross-section polydata of the lumen at point index {indexOfPoint}.").format(indexOfPoint=pointIndex))
 
     return result
@@ -1624,13 +1932,13 @@ class CrossSectionAnalysisLogic(ScriptedLoadableModuleLogic):
     """Create an exact-fit model representing the cross-section.
     """
 
-    if pointIndex in self.crossSectionPolyDataCache:
-      # found polydata cached
-      crossSectionPolyData = self.crossSectionPolyDataCache[pointIndex]
-    else:
+    crossSectionPolyData = self.crossSectionPolyDataCache.get(pointIndex)
+    if crossSectionPolyData is None:
       # cross-section is not found in the cache, compute it now and store in cache
       crossSectionPolyData = self.computeCrossSectionPolydata(pointIndex)
-      self.crossSectionPolyDataCache[pointIndex] = crossSectionPolyData
+      self.crossSectionPolyDataCache.put(pointIndex, crossSectionPolyData)
+    # Have the neighbours ready when the slider moves on.
+    self.crossSectionPolyDataCache.prefetch(pointIndex, len(self.getCrossSectionSource()[1]))
 
     # Finally create/update the model node
     if self.crossSectionModelNode is None:
@@ -1833,3 +2141,7 @@ ROLE_GOTO_REGION = "GoToRegion"
 ROLE_BROWSE_POINT_INDEX = "BrowsePointIndex"
 ROLE_OUTPUT_PLOT_SERIES_TYPE = "OutputPlotSeriesType"
 ROLE_INITIALIZED = "Initialized"
+
+# Cross-section polydata cache
+CROSS_SECTION_CACHE_MAXIMUM_BYTES = 256 * 1024 * 1024
+CROSS_SECTION_PREFETCH_COUNT = 8
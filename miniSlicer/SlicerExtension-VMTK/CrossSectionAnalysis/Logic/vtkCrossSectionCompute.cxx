@@ -8,6 +8,7 @@
 #include <mutex>
 #include <math.h> // sqrt
 #include <vector>
+#include <algorithm> // std::min, std::max
 
 #include <vtkMRMLSegmentationNode.h>
 #include <vtkMRMLModelNode.h>
@@ -22,6 +23,9 @@
 #include <vtkPointData.h>
 #include <vtkIdList.h>
 #include <vtkMRMLMarkupsShapeNode.h>
+#include <vtkFeatureEdges.h>
+#include <vtkStripper.h>
+#include <vtkCellArray.h>
 
 std::mutex mtx;
 
@@ -44,7 +48,9 @@ public:
     vtkDoubleArray* bufferArray,
     vtkIdType startPointIndex,
     vtkIdType endPointIndex,
-    vtkIdList* emptySectionIds = nullptr);
+    vtkIdList* emptySectionIds = nullptr,
+    vtkPoints* contourPoints = nullptr,
+    vtkIdTypeArray* contourCounts = nullptr);
 
 private:
   /**
@@ -240,6 +246,170 @@ bool vtkCrossSectionCompute::UpdateTable(vtkDoubleArray * crossSectionAreaArray,
     return true;
 }
 
+//------------------------------------------------------------------------------
+bool vtkCrossSectionCompute::ComputeContours(vtkPoints * contourPoints, vtkIdTypeArray * contourOffsets,
+                                             vtkDoubleArray * crossSectionAreaArray, vtkDoubleArray * ceDiameterArray,
+                                             vtkIdList* emptySectionIds)
+{
+    if (this->InputSurfaceNode == nullptr || this->ClosedSurfacePolyData == nullptr)
+    {
+        vtkErrorMacro("Input surface is NULL.");
+        return false;
+    }
+    if (this->GeneratedPolyData == nullptr)
+    {
+        vtkErrorMacro("Input centerline is NULL.");
+        return false;
+    }
+    if (contourPoints == nullptr || contourOffsets == nullptr
+        || crossSectionAreaArray == nullptr || ceDiameterArray == nullptr)
+    {
+        vtkErrorMacro("Output arrays must not be NULL.");
+        return false;
+    }
+    const vtkIdType numberOfValues = this->GeneratedPolyData->GetNumberOfPoints();
+    crossSectionAreaArray->SetNumberOfValues(numberOfValues);
+    ceDiameterArray->SetNumberOfValues(numberOfValues);
+    contourPoints->SetDataTypeToDouble();
+    contourPoints->Reset();
+    contourOffsets->SetNumberOfValues(numberOfValues + 1);
+    contourOffsets->SetValue(0, 0);
+    if (numberOfValues == 0)
+    {
+        return true;
+    }
+    const unsigned int numberOfThreads = std::max(1u,
+        std::min(this->NumberOfThreads, (unsigned int) numberOfValues));
+    const vtkIdType numberOfValuesPerBlock = numberOfValues / numberOfThreads;
+    const vtkIdType residual = numberOfValues % numberOfThreads;
+
+    std::vector<std::thread> threads;
+    std::vector<vtkSmartPointer<vtkDoubleArray>> bufferArrays;
+    std::vector<vtkSmartPointer<vtkPoints>> pointBuffers;
+    std::vector<vtkSmartPointer<vtkIdTypeArray>> countBuffers;
+
+    for (unsigned int i = 0; i < numberOfThreads; i++)
+    {
+        vtkIdType startPointIndex = i * numberOfValuesPerBlock;
+        vtkIdType endPointIndex = ((i + 1) * numberOfValuesPerBlock) - 1;
+        if (i == (numberOfThreads - 1))
+        {
+            endPointIndex += residual;
+        }
+        // The surface was prepared once; each thread only gets its own copy.
+        vtkSmartPointer<vtkPolyData> closedSurfacePolyDataCopy = vtkSmartPointer<vtkPolyData>::New();
+        closedSurfacePolyDataCopy->DeepCopy(this->ClosedSurfacePolyData.Get());
+
+        vtkSmartPointer<vtkDoubleArray> bufferArray = vtkSmartPointer<vtkDoubleArray>::New();
+        bufferArray->SetNumberOfComponents(3);
+        bufferArrays.push_back(bufferArray);
+        vtkSmartPointer<vtkPoints> pointBuffer = vtkSmartPointer<vtkPoints>::New();
+        pointBuffer->SetDataTypeToDouble();
+        pointBuffers.push_back(pointBuffer);
+        vtkSmartPointer<vtkIdTypeArray> countBuffer = vtkSmartPointer<vtkIdTypeArray>::New();
+        countBuffers.push_back(countBuffer);
+
+        threads.push_back(std::thread(CrossSectionComputeWorker(),
+                                      this->GeneratedPolyData,
+                                      this->GeneratedTangents,
+                                      closedSurfacePolyDataCopy,
+                                      bufferArrays[i],
+                                      startPointIndex, endPointIndex,
+                                      emptySectionIds,
+                                      pointBuffers[i],
+                                      countBuffers[i]));
+    }
+    for (unsigned int i = 0; i < threads.size(); i++)
+    {
+        threads[i].join();
+    }
+    // Blocks are contiguous and in point order: concatenate them.
+    vtkIdType sectionIndex = 0;
+    vtkIdType offset = 0;
+    for (unsigned int i = 0; i < numberOfThreads; i++)
+    {
+        vtkDoubleArray * bufferArray = bufferArrays[i].Get();
+        for (vtkIdType r = 0; r < bufferArray->GetNumberOfTuples(); r++)
+        {
+            const double * tupleValues = bufferArray->GetTuple3(r);
+            crossSectionAreaArray->SetValue((vtkIdType) tupleValues[0], tupleValues[1]);
+            ceDiameterArray->SetValue((vtkIdType) tupleValues[0], tupleValues[2]);
+        }
+        vtkPoints * pointBuffer = pointBuffers[i].Get();
+        const vtkIdType firstPoint = contourPoints->GetNumberOfPoints();
+        contourPoints->InsertPoints(firstPoint, pointBuffer->GetNumberOfPoints(), 0, pointBuffer);
+        vtkIdTypeArray * countBuffer = countBuffers[i].Get();
+        for (vtkIdType r = 0; r < countBuffer->GetNumberOfValues(); r++)
+        {
+            offset += countBuffer->GetValue(r);
+            contourOffsets->SetValue(++sectionIndex, offset);
+        }
+    }
+    return (sectionIndex == numberOfValues);
+}
+
+//------------------------------------------------------------------------------
+vtkIdType vtkCrossSectionCompute::AppendOuterContour(vtkPolyData * crossSection, vtkPoints * contourPoints)
+{
+    if (crossSection == nullptr || crossSection->GetNumberOfCells() == 0)
+    {
+        return 0;
+    }
+    // The triangulated section is bounded by its contour loops; chain the boundary edges.
+    vtkNew<vtkFeatureEdges> boundaryEdges;
+    boundaryEdges->SetInputData(crossSection);
+    boundaryEdges->BoundaryEdgesOn();
+    boundaryEdges->FeatureEdgesOff();
+    boundaryEdges->NonManifoldEdgesOff();
+    boundaryEdges->ManifoldEdgesOff();
+    boundaryEdges->ColoringOff();
+    vtkNew<vtkStripper> stripper;
+    stripper->SetInputConnection(boundaryEdges->GetOutputPort());
+    stripper->JoinContiguousSegmentsOn();
+    stripper->Update();
+
+    vtkPolyData * loops = stripper->GetOutput();
+    vtkIdType longestLoop = -1;
+    double longestPerimeter = -1.0;
+    for (vtkIdType cellId = 0; cellId < loops->GetNumberOfCells(); cellId++)
+    {
+        vtkIdType numberOfIds = 0;
+        const vtkIdType * ids = nullptr;
+        loops->GetCellPoints(cellId, numberOfIds, ids);
+        double perimeter = 0.0;
+        for (vtkIdType k = 1; k < numberOfIds; k++)
+        {
+            double a[3], b[3];
+            loops->GetPoint(ids[k - 1], a);
+            loops->GetPoint(ids[k], b);
+            perimeter += sqrt(vtkMath::Distance2BetweenPoints(a, b));
+        }
+        // A hole is always shorter than the boundary enclosing it.
+        if (perimeter > longestPerimeter)
+        {
+            longestPerimeter = perimeter;
+            longestLoop = cellId;
+        }
+    }
+    if (longestLoop < 0)
+    {
+        return 0;
+    }
+    vtkIdType numberOfIds = 0;
+    const vtkIdType * ids = nullptr;
+    loops->GetCellPoints(longestLoop, numberOfIds, ids);
+    // A closed polyline repeats its first point.
+    if (numberOfIds > 1 && ids[0] == ids[numberOfIds - 1])
+    {
+        numberOfIds--;
+    }
+    for (vtkIdType k = 0; k < numberOfIds; k++)
+    {
+        contourPoints->InsertNextPoint(loops->GetPoint(ids[k]));
+    }
+    return numberOfIds;
+}
+
 //------------------------------------------------------------------------------
 vtkCrossSectionCompute::SectionCreationResult vtkCrossSectionCompute::CreateCrossSection(
                                 vtkPolyData * result, vtkPolyData * input,
@@ -349,7 +519,9 @@ void CrossSectionComputeWorker::operator () (vtkPolyData * generatedPolyData,
                                                 vtkDoubleArray * bufferArray,
                                                 vtkIdType startPointIndex,
                                                 vtkIdType endPointIndex,
-                                                vtkIdList* emptySectionIds)
+                                                vtkIdList* emptySectionIds,
+                                                vtkPoints* contourPoints,
+                                                vtkIdTypeArray* contourCounts)
 {
     for (vtkIdType i = startPointIndex; i <= endPointIndex; i++)
     {
@@ -368,6 +540,11 @@ void CrossSectionComputeWorker::operator () (vtkPolyData * generatedPolyData,
             
             bufferArray->InsertNextTuple3((double) i, crossSectionSurfaceArea, ceDiameter);
         }
+        if (contourPoints && contourCounts)
+        {
+            contourCounts->InsertNextValue(
+                vtkCrossSectionCompute::AppendOuterContour(contourPolyData, contourPoints));
+        }
     }
 }
 
@@ -11,11 +11,13 @@
 #include <thread>
 
 #include <vtkDoubleArray.h>
+#include <vtkIdTypeArray.h>
 #include <vtkMRMLNode.h>
 #include <vtkPolyData.h>
 #include <vtkSmartPointer.h>
 #include <vtkObjectFactory.h>
 #include <vtkPlane.h>
+#include <vtkPoints.h>
 
 /**
  * This class computes cross-section areas
@@ -54,6 +56,27 @@ public:
   bool UpdateTable(vtkDoubleArray * crossSectionAreaArray, vtkDoubleArray * ceDiameterArray,
                    vtkIdList* emptySectionIds  = nullptr);
 
+  /**
+   * Compute the cross-section polygons at all centerline points in one
+   * threaded pass, using the surface prepared once by SetInputSurfaceNode.
+   * The ordered outer boundary of section i is stored in contourPoints,
+   * from contourOffsets[i] to contourOffsets[i + 1] (exclusive); the offsets
+   * array gets one value more than the number of centerline points.
+   * Empty sections have no points.
+   * crossSectionAreaArray and ceDiameterArray are resized to the number of
+   * centerline points and filled as in UpdateTable.
+   */
+  bool ComputeContours(vtkPoints * contourPoints, vtkIdTypeArray * contourOffsets,
+                       vtkDoubleArray * crossSectionAreaArray, vtkDoubleArray * ceDiameterArray,
+                       vtkIdList* emptySectionIds = nullptr);
+
+  /**
+   * Append the ordered points of the longest boundary loop of a
+   * cross-section polydata to contourPoints.
+   * Returns the number of points appended.
+   */
+  static vtkIdType AppendOuterContour(vtkPolyData * crossSection, vtkPoints * contourPoints);
+
   /**
    * Create a cross-section polydata of the input polydata with a given plane.
    * In ClosestPoint mode, holes nearby to the reference point are rightly
@@ -1,6 +1,11 @@
 import os
 import unittest
 import logging
+import collections
+import hashlib
+import queue
+import threading
+import time
 import vtk, qt, ctk, slicer
 from slicer.ScriptedLoadableModule import *
 from slicer.util import VTKObservationMixin
@@ -51,6 +56,7 @@ class ExtractCenterlineWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
         self.logic = None
         self._parameterNode = None
         self.updatingGUIFromParameterNode = False
+        self.centerlineJob = None
 
     def setup(self):
         """
@@ -92,6 +98,7 @@ class ExtractCenterlineWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
         # Connections
         self.ui.parameterNodeSelector.connect('currentNodeChanged(vtkMRMLNode*)', self.setParameterNode)
         self.ui.applyButton.connect('clicked(bool)', self.onApplyButton)
+        self.applyButtonText = self.ui.applyButton.text
         self.ui.autoDetectEndPointsPushButton.connect('clicked(bool)', self.onAutoDetectEndPoints)
         self.ui.preprocessInputSurfaceModelCheckBox.connect("toggled(bool)", self.updateParameterNodeFromGUI)
         self.ui.subdivideInputSurfaceModelCheckBox.connect("toggled(bool)", self.updateParameterNodeFromGUI)
@@ -140,6 +147,8 @@ class ExtractCenterlineWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
         Called when the application closes and the module widget is destroyed.
         """
         self.removeObservers()
+        if self.centerlineJob:
+            self.centerlineJob.cancel()
 
     def setParameterNode(self, inputParameterNode):
         """
@@ -261,95 +270,47 @@ class ExtractCenterlineWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
     def onApplyButton(self):
         """
         Run processing when user clicks "Apply" button.
+        While processing runs, the button cancels it.
         """
-        qt.QApplication.setOverrideCursor(qt.Qt.WaitCursor)
+        if self.centerlineJob:
+            self.centerlineJob.cancel()
+            slicer.util.showStatusMessage(_("Cancelling after the current stage..."))
+            return
         try:
-            # Preprocessing
-            slicer.util.showStatusMessage(_("Preprocessing..."))
-            slicer.app.processEvents()  # force update
-            preprocessedPolyData = self.getPreprocessedPolyData()
-            # Save preprocessing result to model node
-            preprocessedSurfaceModelNode = self._parameterNode.GetNodeReference("PreprocessedSurface")
-            if preprocessedSurfaceModelNode:
-                preprocessedSurfaceModelNode.SetAndObserveMesh(preprocessedPolyData)
-                if not preprocessedSurfaceModelNode.GetDisplayNode():
-                    preprocessedSurfaceModelNode.CreateDefaultDisplayNodes()
-                    preprocessedSurfaceModelNode.GetDisplayNode().SetColor(1.0, 1.0, 0.0)
-                    preprocessedSurfaceModelNode.GetDisplayNode().SetOpacity(0.4)
-                    preprocessedSurfaceModelNode.GetDisplayNode().SetLineWidth(2)
-
-            # Get non-manifold edges
-            meshErrorsMarkupsNode = self._parameterNode.GetNodeReference("MeshErrors")
-            if meshErrorsMarkupsNode:
-                slicer.util.showStatusMessage(_("Get manifold edges..."))
-                slicer.app.processEvents()  # force update
-                meshErrorsMarkupsNode.RemoveAllControlPoints()
-                nonManifoldEdgePositions = self.logic.extractNonManifoldEdges(preprocessedPolyData)
-                for pointIndex, position in enumerate(nonManifoldEdgePositions):
-                    meshErrorsMarkupsNode.AddControlPoint(vtk.vtkVector3d(position), "NME {0}".format(pointIndex))
-                numberOfNonManifoldEdges = len(nonManifoldEdgePositions)
-                if numberOfNonManifoldEdges > 0:
-                    logging.warning(_("Found {0} non-manifold edges.").format(numberOfNonManifoldEdges)
-                                    + _(" Centerline computation may fail. Try to increase target point count or reduce decimation aggressiveness"))
-                    # TODO: we could remove non-manifold edges by using vtkFeatureEdges
-
-            endPointsMarkupsNode = self._parameterNode.GetNodeReference("EndPoints")
-            inputSurfaceModelNode = self._parameterNode.GetNodeReference("InputSurface")
-
-            # Extract network
-            networkModelNode = self._parameterNode.GetNodeReference("NetworkModel")
-            networkCurveNode = self._parameterNode.GetNodeReference("NetworkCurve")
-            networkPropertiesTableNode = self._parameterNode.GetNodeReference("NetworkProperties")
-            if networkModelNode or networkCurveNode or networkPropertiesTableNode:
-                slicer.util.showStatusMessage(_("Extract network..."))
-                slicer.app.processEvents()  # force update
-                networkPolyData = self.logic.extractNetwork(preprocessedPolyData, endPointsMarkupsNode, computeGeometry=True)
-            if networkModelNode:
-                networkModelNode.SetAndObserveMesh(networkPolyData)
-                if not networkModelNode.GetDisplayNode():
-                    networkModelNode.CreateDefaultDisplayNodes()
-                    networkModelNode.GetDisplayNode().SetColor(0.0, 0.0, 1.0)
-                    inputSurfaceModelNode.GetDisplayNode().SetOpacity(0.4)
-            if networkCurveNode:
-                self.logic.addNetworkCurves(networkPolyData, networkCurveNode)
-            if networkPropertiesTableNode:
-                self.logic.addNetworkProperties(networkPolyData, networkPropertiesTableNode)
-
-            # Extract centerline
-            centerlineModelNode = self._parameterNode.GetNodeReference("CenterlineModel")
-            centerlineCurveNode = self._parameterNode.GetNodeReference("CenterlineCurve")
-            centerlinePropertiesTableNode = self._parameterNode.GetNodeReference("CenterlineProperties")
-            voronoiDiagramModelNode = self._parameterNode.GetNodeReference("VoronoiDiagram")
-            curveSamplingDistance = float(self._parameterNode.GetParameter("CurveSamplingDistance"))
-            if centerlineModelNode or centerlineCurveNode or centerlinePropertiesTableNode or voronoiDiagramModelNode:
-                slicer.util.showStatusMessage(_("Extract centerline..."))
-                slicer.app.processEvents()  # force update
-                centerlinePolyData, voronoiDiagramPolyData = self.logic.extractCenterline(preprocessedPolyData, endPointsMarkupsNode, curveSamplingDistance)
-            if centerlineModelNode:
-                centerlineModelNode.SetAndObserveMesh(centerlinePolyData)
-                if not centerlineModelNode.GetDisplayNode():
-                    centerlineModelNode.CreateDefaultDisplayNodes()
-                    centerlineModelNode.GetDisplayNode().SetColor(0.0, 1.0, 0.0)
-                    centerlineModelNode.GetDisplayNode().SetLineWidth(3)
-                    inputSurfaceModelNode.GetDisplayNode().SetOpacity(0.4)
-
-            if voronoiDiagramModelNode:
-                voronoiDiagramModelNode.SetAndObserveMesh(voronoiDiagramPolyData)
-                if not voronoiDiagramModelNode.GetDisplayNode():
-                    voronoiDiagramModelNode.CreateDefaultDisplayNodes()
-                    voronoiDiagramModelNode.GetDisplayNode().SetColor(0.0, 1.0, 0.0)
-                    voronoiDiagramModelNode.GetDisplayNode().SetOpacity(0.2)
-
-            if centerlineCurveNode or centerlinePropertiesTableNode:
-                slicer.util.showStatusMessage(_("Generate curves and quantification results table..."))
-                slicer.app.processEvents()  # force update
-                self.logic.createCurveTreeFromCenterline(centerlinePolyData, centerlineCurveNode, centerlinePropertiesTableNode, curveSamplingDistance)
-
+            inputSurfacePolyData = self.logic.polyDataFromNode(self._parameterNode.GetNodeReference("InputSurface"),
+                                                               self._parameterNode.GetParameter("InputSegmentID"))
+            if not inputSurfacePolyData or inputSurfacePolyData.GetNumberOfPoints() == 0:
+                raise ValueError(_("Valid input surface is required"))
+            self.centerlineJob = CenterlineJob.fromParameterNode(self.logic, self._parameterNode, inputSurfacePolyData,
+                                                                 progressCallback=self.onCenterlineJobProgress)
         except Exception as e:
             slicer.util.errorDisplay(_("Failed to compute results: ")+str(e))
             import traceback
             traceback.print_exc()
-        qt.QApplication.restoreOverrideCursor()
+            return
+        self.ui.applyButton.text = _("Cancel")
+        self.centerlineJob.start(self.onCenterlineJobFinished)
+
+    def onCenterlineJobProgress(self, job, stageName, stageIndex, numberOfStages):
+        messages = {
+            "preprocess": _("Preprocessing..."),
+            "meshErrors": _("Get manifold edges..."),
+            "network": _("Extract network..."),
+            "centerline": _("Extract centerline..."),
+            "branches": _("Extract branches..."),
+            "curves": _("Generate curves and quantification results table..."),
+            }
+        slicer.util.showStatusMessage("{0} ({1}/{2})".format(messages.get(stageName, stageName), stageIndex + 1, numberOfStages))
+
+    def onCenterlineJobFinished(self, job):
+        self.centerlineJob = None
+        self.ui.applyButton.text = self.applyButtonText
+        if job.cancelled:
+            slicer.util.showStatusMessage(_("Centerline analysis cancelled."), 3000)
+            return
+        if job.error:
+            slicer.util.errorDisplay(_("Failed to compute results: ")+str(job.error))
+            return
         slicer.util.showStatusMessage(_("Centerline analysis complete."), 3000)
 
     def onAutoDetectEndPoints(self):
@@ -479,6 +440,95 @@ class ExtractCenterlineWidget(ScriptedLoadableModuleWidget, VTKObservationMixin)
             import traceback
             traceback.print_exc()
 
+#
+# PreprocessCache
+#
+
+class PreprocessCache:
+    """Cache of preprocessed surfaces, keyed by the input mesh content and the preprocessing parameters.
+
+    Recent results are kept in memory (least recently used are dropped beyond
+    maximumNumberOfItems). If cacheDirectory is set, results are also written
+    there as <key>.vtp files and read back when they are not in memory.
+    Cached polydata are never handed out: get() returns a copy.
+    """
+
+    def __init__(self, maximumNumberOfItems=4, cacheDirectory=None):
+        self.maximumNumberOfItems = maximumNumberOfItems
+        self.cacheDirectory = cacheDirectory
+        self._items = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(surfacePolyData, targetNumberOfPoints, decimationAggressiveness, subdivide):
+        """SHA1 of the points, the cell connectivity and the preprocessing parameters."""
+        from vtk.util.numpy_support import vtk_to_numpy
+        sha = hashlib.sha1(usedforsecurity=False)
+        sha.update(repr((float(targetNumberOfPoints), float(decimationAggressiveness), bool(subdivide))).encode())
+        points = surfacePolyData.GetPoints()
+        if points:
+            sha.update(str(points.GetDataType()).encode())
+            sha.update(vtk_to_numpy(points.GetData()).tobytes())
+        for cells in (surfacePolyData.GetVerts(), surfacePolyData.GetLines(), surfacePolyData.GetPolys(), surfacePolyData.GetStrips()):
+            sha.update(b"|")
+            if cells and cells.GetNumberOfCells():
+                sha.update(vtk_to_numpy(cells.GetOffsetsArray()).tobytes())
+                sha.update(vtk_to_numpy(cells.GetConnectivityArray()).tobytes())
+        return sha.hexdigest()
+
+    def _filePath(self, key):
+        return os.path.join(self.cacheDirectory, key + ".vtp")
+
+    def get(self, key):
+        """Return (copy of the cached polydata, tier), tier is "memory" or "disk"; (None, None) if not found."""
+        polyData = self._items.get(key)
+        tier = "memory"
+        if polyData is None and self.cacheDirectory and os.path.exists(self._filePath(key)):
+            reader = vtk.vtkXMLPolyDataReader()
+            reader.SetFileName(self._filePath(key))
+            reader.Update()
+            if reader.GetOutput().GetNumberOfPoints() > 0:
+                polyData = reader.GetOutput()
+                self._remember(key, polyData)
+                tier = "disk"
+        if polyData is None:
+            self.misses += 1
+            return None, None
+        self._items.move_to_end(key)
+        self.hits += 1
+        result = vtk.vtkPolyData()
+        result.DeepCopy(polyData)
+        return result, tier
+
+    def put(self, key, polyData):
+        cachedPolyData = vtk.vtkPolyData()
+        cachedPolyData.DeepCopy(polyData)
+        self._remember(key, cachedPolyData)
+        if self.cacheDirectory:
+            os.makedirs(self.cacheDirectory, exist_ok=True)
+            # Write to a temporary file first, an interrupted write must not leave a truncated entry.
+            temporaryFilePath = self._filePath(key) + ".tmp.vtp"
+            writer = vtk.vtkXMLPolyDataWriter()
+            writer.SetFileName(temporaryFilePath)
+            writer.SetInputData(cachedPolyData)
+            writer.SetDataModeToAppended()
+            writer.SetCompressorTypeToZLib()
+            if writer.Write():
+                os.replace(temporaryFilePath, self._filePath(key))
+            else:
+                logging.warning(_("Failed to write preprocessing cache file {0}").format(temporaryFilePath))
+
+    def clear(self):
+        """Drop the in-memory entries (files in cacheDirectory are kept)."""
+        self._items.clear()
+
+    def _remember(self, key, polyData):
+        self._items[key] = polyData
+        self._items.move_to_end(key)
+        while len(self._items) > self.maximumNumberOfItems:
+            self._items.popitem(last=False)
+
 #
 # ExtractCenterlineLogic
 #
@@ -493,6 +543,9 @@ class ExtractCenterlineLogic(ScriptedLoadableModuleLogic):
     https://github.com/Slicer/Slicer/blob/master/Base/Python/slicer/ScriptedLoadableModule.py
     """
 
+    # Shared by all logic instances, so that scripts creating a new logic per run benefit too.
+    preprocessCache = PreprocessCache()
+
     def __init__(self):
         ScriptedLoadableModuleLogic.__init__(self)
         self.blankingArrayName = 'Blanking'
@@ -543,7 +596,28 @@ class ExtractCenterlineLogic(ScriptedLoadableModuleLogic):
             logging.error(_("Surface can only be loaded from model or segmentation node"))
             return None
 
-    def preprocess(self, surfacePolyData, targetNumberOfPoints, decimationAggressiveness, subdivide):
+    def preprocess(self, surfacePolyData, targetNumberOfPoints, decimationAggressiveness, subdivide, useCache=True,
+                   callOnMainThread=None):
+        """
+        Decimate, clean, triangulate, optionally subdivide the surface and compute its normals.
+        If useCache is True, the result is looked up in (and stored to) preprocessCache.
+        callOnMainThread: optional callable(function) that runs the decimation CLI, which uses MRML nodes,
+        on the main thread when preprocess is called from a worker thread.
+        """
+        if not useCache:
+            return self._preprocess(surfacePolyData, targetNumberOfPoints, decimationAggressiveness, subdivide, callOnMainThread)
+        startTime = time.time()
+        key = self.preprocessCache.key(surfacePolyData, targetNumberOfPoints, decimationAggressiveness, subdivide)
+        preprocessedPolyData, tier = self.preprocessCache.get(key)
+        if preprocessedPolyData is not None:
+            logging.info(_("Preprocessing cache hit ({tier}) in {duration:.3f} s").format(tier=tier, duration=time.time() - startTime))
+            return preprocessedPolyData
+        preprocessedPolyData = self._preprocess(surfacePolyData, targetNumberOfPoints, decimationAggressiveness, subdivide, callOnMainThread)
+        self.preprocessCache.put(key, preprocessedPolyData)
+        logging.info(_("Preprocessing completed in {duration:.3f} s").format(duration=time.time() - startTime))
+        return preprocessedPolyData
+
+    def _preprocess(self, surfacePolyData, targetNumberOfPoints, decimationAggressiveness, subdivide, callOnMainThread=None):
         # import the vmtk libraries
         try:
             import vtkvmtkComputationalGeometryPython as vtkvmtkComputationalGeometry
@@ -556,21 +630,10 @@ class ExtractCenterlineLogic(ScriptedLoadableModuleLogic):
             raise(_("Input surface model is empty"))
         reductionFactor = (numberOfInputPoints-targetNumberOfPoints) / numberOfInputPoints
         if reductionFactor > 0.0:
-            parameters = {}
-            inputSurfaceModelNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "tempInputSurfaceModel")
-            inputSurfaceModelNode.SetAndObserveMesh(surfacePolyData)
-            parameters["inputModel"] = inputSurfaceModelNode
-            outputSurfaceModelNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "tempDecimatedSurfaceModel")
-            parameters["outputModel"] = outputSurfaceModelNode
-            parameters["reductionFactor"] = reductionFactor
-            parameters["method"] = "FastQuadric"
-            parameters["aggressiveness"] = decimationAggressiveness
-            decimation = slicer.modules.decimation
-            cliNode = slicer.cli.runSync(decimation, None, parameters)
-            surfacePolyData = outputSurfaceModelNode.GetPolyData()
-            slicer.mrmlScene.RemoveNode(inputSurfaceModelNode)
-            slicer.mrmlScene.RemoveNode(outputSurfaceModelNode)
-            slicer.mrmlScene.RemoveNode(cliNode)
+            if callOnMainThread:
+                surfacePolyData = callOnMainThread(lambda: self.decimate(surfacePolyData, reductionFactor, decimationAggressiveness))
+            else:
+                surfacePolyData = self.decimate(surfacePolyData, reductionFactor, decimationAggressiveness)
 
         surfaceCleaner = vtk.vtkCleanPolyData()
         surfaceCleaner.SetInputData(surfacePolyData)
@@ -605,39 +668,77 @@ class ExtractCenterlineLogic(ScriptedLoadableModuleLogic):
 
         return normals.GetOutput()
 
+    @staticmethod
+    def nonManifoldEdgePointIds(polyData):
+        """
+        Returns a (N, 2) array of the point ids of the edges shared by more than two polygons, smaller id first,
+        sorted by first then second point id.
+        Edges are collected from the polygon and triangle strip connectivity arrays and counted with np.unique.
+        """
+        import numpy as np
+        from vtk.util.numpy_support import vtk_to_numpy
+        edges = []
+        for cells in (polyData.GetPolys(), polyData.GetStrips()):
+            if not cells or cells.GetNumberOfCells() == 0:
+                continue
+            offsets = vtk_to_numpy(cells.GetOffsetsArray()).astype(np.int64)
+            connectivity = vtk_to_numpy(cells.GetConnectivityArray()).astype(np.int64)
+            sizes = np.diff(offsets)
+            if cells is polyData.GetStrips():
+                # Strip (p0, p1, p2, p3, ...) has edges (p[k], p[k+1]) and (p[k], p[k+2]).
+                position = np.arange(len(connectivity))
+                lastPosition = np.repeat(offsets[1:], sizes)
+                nextOne = position + 1 < lastPosition
+                nextTwo = position + 2 < lastPosition
+                edges.append(np.column_stack((connectivity[nextOne], connectivity[position[nextOne] + 1])))
+                edges.append(np.column_stack((connectivity[nextTwo], connectivity[position[nextTwo] + 2])))
+                continue
+            # Polygon edges: each point to the next one, the last point of a cell back to the first one.
+            nextPosition = np.arange(1, len(connectivity) + 1)
+            nonEmpty = sizes > 0
+            nextPosition[offsets[1:][nonEmpty] - 1] = offsets[:-1][nonEmpty]
+            edges.append(np.column_stack((connectivity, connectivity[nextPosition])))
+        if not edges:
+            return np.zeros((0, 2), dtype=np.int64)
+        edges = np.sort(np.concatenate(edges), axis=1)
+        edges = edges[edges[:, 0] != edges[:, 1]]  # degenerate cells
+        numberOfPoints = max(polyData.GetNumberOfPoints(), 1)
+        edgeKeys, edgeCounts = np.unique(edges[:, 0] * numberOfPoints + edges[:, 1], return_counts=True)
+        nonManifoldKeys = edgeKeys[edgeCounts > 2]
+        return np.column_stack((nonManifoldKeys // numberOfPoints, nonManifoldKeys % numberOfPoints))
+
+    def decimate(self, surfacePolyData, reductionFactor, decimationAggressiveness):
+        """Decimate the surface with the Decimation CLI module (FastQuadric). Uses temporary MRML nodes."""
+        parameters = {}
+        inputSurfaceModelNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "tempInputSurfaceModel")
+        inputSurfaceModelNode.SetAndObserveMesh(surfacePolyData)
+        parameters["inputModel"] = inputSurfaceModelNode
+        outputSurfaceModelNode = slicer.mrmlScene.AddNewNodeByClass("vtkMRMLModelNode", "tempDecimatedSurfaceModel")
+        parameters["outputModel"] = outputSurfaceModelNode
+        parameters["reductionFactor"] = reductionFactor
+        parameters["method"] = "FastQuadric"
+        parameters["aggressiveness"] = decimationAggressiveness
+        decimation = slicer.modules.decimation
+        cliNode = slicer.cli.runSync(decimation, None, parameters)
+        decimatedPolyData = outputSurfaceModelNode.GetPolyData()
+        slicer.mrmlScene.RemoveNode(inputSurfaceModelNode)
+        slicer.mrmlScene.RemoveNode(outputSurfaceModelNode)
+        slicer.mrmlScene.RemoveNode(cliNode)
+        return decimatedPolyData
+
     def extractNonManifoldEdges(self, polyData, nonManifoldEdgesPolyData=None):
         '''
         Returns non-manifold edge center positions.
         nonManifoldEdgesPolyData: optional vtk.vtkPolyData() input, if specified then a polydata is returned that contains the edges
         '''
-        import vtkvmtkDifferentialGeometryPython as vtkvmtkDifferentialGeometry
-        neighborhoods = vtkvmtkDifferentialGeometry.vtkvmtkNeighborhoods()
-        neighborhoods.SetNeighborhoodTypeToPolyDataManifoldNeighborhood()
-        neighborhoods.SetDataSet(polyData)
-        neighborhoods.Build()
-
-        polyData.BuildCells()
-        polyData.BuildLinks(0)
-
-        edgeCenterPositions = []
-
-        neighborCellIds = vtk.vtkIdList()
-        nonManifoldEdgeLines = vtk.vtkCellArray()
-        points = polyData.GetPoints()
-        for i in range(neighborhoods.GetNumberOfNeighborhoods()):
-            neighborhood = neighborhoods.GetNeighborhood(i)
-            for j in range(neighborhood.GetNumberOfPoints()):
-                neighborId = neighborhood.GetPointId(j)
-                if i < neighborId:
-                    neighborCellIds.Initialize()
-                    polyData.GetCellEdgeNeighbors(-1, i, neighborId, neighborCellIds)
-                    if neighborCellIds.GetNumberOfIds() > 2:
-                        nonManifoldEdgeLines.InsertNextCell(2)
-                        nonManifoldEdgeLines.InsertCellPoint(i)
-                        nonManifoldEdgeLines.InsertCellPoint(neighborId)
-                        p1 = points.GetPoint(i)
-                        p2 = points.GetPoint(neighborId)
-                        edgeCenterPositions.append([(p1[0]+p2[0])/2.0, (p1[1]+p2[1])/2.0, (p1[2]+p2[2])/2.0])
+        import numpy as np
+        from vtk.util.numpy_support import vtk_to_numpy, numpy_to_vtkIdTypeArray
+        edgePointIds = self.nonManifoldEdgePointIds(polyData)
+        if len(edgePointIds):
+            points = vtk_to_numpy(polyData.GetPoints().GetData())
+            edgeCenterPositions = ((points[edgePointIds[:, 0]] + points[edgePointIds[:, 1]]) / 2.0).tolist()
+        else:
+            edgeCenterPositions = []
 
         if nonManifoldEdgesPolyData:
             if not polyData.GetPoints():
@@ -645,6 +746,9 @@ class ExtractCenterlineLogic(ScriptedLoadableModuleLogic):
             pointsCopy = vtk.vtkPoints()
             pointsCopy.DeepCopy(polyData.GetPoints())
             nonManifoldEdgesPolyData.SetPoints(pointsCopy)
+            nonManifoldEdgeLines = vtk.vtkCellArray()
+            nonManifoldEdgeLines.SetData(numpy_to_vtkIdTypeArray(np.arange(0, 2 * len(edgePointIds) + 1, 2, dtype=np.int64), deep=True),
+                                         numpy_to_vtkIdTypeArray(np.ascontiguousarray(edgePointIds.ravel()), deep=True))
             nonManifoldEdgesPolyData.SetLines(nonManifoldEdgeLines)
 
         return edgeCenterPositions
@@ -934,6 +1038,11 @@ class ExtractCenterlineLogic(ScriptedLoadableModuleLogic):
         return endpointPositions
 
     def createCurveTreeFromCenterline(self, centerlinePolyData, centerlineCurveNode=None, centerlinePropertiesTableNode=None, curveSamplingDistance=1.0):
+        mergedCenterlines = self.extractBranches(centerlinePolyData, curveSamplingDistance)
+        self.createCurveTreeFromMergedCenterlines(mergedCenterlines, centerlineCurveNode, centerlinePropertiesTableNode)
+
+    def extractBranches(self, centerlinePolyData, curveSamplingDistance=1.0):
+        """Split the centerlines into branches and merge them; does not use MRML nodes."""
 
         import vtkvmtkComputationalGeometryPython as vtkvmtkComputationalGeometry
 
@@ -957,7 +1066,11 @@ class ExtractCenterlineLogic(ScriptedLoadableModuleLogic):
         mergeCenterlines.SetResamplingStepLength(curveSamplingDistance)
         mergeCenterlines.SetMergeBlanked(True)
         mergeCenterlines.Update()
-        mergedCenterlines = mergeCenterlines.GetOutput()
+        return mergeCenterlines.GetOutput()
+
+    def createCurveTreeFromMergedCenterlines(self, mergedCenterlines, centerlineCurveNode=None, centerlinePropertiesTableNode=None):
+
+        import vtkvmtkComputationalGeometryPython as vtkvmtkComputationalGeometry
 
         if centerlinePropertiesTableNode:
             centerlinePropertiesTableNode.RemoveAllColumns()
@@ -1230,6 +1343,273 @@ class ExtractCenterlineLogic(ScriptedLoadableModuleLogic):
             slicer.app.resumeRender()
 
 
+#
+# CenterlineJob
+#
+
+class CenterlineJobCancelled(Exception):
+    """Raised in CenterlineJob.run() when the job is cancelled."""
+
+
+class EndPointsSnapshot:
+    """
+    Copy of the control point positions and selection states of an endpoints markups node.
+    It provides the part of the markups node interface that extractNetwork and extractCenterline use,
+    so that they can run on a worker thread without accessing the node.
+    """
+
+    def __init__(self, endPointsMarkupsNode):
+        self.positions = []
+        self.selected = []
+        for controlPointIndex in range(endPointsMarkupsNode.GetNumberOfControlPoints()):
+            position = [0.0, 0.0, 0.0]
+            endPointsMarkupsNode.GetNthControlPointPosition(controlPointIndex, position)
+            self.positions.append(position)
+            self.selected.append(bool(endPointsMarkupsNode.GetNthControlPointSelected(controlPointIndex)))
+
+    def GetNumberOfControlPoints(self):
+        return len(self.positions)
+
+    def GetNthControlPointPosition(self, controlPointIndex, position):
+        position[:] = self.positions[controlPointIndex]
+
+    def GetNthControlPointSelected(self, controlPointIndex):
+        return self.selected[controlPointIndex]
+
+
+class CenterlineJob:
+    """
+    Centerline extraction as a sequence of stages:
+      preprocess, meshErrors, network, centerline (Voronoi diagram and centerlines), branches, curves.
+    Only the stages needed for the output nodes are run (see defaultStageNames).
+
+    start() runs the stages on a worker thread. Everything that reads or writes MRML nodes
+    (decimation CLI, output nodes) is handed to the main thread, which polls the job with a timer.
+    run() executes all stages in the calling thread, which must be the main thread, e.g. in batch scripts:
+
+        job = CenterlineJob(ExtractCenterlineLogic(), surfacePolyData, endPointsNode)
+        centerlinePolyData = job.run()["centerlinePolyData"]
+
+    Cancellation is checked between stages. Stage durations are stored in stageTimes and logged.
+    """
+
+    POLL_INTERVAL_MS = 50
+
+    def __init__(self, logic, inputSurfacePolyData, endPointsMarkupsNode=None, nodes=None,
+                 preprocess=True, targetNumberOfPoints=5000, decimationAggressiveness=4.0, subdivide=False,
+                 curveSamplingDistance=1.0, stageNames=None, progressCallback=None):
+        """
+        nodes: output nodes by parameter node role (PreprocessedSurface, MeshErrors, NetworkModel, NetworkCurve,
+          NetworkProperties, CenterlineModel, CenterlineCurve, CenterlineProperties, VoronoiDiagram, InputSurface).
+        stageNames: stages to run; by default derived from the output nodes.
+        progressCallback: called on the main thread as progressCallback(job, stageName, stageIndex, numberOfStages).
+        """
+        self.logic = logic
+        self.inputSurfacePolyData = inputSurfacePolyData
+        self.endPoints = EndPointsSnapshot(endPointsMarkupsNode) if endPointsMarkupsNode else None
+        self.nodes = {role: node for role, node in (nodes or {}).items() if node}
+        self.preprocessEnabled = preprocess
+        self.targetNumberOfPoints = targetNumberOfPoints
+        self.decimationAggressiveness = decimationAggressiveness
+        self.subdivide = subdivide
+        self.curveSamplingDistance = curveSamplingDistance
+        self.stageNames = list(stageNames) if stageNames is not None else self.defaultStageNames()
+        self.progressCallback = progressCallback
+        self.results = {}
+        self.stageTimes = []
+        self.error = None
+        self.cancelled = False
+        self._cancelRequested = threading.Event()
+        self._mainThreadCalls = queue.Queue()
+        self._thread = None
+        self._timer = None
+        self._finishedCallback = None
+
+    @classmethod
+    def fromParameterNode(cls, logic, parameterNode, inputSurfacePolyData, progressCallback=None):
+        roles = ["PreprocessedSurface", "MeshErrors", "NetworkModel", "NetworkCurve", "NetworkProperties",
+                 "CenterlineModel", "CenterlineCurve", "CenterlineProperties", "VoronoiDiagram", "InputSurface"]
+        return cls(logic, inputSurfacePolyData, parameterNode.GetNodeReference("EndPoints"),
+                   nodes={role: parameterNode.GetNodeReference(role) for role in roles},
+                   preprocess=(parameterNode.GetParameter("PreprocessInputSurface") == "true"),
+                   targetNumberOfPoints=float(parameterNode.GetParameter("TargetNumberOfPoints")),
+                   decimationAggressiveness=float(parameterNode.GetParameter("DecimationAggressiveness")),
+                   subdivide=(parameterNode.GetParameter("SubdivideInputSurface") == "true"),
+                   curveSamplingDistance=float(parameterNode.GetParameter("CurveSamplingDistance")),
+                   progressCallback=progressCallback)
+
+    def defaultStageNames(self):
+        """Stages needed for the output nodes; without any output node, the centerline is computed."""
+        roles = self.nodes.keys()
+        curveRoles = {"CenterlineCurve", "CenterlineProperties"}
+        stageNames = ["preprocess"]
+        if "MeshErrors" in roles:
+            stageNames.append("meshErrors")
+        if roles & {"NetworkModel", "NetworkCurve", "NetworkProperties"}:
+            stageNames.append("network")
+        if (roles & ({"CenterlineModel", "VoronoiDiagram"} | curveRoles)) or not (roles - {"InputSurface"}):
+            stageNames.append("centerline")
+        if roles & curveRoles:
+            stageNames += ["branches", "curves"]
+        return stageNames
+
+    def run(self):
+        """Run all stages in the calling thread and return the results dictionary.
+        Must be called from the main thread: main thread calls are only executed by start() polling otherwise.
+        """
+        if threading.current_thread() is not threading.main_thread():
+            raise RuntimeError("CenterlineJob.run() must be called from the main thread, use start() instead")
+        self._runStages()
+        return self.results
+
+    def start(self, finishedCallback=None):
+        """Run the stages on a worker thread; finishedCallback(job) is called on the main thread at the end."""
+        self._finishedCallback = finishedCallback
+        self._thread = threading.Thread(target=self._runInThread, name="CenterlineJob", daemon=True)
+        self._timer = qt.QTimer()
+        self._timer.setInterval(self.POLL_INTERVAL_MS)
+        self._timer.connect("timeout()", self._poll)
+        self._thread.start()
+        self._timer.start()
+
+    def cancel(self):
+        self._cancelRequested.set()
+
+    def isRunning(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def callOnMainThread(self, function):
+        """Run function on the main thread and return its result (directly, if already on the main thread)."""
+        if threading.current_thread() is threading.main_thread():
+            return function()
+        call = {"function": function, "done": threading.Event()}
+        self._mainThreadCalls.put(call)
+        call["done"].wait()
+        if "error" in call:
+            raise call["error"]
+        return call.get("result")
+
+    def _runInThread(self):
+        try:
+            self._runStages()
+        except CenterlineJobCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+            import traceback
+            traceback.print_exc()
+
+    def _poll(self):
+        while True:
+            try:
+                call = self._mainThreadCalls.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                call["result"] = call["function"]()
+            except Exception as e:
+                call["error"] = e
+            call["done"].set()
+        if self._thread.is_alive() or not self._mainThreadCalls.empty():
+            return
+        self._timer.stop()
+        if self._finishedCallback:
+            self._finishedCallback(self)
+
+    def _runStages(self):
+        stages = {
+            "preprocess": self._preprocess,
+            "meshErrors": self._meshErrors,
+            "network": self._network,
+            "centerline": self._centerline,
+            "branches": self._branches,
+            "curves": self._curves,
+            }
+        for stageIndex, stageName in enumerate(self.stageNames):
+            if self._cancelRequested.is_set():
+                self.cancelled = True
+                logging.info(_("Centerline extraction cancelled before stage {0}").format(stageName))
+                raise CenterlineJobCancelled(stageName)
+            if self.progressCallback:
+                self.callOnMainThread(lambda: self.progressCallback(self, stageName, stageIndex, len(self.stageNames)))
+            startTime = time.time()
+            stages[stageName]()
+            self.stageTimes.append((stageName, time.time() - startTime))
+            logging.info(_("Centerline extraction stage {0} completed in {1:.2f} s").format(stageName, self.stageTimes[-1][1]))
+
+    def _setModelMesh(self, role, polyData, color, opacity=None, lineWidth=None):
+        modelNode = self.nodes.get(role)
+        if not modelNode:
+            return
+        # the worker thread keeps using polyData in the next stages, the node gets its own copy
+        meshPolyData = vtk.vtkPolyData()
+        meshPolyData.DeepCopy(polyData)
+        def update():
+            modelNode.SetAndObserveMesh(meshPolyData)
+            if not modelNode.GetDisplayNode():
+                modelNode.CreateDefaultDisplayNodes()
+                modelNode.GetDisplayNode().SetColor(*color)
+                if opacity is not None:
+                    modelNode.GetDisplayNode().SetOpacity(opacity)
+                if lineWidth is not None:
+                    modelNode.GetDisplayNode().SetLineWidth(lineWidth)
+                inputSurfaceModelNode = self.nodes.get("InputSurface")
+                if role in ("NetworkModel", "CenterlineModel") and inputSurfaceModelNode and inputSurfaceModelNode.GetDisplayNode():
+                    inputSurfaceModelNode.GetDisplayNode().SetOpacity(0.4)
+        self.callOnMainThread(update)
+
+    def _preprocess(self):
+        if self.preprocessEnabled:
+            preprocessedPolyData = self.logic.preprocess(self.inputSurfacePolyData, self.targetNumberOfPoints,
+                                                         self.decimationAggressiveness, self.subdivide,
+                                                         callOnMainThread=self.callOnMainThread)
+        else:
+            preprocessedPolyData = self.inputSurfacePolyData
+        self.results["preprocessedPolyData"] = preprocessedPolyData
+        self._setModelMesh("PreprocessedSurface", preprocessedPolyData, (1.0, 1.0, 0.0), opacity=0.4, lineWidth=2)
+
+    def _meshErrors(self):
+        nonManifoldEdgePositions = self.logic.extractNonManifoldEdges(self.results["preprocessedPolyData"])
+        self.results["nonManifoldEdgePositions"] = nonManifoldEdgePositions
+        meshErrorsMarkupsNode = self.nodes.get("MeshErrors")
+        if meshErrorsMarkupsNode:
+            def update():
+                meshErrorsMarkupsNode.RemoveAllControlPoints()
+                for pointIndex, position in enumerate(nonManifoldEdgePositions):
+                    meshErrorsMarkupsNode.AddControlPoint(vtk.vtkVector3d(position), "NME {0}".format(pointIndex))
+            self.callOnMainThread(update)
+        numberOfNonManifoldEdges = len(nonManifoldEdgePositions)
+        if numberOfNonManifoldEdges > 0:
+            logging.warning(_("Found {0} non-manifold edges.").format(numberOfNonManifoldEdges)
+                            + _(" Centerline computation may fail. Try to increase target point count or reduce decimation aggressiveness"))
+            # TODO: we could remove non-manifold edges by using vtkFeatureEdges
+
+    def _network(self):
+        networkPolyData = self.logic.extractNetwork(self.results["preprocessedPolyData"], self.endPoints, computeGeometry=True)
+        self.results["networkPolyData"] = networkPolyData
+        self._setModelMesh("NetworkModel", networkPolyData, (0.0, 0.0, 1.0))
+        networkCurveNode = self.nodes.get("NetworkCurve")
+        if networkCurveNode:
+            self.callOnMainThread(lambda: self.logic.addNetworkCurves(networkPolyData, networkCurveNode))
+        networkPropertiesTableNode = self.nodes.get("NetworkProperties")
+        if networkPropertiesTableNode:
+            self.callOnMainThread(lambda: self.logic.addNetworkProperties(networkPolyData, networkPropertiesTableNode))
+
+    def _centerline(self):
+        centerlinePolyData, voronoiDiagramPolyData = self.logic.extractCenterline(
+            self.results["preprocessedPolyData"], self.endPoints, self.curveSamplingDistance)
+        self.results["centerlinePolyData"] = centerlinePolyData
+        self.results["voronoiDiagramPolyData"] = voronoiDiagramPolyData
+        self._setModelMesh("CenterlineModel", centerlinePolyData, (0.0, 1.0, 0.0), lineWidth=3)
+        self._setModelMesh("VoronoiDiagram", voronoiDiagramPolyData, (0.0, 1.0, 0.0), opacity=0.2)
+
+    def _branches(self):
+        self.results["mergedCenterlines"] = self.logic.extractBranches(self.results["centerlinePolyData"], self.curveSamplingDistance)
+
+    def _curves(self):
+        self.callOnMainThread(lambda: self.logic.createCurveTreeFromMergedCenterlines(
+            self.results["mergedCenterlines"], self.nodes.get("CenterlineCurve"), self.nodes.get("CenterlineProperties")))
+
 #
 # ExtractCenterlineTest
 #
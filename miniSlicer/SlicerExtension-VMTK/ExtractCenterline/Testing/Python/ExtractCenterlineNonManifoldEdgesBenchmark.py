@@ -0,0 +1,111 @@
+"""
+Benchmark of ExtractCenterlineLogic.extractNonManifoldEdges on closed meshes of 10k to 2M triangles.
+
+The meshes are spheres with a few "fin" triangles attached to existing edges, so that each mesh
+has a known set of non-manifold edges. Up to --reference-limit triangles, the result and the
+run time are compared with the former implementation (Python loop over vtkvmtkNeighborhoods
+calling GetCellEdgeNeighbors per edge).
+
+Run in Slicer:
+    Slicer --no-main-window --python-script ExtractCenterlineNonManifoldEdgesBenchmark.py -- [--sizes 10000 100000] [--reference-limit 200000]
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+import vtk
+
+from ExtractCenterline import ExtractCenterlineLogic
+
+DEFAULT_SIZES = [10000, 100000, 500000, 1000000, 2000000]
+NUMBER_OF_FINS = 16
+
+
+def makeMesh(numberOfTriangles, numberOfFins=NUMBER_OF_FINS):
+    """Sphere of about numberOfTriangles triangles, plus fins; returns (polyData, sorted fin edges)."""
+    resolution = max(8, int(round(np.sqrt(numberOfTriangles / 2.0))))
+    sphere = vtk.vtkSphereSource()
+    sphere.SetThetaResolution(resolution)
+    sphere.SetPhiResolution(resolution + 1)
+    sphere.Update()
+    polyData = vtk.vtkPolyData()
+    polyData.DeepCopy(sphere.GetOutput())
+    points = polyData.GetPoints()
+    polys = polyData.GetPolys()
+    cellPointIds = vtk.vtkIdList()
+    finEdges = set()
+    for cellId in np.linspace(0, polyData.GetNumberOfCells() - 1, numberOfFins).astype(int):
+        polyData.GetCellPoints(int(cellId), cellPointIds)
+        a, b = cellPointIds.GetId(0), cellPointIds.GetId(1)
+        tip = points.InsertNextPoint(np.asarray(points.GetPoint(a)) * 1.5)
+        polys.InsertNextCell(3, [a, b, tip])
+        finEdges.add((min(a, b), max(a, b)))
+    polyData.Modified()
+    return polyData, sorted(finEdges)
+
+
+def referenceNonManifoldEdges(polyData):
+    """Former implementation: returns the sorted (i, j) point id pairs."""
+    import vtkvmtkDifferentialGeometryPython as vtkvmtkDifferentialGeometry
+    neighborhoods = vtkvmtkDifferentialGeometry.vtkvmtkNeighborhoods()
+    neighborhoods.SetNeighborhoodTypeToPolyDataManifoldNeighborhood()
+    neighborhoods.SetDataSet(polyData)
+    neighborhoods.Build()
+    polyData.BuildCells()
+    polyData.BuildLinks(0)
+    edges = []
+    neighborCellIds = vtk.vtkIdList()
+    for i in range(neighborhoods.GetNumberOfNeighborhoods()):
+        neighborhood = neighborhoods.GetNeighborhood(i)
+        for j in range(neighborhood.GetNumberOfPoints()):
+            neighborId = neighborhood.GetPointId(j)
+            if i < neighborId:
+                neighborCellIds.Initialize()
+                polyData.GetCellEdgeNeighbors(-1, i, neighborId, neighborCellIds)
+                if neighborCellIds.GetNumberOfIds() > 2:
+                    edges.append((i, neighborId))
+    return sorted(edges)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Benchmark of non-manifold edge extraction")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Numbers of triangles")
+    parser.add_argument("--reference-limit", type=int, default=200000,
+                        help="Largest mesh on which the former implementation is run")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per mesh (best is reported)")
+    args = parser.parse_args(argv)
+
+    logic = ExtractCenterlineLogic()
+    print(f"{'triangles':>10} {'points':>10} {'found':>6} {'array (s)':>10} {'loop (s)':>10} {'speedup':>8}")
+    for size in args.sizes:
+        polyData, finEdges = makeMesh(size)
+        times = []
+        for _ in range(args.repeat):
+            startTime = time.perf_counter()
+            edgesPolyData = vtk.vtkPolyData()
+            centers = logic.extractNonManifoldEdges(polyData, edgesPolyData)
+            times.append(time.perf_counter() - startTime)
+        edges = [tuple(edge) for edge in logic.nonManifoldEdgePointIds(polyData).tolist()]
+        if edges != finEdges or len(centers) != len(finEdges) or edgesPolyData.GetNumberOfLines() != len(finEdges):
+            raise RuntimeError(f"Unexpected non-manifold edges on the {size} triangle mesh")
+
+        referenceTime = float("nan")
+        if polyData.GetNumberOfCells() <= args.reference_limit:
+            startTime = time.perf_counter()
+            referenceEdges = referenceNonManifoldEdges(polyData)
+            referenceTime = time.perf_counter() - startTime
+            if referenceEdges != edges:
+                raise RuntimeError(f"Results differ from the former implementation on the {size} triangle mesh")
+        print(f"{polyData.GetNumberOfCells():>10} {polyData.GetNumberOfPoints():>10} {len(edges):>6} "
+              f"{min(times):>10.3f} {referenceTime:>10.3f} {referenceTime / min(times):>8.1f}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
+    try:
+        import slicer
+        slicer.util.exit()
+    except (ImportError, AttributeError):
+        pass